@@ -1,17 +1,21 @@
 from typing import Optional, List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Response, Form
 from pydantic import BaseModel, Field
+from dataclasses import fields
 from sqlalchemy.orm import Session
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.services.bandoeng_engine import (
     run_bandoeng_simulation,
+    run_bandoeng_sweep,
     BandoengInputVolumes,
     BandoengParameters,
     BandoengSimulationResult,
-    BandoengTaskResult
+    BandoengTaskResult,
 )
+from app.services.referentiel_snapshot import bump_referentiel_version, get_role_mapping, get_exclusions_optimisees, get_sites_rattaches
 
-from openpyxl import load_workbook, Workbook
+from app.services.excel_reader import open_workbook, iter_rows, SheetWindow
 import io
 from copy import deepcopy
 
@@ -442,7 +446,7 @@ def simulate_bandoeng(request: BandoengSimulateRequest, db: Session = Depends(ge
             cr_pct_hors_crbt=request.params.cr_pct_hors_crbt
         )
         
-        print(f"DEBUG: simulate_bandoeng received grid_values: {request.volumes.grid_values}")
+        trace(lambda: f"DEBUG: simulate_bandoeng received grid_values: {request.volumes.grid_values}")
         result = run_bandoeng_simulation(db, request.centre_id, volumes, params, request.poste_code)
         
         # Convert Engine Result to Response
@@ -506,6 +510,134 @@ class SimplifiedBandoengRequest(BaseModel):
     parameters: dict = Field(default_factory=dict, description="Paramètres de simulation")
     mode: str = Field(default="actuel", description="Mode de simulation: 'actuel', 'recommande' ou 'optimise'")
 
+
+def _params_from_dict(p: dict) -> BandoengParameters:
+    """Construit BandoengParameters depuis le dict `parameters` (noms Step4 ou alias frontend)."""
+    return BandoengParameters(
+        ed_percent=p.get('ed_percent', p.get('edPercent', p.get('pct_sac', 60.0))),
+        colis_amana_par_canva_sac=p.get('colis_amana_par_canva_sac', p.get('colisAmanaParCanvaSac', 35.0)),
+        nbr_co_sac=p.get('nbr_co_sac', 350.0),
+        nbr_cr_sac=p.get('nbr_cr_sac', 400.0),
+        # Noms Step4 en priorité, puis anciens alias frontend
+        coeff_circ=p.get('coeff_circ', p.get('taux_complexite', p.get('tauxComplexite', 1.0))),
+        coeff_geo=p.get('coeff_geo', p.get('nature_geo', p.get('natureGeo', 1.0))),
+        pct_retour=p.get('pct_retour', 0.0),
+        pct_collecte=p.get('pct_collecte', 0.0),
+        pct_guichet=p.get('pct_guichet', p.get('pctGuichet', 0.0)),
+        pct_axes=p.get('pct_axes', p.get('pct_axes_arrivee', 0.0)),
+        pct_local=p.get('pct_local', p.get('pct_axes_depart', 0.0)),
+        pct_international=p.get('pct_international', 0.0),
+        pct_national=p.get('pct_national', 100.0),
+        pct_marche_ordinaire=p.get('pct_marche_ordinaire', 0.0),
+        productivite=p.get('productivite', 100.0),
+        idle_minutes=p.get('idle_minutes', p.get('idleMinutes', 0.0)),
+        shift=int(p.get('shift', 1)),
+        duree_trajet=float(p.get('duree_trajet', p.get('dureeTrajet', 0.0))),
+        has_guichet=int(p.get('has_guichet', p.get('hasGuichet', 1))),
+        pct_mois=p.get('pct_mois'),
+        pct_vague_master=p.get('pct_vague_master', p.get('pctVagueMaster', 0.0)),
+        pct_boite_postale=p.get('pct_boite_postale', p.get('pctBoitePostale', 0.0)),
+        pct_crbt=p.get('pct_crbt', p.get('pctCrbt', 50.0)),
+        pct_hors_crbt=p.get('pct_hors_crbt', p.get('pctHorsCrbt', 50.0)),
+        # Saisonnalité par flux
+        pct_mois_amana=p.get('pct_mois_amana'),
+        pct_mois_co=p.get('pct_mois_co'),
+        pct_mois_cr=p.get('pct_mois_cr'),
+        pct_mois_lrh=p.get('pct_mois_lrh'),
+        pct_mois_ebarkia=p.get('pct_mois_ebarkia'),
+        pct_annee=p.get('pct_annee'),
+        cr_par_caisson=p.get('cr_par_caisson', 40.0),
+        # Taux par flux
+        amana_pct_annee=p.get('amana_pct_annee'),
+        co_pct_annee=p.get('co_pct_annee'),
+        cr_pct_annee=p.get('cr_pct_annee'),
+        lrh_pct_annee=p.get('lrh_pct_annee'),
+        ebarkia_pct_annee=p.get('ebarkia_pct_annee'),
+        # AMANA
+        amana_pct_collecte=p.get('amana_pct_collecte', p.get('amana_pctCollecte')),
+        amana_pct_guichet=p.get('amana_pct_guichet', p.get('amana_pctGuichet')),
+        amana_pct_retour=p.get('amana_pct_retour', p.get('amana_pctRetour')),
+        amana_pct_axes_arrivee=p.get('amana_pct_axes_arrivee', p.get('amana_pctAxesArrivee')),
+        amana_pct_axes_depart=p.get('amana_pct_axes_depart', p.get('amana_pctAxesDepart')),
+        amana_pct_national=p.get('amana_pct_national', p.get('amana_pctNational')),
+        amana_pct_international=p.get('amana_pct_international', p.get('amana_pctInternational')),
+        amana_pct_marche_ordinaire=p.get('amana_pct_marche_ordinaire', p.get('amana_pctMarcheOrdinaire')),
+        amana_pct_crbt=p.get('amana_pct_crbt', p.get('amana_pctCrbt')),
+        amana_pct_hors_crbt=p.get('amana_pct_hors_crbt', p.get('amana_pctHorsCrbt')),
+        # CO
+        co_pct_collecte=p.get('co_pct_collecte', p.get('co_pctCollecte')),
+        co_pct_guichet=p.get('co_pct_guichet', p.get('co_pctGuichet')),
+        co_pct_retour=p.get('co_pct_retour', p.get('co_pctRetour')),
+        co_pct_axes_arrivee=p.get('co_pct_axes_arrivee', p.get('co_pctAxesArrivee')),
+        co_pct_axes_depart=p.get('co_pct_axes_depart', p.get('co_pctAxesDepart')),
+        co_pct_national=p.get('co_pct_national', p.get('co_pctNational')),
+        co_pct_international=p.get('co_pct_international', p.get('co_pctInternational')),
+        co_pct_marche_ordinaire=p.get('co_pct_marche_ordinaire', p.get('co_pctMarcheOrdinaire')),
+        co_pct_vague_master=p.get('co_pct_vague_master', p.get('co_pctVagueMaster')),
+        co_pct_boite_postale=p.get('co_pct_boite_postale', p.get('co_pctBoitePostale')),
+        # CR
+        cr_pct_collecte=p.get('cr_pct_collecte', p.get('cr_pctCollecte')),
+        cr_pct_guichet=p.get('cr_pct_guichet', p.get('cr_pctGuichet')),
+        cr_pct_retour=p.get('cr_pct_retour', p.get('cr_pctRetour')),
+        cr_pct_axes_arrivee=p.get('cr_pct_axes_arrivee', p.get('cr_pctAxesArrivee')),
+        cr_pct_axes_depart=p.get('cr_pct_axes_depart', p.get('cr_pctAxesDepart')),
+        cr_pct_national=p.get('cr_pct_national', p.get('cr_pctNational')),
+        cr_pct_international=p.get('cr_pct_international', p.get('cr_pctInternational')),
+        cr_pct_marche_ordinaire=p.get('cr_pct_marche_ordinaire', p.get('cr_pctMarcheOrdinaire')),
+        cr_pct_vague_master=p.get('cr_pct_vague_master', p.get('cr_pctVagueMaster')),
+        cr_pct_crbt=p.get('cr_pct_crbt', p.get('cr_pctCrbt')),
+        cr_pct_hors_crbt=p.get('cr_pct_hors_crbt', p.get('cr_pctHorsCrbt'))
+    )
+
+
+def _params_valides(p: dict, contexte: str = "") -> BandoengParameters:
+    """
+    _params_from_dict avec contrôle et conversion des valeurs : champs numériques
+    en float (int pour shift / has_guichet), valeur vide traitée comme absente
+    (défaut habituel). Un paramètre non numérique est une erreur de la requête
+    (400), pas une erreur de calcul (500).
+    """
+    p = {k: v for k, v in (p or {}).items() if not (isinstance(v, str) and not v.strip())}
+    try:
+        params = _params_from_dict(p)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Paramètres invalides{contexte} : {e}")
+    for f in fields(params):
+        value = getattr(params, f.name)
+        if value is None:
+            continue
+        cast = int if type(f.default) is int else float
+        try:
+            setattr(params, f.name, cast(float(value)))
+        except (TypeError, ValueError):
+            raise HTTPException(status_code=400, detail=f"Paramètre '{f.name}' invalide{contexte} : {value!r}")
+    return params
+
+
+def _load_role_mapping(db: Session) -> Dict[str, str]:
+    """Mapping des responsables {source_code: cible_code} pour le mode recommandé (snapshot)."""
+    return get_role_mapping(db)
+
+
+def _load_optimise_exclusions(db: Session, centre_id: int) -> tuple:
+    """Exclusions du mode optimisé : (ids de tâches du centre, quadruplets de la typologie)."""
+    exclusions = get_exclusions_optimisees(db)
+
+    # --- 1. Exclusions par ID (Centre spécifique) ---
+    excluded_task_ids = list(exclusions.ids_by_centre.get(centre_id, ()))
+
+    # --- 2. Exclusions par Typologie (Quadruplet) ---
+    excluded_task_quadruplets = None
+    categorie_id = db.query(Centre.categorie_id).filter(Centre.id == centre_id).scalar()
+    if categorie_id:
+        # Normalisation pour match efficace dans l'engine
+        excluded_task_quadruplets = [
+            (normalize_ws(nom), normalize_ws(produit), normalize_ws(famille), normalize_ws(unite))
+            for nom, produit, famille, unite in exclusions.quads_by_categorie.get(categorie_id, ())
+        ]
+    return excluded_task_ids, excluded_task_quadruplets
+
+
 @router.post("/simulate-bandoeng", response_model=BandoengSimulateResponse)
 def simulate_bandoeng_direct(request: SimplifiedBandoengRequest, db: Session = Depends(get_db)):
     """
@@ -530,130 +662,21 @@ def simulate_bandoeng_direct(request: SimplifiedBandoengRequest, db: Session = D
         )
         
         # 2. Construire BandoengParameters depuis le dict parameters
-        p = request.parameters
-        params = BandoengParameters(
-            ed_percent=p.get('ed_percent', p.get('edPercent', p.get('pct_sac', 60.0))),
-            colis_amana_par_canva_sac=p.get('colis_amana_par_canva_sac', p.get('colisAmanaParCanvaSac', 35.0)),
-            nbr_co_sac=p.get('nbr_co_sac', 350.0),
-            nbr_cr_sac=p.get('nbr_cr_sac', 400.0),
-            # Noms Step4 en priorité, puis anciens alias frontend
-            coeff_circ=p.get('coeff_circ', p.get('taux_complexite', p.get('tauxComplexite', 1.0))),
-            coeff_geo=p.get('coeff_geo', p.get('nature_geo', p.get('natureGeo', 1.0))),
-            pct_retour=p.get('pct_retour', 0.0),
-            pct_collecte=p.get('pct_collecte', 0.0),
-            pct_guichet=p.get('pct_guichet', p.get('pctGuichet', 0.0)),
-            pct_axes=p.get('pct_axes', p.get('pct_axes_arrivee', 0.0)),
-            pct_local=p.get('pct_local', p.get('pct_axes_depart', 0.0)),
-            pct_international=p.get('pct_international', 0.0),
-            pct_national=p.get('pct_national', 100.0),
-            pct_marche_ordinaire=p.get('pct_marche_ordinaire', 0.0),
-            productivite=p.get('productivite', 100.0),
-            idle_minutes=p.get('idle_minutes', p.get('idleMinutes', 0.0)),
-            shift=int(p.get('shift', 1)),
-            duree_trajet=float(p.get('duree_trajet', p.get('dureeTrajet', 0.0))),
-            has_guichet=int(p.get('has_guichet', p.get('hasGuichet', 1))),
-            pct_mois=p.get('pct_mois'),
-            pct_vague_master=p.get('pct_vague_master', p.get('pctVagueMaster', 0.0)),
-            pct_boite_postale=p.get('pct_boite_postale', p.get('pctBoitePostale', 0.0)),
-            pct_crbt=p.get('pct_crbt', p.get('pctCrbt', 50.0)),
-            pct_hors_crbt=p.get('pct_hors_crbt', p.get('pctHorsCrbt', 50.0)),
-            # Saisonnalité par flux
-            pct_mois_amana=p.get('pct_mois_amana'),
-            pct_mois_co=p.get('pct_mois_co'),
-            pct_mois_cr=p.get('pct_mois_cr'),
-            pct_mois_lrh=p.get('pct_mois_lrh'),
-            pct_mois_ebarkia=p.get('pct_mois_ebarkia'),
-            pct_annee=p.get('pct_annee'),
-            cr_par_caisson=p.get('cr_par_caisson', 40.0),
-            # Taux par flux
-            amana_pct_annee=p.get('amana_pct_annee'),
-            co_pct_annee=p.get('co_pct_annee'),
-            cr_pct_annee=p.get('cr_pct_annee'),
-            lrh_pct_annee=p.get('lrh_pct_annee'),
-            ebarkia_pct_annee=p.get('ebarkia_pct_annee'),
-            # AMANA
-            amana_pct_collecte=p.get('amana_pct_collecte', p.get('amana_pctCollecte')),
-            amana_pct_guichet=p.get('amana_pct_guichet', p.get('amana_pctGuichet')),
-            amana_pct_retour=p.get('amana_pct_retour', p.get('amana_pctRetour')),
-            amana_pct_axes_arrivee=p.get('amana_pct_axes_arrivee', p.get('amana_pctAxesArrivee')),
-            amana_pct_axes_depart=p.get('amana_pct_axes_depart', p.get('amana_pctAxesDepart')),
-            amana_pct_national=p.get('amana_pct_national', p.get('amana_pctNational')),
-            amana_pct_international=p.get('amana_pct_international', p.get('amana_pctInternational')),
-            amana_pct_marche_ordinaire=p.get('amana_pct_marche_ordinaire', p.get('amana_pctMarcheOrdinaire')),
-            amana_pct_crbt=p.get('amana_pct_crbt', p.get('amana_pctCrbt')),
-            amana_pct_hors_crbt=p.get('amana_pct_hors_crbt', p.get('amana_pctHorsCrbt')),
-            # CO
-            co_pct_collecte=p.get('co_pct_collecte', p.get('co_pctCollecte')),
-            co_pct_guichet=p.get('co_pct_guichet', p.get('co_pctGuichet')),
-            co_pct_retour=p.get('co_pct_retour', p.get('co_pctRetour')),
-            co_pct_axes_arrivee=p.get('co_pct_axes_arrivee', p.get('co_pctAxesArrivee')),
-            co_pct_axes_depart=p.get('co_pct_axes_depart', p.get('co_pctAxesDepart')),
-            co_pct_national=p.get('co_pct_national', p.get('co_pctNational')),
-            co_pct_international=p.get('co_pct_international', p.get('co_pctInternational')),
-            co_pct_marche_ordinaire=p.get('co_pct_marche_ordinaire', p.get('co_pctMarcheOrdinaire')),
-            co_pct_vague_master=p.get('co_pct_vague_master', p.get('co_pctVagueMaster')),
-            co_pct_boite_postale=p.get('co_pct_boite_postale', p.get('co_pctBoitePostale')),
-            # CR
-            cr_pct_collecte=p.get('cr_pct_collecte', p.get('cr_pctCollecte')),
-            cr_pct_guichet=p.get('cr_pct_guichet', p.get('cr_pctGuichet')),
-            cr_pct_retour=p.get('cr_pct_retour', p.get('cr_pctRetour')),
-            cr_pct_axes_arrivee=p.get('cr_pct_axes_arrivee', p.get('cr_pctAxesArrivee')),
-            cr_pct_axes_depart=p.get('cr_pct_axes_depart', p.get('cr_pctAxesDepart')),
-            cr_pct_national=p.get('cr_pct_national', p.get('cr_pctNational')),
-            cr_pct_international=p.get('cr_pct_international', p.get('cr_pctInternational')),
-            cr_pct_marche_ordinaire=p.get('cr_pct_marche_ordinaire', p.get('cr_pctMarcheOrdinaire')),
-            cr_pct_vague_master=p.get('cr_pct_vague_master', p.get('cr_pctVagueMaster')),
-            cr_pct_crbt=p.get('cr_pct_crbt', p.get('cr_pctCrbt')),
-            cr_pct_hors_crbt=p.get('cr_pct_hors_crbt', p.get('cr_pctHorsCrbt'))
-        )
-        
+        params = _params_valides(request.parameters)
+
         # 2.5 Charger le mapping des responsables si mode recommande
         role_mapping = None
         if request.mode == "recommande":
-            mappings = db.query(MappingPosteRecommande).all()
-            # On construit un dictionnaire {source_code: cible_code}
-            # En utilisant les relations pour récupérer les Codes
-            role_mapping = {}
-            for m in mappings:
-                if m.poste_source and m.poste_cible:
-                    role_mapping[m.poste_source.Code] = m.poste_cible.Code
-
-        print(f"DEBUG: simulate_bandoeng_direct received grid_values: {request.grid_values}")
+            role_mapping = _load_role_mapping(db)
+
+        trace(lambda: f"DEBUG: simulate_bandoeng_direct received grid_values: {request.grid_values}")
         
         # 3.6 Gérer les exclusions pour le mode optimisé
         excluded_task_ids = None
         excluded_task_quadruplets = None
         
         if request.mode == "optimise":
-            # --- 1. Exclusions par ID (Centre spécifique) ---
-            excl_ids_query = db.query(TacheExclueOptimisee.tache_id).filter(
-                TacheExclueOptimisee.centre_id == request.centre_id,
-                TacheExclueOptimisee.tache_id.isnot(None)
-            )
-            excluded_task_ids = [r[0] for r in excl_ids_query.all()]
-            
-            # --- 2. Exclusions par Typologie (Quadruplet) ---
-            centre = db.query(Centre).filter(Centre.id == request.centre_id).first()
-            if centre and centre.categorie_id:
-                excl_quads_query = db.query(
-                    TacheExclueOptimisee.nom_tache,
-                    TacheExclueOptimisee.produit,
-                    TacheExclueOptimisee.famille_uo,
-                    TacheExclueOptimisee.unite_mesure
-                ).filter(
-                    TacheExclueOptimisee.categorie_id == centre.categorie_id,
-                    TacheExclueOptimisee.nom_tache.isnot(None)
-                )
-                
-                # Normalisation pour match efficace dans l'engine
-                def clean_q(s):
-                    if not s: return ""
-                    return "".join(str(s).split()).lower()
-                
-                excluded_task_quadruplets = [
-                    (clean_q(q.nom_tache), clean_q(q.produit), clean_q(q.famille_uo), clean_q(q.unite_mesure))
-                    for q in excl_quads_query.all()
-                ]
+            excluded_task_ids, excluded_task_quadruplets = _load_optimise_exclusions(db, request.centre_id)
 
         # 3. Appeler run_bandoeng_simulation
         result = run_bandoeng_simulation(
@@ -666,7 +689,7 @@ def simulate_bandoeng_direct(request: SimplifiedBandoengRequest, db: Session = D
             excluded_task_ids=excluded_task_ids,
             excluded_task_quadruplets=excluded_task_quadruplets
         )
-        print(f"DEBUG: result.total_heures={result.total_heures}, result.total_ressources_humaines={result.total_ressources_humaines}")
+        trace(lambda: f"DEBUG: result.total_heures={result.total_heures}, result.total_ressources_humaines={result.total_ressources_humaines}")
         
         # 3.5 Calculer les ressources actuelles agrégées par poste si mode recommande
         ressources_actuelles_par_poste = {}
@@ -752,12 +775,133 @@ def simulate_bandoeng_direct(request: SimplifiedBandoengRequest, db: Session = D
             debug_info=result.debug_info
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Erreur simulation Bandoeng: {str(e)}")
 
 
+# --- Balayage de paramètres (N jeux de paramètres, un seul centre) ---
+MAX_SWEEP_COMBINATIONS = 2000
+
+
+class BandoengSweepRequest(BaseModel):
+    """
+    Même entrée que /simulate-bandoeng, plus les variations à évaluer.
+    Les combinaisons = chaque scénario x produit cartésien des axes de `sweep`
+    (ex: {"productivite": [80, 90, 100], "shift": [1, 2, 3]} -> 9 combinaisons).
+    """
+    centre_id: int = Field(..., description="ID du centre")
+    poste_code: Optional[str] = Field(default=None, description="Code du poste (optionnel)")
+    grid_values: dict = Field(default_factory=dict, description="Valeurs de la grille Bandoeng")
+    parameters: dict = Field(default_factory=dict, description="Paramètres de base")
+    sweep: Dict[str, List[Any]] = Field(default_factory=dict, description="Axes à balayer: {parametre: [valeurs]}")
+    scenarios: List[dict] = Field(default_factory=list, description="Jeux de surcharges explicites")
+    mode: str = Field(default="actuel", description="Mode de simulation: 'actuel', 'recommande' ou 'optimise'")
+
+
+class BandoengSweepPoint(BaseModel):
+    overrides: dict
+    total_heures: float
+    heures_net_jour: float
+    fte_calcule: float
+    fte_arrondi: int
+    total_ressources_humaines: float
+    ressources_par_poste: dict = {}
+
+
+class BandoengSweepResponse(BaseModel):
+    centre_id: int
+    mode: str
+    combinations: int
+    postes: List[str] = []
+    # matrix[i][j] = ETP du poste postes[j] pour la combinaison results[i]
+    matrix: List[List[float]] = []
+    results: List[BandoengSweepPoint] = []
+
+
+def _expand_sweep(scenarios: List[dict], sweep: Dict[str, List[Any]]) -> List[dict]:
+    """Liste des surcharges à évaluer : scénarios x produit cartésien des axes."""
+    from itertools import product
+
+    axes = [(k, v) for k, v in sweep.items() if v]
+    keys = [k for k, _ in axes]
+    combos = []
+    for scenario in (scenarios or [{}]):
+        for values in product(*(v for _, v in axes)):
+            combos.append({**scenario, **dict(zip(keys, values))})
+    return combos
+
+
+@router.post("/simulate-bandoeng-sweep", response_model=BandoengSweepResponse)
+def simulate_bandoeng_sweep(request: BandoengSweepRequest, db: Session = Depends(get_db)):
+    """
+    Évalue N jeux de paramètres pour un même centre en un seul appel.
+    Tâches, mapping et exclusions sont chargés une fois ; seuls les agrégats
+    (ETP, ressources par poste) sont restitués pour chaque combinaison.
+    """
+    combos = _expand_sweep(request.scenarios, request.sweep)
+    if len(combos) > MAX_SWEEP_COMBINATIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Trop de combinaisons ({len(combos)}), maximum {MAX_SWEEP_COMBINATIONS}"
+        )
+
+    params_list = [
+        _params_valides({**request.parameters, **o}, f" (combinaison {i + 1} : {o})")
+        for i, o in enumerate(combos)
+    ]
+
+    try:
+        volumes = BandoengInputVolumes(grid_values=request.grid_values)
+
+        role_mapping = _load_role_mapping(db) if request.mode == "recommande" else None
+        excluded_task_ids = None
+        excluded_task_quadruplets = None
+        if request.mode == "optimise":
+            excluded_task_ids, excluded_task_quadruplets = _load_optimise_exclusions(db, request.centre_id)
+
+        results = run_bandoeng_sweep(
+            db=db,
+            centre_id=request.centre_id,
+            volumes=volumes,
+            params_list=params_list,
+            poste_code=request.poste_code,
+            role_mapping=role_mapping,
+            excluded_task_ids=excluded_task_ids,
+            excluded_task_quadruplets=excluded_task_quadruplets
+        )
+
+        # Colonnes de la matrice : postes dans l'ordre de première apparition
+        postes = list(dict.fromkeys(k for r in results for k in r.ressources_par_poste))
+        matrix = [[r.ressources_par_poste.get(k, 0.0) for k in postes] for r in results]
+
+        return BandoengSweepResponse(
+            centre_id=request.centre_id,
+            mode=request.mode,
+            combinations=len(combos),
+            postes=postes,
+            matrix=matrix,
+            results=[
+                BandoengSweepPoint(
+                    overrides=o,
+                    total_heures=r.total_heures,
+                    heures_net_jour=r.heures_net_jour,
+                    fte_calcule=r.fte_calcule,
+                    fte_arrondi=r.fte_arrondi,
+                    total_ressources_humaines=r.total_ressources_humaines,
+                    ressources_par_poste=r.ressources_par_poste
+                ) for o, r in zip(combos, results)
+            ]
+        )
+
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"Erreur balayage Bandoeng: {str(e)}")
+
 
 # --- New Response Model for Centre Details ---
 class BandoengCentreDetailsResponse(BaseModel):
@@ -834,6 +978,9 @@ def get_bandoeng_centre_details(centre_id: int, db: Session = Depends(get_db)):
         
         # 5. Compter les tâches du centre
         task_count = db.query(Tache).join(CentrePoste).filter(CentrePoste.centre_id == centre_id).count()
+
+        # 6. Sites rattachés (snapshot référentiel)
+        sites = get_sites_rattaches(db).get(centre_id, ())
                 
         return BandoengCentreDetailsResponse(
             centre_id=centre.id,
@@ -845,8 +992,8 @@ def get_bandoeng_centre_details(centre_id: int, db: Session = Depends(get_db)):
             mod_global=int(mod_sum),
             total_global=int(moi_sum + mod_sum),
             task_count=task_count,
-            sites_count=len(centre.attached_sites) if centre.attached_sites else 0,
-            sites=[s.label for s in centre.attached_sites] if centre.attached_sites else [],
+            sites_count=len(sites),
+            sites=[s["label"] for s in sites],
             nature_geo=float(ville_data.geographie) if ville_data else 0.0,
             taux_complexite=float(ville_data.circulation) if ville_data else 0.0,
             duree_trajet=float(ville_data.trajet) if ville_data else 0.0,
@@ -913,7 +1060,7 @@ def list_bandoeng_postes(
 
         result = []
         if rows:
-            print(f"DEBUG BACKEND: First row category = {rows[0].categorie} | Raw Hie = {rows[0].raw_hie}")
+            trace(lambda: f"DEBUG BACKEND: First row category = {rows[0].categorie} | Raw Hie = {rows[0].raw_hie}")
             
         for r in rows:
             effectif_actuel = float(r.effectif_actuel or 0)
@@ -944,8 +1091,9 @@ def list_bandoeng_postes(
 async def import_bandoeng_volumes(file: UploadFile = File(...)):
     try:
         content = await file.read()
-        wb = load_workbook(filename=io.BytesIO(content), data_only=True)
-        ws = wb.active
+        wb = open_workbook(content)
+        ws = SheetWindow(wb.active, max_row=14, max_col=7)
+        wb.close()
         
         grid_values = {
             "amana": {
@@ -1050,6 +1198,7 @@ def get_import_template(
     une région, ou globalement.
     Groupement par (nom_tache, produit, famille_uo, unite_mesure).
     """
+    from openpyxl import Workbook
     from app.models.db_models import Tache, CentrePoste, Poste, Centre
     from sqlalchemy import and_
 
@@ -1170,6 +1319,7 @@ async def import_bandoeng_tasks(
     Importe les tâches depuis un fichier Excel et met à jour les responsables et chronos.
     Gère la duplication des tâches si deux responsables sont fournis.
     """
+    from openpyxl import load_workbook, Workbook
     try:
         content = await file.read()
         wb = load_workbook(filename=io.BytesIO(content), data_only=True)
@@ -1364,6 +1514,7 @@ async def import_bandoeng_tasks(
                      updated_count += 1
 
         db.commit()
+        bump_referentiel_version("taches", "postes")
 
         if failed_rows:
             ewb = Workbook()
@@ -1404,6 +1555,7 @@ async def import_bandoeng_tasks(
 
 @router.get("/new-tasks-template")
 def get_new_tasks_template():
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Modele Nouvelles Taches"
@@ -1556,6 +1708,7 @@ async def import_new_tasks(
     file: UploadFile = File(...), 
     db: Session = Depends(get_db)
 ):
+    from openpyxl import Workbook
     import openpyxl
     from openpyxl import Workbook
     
@@ -1567,6 +1720,7 @@ async def import_new_tasks(
         created_count, failed_rows = _process_task_import_workbook(db, centre_id, ws)
         
         db.commit()
+        bump_referentiel_version("taches", "postes")
 
         # If errors, return Excel file
         if failed_rows:
@@ -1664,6 +1818,7 @@ async def auto_import_tasks(
         created_count, failed_rows = _process_task_import_workbook(db, centre_id, ws)
         
         db.commit()
+        bump_referentiel_version("taches", "postes")
         
         return {
             "success": True,
@@ -1687,6 +1842,7 @@ async def export_rejections(request: ExportRejectionsRequest):
     """
     Génère un fichier Excel à partir des lignes en échec.
     """
+    from openpyxl import Workbook
     try:
         from openpyxl import Workbook
         import io
@@ -1794,11 +1950,13 @@ def toggle_exclusion(data: ToggleExclusionIn, db: Session = Depends(get_db)):
     if existing:
         db.delete(existing)
         db.commit()
+        bump_referentiel_version("exclusions")
         return {"status": "removed"}
     else:
         new_excl = TacheExclueOptimisee(**data.dict())
         db.add(new_excl)
         db.commit()
+        bump_referentiel_version("exclusions")
         return {"status": "added"}
 
 @router.get("/categories")
@@ -1841,11 +1999,11 @@ def get_standard_tasks(categorie_id: int, db: Session = Depends(get_db)):
     if not file_path.exists():
         file_path = resources_dir / "Standard.xlsx"
 
-    print(f"DEBUG PM: Loading typology tasks from {file_path} for category {typology_label}")
+    trace(lambda: f"DEBUG PM: Loading typology tasks from {file_path} for category {typology_label}")
 
     tasks = []
     if not file_path.exists():
-        print(f"DEBUG PM: File NOT FOUND at {file_path}")
+        trace(lambda: f"DEBUG PM: File NOT FOUND at {file_path}")
         return tasks
 
     try:
@@ -1925,7 +2083,7 @@ async def import_exclusions(
         raise HTTPException(status_code=404, detail="Typologie non trouvée")
 
     content = await file.read()
-    wb = openpyxl.load_workbook(BytesIO(content), data_only=True)
+    wb = open_workbook(content)
     ws = wb.worksheets[0]
 
     # Get standard tasks for this typology to validate
@@ -1944,8 +2102,8 @@ async def import_exclusions(
     valid_by_key = {}
     failed_rows = []
 
-    for row_idx in range(2, ws.max_row + 1):
-        cells = [ws.cell(row=row_idx, column=c).value for c in range(1, 5)]
+    for row_idx, values in iter_rows(ws, min_row=2, max_col=4):
+        cells = list(values) + [None] * (4 - len(values))
         if not cells[0]:
             continue
 
@@ -1961,6 +2119,7 @@ async def import_exclusions(
             continue
 
         valid_by_key[key] = (nom, produit, famille, unite)
+    wb.close()
 
     # 2) Remplacement complet pour cette typologie : exclusions « quadruplet » uniquement
     #    (pas les exclusions par centre qui utilisent tache_id)
@@ -1983,6 +2142,7 @@ async def import_exclusions(
 
     created_count = len(valid_by_key)
     db.commit()
+    bump_referentiel_version("exclusions")
 
     if failed_rows:
         # Generate Rejection Excel
@@ -2062,6 +2222,7 @@ def create_mapping(mapping: MappingPosteIn, db: Session = Depends(get_db)):
         existing = db_mapping
         
     db.commit()
+    bump_referentiel_version("mappings")
     db.refresh(existing)
     
     # Enrich for response
@@ -2081,10 +2242,12 @@ def delete_mapping(mapping_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Mapping non trouvé")
     db.delete(db_mapping)
     db.commit()
+    bump_referentiel_version("mappings")
     return {"success": True}
 
 @router.get("/mappings/template")
 def get_mappings_template():
+    from openpyxl import Workbook
     wb = Workbook()
     ws = wb.active
     ws.title = "Modele Mapping"
@@ -2106,9 +2269,10 @@ def get_mappings_template():
 
 @router.post("/mappings/import")
 async def import_mappings(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    from openpyxl import Workbook
     try:
         content = await file.read()
-        wb = load_workbook(io.BytesIO(content), data_only=True)
+        wb = open_workbook(content)
         ws = wb.active
         
         created = 0
@@ -2118,10 +2282,8 @@ async def import_mappings(file: UploadFile = File(...), db: Session = Depends(ge
         # Headers pour le rapport de rejets
         headers = ["Poste Source (Actuel)", "Poste Cible (Recommande)", "Centre ID (Optionnel)", "Raison du rejet"]
         
-        for row_idx in range(2, ws.max_row + 1):
-            source_lbl = ws.cell(row=row_idx, column=1).value
-            target_lbl = ws.cell(row=row_idx, column=2).value
-            c_id = ws.cell(row=row_idx, column=3).value
+        for row_idx, values in iter_rows(ws, min_row=2, max_col=3):
+            source_lbl, target_lbl, c_id = (tuple(values) + (None, None, None))[:3]
             
             if source_lbl is None and target_lbl is None:
                 continue
@@ -2164,8 +2326,10 @@ async def import_mappings(file: UploadFile = File(...), db: Session = Depends(ge
                 )
                 db.add(new_m)
                 created += 1
+        wb.close()
         
         db.commit()
+        bump_referentiel_version("mappings")
         
         if failed_rows:
             ewb = Workbook()
@@ -2202,6 +2366,7 @@ def get_unmapped_report(db: Session = Depends(get_db)):
     # Récupérer tous les postes qui existent dans CentrePoste (donc actifs dans un centre)
     # et qui n'ont pas de mapping global (centre_id IS NULL)
     
+    from openpyxl import Workbook
     sql = """
     SELECT DISTINCT p.id, p.label, p.Code
     FROM dbo.postes p
@@ -5,32 +5,34 @@ Endpoints:
   GET  /batch/template/regional?region_id={id}   → Excel template pour une région
   GET  /batch/template/national                   → Excel template pour tout le réseau
   POST /batch/simulate                            → Lance la simulation sur le fichier importé
+  POST /batch/simulate-comparatif                 → Les 3 modes (actuel / recommande / optimise)
+  POST /batch/simulate/stream                     → Idem /simulate, résultats en flux NDJSON
+  POST /batch/simulate-comparatif/stream          → Idem /simulate-comparatif, en flux NDJSON
 """
 
-from typing import Optional, List
+from typing import Iterator, Optional, List
 from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import text
-import asyncio
+from sqlalchemy import text, bindparam
+from starlette.concurrency import run_in_threadpool
+from copy import deepcopy
 import io
-import openpyxl
-from openpyxl.styles import Alignment, Font, PatternFill, Border, Side, Color, Protection
-from openpyxl.utils import get_column_letter
+import json
 
 from app.core.db import get_db
 from app.services.bandoeng_engine import (
-    run_bandoeng_simulation,
-    BandoengInputVolumes,
+    compile_bandoeng_plan,
+    load_bandoeng_tasks_by_centre,
+    load_poste_map,
     BandoengParameters,
+    BULK_IN_CHUNK_SIZE,
 )
+from app.services.batch_compute import compute_centres_incremental, iter_centres_incremental, incremental_report
+from app.services.excel_reader import open_workbook, iter_sheets, SheetWindow
 from app.services.taches_service import auto_import_tasks_if_empty
-from app.models.db_models import CentrePoste, Poste, Centre
-try:
-    from app.models.db_models import MappingPosteRecommande, TacheExclueOptimisee
-except ImportError:
-    MappingPosteRecommande = None
-    TacheExclueOptimisee = None
+from app.services.referentiel_snapshot import get_role_mapping, get_exclusions_optimisees
+from app.models.db_models import CentrePoste, Poste
 
 
 router = APIRouter(prefix="/batch", tags=["Batch Simulation"])
@@ -39,6 +41,7 @@ router = APIRouter(prefix="/batch", tags=["Batch Simulation"])
 # Styles helpers
 # ─────────────────────────────────────────────────────────────────────────────
 def _styles():
+    from openpyxl.styles import Alignment, Font, PatternFill, Border, Side
     center = Alignment(horizontal="center", vertical="center", wrap_text=True)
     bold = Font(bold=True)
     title_font = Font(bold=True, size=12, color="FFFFFF")
@@ -215,7 +218,10 @@ PARAMS_FLUX_MAP = {
 # ─────────────────────────────────────────────────────────────────────────────
 # Core: generate template workbook
 # ─────────────────────────────────────────────────────────────────────────────
-def _build_template_workbook(centres: list) -> openpyxl.Workbook:
+def _build_template_workbook(centres: list) -> "openpyxl.Workbook":
+    import openpyxl
+    from openpyxl.styles import Alignment, Font, PatternFill, Protection
+    from openpyxl.utils import get_column_letter
     s = _styles()
     wb = openpyxl.Workbook()
     wb.remove(wb.active)
@@ -715,11 +721,15 @@ def _recalculate_grid_values_like_wizard(grid_values: dict, raw_params: dict) ->
     return grid_values
 
 
-def _parse_sheet_params(ws, start_row: int = 12) -> dict:
+PARAMS_START_ROW = 12
+PARAMS_SCAN_ROWS = 100
+
+
+def _parse_sheet_params(ws, start_row: int = PARAMS_START_ROW) -> dict:
     """Scan rows from start_row looking for parameter keys in column 1."""
     params = {}
     # On scanne un range large car la section des paramètres s'est agrandie
-    for row in range(start_row, start_row + 100):
+    for row in range(start_row, start_row + PARAMS_SCAN_ROWS):
         key = ws.cell(row=row, column=1).value
         val = ws.cell(row=row, column=3).value
         if key and isinstance(key, str) and not key.startswith("SECTION"):
@@ -784,7 +794,35 @@ def _normalize_params_like_wizard(params: dict) -> dict:
     return p
 
 
-def _fill_city_params_from_db_if_missing(db: Session, centre_id: int, raw_params: dict) -> dict:
+def _load_city_params(db: Session, centre_ids: list) -> dict:
+    """
+    Paramètres Ville (coeff_geo/coeff_circ/duree_trajet) de tous les centres du batch,
+    en une requête par tranche d'IDs : {centre_id: row}.
+    """
+    out: dict = {}
+    ids = sorted({int(c) for c in centre_ids})
+    for i in range(0, len(ids), BULK_IN_CHUNK_SIZE):
+        rows = db.execute(
+            text(
+                """
+                SELECT
+                    c.id AS centre_id,
+                    v.geographie AS coeff_geo_db,
+                    v.circulation AS coeff_circ_db,
+                    v.trajet AS duree_trajet_db
+                FROM dbo.centres c
+                LEFT JOIN dbo.Ville v ON v.Code = c.code_ville
+                WHERE c.id IN :cids
+                """
+            ).bindparams(bindparam("cids", expanding=True)),
+            {"cids": ids[i:i + BULK_IN_CHUNK_SIZE]},
+        ).mappings().all()
+        for row in rows:
+            out[int(row["centre_id"])] = row
+    return out
+
+
+def _fill_city_params_if_missing(raw_params: dict, city_row) -> dict:
     """
     Dans le Wizard, coeff_geo/coeff_circ/duree_trajet sont pré-remplis depuis la BD (Ville du centre).
     Dans Excel, on les pré-remplit dans le template, mais à l'import on garantit aussi le fallback BD
@@ -795,33 +833,15 @@ def _fill_city_params_from_db_if_missing(db: Session, centre_id: int, raw_params
     def is_missing(k: str) -> bool:
         return k not in p or p.get(k) is None
 
-    if not (is_missing("coeff_geo") or is_missing("coeff_circ") or is_missing("duree_trajet")):
-        return p
-
-    row = db.execute(
-        text(
-            """
-            SELECT
-                v.geographie AS coeff_geo_db,
-                v.circulation AS coeff_circ_db,
-                v.trajet AS duree_trajet_db
-            FROM dbo.centres c
-            LEFT JOIN dbo.Ville v ON v.Code = c.code_ville
-            WHERE c.id = :cid
-            """
-        ),
-        {"cid": int(centre_id)},
-    ).mappings().first()
-
-    if not row:
+    if not city_row:
         return p
 
-    if is_missing("coeff_geo") and row.get("coeff_geo_db") is not None:
-        p["coeff_geo"] = float(row["coeff_geo_db"])
-    if is_missing("coeff_circ") and row.get("coeff_circ_db") is not None:
-        p["coeff_circ"] = float(row["coeff_circ_db"])
-    if is_missing("duree_trajet") and row.get("duree_trajet_db") is not None:
-        p["duree_trajet"] = float(row["duree_trajet_db"])
+    if is_missing("coeff_geo") and city_row.get("coeff_geo_db") is not None:
+        p["coeff_geo"] = float(city_row["coeff_geo_db"])
+    if is_missing("coeff_circ") and city_row.get("coeff_circ_db") is not None:
+        p["coeff_circ"] = float(city_row["coeff_circ_db"])
+    if is_missing("duree_trajet") and city_row.get("duree_trajet_db") is not None:
+        p["duree_trajet"] = float(city_row["duree_trajet_db"])
 
     return p
 
@@ -888,31 +908,26 @@ def _params_to_engine(p: dict) -> BandoengParameters:
 # ─────────────────────────────────────────────────────────────────────────────
 # Endpoint 3: Simulate Batch
 # ─────────────────────────────────────────────────────────────────────────────
-@router.post("/simulate")
-async def simulate_batch(
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    region_id: Optional[int] = Query(default=None, description="Filtre centres par région (pour template régional)"),
-    process_mode: str = Query(default="actuel", description="Mode de calcul : actuel | recommande | optimise"),
-):
+def _normalize_sheet_key(name: str) -> str:
     """
-    Parse the imported Excel file and run Bandoeng simulation for each sheet.
-    Returns results per centre + aggregated by region + national total.
+    Normalise un nom d'onglet ou de centre pour le matching:
+    - trim
+    - passe en minuscule
+    - supprime tous les espaces (y compris multiples)
     """
-    content = await file.read()
+    if not name:
+        return ""
+    # "".join(split()) supprime tous les espaces, tabulations, etc.
+    return "".join(str(name).split()).lower()
 
-    try:
-        wb = openpyxl.load_workbook(io.BytesIO(content), data_only=True)
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Fichier Excel invalide : {str(e)}")
 
-    # Build mapping sheet_name -> centre (strict matching)
-    # On limite d'abord les centres à la région si `region_id` est fourni.
+def _load_sheet_centres(db: Session, region_id: Optional[int]) -> dict:
+    """Build mapping sheet_name -> centre (strict matching), limité à la région si fournie."""
     if region_id:
         centres_db = db.execute(
             text(
                 """
-                SELECT c.id, c.label, r.id AS region_id, r.label AS region_label
+                SELECT c.id, c.label, c.categorie_id, r.id AS region_id, r.label AS region_label
                 FROM dbo.centres c
                 JOIN dbo.regions r ON r.id = c.region_id
                 WHERE c.region_id = :rid
@@ -926,7 +941,7 @@ async def simulate_batch(
         centres_db = db.execute(
             text(
                 """
-                SELECT c.id, c.label, r.id AS region_id, r.label AS region_label
+                SELECT c.id, c.label, c.categorie_id, r.id AS region_id, r.label AS region_label
                 FROM dbo.centres c
                 JOIN dbo.regions r ON r.id = c.region_id
                 WHERE c.categorie_id IS NOT NULL
@@ -945,240 +960,211 @@ async def simulate_batch(
         used_names.add(name)
         return name
 
-    def _normalize_sheet_key(name: str) -> str:
-        """
-        Normalise un nom d'onglet ou de centre pour le matching:
-        - trim
-        - passe en minuscule
-        - supprime tous les espaces (y compris multiples)
-        """
-        if not name:
-            return ""
-        # "".join(split()) supprime tous les espaces, tabulations, etc.
-        return "".join(str(name).split()).lower()
-
     used_names: set = set()
     sheet_name_to_centre = {}
     for c in centres_db:
         c_label = (c.get("label") or "").strip()
         sheet_name = _safe_sheet_name(c_label, used_names)
-        key = _normalize_sheet_key(sheet_name)
-        sheet_name_to_centre[key] = dict(c)
+        sheet_name_to_centre[_normalize_sheet_key(sheet_name)] = dict(c)
+    return sheet_name_to_centre
+
+
+def _load_postes_by_centre(db: Session, centre_ids: list) -> dict:
+    """Effectifs actuels MOI/MOD/APS de tous les centres (alignement avec Wizard) : {centre_id: [rows]}."""
+    out: dict = {cid: [] for cid in centre_ids}
+    ids = sorted(out)
+    for i in range(0, len(ids), BULK_IN_CHUNK_SIZE):
+        rows = (
+            db.query(
+                CentrePoste.centre_id,
+                CentrePoste.effectif_actuel,
+                CentrePoste.aps,
+                Poste.type_poste,
+                Poste.label,
+                Poste.charge_salaire,
+            )
+            .join(Poste, CentrePoste.code_resp == Poste.Code)
+            .filter(CentrePoste.centre_id.in_(ids[i:i + BULK_IN_CHUNK_SIZE]))
+            .order_by(CentrePoste.centre_id, CentrePoste.id)
+            .all()
+        )
+        for cid, *row in rows:
+            out[cid].append(tuple(row))
+    return out
+
 
-    results_par_centre = []
+def _parse_batch_workbook(db: Session, content: bytes, region_id: Optional[int]) -> tuple:
+    """Parse le classeur : (onglets reconnus avec centre/paramètres/grille, erreurs)."""
+    try:
+        wb = open_workbook(content)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Fichier Excel invalide : {str(e)}")
+
+    sheet_name_to_centre = _load_sheet_centres(db, region_id)
+
+    entries = []
     errors = []
+    for sheet_name, sheet in iter_sheets(wb, skip=("Guide",)):
+        # Matching insensible aux espaces et à la casse
+        match = sheet_name_to_centre.get(_normalize_sheet_key(sheet_name))
+        if not match:
+            errors.append({"sheet": sheet_name, "error": "Centre non trouvé (matching strict onglet)"})
+            continue
 
-    # ─── Pré-chargement des données selon le process_mode ────────────────────
-    # Consolidé : chargement global des mappings de postes (source → cible)
-    role_mapping_global: Optional[dict] = None
-    if process_mode == "recommande" and MappingPosteRecommande is not None:
         try:
-            mappings = db.query(MappingPosteRecommande).all()
-            role_mapping_global = {
-                m.poste_source.Code: m.poste_cible.Code
-                for m in mappings
-                if m.poste_source and m.poste_cible
-            }
+            # Canvas (lignes 5-9) + paramètres (lignes 12+) lus en une passe
+            ws = SheetWindow(sheet, max_row=PARAMS_START_ROW + PARAMS_SCAN_ROWS - 1, max_col=13)
+            raw_params = _normalize_params_like_wizard(_parse_sheet_params(ws))
+            entries.append({"sheet": sheet_name, "centre": match, "raw_params": raw_params, "grid": _parse_sheet_grid(ws)})
+        except Exception as e:
+            errors.append({"sheet": sheet_name, "centre": match["label"], "error": str(e)})
+    wb.close()
+    return entries, errors
+
+
+def _prefetch_centres(db: Session, entries: list) -> dict:
+    """
+    Charge en quelques requêtes ensemblistes tout ce dont le calcul des onglets
+    a besoin (paramètres Ville, tâches, effectifs).
+    """
+    centre_ids = sorted({e["centre"]["id"] for e in entries})
+    tasks_by_centre, moi_by_centre = load_bandoeng_tasks_by_centre(db, centre_ids)
+
+    # ✅ AUTO-IMPORT if empty (uniquement les centres sans tâches), puis rechargement
+    empty_ids = [cid for cid in centre_ids if not tasks_by_centre.get(cid)]
+    imported_ids = []
+    for cid in empty_ids:
+        try:
+            count, _ = auto_import_tasks_if_empty(db, cid)
+            if count:
+                imported_ids.append(cid)
+        except Exception as e:
+            print(f"⚠️ Auto-import centre {cid} échoué: {e}")
+    if imported_ids:
+        reloaded, reloaded_moi = load_bandoeng_tasks_by_centre(db, imported_ids)
+        tasks_by_centre.update(reloaded)
+        moi_by_centre.update(reloaded_moi)
+
+    return {
+        "entries": entries,
+        "tasks_by_centre": tasks_by_centre,
+        "moi_by_centre": moi_by_centre,
+        "city_by_centre": _load_city_params(db, centre_ids),
+        "postes_by_centre": _load_postes_by_centre(db, centre_ids),
+        "poste_map": load_poste_map(db),
+    }
+
+
+def _prefetch_batch(db: Session, content: bytes, region_id: Optional[int]) -> dict:
+    """
+    Phase 1 (BDD) : parse le classeur et charge tout ce dont le calcul a besoin.
+    """
+    entries, errors = _parse_batch_workbook(db, content, region_id)
+    return {**_prefetch_centres(db, entries), "errors": errors}
+
+
+def _load_mode_context(db: Session, process_mode: str) -> dict:
+    """Mapping des postes (recommande) ou exclusions par centre / catégorie (optimise)."""
+    ctx = {"role_mapping": None, "excl_ids_by_centre": {}, "quads_by_cat": {}}
+
+    # Consolidé : mappings de postes (source → cible), snapshot référentiel
+    if process_mode == "recommande":
+        try:
+            ctx["role_mapping"] = get_role_mapping(db)
         except Exception:
-            role_mapping_global = {}
+            ctx["role_mapping"] = {}
 
-    # Optimisé : chargement des exclusions par centre et par quadruplet
-    # On construit une map { centre_id: (excluded_ids, excluded_quadruplets) }
-    optimise_excl_by_centre: dict = {}
-    if process_mode == "optimise" and TacheExclueOptimisee is not None:
+    # Optimisé : exclusions par centre et par quadruplet, snapshot référentiel
+    if process_mode == "optimise":
         try:
             def _clean(s):
                 if not s: return ""
                 return "".join(str(s).split()).lower()
 
+            exclusions = get_exclusions_optimisees(db)
             # Exclusions par ID (liées à un centre spécifique)
-            all_id_excl = (
-                db.query(TacheExclueOptimisee.centre_id, TacheExclueOptimisee.tache_id)
-                .filter(TacheExclueOptimisee.centre_id.isnot(None),
-                        TacheExclueOptimisee.tache_id.isnot(None))
-                .all()
-            )
-            for cid, tid in all_id_excl:
-                optimise_excl_by_centre.setdefault(cid, {"ids": [], "quads": []})["ids"].append(tid)
+            ctx["excl_ids_by_centre"] = {cid: list(tids) for cid, tids in exclusions.ids_by_centre.items()}
 
             # Exclusions par quadruplet (liées à une catégorie, appliquées à tout centre de la catégorie)
-            all_quad_excl = (
-                db.query(
-                    TacheExclueOptimisee.categorie_id,
-                    TacheExclueOptimisee.nom_tache,
-                    TacheExclueOptimisee.produit,
-                    TacheExclueOptimisee.famille_uo,
-                    TacheExclueOptimisee.unite_mesure,
-                )
-                .filter(TacheExclueOptimisee.nom_tache.isnot(None))
-                .all()
-            )
-            # Map catégorie_id → list of quadruplets
-            quads_by_cat = {}
-            for cat_id, nom, produit, famille, unite in all_quad_excl:
-                if cat_id not in quads_by_cat:
-                    quads_by_cat[cat_id] = []
-                quads_by_cat[cat_id].append(
-                    (_clean(nom), _clean(produit), _clean(famille), _clean(unite))
-                )
+            ctx["quads_by_cat"] = {
+                cat_id: [(_clean(nom), _clean(produit), _clean(famille), _clean(unite)) for nom, produit, famille, unite in quads]
+                for cat_id, quads in exclusions.quads_by_categorie.items()
+            }
         except Exception:
             pass
 
-    for sheet_name in wb.sheetnames:
-        if sheet_name == "Guide":
-            continue
+    return ctx
 
-        ws = wb[sheet_name]
 
-        # Matching insensible aux espaces et à la casse
-        lookup_key = _normalize_sheet_key(sheet_name)
-        match = sheet_name_to_centre.get(lookup_key)
-        if not match:
-            errors.append({"sheet": sheet_name, "error": "Centre non trouvé (matching strict onglet)"})
-            continue
-
-        centre_id = match["id"]
-        centre_label = match["label"]
-        region_id = match["region_id"]
-        region_label = match["region_label"]
-
-        try:
-            # ✅ AUTO-IMPORT if empty
-            auto_import_tasks_if_empty(db, centre_id)
-
-            raw_params = _parse_sheet_params(ws)
-            raw_params = _normalize_params_like_wizard(raw_params)
-            raw_params = _fill_city_params_from_db_if_missing(db, centre_id, raw_params)
-            grid_values = _parse_sheet_grid(ws)
-            grid_values = _recalculate_grid_values_like_wizard(grid_values, raw_params)
-            engine_params = _params_to_engine(raw_params)
-
-            # Résoudre role_mapping et exclusions pour ce centre selon le mode
-            role_mapping = role_mapping_global  # None ou dict (recommande)
-            excluded_task_ids = None
-            excluded_task_quadruplets = None
-            if process_mode == "optimise" and TacheExclueOptimisee is not None:
-                centre_excl = optimise_excl_by_centre.get(centre_id, {})
-                excluded_task_ids = centre_excl.get("ids") or None
-                # Quadruplets par catégorie du centre
-                centre_obj = db.query(Centre).filter(Centre.id == centre_id).first()
-                if centre_obj and centre_obj.categorie_id and centre_obj.categorie_id in quads_by_cat:
-                    excluded_task_quadruplets = quads_by_cat[centre_obj.categorie_id]
-
-            volumes = BandoengInputVolumes(grid_values=grid_values)
-
-            # Récupérer les effectifs actuels MOI/MOD/APS (alignement avec Wizard)
-            rows_postes = (
-                db.query(
-                    CentrePoste.effectif_actuel,
-                    CentrePoste.aps,
-                    Poste.type_poste,
-                    Poste.label,
-                    Poste.charge_salaire,
-                )
-                .join(Poste, CentrePoste.code_resp == Poste.Code)
-                .filter(CentrePoste.centre_id == centre_id)
-                .all()
-            )
-            actual_moi = 0.0
-            actual_mod = 0.0
-            actual_aps = 0.0
-            actual_aps_mod = 0.0
-            effectifs_par_poste: dict = {}
-            for eff, aps, type_poste, poste_label, _charge in rows_postes:
-                eff_val = float(eff or 0)
-                aps_val = float(aps or 0)
-                total_poste = eff_val + aps_val
-                t = (type_poste or "").upper()
-                is_moi = t in ["MOI", "INDIRECT", "STRUCTURE"]
-                if is_moi:
-                    actual_moi += eff_val
-                else:
-                    actual_mod += eff_val
-                    actual_aps_mod += aps_val
-                actual_aps += aps_val
-                if not is_moi and total_poste > 0 and poste_label:
-                    effectifs_par_poste[poste_label] = round(total_poste, 2)
-
-            result = run_bandoeng_simulation(
-                db, centre_id, volumes, engine_params,
-                role_mapping=role_mapping,
-                excluded_task_ids=excluded_task_ids,
-                excluded_task_quadruplets=excluded_task_quadruplets,
+def _build_batch_jobs(prefetch: dict, process_mode: str, mode_ctx: dict, plans: Optional[dict] = None) -> list:
+    """
+    Jobs de calcul autonomes (picklables) : un par onglet.
+    `plans` permet de partager les plans compilés entre modes de même role_mapping.
+    """
+    role_mapping = mode_ctx["role_mapping"]
+    plans = {} if plans is None else plans
+    jobs = []
+    for entry in prefetch["entries"]:
+        centre = entry["centre"]
+        cid = centre["id"]
+        if cid not in plans:
+            plans[cid] = compile_bandoeng_plan(
+                prefetch["tasks_by_centre"].get(cid, []), cid, prefetch["poste_map"],
+                role_mapping, prefetch["moi_by_centre"].get(cid, 0.0)
             )
 
-            rpp = result.ressources_par_poste or {}
-
-            def _rpp_match_etp(lab: str) -> float:
-                if not lab:
-                    return 0.0
-                L = str(lab).strip()
-                if L in rpp:
-                    return float(rpp[L] or 0)
-                lu = L.upper()
-                for k, v in rpp.items():
-                    if str(k).strip().upper() == lu:
-                        return float(v or 0)
-                return 0.0
-
-            postes_chiffrage: list = []
-            for eff, aps, type_poste, poste_label, charge_salaire in rows_postes:
-                eff_val = float(eff or 0)
-                aps_val = float(aps or 0)
-                total_poste = eff_val + aps_val
-                t = (type_poste or "").upper()
-                is_moi = t in ["MOI", "INDIRECT", "STRUCTURE"]
-                if is_moi:
-                    continue
-                plab = (poste_label or "").strip()
-                if not plab:
-                    continue
-                sim_etp = int(round(_rpp_match_etp(plab)))
-                sal = float(charge_salaire or 0)
-                if total_poste <= 0 and sim_etp <= 0:
-                    continue
-                postes_chiffrage.append({
-                    "label": plab,
-                    "type_poste": type_poste or "",
-                    "charge_salaire": sal,
-                    "actuel_etp": round(total_poste, 2),
-                    "simule_etp": sim_etp,
-                })
-
-            fte_calcule = round(result.fte_calcule, 2)
-            # Cohérence visuelle: `arrondi` doit correspondre à `calculé`
-            fte_total_calcule = fte_calcule
-            fte_total_arrondi = int(round(fte_calcule))
-            fte_arrondi = int(round(fte_calcule))
-
-            results_par_centre.append({
-                "centre_id": centre_id,
-                "centre_label": centre_label,
-                "region_id": region_id,
-                "region_label": region_label,
-                "fte_calcule": fte_calcule,
-                "fte_arrondi": fte_arrondi,
-                "fte_total_calcule": fte_total_calcule,
-                "fte_total_arrondi": fte_total_arrondi,
-                "actual_moi": round(actual_moi, 2),
-                "actual_mod": round(actual_mod, 2),
-                "actual_aps": round(actual_aps, 2),
-                "actual_aps_mod": round(actual_aps_mod, 2),
-                "total_heures": round(result.total_heures, 2),
-                "ressources_par_poste": result.ressources_par_poste,
-                "effectifs_par_poste": effectifs_par_poste,
-                "postes_chiffrage": postes_chiffrage,
-            })
-
-        except Exception as e:
-            errors.append({"sheet": sheet_name, "centre": centre_label, "error": str(e)})
-
-    # Aggregate by region
-    par_region: dict = {}
-    for r in results_par_centre:
+        raw_params = _fill_city_params_if_missing(entry["raw_params"], prefetch["city_by_centre"].get(cid))
+        grid_values = _recalculate_grid_values_like_wizard(deepcopy(entry["grid"]), raw_params)
+
+        excluded_task_ids = None
+        excluded_task_quadruplets = None
+        if process_mode == "optimise":
+            excluded_task_ids = mode_ctx["excl_ids_by_centre"].get(cid) or None
+            excluded_task_quadruplets = mode_ctx["quads_by_cat"].get(centre.get("categorie_id")) or None
+
+        jobs.append({
+            "sheet": entry["sheet"],
+            "process_mode": process_mode,
+            "centre_id": cid,
+            "centre_label": centre["label"],
+            "region_id": centre["region_id"],
+            "region_label": centre["region_label"],
+            "plan": plans[cid],
+            "grid_values": grid_values,
+            "params": _params_to_engine(raw_params),
+            "excluded_task_ids": excluded_task_ids,
+            "excluded_task_quadruplets": excluded_task_quadruplets,
+            "rows_postes": prefetch["postes_by_centre"].get(cid, []),
+        })
+    return jobs
+
+
+class _BatchAggregator:
+    """Agrégats par région et national, alimentés centre par centre."""
+
+    def __init__(self, keep_centres: bool = True):
+        self.keep_centres = keep_centres
+        self.par_centre: list = []
+        self.par_region: dict = {}
+        self.errors: list = []
+        self.nb_centres = 0
+        self.national_total = 0.0
+        self.national_arrondi = 0
+        self.national_total_total = 0.0
+        self.national_arrondi_total = 0
+
+    def add(self, r: dict) -> bool:
+        """Ajoute un résultat de centre ; False si c'est une erreur."""
+        if "error" in r:
+            self.errors.append(r)
+            return False
+        if self.keep_centres:
+            self.par_centre.append(r)
+
+        # Aggregate by region
         rid = r["region_id"]
-        if rid not in par_region:
-            par_region[rid] = {
+        if rid not in self.par_region:
+            self.par_region[rid] = {
                 "region_id": rid,
                 "region_label": r["region_label"],
                 "total_fte_calcule": 0.0,
@@ -1187,64 +1173,209 @@ async def simulate_batch(
                 "total_fte_total_arrondi": 0,
                 "nb_centres": 0,
             }
-        par_region[rid]["total_fte_calcule"] += r["fte_calcule"]
-        par_region[rid]["total_fte_arrondi"] += r["fte_arrondi"]
-        par_region[rid]["total_fte_total_calcule"] += r.get("fte_total_calcule", r["fte_calcule"])
-        par_region[rid]["total_fte_total_arrondi"] += r.get("fte_total_arrondi", r["fte_arrondi"])
-        par_region[rid]["nb_centres"] += 1
+        reg = self.par_region[rid]
+        reg["total_fte_calcule"] += r["fte_calcule"]
+        reg["total_fte_arrondi"] += r["fte_arrondi"]
+        reg["total_fte_total_calcule"] += r.get("fte_total_calcule", r["fte_calcule"])
+        reg["total_fte_total_arrondi"] += r.get("fte_total_arrondi", r["fte_arrondi"])
+        reg["nb_centres"] += 1
+
+        self.nb_centres += 1
+        self.national_total += r["fte_calcule"]
+        self.national_arrondi += r["fte_arrondi"]
+        self.national_total_total += r.get("fte_total_calcule", r["fte_calcule"])
+        self.national_arrondi_total += r.get("fte_total_arrondi", r["fte_arrondi"])
+        return True
+
+    def summary(self) -> dict:
+        return {
+            "par_region": list(self.par_region.values()),
+            "national": {
+                "total_fte_calcule": round(self.national_total, 2),
+                "total_fte_arrondi": self.national_arrondi,
+                "total_fte_total_calcule": round(self.national_total_total, 2),
+                "total_fte_total_arrondi": self.national_arrondi_total,
+                "nb_centres": self.nb_centres,
+            },
+        }
+
+
+def _aggregate_batch(computed: list, errors: list) -> dict:
+    """Fusionne les résultats des workers : par centre, par région, national."""
+    agg = _BatchAggregator()
+    agg.errors = list(errors)
+    for r in computed:
+        agg.add(r)
+    return {"par_centre": agg.par_centre, **agg.summary(), "errors": agg.errors}
 
-    national_total = sum(r["fte_calcule"] for r in results_par_centre)
-    national_arrondi = sum(r["fte_arrondi"] for r in results_par_centre)
-    national_total_total = sum(r.get("fte_total_calcule", r["fte_calcule"]) for r in results_par_centre)
-    national_arrondi_total = sum(r.get("fte_total_arrondi", r["fte_arrondi"]) for r in results_par_centre)
 
+def _run_batch(db: Session, content: bytes, region_id: Optional[int], process_mode: str, force: bool = False) -> dict:
+    prefetch = _prefetch_batch(db, content, region_id)
+    jobs = _build_batch_jobs(prefetch, process_mode, _load_mode_context(db, process_mode))
+    # Phase 2 (calcul pur) : seuls les onglets modifiés passent par le pool de processus
+    computed, reused = compute_centres_incremental(jobs, force=force)
+    out = _aggregate_batch(computed, prefetch["errors"])
+    out["incremental"] = incremental_report(jobs, reused)
+    return out
+
+
+@router.post("/simulate")
+async def simulate_batch(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    region_id: Optional[int] = Query(default=None, description="Filtre centres par région (pour template régional)"),
+    process_mode: str = Query(default="actuel", description="Mode de calcul : actuel | recommande | optimise"),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)"),
+):
+    """
+    Parse the imported Excel file and run Bandoeng simulation for each sheet.
+    Returns results per centre + aggregated by region + national total.
+    Seuls les onglets dont le contenu ou le référentiel a changé depuis le dernier
+    import sont recalculés (voir `incremental` dans la réponse).
+    """
+    content = await file.read()
+    # Pré-chargement + calcul hors de la boucle asyncio : les autres requêtes restent servies
+    return await run_in_threadpool(_run_batch, db, content, region_id, process_mode, force)
+
+
+COMPARATIF_MODES = ("actuel", "recommande", "optimise")
+
+
+def _build_comparatif_jobs(db: Session, prefetch: dict) -> dict:
+    """Jobs des 3 modes ; actuel et optimise partagent les mêmes plans compilés."""
+    shared_plans: dict = {}
     return {
-        "par_centre": results_par_centre,
-        "par_region": list(par_region.values()),
-        "national": {
-            "total_fte_calcule": round(national_total, 2),
-            "total_fte_arrondi": national_arrondi,
-            "total_fte_total_calcule": round(national_total_total, 2),
-            "total_fte_total_arrondi": national_arrondi_total,
-            "nb_centres": len(results_par_centre),
-        },
-        "errors": errors,
+        mode: _build_batch_jobs(
+            prefetch, mode, _load_mode_context(db, mode),
+            plans=None if mode == "recommande" else shared_plans
+        )
+        for mode in COMPARATIF_MODES
     }
 
 
+def _run_batch_comparatif(db: Session, content: bytes, region_id: Optional[int], force: bool = False) -> dict:
+    """
+    Les 3 modes sur un seul pré-chargement : le classeur est parsé et les tâches
+    chargées une fois ; actuel et optimise partagent les mêmes plans compilés.
+    """
+    prefetch = _prefetch_batch(db, content, region_id)
+    jobs_by_mode = _build_comparatif_jobs(db, prefetch)
+    modes = tuple(jobs_by_mode)
+
+    # Un seul passage sur le pool pour les 3 modes, puis redécoupage dans l'ordre
+    all_jobs = [job for mode in modes for job in jobs_by_mode[mode]]
+    computed, reused = compute_centres_incremental(all_jobs, force=force)
+    out = {}
+    start = 0
+    for mode in modes:
+        end = start + len(jobs_by_mode[mode])
+        out[mode] = _aggregate_batch(computed[start:end], prefetch["errors"])
+        out[mode]["incremental"] = incremental_report(all_jobs[start:end], reused[start:end])
+        start = end
+    return out
+
+
 @router.post("/simulate-comparatif")
 async def simulate_batch_comparatif(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     region_id: Optional[int] = Query(default=None),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)"),
 ):
     """
     Lance la simulation batch pour les 3 modes (actuel / recommande / optimise)
     avec le même fichier Excel et renvoie les 3 résultats pour comparatif.
     """
     content = await file.read()
+    return await run_in_threadpool(_run_batch_comparatif, db, content, region_id, force)
 
-    async def _run_mode(mode: str):
-        mock_file = UploadFile(
-            filename=file.filename,
-            file=io.BytesIO(content),
-        )
-        return await simulate_batch(
-            file=mock_file,
-            db=db,
-            region_id=region_id,
-            process_mode=mode,
-        )
 
-    actuel, recommande, optimise = await asyncio.gather(
-        _run_mode("actuel"),
-        _run_mode("recommande"),
-        _run_mode("optimise"),
-    )
+# ─────────────────────────────────────────────────────────────────────────────
+# Variantes en flux (NDJSON) : un événement par centre dès qu'il est calculé
+# ─────────────────────────────────────────────────────────────────────────────
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False, default=str) + "\n"
 
-    return {
-        "actuel":     actuel,
-        "recommande": recommande,
-        "optimise":   optimise,
-    }
 
+def _stream_batch_events(jobs_by_mode: dict, prefetch_errors: list, force: bool) -> Iterator[str]:
+    """
+    Événements : start, error (onglets rejetés), centre (par centre, au fil du calcul),
+    summary (agrégats région/national par mode), end. Seuls les agrégats sont gardés
+    en mémoire, pas la liste des centres.
+    """
+    modes = list(jobs_by_mode)
+    all_jobs = [job for mode in modes for job in jobs_by_mode[mode]]
+    mode_of = [mode for mode in modes for _ in jobs_by_mode[mode]]
+
+    yield _ndjson({"type": "start", "modes": modes, "total": len(all_jobs)})
+    for err in prefetch_errors:
+        yield _ndjson({"type": "error", "data": err})
+
+    aggs = {mode: _BatchAggregator(keep_centres=False) for mode in modes}
+    reused = [False] * len(all_jobs)
+    try:
+        for i, res, was_cached in iter_centres_incremental(all_jobs, force=force):
+            mode = mode_of[i]
+            reused[i] = was_cached
+            if aggs[mode].add(res):
+                yield _ndjson({"type": "centre", "mode": mode, "reutilise": was_cached, "data": res})
+            else:
+                yield _ndjson({"type": "error", "mode": mode, "data": res})
+    except Exception as e:
+        yield _ndjson({"type": "fatal", "error": str(e)})
+        return
+
+    start = 0
+    for mode in modes:
+        end = start + len(jobs_by_mode[mode])
+        yield _ndjson({
+            "type": "summary",
+            "mode": mode,
+            **aggs[mode].summary(),
+            "nb_erreurs": len(prefetch_errors) + len(aggs[mode].errors),
+            "incremental": incremental_report(all_jobs[start:end], reused[start:end]),
+        })
+        start = end
+    yield _ndjson({"type": "end"})
+
+
+@router.post("/simulate/stream")
+async def simulate_batch_stream(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    region_id: Optional[int] = Query(default=None, description="Filtre centres par région (pour template régional)"),
+    process_mode: str = Query(default="actuel", description="Mode de calcul : actuel | recommande | optimise"),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)"),
+):
+    """
+    Comme /batch/simulate, en NDJSON : chaque entrée `par_centre` est envoyée dès
+    qu'elle est calculée, puis les agrégats région/national en fin de flux.
+    """
+    content = await file.read()
+
+    def _prepare():
+        # Tout l'accès BDD se fait ici, avant l'ouverture du flux
+        prefetch = _prefetch_batch(db, content, region_id)
+        jobs = _build_batch_jobs(prefetch, process_mode, _load_mode_context(db, process_mode))
+        return {process_mode: jobs}, prefetch["errors"]
+
+    jobs_by_mode, errors = await run_in_threadpool(_prepare)
+    return StreamingResponse(_stream_batch_events(jobs_by_mode, errors, force), media_type="application/x-ndjson")
+
+
+@router.post("/simulate-comparatif/stream")
+async def simulate_batch_comparatif_stream(
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    region_id: Optional[int] = Query(default=None),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)"),
+):
+    """Comme /batch/simulate-comparatif, en NDJSON (événements étiquetés par `mode`)."""
+    content = await file.read()
+
+    def _prepare():
+        prefetch = _prefetch_batch(db, content, region_id)
+        return _build_comparatif_jobs(db, prefetch), prefetch["errors"]
+
+    jobs_by_mode, errors = await run_in_threadpool(_prepare)
+    return StreamingResponse(_stream_batch_events(jobs_by_mode, errors, force), media_type="application/x-ndjson")
@@ -6,10 +6,10 @@ from pydantic import BaseModel
 
 from app.core.db import get_db
 from app.models import db_models
+from app.services.referentiel_snapshot import bump_referentiel_version
 from app.services.bandoeng_engine import (
     BandoengInputVolumes, BandoengParameters, run_bandoeng_simulation
 )
-import openpyxl
 import os
 
 router = APIRouter(tags=["Builder"])
@@ -211,6 +211,7 @@ def create_new_centre(payload: NewCentrePayload, db: Session = Depends(get_db)):
         print("Warning: No referentiel_taches.xlsx found for auto-import.")
 
     db.commit()
+    bump_referentiel_version("taches", "postes")
     return {"status": "success", "id": new_centre.id, "label": new_centre.label}
 
 
@@ -232,6 +233,7 @@ def simulate_test(payload: VirtualSimulationRequest, db: Session = Depends(get_d
     Ne touche pas à la base de données.
     """
     # Extract short code (e.g., 'AM' from 'AM- Agence Messagerie')
+    import openpyxl
     typo_code = payload.typology.split("-")[0].split(" ")[0].upper().strip()
     template_name = f"{typo_code}.xlsx"
     
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.services.simulation_CCI import (
     calculate_cci_simulation,
@@ -76,7 +77,7 @@ def simulate_cci(
     CCI-specific simulation endpoint
     """
     try:
-        print(f"🔵 [CCI API] Simulation request for centre {request.centre_id}")
+        trace(lambda: f"🔵 [CCI API] Simulation request for centre {request.centre_id}")
         
         # Adapt request model to what calculate_cci_simulation expects (SimulationRequest)
         # We need to map the flat CCISimulationRequest back to the generic SimulationRequest structure
@@ -119,7 +120,7 @@ def simulate_cci(
         
         result = calculate_cci_simulation(db, core_request)
         
-        print(f"✅ [CCI API] Simulation completed: {result.fte_arrondi} FTE")
+        trace(lambda: f"✅ [CCI API] Simulation completed: {result.fte_arrondi} FTE")
         return result
         
     except Exception as e:
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.services.simulation_CCP import (
     calculate_ccp_simulation,
@@ -89,7 +90,7 @@ def simulate_ccp(
     - details_taches: List of task details with hours
     """
     try:
-        print(f"🔵 [CCP API] Simulation request for centre {request.centre_id}, poste {request.poste_id}")
+        trace(lambda: f"🔵 [CCP API] Simulation request for centre {request.centre_id}, poste {request.poste_id}")
         
         result = calculate_ccp_simulation(
             db=db,
@@ -99,7 +100,7 @@ def simulate_ccp(
             params=request.params
         )
         
-        print(f"✅ [CCP API] Simulation completed: {result.fte_arrondi} FTE")
+        trace(lambda: f"✅ [CCP API] Simulation completed: {result.fte_arrondi} FTE")
         return result
         
     except Exception as e:
@@ -115,11 +116,11 @@ def get_ccp_positions(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"🔵 [CCP API] Fetching positions for centre {centre_id}")
+        trace(lambda: f"🔵 [CCP API] Fetching positions for centre {centre_id}")
         
         postes = get_ccp_postes(db, centre_id)
         
-        print(f"✅ [CCP API] Found {len(postes)} positions")
+        trace(lambda: f"✅ [CCP API] Found {len(postes)} positions")
         return {"postes": postes}
         
     except Exception as e:
@@ -134,7 +135,7 @@ def get_ccp_referentiel(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"🔵 [CCP API] Fetching referentiel for centre {centre_id}, poste {poste_id}")
+        trace(lambda: f"🔵 [CCP API] Fetching referentiel for centre {centre_id}, poste {poste_id}")
         
         tasks = load_ccp_tasks(db, centre_id, poste_id)
         
@@ -153,7 +154,7 @@ def get_ccp_referentiel(
             for t in tasks
         ]
         
-        print(f"✅ [CCP API] Found {len(referentiel)} tasks")
+        trace(lambda: f"✅ [CCP API] Found {len(referentiel)} tasks")
         return {"referentiel": referentiel}
         
     except Exception as e:
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.services.simulation_CNA import (
     calculate_cna_simulation,
@@ -91,7 +92,7 @@ def simulate_cna(
     - details_taches: List of task details with hours
     """
     try:
-        print(f"🟢 [CNA API] Simulation request for centre {request.centre_id}, poste {request.poste_id}")
+        trace(lambda: f"🟢 [CNA API] Simulation request for centre {request.centre_id}, poste {request.poste_id}")
         
         result = calculate_cna_simulation(
             db=db,
@@ -101,7 +102,7 @@ def simulate_cna(
             params=request.params
         )
         
-        print(f"✅ [CNA API] Simulation completed: {result.fte_arrondi} FTE")
+        trace(lambda: f"✅ [CNA API] Simulation completed: {result.fte_arrondi} FTE")
         return result
         
     except Exception as e:
@@ -117,11 +118,11 @@ def get_cna_positions(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"🟢 [CNA API] Fetching positions for centre {centre_id}")
+        trace(lambda: f"🟢 [CNA API] Fetching positions for centre {centre_id}")
         
         postes = get_cna_postes(db, centre_id)
         
-        print(f"✅ [CNA API] Found {len(postes)} positions")
+        trace(lambda: f"✅ [CNA API] Found {len(postes)} positions")
         return {"postes": postes}
         
     except Exception as e:
@@ -136,7 +137,7 @@ def get_cna_referentiel(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"🟢 [CNA API] Fetching referentiel for centre {centre_id}, poste {poste_id}")
+        trace(lambda: f"🟢 [CNA API] Fetching referentiel for centre {centre_id}, poste {poste_id}")
         
         tasks = load_cna_tasks(db, centre_id, poste_id)
         
@@ -155,7 +156,7 @@ def get_cna_referentiel(
             for t in tasks
         ]
         
-        print(f"✅ [CNA API] Found {len(referentiel)} tasks")
+        trace(lambda: f"✅ [CNA API] Found {len(referentiel)} tasks")
         return {"referentiel": referentiel}
         
     except Exception as e:
@@ -9,11 +9,11 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form, Q
 from pydantic import BaseModel, Field
 from sqlalchemy.orm import Session
 from sqlalchemy import func
-import pandas as pd
 import io
 
 from app.core.db import get_db
 from app.models.db_models import Centre, Poste, CentrePoste, Tache, HierarchiePostes
+from app.services.referentiel_snapshot import bump_referentiel_version
 from app.services.cndp_engine import (
     run_cndp_simulation,
     CNDPInputVolumes,
@@ -252,6 +252,7 @@ async def import_cndp_tasks(
     - famille_uo (Optional)
     - moy_sec (Optional)
     """
+    import pandas as pd
     VALID_EXTENSIONS = {".xlsx", ".xls"}
     import os
     filename, ext = os.path.splitext(file.filename)
@@ -286,6 +287,7 @@ async def import_cndp_tasks(
             # Delete tasks linked to these CentrePoste
             db.query(Tache).filter(Tache.centre_poste_id.in_(cp_ids)).delete(synchronize_session=False)
             db.commit() # Commit deletion
+            bump_referentiel_version("taches")
 
         # 2. Iterate and Create
         created_count = 0
@@ -371,6 +373,7 @@ async def import_cndp_tasks(
                     created_count += 1
         
         db.commit()
+        bump_referentiel_version("taches", "postes")
         return {"status": "success", "imported_tasks": created_count, "message": f"Successfully imported {created_count} tasks."}
 
     except Exception as e:
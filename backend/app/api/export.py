@@ -4,10 +4,6 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import Optional
 from io import BytesIO
-from openpyxl import Workbook
-from openpyxl.drawing.image import Image
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 
 from app.core.db import get_db
 from app.services.simulation_run import get_simulation_history
@@ -22,6 +18,10 @@ def export_history_excel(
     db: Session = Depends(get_db)
 ):
     # 1. Récupérer les données
+    from openpyxl import Workbook
+    from openpyxl.drawing.image import Image
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     simulations = get_simulation_history(
         db, 
         centre_id=centre_id, 
@@ -123,6 +123,9 @@ def export_history_excel(
 
 @router.get("/export/bandoeng/template")
 def generate_bandoeng_template():
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     wb = Workbook()
     ws = wb.active
     ws.title = "Modèle Import Volumes"
@@ -276,6 +279,9 @@ def generate_bandoeng_tasks_template():
     Génère un modèle Excel pour l'importation des tâches Bandoeng.
     Colonnes: Nom de tâche, Produit, Famille, Unité de mesure, Responsable 1, Responsable 2, Temps_min, Temps_sec
     """
+    from openpyxl import Workbook
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     wb = Workbook()
     ws = wb.active
     ws.title = "Modèle Import Tâches"
@@ -1,16 +1,23 @@
 from fastapi import APIRouter
 from sqlalchemy import text, inspect
 from app.core.config import settings
-from app.core.db import engine
+from app.core import db as core_db
+from app.core.db import engine, pool_status
 import app.main as app_main
 import os
 
 router = APIRouter(tags=["health"])
+# Seule route montée dans main.py : les diagnostics ci-dessous (config BDD, fichiers, comptages)
+# ne sont pas protégés et restent hors de l'application publiée.
+public_router = APIRouter(tags=["health"])
 
 
-@router.get("/health", summary="Health")
+@public_router.get("/health", summary="Health")
 def health():
-    return {"status": "ok"}
+    pools = {"api": pool_status()}
+    if core_db._worker_engine is not None:
+        pools["worker"] = pool_status(core_db._worker_engine)
+    return {"status": "ok", "db_pool": pools}
 
 
 @router.get("/health/config", summary="Effective DB Config (redacted)")
@@ -92,3 +99,6 @@ def health_db_meta():
         meta["status"] = "error"
         meta["detail"] = str(e)
         return meta
+
+
+router.include_router(public_router)
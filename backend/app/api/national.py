@@ -1,7 +1,7 @@
 # backend/app/api/national.py
 
-from typing import List
-from fastapi import APIRouter, Depends
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel, Field
@@ -9,6 +9,7 @@ from pydantic import BaseModel, Field
 from app.core.db import get_db
 from app.schemas.direction_sim import VolumeMatriciel, GlobalParams, CentreSimulationData
 from app.services.national_simulation_service import process_national_simulation
+from app.services.national_cube import AXES, get_cube, slice_cube
 
 router = APIRouter(tags=["national"])
 print(">>> [NATIONAL] Loading National API Router...")
@@ -29,6 +30,7 @@ class NationalSimResponse(BaseModel):
     postes: List[dict] = []   # 🆕 Agrégation par poste
     all_centre_postes: List[dict] = [] # 🆕 Liste Granulaire (flat) pour modales détail
     kpis_nationaux: dict
+    run_id: Optional[str] = None # Cube de résultats (vues /simulation/national/cube/{run_id})
 
 @router.post("/simulation/national", response_model=NationalSimResponse)
 def simulate_national(payload: NationalSimRequest, db: Session = Depends(get_db)):
@@ -62,8 +64,6 @@ def simulate_national(payload: NationalSimRequest, db: Session = Depends(get_db)
 
 from fastapi.responses import StreamingResponse
 import io
-import openpyxl
-from openpyxl.utils import get_column_letter
 
 @router.get("/simulation/template/centres")
 def get_centres_template(db: Session = Depends(get_db)):
@@ -277,3 +277,44 @@ def get_national_structure(db: Session = Depends(get_db)):
             "directions_total": len(directions_output)
         }
     }
+
+
+# --- Cube de résultats d'un run national (drill-down sans recalcul) ---
+
+@router.get("/simulation/national/cube/{run_id}")
+def get_national_cube(run_id: str):
+    """Résumé du cube d'un run national (centres, postes, flux, paramètres du run)."""
+    cube = get_cube(run_id)
+    if cube is None:
+        raise HTTPException(status_code=404, detail=f"Run national {run_id} inconnu ou expiré")
+    return cube.resume()
+
+
+@router.get("/simulation/national/cube/{run_id}/slice")
+def slice_national_cube(
+    run_id: str,
+    by: str = Query("direction", pattern=f"^({'|'.join(AXES)})$", description="Axe d'agrégation"),
+    direction_id: Optional[int] = Query(None),
+    region_id: Optional[int] = Query(None),
+    typologie: Optional[str] = Query(None),
+    centre_id: Optional[int] = Query(None),
+    poste: Optional[str] = Query(None, description="Libellé du poste"),
+    flux: Optional[str] = Query(None),
+):
+    """
+    Vue agrégée d'un run national par direction, région, typologie, centre, poste ou flux,
+    filtrée par les autres axes. Lue depuis le cube du run : aucune simulation relancée.
+    """
+    cube = get_cube(run_id)
+    if cube is None:
+        raise HTTPException(status_code=404, detail=f"Run national {run_id} inconnu ou expiré")
+    filtres = {
+        "direction_id": direction_id, "region_id": region_id, "typologie": typologie,
+        "centre_id": centre_id, "poste": poste, "flux": flux,
+    }
+    return {
+        "run_id": run_id,
+        "by": by,
+        "filtres": {k: v for k, v in filtres.items() if v is not None},
+        "rows": slice_cube(cube, by, filtres),
+    }
@@ -7,16 +7,15 @@ Permet de gérer la relation centre_postes (effectifs actuels par poste dans un
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, Query, File, UploadFile
 from fastapi.responses import StreamingResponse
-import pandas as pd
 import io
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
 
 from app.core.db import get_db
 from app.models.db_models import CentrePoste, Poste, Centre, Tache
+from app.services.referentiel_snapshot import bump_referentiel_version
+from app.services.excel_reader import open_workbook, iter_records
 
 router = APIRouter(prefix="/pm", tags=["Postes Management"])
 
@@ -75,6 +74,9 @@ def export_aps_template(
     """
     Exporte un template Excel des centres filtrés avec leur APS actuel.
     """
+    import pandas as pd
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     query = db.query(Centre)
     if region_id:
         query = query.filter(Centre.region_id == region_id)
@@ -144,6 +146,7 @@ async def import_aps(file: UploadFile = File(...), db: Session = Depends(get_db)
     """
     Importe un fichier Excel pour mettre à jour les APS des centres par lot.
     """
+    import pandas as pd
     try:
         contents = await file.read()
         df = pd.read_excel(io.BytesIO(contents))
@@ -220,6 +223,9 @@ def export_effectifs_template(
     """
     Exporte un template Excel des postes par centre selon les filtres.
     """
+    import pandas as pd
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     if centre_id:
         # Si un centre est spécifié, on utilise LEFT JOIN pour qu'il apparaisse même s'il n'a pas encore de postes
         query = text("""
@@ -331,22 +337,14 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
     """
     Importe un fichier Excel pour mettre à jour ou ajouter des effectifs (Upsert).
     """
+    import pandas as pd
     try:
         contents = await file.read()
         
-        # Détection automatique du début du tableau
-        df_temp = pd.read_excel(io.BytesIO(contents), nrows=5)
-        skip = 0
-        if "Centre" not in df_temp.columns:
-            df_check = pd.read_excel(io.BytesIO(contents), skiprows=1, nrows=5)
-            if "Centre" in df_check.columns:
-                skip = 1
-        
-        df = pd.read_excel(io.BytesIO(contents), skiprows=skip)
-        
+        # Lecture en flux : la ligne d'en-tête (1re ou 2e ligne) est détectée dans la même passe
+        wb = open_workbook(contents)
         required_cols = ["Centre", "Poste", "Statutaires"]
-        # On rend "APS" optionnel pour la compatibilité avec les anciens templates
-        has_aps_col = "APS" in df.columns
+        records = iter_records(wb.active, required_cols, header_scan_rows=2)
         
         updated_count = 0
         created_count = 0
@@ -367,12 +365,15 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
         all_centres = {norm(c.label): c.id for c in db.query(Centre).all()}
         all_postes_by_label = {norm(p.label): (p.id, p.Code) for p in db.query(Poste).all()}
         
-        for index, row in df.iterrows():
-            centre_name_raw = str(row["Centre"]).strip()
-            poste_label_raw = str(row["Poste"]).strip()
+        has_aps_col = False
+        for line, row in records:
+            # On rend "APS" optionnel pour la compatibilité avec les anciens templates
+            has_aps_col = "APS" in row
+            centre_name_raw = str(row["Centre"] if row["Centre"] is not None else "").strip()
+            poste_label_raw = str(row["Poste"] if row["Poste"] is not None else "").strip()
             new_val = row["Statutaires"]
             try:
-                if pd.isna(new_val) or str(new_val).strip() == "":
+                if new_val is None or str(new_val).strip() == "":
                     new_val_float = 0.0
                 else:
                     new_val_float = float(str(new_val).replace(',', '.'))
@@ -380,10 +381,17 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
                 new_aps_float = 0.0
                 if has_aps_col:
                     aps_val = row["APS"]
-                    if not pd.isna(aps_val) and str(aps_val).strip() != "":
+                    if aps_val is not None and str(aps_val).strip() != "":
                         new_aps_float = float(str(aps_val).replace(',', '.'))
             except ValueError:
-                errors.append(f"Ligne {index+2}: Valeur d'effectif ou APS invalide")
+                errors.append({
+                    "Région": row.get("Région") or "",
+                    "Centre": centre_name_raw,
+                    "Poste": poste_label_raw,
+                    "Statutaires": new_val,
+                    "APS": row.get("APS"),
+                    "Erreur": f"Ligne {line}: Valeur d'effectif ou APS invalide"
+                })
                 continue
             centre_key = norm(centre_name_raw)
             centre_id = all_centres.get(centre_key)
@@ -407,7 +415,7 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
             
             # Données de base de la ligne pour le fichier de rejets
             row_context = {
-                "Région": row.get("Région", ""),
+                "Région": row.get("Région") or "",
                 "Centre": centre_name_raw,
                 "Poste": poste_label_raw,
                 "Statutaires": new_val_float,
@@ -446,6 +454,7 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
                 )
                 db.add(new_cp)
                 created_count += 1
+        wb.close()
         
         # Logic to zero-out missing posts for affected centers
         zeroed_count = 0
@@ -462,6 +471,7 @@ async def import_effectifs(file: UploadFile = File(...), db: Session = Depends(g
                         zeroed_count += 1
 
         db.commit()
+        bump_referentiel_version("taches", "postes")
         
         if errors:
             # S'il y a des erreurs, on génère un fichier excel de rejets
@@ -539,6 +549,7 @@ def clear_effectifs(
             db.query(CentrePoste).delete(synchronize_session=False)
 
         db.commit()
+        bump_referentiel_version("taches", "postes")
         return {"status": "success", "message": "Les effectifs pour le périmètre sélectionné ont été réinitialisés."}
     except Exception as e:
         db.rollback()
@@ -584,6 +595,7 @@ def update_centre_poste(cp_id: int, update: PosteCentreUpdate, db: Session = Dep
         cp.aps = update.effectif_aps
     
     db.commit()
+    bump_referentiel_version("taches", "postes")
     return {"status": "success", "message": "Poste mis à jour"}
 
 
@@ -4,14 +4,14 @@ from pydantic import BaseModel
 
 from fastapi import APIRouter, Depends, Query, HTTPException, Body, UploadFile, File
 from fastapi.responses import StreamingResponse
-import pandas as pd
 import io
 from sqlalchemy import text
 from sqlalchemy.orm import Session
-from openpyxl.worksheet.datavalidation import DataValidation
 
 from app.core.db import get_db
+from app.core.cache import cache_referentiel
 from app.models import db_models
+from app.services.referentiel_snapshot import bump_referentiel_version
 from app.schemas.refs import RegionOut, CategorieOut
 #from app.services.simulation import calculer_simulation  # Import du service
 #from app.schemas.models import VolumesInput, VolumesAnnuels
@@ -175,6 +175,7 @@ def get_siege_postes(
 
 
 @router.get("/directions")
+@cache_referentiel(ttl=14400)  # Servi depuis la mémoire (L1) à chaque chargement de page
 def get_directions(db: Session = Depends(get_db)):
     """
     Retourne la liste des directions (pour compatibilitÃ© avec le frontend).
@@ -199,6 +200,7 @@ def get_directions(db: Session = Depends(get_db)):
 # Vos endpoints existants (rÃ©gions, centres, postes, catÃ©gories, tÃ¢ches, consolidÃ©)
 # ---------------------------
 @router.get("/regions", response_model=List[RegionOut])
+@cache_referentiel(ttl=14400)
 def list_regions(db: Session = Depends(get_db)):
     """
     Retourne toutes les régions.
@@ -367,6 +369,7 @@ def list_postes(
     return result
 
 @router.get("/categories", response_model=List[CategorieOut])
+@cache_referentiel(ttl=14400)
 def list_categories(db: Session = Depends(get_db)):
     rows = db.execute(text("""
         SELECT id, label
@@ -376,6 +379,7 @@ def list_categories(db: Session = Depends(get_db)):
     return [dict(r) for r in rows]
 
 @router.get("/categorisations", response_model=List[CategorieOut])
+@cache_referentiel(ttl=14400)
 def list_categorisations(db: Session = Depends(get_db)):
     rows = db.execute(text("""
         SELECT id_categorisation as id, label
@@ -566,6 +570,8 @@ def update_centre_categorisation(
         vol_ref.colis = input.volumes.colis
 
     db.commit()
+    if updated_postes:
+        bump_referentiel_version("postes")
     
     return {
         "status": "success", 
@@ -633,6 +639,8 @@ def export_typologies(
     """
     Exporte la liste des centres (par région ou tous) pour modification de typologie par Excel.
     """
+    import pandas as pd
+    from openpyxl.worksheet.datavalidation import DataValidation
     try:
         sql = """
             SELECT 
@@ -733,6 +741,7 @@ async def import_typologies(
     """
     Importe les modifications de typologies depuis un fichier Excel.
     """
+    import pandas as pd
     try:
         content = await file.read()
         df = pd.read_excel(io.BytesIO(content))
@@ -80,6 +80,69 @@ def get_active_campaign(db: Session = Depends(get_db)):
         "stats": stats
     }
 
+CAMPAIGN_STREAM_BATCH = 2000   # rows fetched per round trip from the task cursor
+CAMPAIGN_INSERT_CHUNK = 500    # results per executemany (details follow their parents)
+
+
+def _iter_taches_par_centre(db: Session):
+    """
+    Streams every task of every centre through one server-side cursor ordered
+    by centre, yielding (centre_id, [task dicts]) one centre at a time.
+
+    Only mapped columns are selected (no ORM instances, no __dict__ state).
+    No other statement may run on the session until the generator is exhausted
+    or closed (SQL Server without MARS).
+    """
+    from itertools import groupby
+    from sqlalchemy import select
+    from app.models.db_models import Tache, CentrePoste
+
+    columns = [getattr(Tache, attr.key) for attr in Tache.__mapper__.column_attrs]
+    stmt = (
+        select(*columns, CentrePoste.centre_id.label("_centre_id"))
+        .join(CentrePoste, CentrePoste.id == Tache.centre_poste_id)
+        .order_by(CentrePoste.centre_id, Tache.id)
+    )
+    result = db.execute(stmt, execution_options={"yield_per": CAMPAIGN_STREAM_BATCH})
+    try:
+        for centre_id, group in groupby(result.mappings(), key=lambda m: m["_centre_id"]):
+            tasks = []
+            for m in group:
+                t = dict(m)
+                del t["_centre_id"]
+                tasks.append(t)
+            yield centre_id, tasks
+    finally:
+        result.close()
+
+
+def _bulk_insert_results(db: Session, results_rows: list, details_rows: list):
+    """
+    Inserts ScoringResult rows then their ScoringDetail rows with executemany,
+    CAMPAIGN_INSERT_CHUNK results at a time. details_rows[i] holds the details
+    of results_rows[i]; generated ids are read back in parameter order.
+    """
+    from sqlalchemy import insert
+
+    result_table = models.ScoringResult.__table__
+    detail_table = models.ScoringDetail.__table__
+
+    for i in range(0, len(results_rows), CAMPAIGN_INSERT_CHUNK):
+        chunk = results_rows[i:i + CAMPAIGN_INSERT_CHUNK]
+        ids = db.execute(
+            insert(result_table).returning(result_table.c.id, sort_by_parameter_order=True),
+            chunk,
+        ).scalars().all()
+
+        details = [
+            {**d, "result_id": result_id}
+            for result_id, result_details in zip(ids, details_rows[i:i + CAMPAIGN_INSERT_CHUNK])
+            for d in result_details
+        ]
+        if details:
+            db.execute(insert(detail_table), details)
+
+
 @router.post("/scoring/campaign/run")
 def run_campaign(
     campaign_id: str, 
@@ -89,6 +152,9 @@ def run_campaign(
     """
     Runs the scoring engine for ALL centres (or scoped) and saves results to DB.
     Includes running the full RH Simulation for each centre to get ETP Arrondi.
+
+    Tasks are read in a single streamed query grouped by centre (instead of one
+    query per centre) and results are written with chunked executemany.
     """
     # 1. Fetch Centres with associated volumes
     sql = """
@@ -103,104 +169,107 @@ def run_campaign(
         FROM dbo.centres c
         LEFT JOIN dbo.Categorisation cat ON cat.id_categorisation = c.id_categorisation
         Left join dbo.regions re ON re.id = c.region_id
-
+        ORDER BY c.id
     """
     rows = db.execute(text(sql)).mappings().all()
-    
-    # 2. Pre-fetch Tasks for all centres to avoid N+1? 
-    # Too much memory if thousands of tasks.
-    # We'll batch query or Lazy load. Given request for "no row by row", 
-    # but simulation IS row by row by definition (complex logic per centre).
-    # We will compromise: efficient reading, batch insert.
 
     from app.services.simulation import calculer_simulation
-    from app.models.db_models import Tache, CentrePoste
 
-    results_to_insert = []
+    results_rows = []
+    details_rows = []
     
     stats = {"total": 0, "impacted": 0, "promotions": 0, "downgrades": 0, "stable": 0}
 
-    for r in rows:
-        # A. Fetch Tasks for Simulation
-        # TODO: Optimize with a single query grouping by centre_id if performance issues.
-        tasks = db.query(Tache).join(CentrePoste).filter(CentrePoste.centre_id == r.id).all()
-        tasks_dicts = [t.__dict__ for t in tasks] # simpler serialization
-        
-        # B. Prepare Volumes
-        seed = int(r.id) * 12345
-        # Use DB values or Fallback if 0 (for demo sweetness)
-        vol_co = r.get('courrier_ordinaire') or (10000 + (seed % 100000))
-        vol_cr = r.get('courrier_recommande') or (5000 + (seed % 50000))
-        vol_col = r.get('colis') or (1000 + (seed % 20000))
-        vol_ama = r.get('amana') or (500 + (seed % 10000))
-        vol_eb = r.get('ebarkia') or (100 + (seed % 2000))
-        vol_lrh = r.get('lrh') or (50 + (seed % 500))
-
-        volumes_input = {
-             "courrier_ordinaire": vol_co,
-             "courrier_recommande": vol_cr,
-             "colis": vol_col,
-             "amana": vol_ama,
-             "ebarkia": vol_eb,
-             "lrh": vol_lrh,
-             "sacs": 0, # Assuming 0 for generic run
-             "colis_amana_par_sac": 5, 
-             "courriers_par_sac": 4500
-        }
+    # 2. Single ordered stream of tasks, merged with the (same-ordered) centres
+    groups = _iter_taches_par_centre(db)
+    pending = next(groups, None)
 
-        # C. Run Simulation RH (Layer 1)
-        sim_result = calculer_simulation(
-            taches=tasks_dicts,
-            volumes=volumes_input,
-            productivite=80.0, # Standard assumption
-            volumes_annuels=volumes_input # Pass as annuals
-        )
-        etp_arrondi = sim_result.fte_arrondi
-
-        # D. Run Scoring (Layer 2)
-        scoring_input = {
-            **volumes_input,
-            "effectif_global": etp_arrondi
-        }
-        
-        output = ScoringService.calculate_score(scoring_input)
-        current_cat = r.get('cat_label') or "SANS"
-        impact = ScoringService.determine_impact(current_cat, output['simulated_class'])
-        
-        # Stats
-        stats["total"] += 1
-        if impact == "Promotion": stats["promotions"] += 1
-        elif impact == "Reclassement": stats["downgrades"] += 1
-        else: stats["stable"] += 1
-        if impact != "Stable": stats["impacted"] += 1
+    try:
+        for r in rows:
+            # A. Tasks of this centre (empty list if the centre has none)
+            while pending is not None and pending[0] < r.id:
+                pending = next(groups, None)
+            tasks_dicts = []
+            if pending is not None and pending[0] == r.id:
+                tasks_dicts = pending[1]
+                pending = next(groups, None)
 
-        # E. Prepare DB Object (Parent + Child)
-        result_obj = models.ScoringResult(
-            campaign_id=campaign_id,
-            centre_id=r.id,
-            global_score=output['global_score'],
-            simulated_class=output['simulated_class'],
-            impact=impact,
-            effectif_input=etp_arrondi
-        )
-        
-        for d in output['details']:
-            result_obj.details.append(models.ScoringDetail(
-                indicator_key=d['key'],
-                label=d['label'],
-                value=d['value'],
-                unit=d['unit'],
-                tier_range=d['tier_range'],
-                points=d['points'],
-                weight=d['weight'],
-                score=d['score']
-            ))
+            # B. Prepare Volumes
+            seed = int(r.id) * 12345
+            # Use DB values or Fallback if 0 (for demo sweetness)
+            vol_co = r.get('courrier_ordinaire') or (10000 + (seed % 100000))
+            vol_cr = r.get('courrier_recommande') or (5000 + (seed % 50000))
+            vol_col = r.get('colis') or (1000 + (seed % 20000))
+            vol_ama = r.get('amana') or (500 + (seed % 10000))
+            vol_eb = r.get('ebarkia') or (100 + (seed % 2000))
+            vol_lrh = r.get('lrh') or (50 + (seed % 500))
+
+            volumes_input = {
+                 "courrier_ordinaire": vol_co,
+                 "courrier_recommande": vol_cr,
+                 "colis": vol_col,
+                 "amana": vol_ama,
+                 "ebarkia": vol_eb,
+                 "lrh": vol_lrh,
+                 "sacs": 0, # Assuming 0 for generic run
+                 "colis_amana_par_sac": 5, 
+                 "courriers_par_sac": 4500
+            }
+
+            # C. Run Simulation RH (Layer 1)
+            sim_result = calculer_simulation(
+                taches=tasks_dicts,
+                volumes=volumes_input,
+                productivite=80.0, # Standard assumption
+                volumes_annuels=volumes_input # Pass as annuals
+            )
+            etp_arrondi = sim_result.fte_arrondi
+
+            # D. Run Scoring (Layer 2)
+            scoring_input = {
+                **volumes_input,
+                "effectif_global": etp_arrondi
+            }
+            
+            output = ScoringService.calculate_score(scoring_input)
+            current_cat = r.get('cat_label') or "SANS"
+            impact = ScoringService.determine_impact(current_cat, output['simulated_class'])
             
-        results_to_insert.append(result_obj)
+            # Stats
+            stats["total"] += 1
+            if impact == "Promotion": stats["promotions"] += 1
+            elif impact == "Reclassement": stats["downgrades"] += 1
+            else: stats["stable"] += 1
+            if impact != "Stable": stats["impacted"] += 1
+
+            # E. Prepare rows (Parent + Children), inserted once the stream is closed
+            results_rows.append({
+                "campaign_id": campaign_id,
+                "centre_id": r.id,
+                "global_score": output['global_score'],
+                "simulated_class": output['simulated_class'],
+                "impact": impact,
+                "effectif_input": etp_arrondi
+            })
+            details_rows.append([
+                {
+                    "indicator_key": d['key'],
+                    "label": d['label'],
+                    "value": d['value'],
+                    "unit": d['unit'],
+                    "tier_range": d['tier_range'],
+                    "points": d['points'],
+                    "weight": d['weight'],
+                    "score": d['score']
+                }
+                for d in output['details']
+            ])
+    finally:
+        groups.close()
 
     # 3. Batch Insert
     try:
-        db.add_all(results_to_insert)
+        _bulk_insert_results(db, results_rows, details_rows)
         db.commit()
     except Exception as e:
         db.rollback()
@@ -209,7 +278,7 @@ def run_campaign(
     return {
         "campaign_id": campaign_id,
         "summary": stats,
-        "results_count": len(results_to_insert)
+        "results_count": len(results_rows)
     }
 
 @router.get("/scoring/campaign/{campaign_id}/results", response_model=ScoringResponse)
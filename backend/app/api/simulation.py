@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.schemas.models import (
     SimulationRequest,
@@ -72,7 +73,7 @@ def simulate_effectifs(request: SimulationRequest, db: Session = Depends(get_db)
     try:
         # 🆕 SPECIAL ENGINE FOR CNDP (Centre 1965)
         if str(request.centre_id) == "1965" and request.volumes_ui:
-            print(f"🚀 [CNDP ENGINE] Using specialized simulation for center {request.centre_id}", flush=True)
+            trace(lambda: f"🚀 [CNDP ENGINE] Using specialized simulation for center {request.centre_id}")
             resultat = calculer_simulation_cndp(
                 db=db,
                 centre_id=request.centre_id,
@@ -94,7 +95,7 @@ def simulate_effectifs(request: SimulationRequest, db: Session = Depends(get_db)
             BandoengSimulationResult
         )
 
-        print(f"🔄 [BANDOENG ENGINE] Redirecting /simulate for Centre {request.centre_id}", flush=True)
+        trace(lambda: f"🔄 [BANDOENG ENGINE] Redirecting /simulate for Centre {request.centre_id}")
 
         # 1. Mapping Volumes (Daily & Annual)
         # Simulation.jsx passes annual volumes in 'volumes_annuels' and daily in 'volumes'
@@ -255,7 +256,7 @@ def simulate_vue_centre_optimisee(
 
         # 🆕 ROUTING SPECIAL CASA CCI (1952) pour Vue Centre
         if request.centre_id == 1952:
-             print("==================== REQUEST RECEIVED /vue-centre-optimisee (CASA CCI 1952) ====================", flush=True)
+             trace("==================== REQUEST RECEIVED /vue-centre-optimisee (CASA CCI 1952) ====================")
              cci_res = calculate_cci_simulation(db, request)
              
              # Mapping vers le format attendu par VueCentre (dict legacy)
@@ -287,7 +288,7 @@ def simulate_vue_centre_optimisee(
             FROM dbo.centres c
             WHERE c.id = :centre_id
         """
-        print("🔍 [DEBUG] REQUETE SQL MISE A JOUR (FAMILLE + POSTE) CHARGÉE", flush=True)
+        trace("🔍 [DEBUG] REQUETE SQL MISE A JOUR (FAMILLE + POSTE) CHARGÉE")
         centre_label = (
             db.execute(text(sql_centre), {"centre_id": request.centre_id}).scalar()
             or f"Centre {request.centre_id}"
@@ -375,14 +376,14 @@ def simulate_vue_centre_optimisee(
         volumes_journaliers["colis_par_collecte"] = _ratio("colis_par_collecte", 1.0)
 
         # DEBUG : vérifier les ratios reçus (Vue Centre)
-        print("==================== REQUEST RECEIVED /vue-centre-optimisee ====================", flush=True)
-        print(f"DEBUG vue-centre centre_id = {request.centre_id}", flush=True)
-        print(f"DEBUG vue-centre productivite = {request.productivite}", flush=True)
-        print(f"DEBUG vue-centre heures_net = {request.heures_net}", flush=True)
-        print(f"DEBUG vue-centre idle_minutes = {getattr(request, 'idle_minutes', 0.0)}", flush=True)
-        print(f"DEBUG vue-centre volumes_journaliers = {volumes_journaliers}", flush=True)
-        print(f"DEBUG vue-centre volumes_annuels (va_dict) = {va_dict}", flush=True)
-        print(f"DEBUG vue-centre nb taches finales = {len(taches_finales)}", flush=True)
+        trace("==================== REQUEST RECEIVED /vue-centre-optimisee ====================")
+        trace(lambda: f"DEBUG vue-centre centre_id = {request.centre_id}")
+        trace(lambda: f"DEBUG vue-centre productivite = {request.productivite}")
+        trace(lambda: f"DEBUG vue-centre heures_net = {request.heures_net}")
+        trace(lambda: f"DEBUG vue-centre idle_minutes = {getattr(request, 'idle_minutes', 0.0)}")
+        trace(lambda: f"DEBUG vue-centre volumes_journaliers = {volumes_journaliers}")
+        trace(lambda: f"DEBUG vue-centre volumes_annuels (va_dict) = {va_dict}")
+        trace(lambda: f"DEBUG vue-centre nb taches finales = {len(taches_finales)}")
 
         # Extract complexity from annual volumes (V2 standard)
         t_complexite = float(va_dict.get("taux_complexite", 1.0))
@@ -405,8 +406,8 @@ def simulate_vue_centre_optimisee(
         heures_net = sim_result.heures_net_jour or 8.5
 
         # 5) payload postes
-        print(f"DEBUG: Found {len(postes_meta)} postes for centre {request.centre_id}")
-        print(f"DEBUG: Found {len(taches_finales)} taches")
+        trace(lambda: f"DEBUG: Found {len(postes_meta)} postes for centre {request.centre_id}")
+        trace(lambda: f"DEBUG: Found {len(taches_finales)} taches")
 
         postes_payload = []
         total_heures_round = 0.0
@@ -441,7 +442,7 @@ def simulate_vue_centre_optimisee(
                 }
             )
         
-        print(f"DEBUG: Returning {len(postes_payload)} items in 'postes'")
+        trace(lambda: f"DEBUG: Returning {len(postes_payload)} items in 'postes'")
 
         total_heures = round(sim_result.total_heures or total_heures_round, 2)
         total_etp_calcule = round(sim_result.fte_calcule or 0.0, 2)
@@ -499,7 +500,7 @@ def simulate_vue_centre_optimisee(
                 )
                 
                 db.commit()
-                print(f"✅ Simulation Vue Centre #{sim_id} sauvegardée avec succès", flush=True)
+                trace(lambda: f"✅ Simulation Vue Centre #{sim_id} sauvegardée avec succès")
                 
             except Exception as e:
                 print(f"⚠️  Erreur sauvegarde simulation Vue Centre: {e}", flush=True)
@@ -734,7 +735,7 @@ def national_simulation(
     request: NationalSimRequest, db: Session = Depends(get_db)
 ):
     try:
-        print("🔹 [NATIONAL] Starting National Simulation...", flush=True)
+        trace("🔹 [NATIONAL] Starting National Simulation...")
         return process_national_simulation(db, request)
     except Exception as e:
         import traceback
@@ -2,21 +2,17 @@
 API endpoints pour les simulations asynchrones
 
 Ce module fournit des endpoints pour lancer et suivre
-les simulations en mode asynchrone via Celery.
+les simulations en mode asynchrone via Celery, ou dans le processus API
+quand Celery/Redis ne sont pas déployés (voir app.tasks.jobs, JOB_BACKEND).
 """
 
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks, UploadFile, File, Query
 from sqlalchemy.orm import Session
-from celery.result import AsyncResult
 from typing import Optional
 import logging
 
-from app.core.database import get_db
-from app.tasks.simulation_tasks import (
-    async_direction_simulation,
-    async_nationale_simulation,
-    async_centre_batch_simulation
-)
+from app.core.db import get_db
+from app.tasks.jobs import get_job_backend, backend_for, JobKindNotSupported
 from app.schemas.direction_sim import DirectionSimRequest
 
 logger = logging.getLogger(__name__)
@@ -63,17 +59,17 @@ def start_direction_simulation_async(
     logger.info(f"📤 Lancement simulation asynchrone direction {direction_id}")
     
     try:
-        # Convertir le request Pydantic en dict pour Celery
+        # Convertir le request Pydantic en dict (sérialisable)
         request_data = request.dict()
         
         # Lancer la tâche asynchrone
-        task = async_direction_simulation.delay(direction_id, request_data)
+        task_id = get_job_backend().submit("direction", direction_id, request_data)
         
         return {
-            "task_id": task.id,
+            "task_id": task_id,
             "status": "PENDING",
             "message": "Simulation lancée en arrière-plan",
-            "check_status_url": f"/api/async/task/{task.id}",
+            "check_status_url": f"/api/async/task/{task_id}",
             "direction_id": direction_id
         }
         
@@ -85,42 +81,70 @@ def start_direction_simulation_async(
         )
 
 
+def _start_batch(content: bytes, region_id: Optional[int], process_mode: str, force: bool) -> dict:
+    if not content:
+        raise HTTPException(status_code=400, detail="Fichier Excel vide")
+    try:
+        task_id = get_job_backend().submit("batch", content, region_id, process_mode, force)
+    except Exception as e:
+        logger.error(f"❌ Erreur lancement simulation batch: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du lancement de la simulation: {str(e)}"
+        )
+    return {
+        "task_id": task_id,
+        "status": "PENDING",
+        "message": "Simulation lancée en arrière-plan",
+        "check_status_url": f"/api/async/task/{task_id}",
+        "region_id": region_id,
+        "process_mode": process_mode
+    }
+
+
 @router.post("/simulation/nationale")
-def start_nationale_simulation_async(
-    request: dict,
-    db: Session = Depends(get_db)
+async def start_nationale_simulation_async(
+    file: UploadFile = File(...),
+    process_mode: str = Query(default="actuel", description="Mode de calcul : actuel | recommande | optimise"),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)")
 ):
     """
     Lance une simulation nationale en mode asynchrone
-    
-    La simulation nationale est très lourde et DOIT être
-    exécutée en mode asynchrone.
-    
+
+    Même fichier et même résultat que POST /batch/simulate (template national) :
+    le calcul est réparti en paquets de centres sur les workers, puis agrégé
+    par région et national.
+
     Args:
-        request: Paramètres de simulation nationale
-        
+        file: Classeur Excel (template national)
+        process_mode: actuel | recommande | optimise
+
     Returns:
         Dict contenant le task_id pour suivre la progression
     """
     logger.info("📤 Lancement simulation asynchrone nationale")
-    
-    try:
-        task = async_nationale_simulation.delay(request)
-        
-        return {
-            "task_id": task.id,
-            "status": "PENDING",
-            "message": "Simulation nationale lancée en arrière-plan",
-            "check_status_url": f"/api/async/task/{task.id}",
-            "estimated_duration": "2-5 minutes"
-        }
-        
-    except Exception as e:
-        logger.error(f"❌ Erreur lancement simulation nationale: {e}", exc_info=True)
-        raise HTTPException(
-            status_code=500,
-            detail=f"Erreur lors du lancement de la simulation: {str(e)}"
-        )
+    return _start_batch(await file.read(), None, process_mode, force)
+
+
+@router.post("/simulation/regionale/{region_id}")
+async def start_regionale_simulation_async(
+    region_id: int,
+    file: UploadFile = File(...),
+    process_mode: str = Query(default="actuel", description="Mode de calcul : actuel | recommande | optimise"),
+    force: bool = Query(default=False, description="Recalcule tous les centres (ignore les résultats réutilisables)")
+):
+    """
+    Lance une simulation régionale en mode asynchrone (template régional)
+
+    Args:
+        region_id: ID de la région
+        file: Classeur Excel (template régional)
+
+    Returns:
+        Dict contenant le task_id pour suivre la progression
+    """
+    logger.info(f"📤 Lancement simulation asynchrone région {region_id}")
+    return _start_batch(await file.read(), region_id, process_mode, force)
 
 
 @router.post("/simulation/centres/batch")
@@ -148,16 +172,18 @@ def start_centres_batch_simulation(
         )
     
     try:
-        task = async_centre_batch_simulation.delay(centre_ids, request)
+        task_id = get_job_backend().submit("centre_batch", centre_ids, request)
         
         return {
-            "task_id": task.id,
+            "task_id": task_id,
             "status": "PENDING",
             "message": f"Simulation batch de {len(centre_ids)} centres lancée",
-            "check_status_url": f"/api/async/task/{task.id}",
+            "check_status_url": f"/api/async/task/{task_id}",
             "total_centres": len(centre_ids)
         }
         
+    except JobKindNotSupported as e:
+        raise HTTPException(status_code=501, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Erreur lancement batch: {e}", exc_info=True)
         raise HTTPException(
@@ -202,52 +228,7 @@ def get_task_status(task_id: str):
         }
     """
     try:
-        task = AsyncResult(task_id)
-        
-        response = {
-            "task_id": task_id,
-            "state": task.state,
-        }
-        
-        if task.state == 'PENDING':
-            response.update({
-                "progress": 0,
-                "status": "En attente de démarrage...",
-                "result": None
-            })
-            
-        elif task.state == 'PROGRESS':
-            info = task.info or {}
-            response.update({
-                "progress": info.get('progress', 0),
-                "status": info.get('status', 'Calcul en cours...'),
-                "result": None,
-                "details": info
-            })
-            
-        elif task.state == 'SUCCESS':
-            response.update({
-                "progress": 100,
-                "status": "Terminé avec succès",
-                "result": task.result
-            })
-            
-        elif task.state == 'FAILURE':
-            response.update({
-                "progress": 0,
-                "status": "Erreur lors du calcul",
-                "error": str(task.info),
-                "result": None
-            })
-            
-        else:
-            response.update({
-                "progress": 0,
-                "status": f"État inconnu: {task.state}",
-                "result": None
-            })
-        
-        return response
+        return backend_for(task_id).status(task_id)
         
     except Exception as e:
         logger.error(f"❌ Erreur récupération statut tâche {task_id}: {e}")
@@ -271,23 +252,7 @@ def cancel_task(task_id: str):
         Dict confirmant l'annulation
     """
     try:
-        task = AsyncResult(task_id)
-        
-        if task.state in ['PENDING', 'PROGRESS']:
-            task.revoke(terminate=True)
-            logger.info(f"🛑 Tâche {task_id} annulée")
-            
-            return {
-                "task_id": task_id,
-                "status": "cancelled",
-                "message": "Tâche annulée avec succès"
-            }
-        else:
-            return {
-                "task_id": task_id,
-                "status": task.state,
-                "message": f"Impossible d'annuler une tâche en état {task.state}"
-            }
+        return backend_for(task_id).cancel(task_id)
             
     except Exception as e:
         logger.error(f"❌ Erreur annulation tâche {task_id}: {e}")
@@ -308,19 +273,7 @@ def get_active_tasks():
         Dict contenant la liste des tâches actives
     """
     try:
-        from app.core.celery_app import celery_app
-        
-        # Récupérer les tâches actives
-        inspect = celery_app.control.inspect()
-        active = inspect.active()
-        scheduled = inspect.scheduled()
-        
-        return {
-            "active_tasks": active or {},
-            "scheduled_tasks": scheduled or {},
-            "total_active": sum(len(tasks) for tasks in (active or {}).values()),
-            "total_scheduled": sum(len(tasks) for tasks in (scheduled or {}).values())
-        }
+        return get_job_backend().active()
         
     except Exception as e:
         logger.error(f"❌ Erreur récupération tâches actives: {e}")
@@ -333,21 +286,13 @@ def get_active_tasks():
 @router.get("/stats")
 def get_celery_stats():
     """
-    Récupère des statistiques sur Celery
+    Récupère des statistiques sur le backend d'exécution (Celery ou local)
     
     Returns:
         Dict contenant les statistiques
     """
     try:
-        from app.core.celery_app import celery_app
-        
-        inspect = celery_app.control.inspect()
-        stats = inspect.stats()
-        
-        return {
-            "workers": stats or {},
-            "total_workers": len(stats or {})
-        }
+        return get_job_backend().stats()
         
     except Exception as e:
         logger.error(f"❌ Erreur récupération stats: {e}")
@@ -357,34 +302,17 @@ def get_celery_stats():
         )
 
 
-# Health check pour Celery
+# Health check du backend d'exécution
 @router.get("/health")
 def celery_health_check():
     """
-    Vérifie que Celery est opérationnel
+    Vérifie que le backend d'exécution (Celery ou local) est opérationnel
     
     Returns:
         Dict avec le statut de santé
     """
     try:
-        from app.core.celery_app import celery_app
-        
-        # Tester la connexion au broker
-        inspect = celery_app.control.inspect()
-        stats = inspect.stats()
-        
-        if stats:
-            return {
-                "status": "healthy",
-                "workers_online": len(stats),
-                "message": "Celery est opérationnel"
-            }
-        else:
-            return {
-                "status": "degraded",
-                "workers_online": 0,
-                "message": "Aucun worker Celery détecté"
-            }
+        return get_job_backend().health()
             
     except Exception as e:
         logger.error(f"❌ Health check Celery échoué: {e}")
@@ -4,11 +4,12 @@ Endpoints API pour la simulation data-driven.
 """
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
 
+from app.core.tracing import trace
 from app.core.db import get_db
 from app.schemas.volumes_ui import VolumesUIInput
-from app.schemas.models import SimulationResponse
+from app.schemas.models import SimulationResponse, MultiCentresSimulationResponse
 from app.services.simulation_data_driven import (
     calculer_simulation_data_driven,
     calculer_simulation_centre_data_driven,
@@ -32,28 +33,28 @@ def simulate_intervenant_data_driven(
     db: Session = Depends(get_db)
 ):
     try:
-        print(f"\n{'='*80}")
-        print(f"🎯 [BACKEND - STEP 1] API INTERVENANT - Requête reçue")
-        print(f"{'='*80}")
-        print(f"   Centre/Poste ID: {centre_poste_id}")
-        print(f"   Productivité: {productivite}%")
-        print(f"   Heures/jour: {heures_par_jour}h")
-        print(f"   Idle minutes: {idle_minutes} min")
-        print(f"   Debug: {debug}")
-        print(f"   Volumes UI reçus: {volumes_ui.dict()}")
-        print(f"{'='*80}\n")
+        trace(lambda: f"\n{'='*80}")
+        trace(f"🎯 [BACKEND - STEP 1] API INTERVENANT - Requête reçue")
+        trace(lambda: f"{'='*80}")
+        trace(lambda: f"   Centre/Poste ID: {centre_poste_id}")
+        trace(lambda: f"   Productivité: {productivite}%")
+        trace(lambda: f"   Heures/jour: {heures_par_jour}h")
+        trace(lambda: f"   Idle minutes: {idle_minutes} min")
+        trace(lambda: f"   Debug: {debug}")
+        trace(lambda: f"   Volumes UI reçus: {volumes_ui.dict()}")
+        trace(lambda: f"{'='*80}\n")
         
-        print(f"📋 [BACKEND - STEP 2] Vérification du centre/poste ID={centre_poste_id}")
+        trace(lambda: f"📋 [BACKEND - STEP 2] Vérification du centre/poste ID={centre_poste_id}")
         # Vérifier que le centre/poste existe
         centre_poste = db.query(CentrePoste).filter(CentrePoste.id == centre_poste_id).first()
         if not centre_poste:
-            print(f"❌ [BACKEND - STEP 2] Centre/Poste {centre_poste_id} non trouvé")
+            trace(lambda: f"❌ [BACKEND - STEP 2] Centre/Poste {centre_poste_id} non trouvé")
             raise HTTPException(status_code=404, detail=f"Centre/Poste {centre_poste_id} non trouvé")
         
-        print(f"✅ [BACKEND - STEP 2] Centre/Poste trouvé: {centre_poste.centre.label if centre_poste.centre else 'N/A'} - {centre_poste.poste.label if centre_poste.poste else 'N/A'}")
+        trace(lambda: f"✅ [BACKEND - STEP 2] Centre/Poste trouvé: {centre_poste.centre.label if centre_poste.centre else 'N/A'} - {centre_poste.poste.label if centre_poste.poste else 'N/A'}")
         
-        print(f"\n🔄 [BACKEND - STEP 3] Appel du service de calcul data-driven...")
-        print(f"   ED%: {ed_percent}%")
+        trace(f"\n🔄 [BACKEND - STEP 3] Appel du service de calcul data-driven...")
+        trace(lambda: f"   ED%: {ed_percent}%")
         # Calculer la simulation
         result = calculer_simulation_data_driven(
             db=db,
@@ -66,11 +67,11 @@ def simulate_intervenant_data_driven(
             debug=debug
         )
         
-        print(f"\n✅ [BACKEND - STEP 10] Résultat final calculé:")
-        print(f"   ETP: {result.fte_arrondi}")
-        print(f"   Heures totales: {result.total_heures}h")
-        print(f"   Nombre de tâches: {len(result.details_taches)}")
-        print(f"{'='*80}\n")
+        trace(f"\n✅ [BACKEND - STEP 10] Résultat final calculé:")
+        trace(lambda: f"   ETP: {result.fte_arrondi}")
+        trace(lambda: f"   Heures totales: {result.total_heures}h")
+        trace(lambda: f"   Nombre de tâches: {len(result.details_taches)}")
+        trace(lambda: f"{'='*80}\n")
         
         return result
     except Exception as e:
@@ -112,23 +113,23 @@ def simulate_centre_data_driven(
     - ETP total calculé
     """
     
-    print(f"\n{'='*80}")
-    print(f"🏢 API CENTRE - Requête reçue")
-    print(f"{'='*80}")
-    print(f"   Centre ID: {centre_id}")
-    print(f"   Productivité: {productivite}%")
-    print(f"   Heures/jour: {heures_par_jour}h")
-    print(f"   Idle minutes: {idle_minutes} min")
-    print(f"   Debug: {debug}")
-    print(f"   Volumes UI: {volumes_ui.dict()}")
-    print(f"{'='*80}\n")
+    trace(lambda: f"\n{'='*80}")
+    trace(f"🏢 API CENTRE - Requête reçue")
+    trace(lambda: f"{'='*80}")
+    trace(lambda: f"   Centre ID: {centre_id}")
+    trace(lambda: f"   Productivité: {productivite}%")
+    trace(lambda: f"   Heures/jour: {heures_par_jour}h")
+    trace(lambda: f"   Idle minutes: {idle_minutes} min")
+    trace(lambda: f"   Debug: {debug}")
+    trace(lambda: f"   Volumes UI: {volumes_ui.dict()}")
+    trace(lambda: f"{'='*80}\n")
     
     # Vérifier que le centre existe
     centre = db.query(Centre).filter(Centre.id == centre_id).first()
     if not centre:
         raise HTTPException(status_code=404, detail=f"Centre {centre_id} non trouvé")
     
-    print(f"✅ Centre trouvé: {centre.label}")
+    trace(lambda: f"✅ Centre trouvé: {centre.label}")
     
     # Calculer la simulation
     return calculer_simulation_centre_data_driven(
@@ -144,13 +145,15 @@ def simulate_centre_data_driven(
     )
 
 
-@router.post("/multi-centres", response_model=SimulationResponse)
+@router.post("/multi-centres", response_model=MultiCentresSimulationResponse)
 def simulate_multi_centres_data_driven(
     centre_ids: List[int],
     volumes_ui: VolumesUIInput,
+    volumes_par_centre: Optional[Dict[int, VolumesUIInput]] = None,
     productivite: float = Query(100.0, ge=0, le=200),
     heures_par_jour: float = Query(8.5, ge=0, le=24),
     idle_minutes: float = Query(0.0, ge=0, le=480),
+    avec_details: bool = Query(False),
     debug: bool = Query(False),
     db: Session = Depends(get_db)
 ):
@@ -163,24 +166,29 @@ def simulate_multi_centres_data_driven(
     
     **Paramètres :**
     - `centre_ids` : Liste des IDs de centres (dans le body)
-    - `volumes_ui` : Volumes annuels saisis dans l'UI
+    - `volumes_ui` : Volumes annuels saisis dans l'UI (partagés par défaut)
+    - `volumes_par_centre` : Volumes propres à certains centres {centre_id: volumes} (optionnel, body)
     - `productivite` : Productivité en % (défaut: 100%)
     - `heures_par_jour` : Heures de travail par jour (défaut: 8h)
     - `idle_minutes` : Marge d'inactivité en minutes/jour (défaut: 0)
+    - `avec_details` : Inclure le détail des tâches de tous les centres (défaut: false)
     - `debug` : Activer les logs détaillés (défaut: false)
     
     **Retourne :**
-    - Résultats agrégés pour tous les centres
+    - Résultats agrégés pour tous les centres, `postes` consolidés par poste
     - ETP total calculé
+    - `centres` : résultat et postes de chaque centre
     """
     
     if not centre_ids:
         raise HTTPException(status_code=400, detail="La liste centre_ids ne peut pas être vide")
     
     # Vérifier que tous les centres existent
-    centres = db.query(Centre).filter(Centre.id.in_(centre_ids)).all()
-    if len(centres) != len(centre_ids):
+    centres = db.query(Centre.id).filter(Centre.id.in_(centre_ids)).all()
+    if len(centres) != len(set(centre_ids)):
         raise HTTPException(status_code=404, detail="Un ou plusieurs centres non trouvés")
+    if volumes_par_centre and not set(volumes_par_centre) <= set(centre_ids):
+        raise HTTPException(status_code=400, detail="volumes_par_centre contient des centres absents de centre_ids")
     
     # Calculer la simulation
     return calculer_simulation_multi_centres_data_driven(
@@ -190,7 +198,9 @@ def simulate_multi_centres_data_driven(
         productivite=productivite,
         heures_par_jour=heures_par_jour,
         idle_minutes=idle_minutes,
-        debug=debug
+        debug=debug,
+        volumes_par_centre=volumes_par_centre,
+        avec_details=avec_details
     )
 
 
@@ -464,7 +474,7 @@ def debug_compare_totals(
     colis_amana_par_sac = 10.0
 
     # 1. Simulation CENTRE GLOBAL
-    print("\\n--- DEBUG AGREGATION: CALCUL VUE CENTRE ---")
+    trace("\\n--- DEBUG AGREGATION: CALCUL VUE CENTRE ---")
     res_centre = calculer_simulation_centre_data_driven(
         db=db,
         centre_id=centre_id,
@@ -478,7 +488,7 @@ def debug_compare_totals(
     )
 
     # 2. Simulation POSTE par POSTE (Somme manuelle)
-    print("\\n--- DEBUG AGREGATION: CALCUL PROFIL INTERVENANT (SOMME) ---")
+    trace("\\n--- DEBUG AGREGATION: CALCUL PROFIL INTERVENANT (SOMME) ---")
     centre_postes = db.query(CentrePoste).filter(CentrePoste.centre_id == centre_id).all()
     
     total_heures_sum = 0.0
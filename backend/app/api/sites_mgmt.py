@@ -2,16 +2,14 @@ from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-import pandas as pd
 import io
 import re
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
 from typing import List, Optional
 from pydantic import BaseModel
 
 from app.core.db import get_db
 from app.models.db_models import Centre, AttachedSite, Region
+from app.services.referentiel_snapshot import bump_referentiel_version, get_sites_rattaches
 
 router = APIRouter(tags=["Sites Rattachés"])
 
@@ -46,8 +44,7 @@ def norm(s):
 @router.get("/sites/centre/{centre_id}", response_model=List[AttachedSiteItem])
 def get_sites_by_centre(centre_id: int, db: Session = Depends(get_db)):
     """Lister les sites rattachés à un centre."""
-    sites = db.query(AttachedSite).filter(AttachedSite.centre_id == centre_id).all()
-    return sites
+    return list(get_sites_rattaches(db).get(centre_id, ()))
 
 @router.post("/sites", response_model=AttachedSiteItem)
 def create_site(site: AttachedSiteCreate, db: Session = Depends(get_db)):
@@ -73,6 +70,7 @@ def create_site(site: AttachedSiteCreate, db: Session = Depends(get_db)):
     new_site = AttachedSite(**site.dict())
     db.add(new_site)
     db.commit()
+    bump_referentiel_version("sites")
     db.refresh(new_site)
     return new_site
 
@@ -95,6 +93,7 @@ def update_site(site_id: int, update: AttachedSiteUpdate, db: Session = Depends(
         site.centre_id = update.centre_id
         
     db.commit()
+    bump_referentiel_version("sites")
     db.refresh(site)
     return site
 
@@ -107,6 +106,7 @@ def delete_site(site_id: int, db: Session = Depends(get_db)):
     
     db.delete(site)
     db.commit()
+    bump_referentiel_version("sites")
     return {"status": "success", "message": "Site supprimé"}
 
 @router.get("/sites/export-template")
@@ -116,6 +116,9 @@ def export_sites_template(
     db: Session = Depends(get_db)
 ):
     """Générer un template Excel pour l'import des sites."""
+    import pandas as pd
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.utils import get_column_letter
     query_str = """
         SELECT r.label as region, c.label as centre, s.label as site_label
         FROM dbo.centres c
@@ -220,6 +223,7 @@ def export_sites_template(
 @router.post("/sites/import")
 async def import_sites(file: UploadFile = File(...), db: Session = Depends(get_db)):
     """Importer des sites depuis un fichier Excel (Génération auto du code)."""
+    import pandas as pd
     try:
         contents = await file.read()
         # On tente de lire l'en-tête soit à la ligne 0 soit à la ligne 1 (si une note existe)
@@ -290,6 +294,7 @@ async def import_sites(file: UploadFile = File(...), db: Session = Depends(get_d
             success_count += 1
             
         db.commit()
+        bump_referentiel_version("sites")
         
         if errors:
             # Générer rapport de rejets
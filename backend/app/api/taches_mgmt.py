@@ -4,13 +4,13 @@ from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 from pydantic import BaseModel
-import openpyxl
 import io
 from io import BytesIO
 import os
 
 from app.core.db import get_db
 from app.models import db_models
+from app.services.referentiel_snapshot import bump_referentiel_version
 
 router = APIRouter(tags=["taches_mgmt"])
 
@@ -86,6 +86,7 @@ def create_tache(tache: TacheCreate, db: Session = Depends(get_db)):
     )
     db.add(new_tache)
     db.commit()
+    bump_referentiel_version("taches", "postes")
     db.refresh(new_tache)
     return {"status": "created", "id": new_tache.id}
 
@@ -125,6 +126,7 @@ def update_tache(tache_id: int, update: TacheUpdate, db: Session = Depends(get_d
     # No auto-calculation. We trust the inputs are mapped to the correct columns as requested.
     
     db.commit()
+    bump_referentiel_version("taches")
     return {"status": "updated"}
 
 @router.delete("/taches/{tache_id}")
@@ -135,6 +137,7 @@ def delete_tache(tache_id: int, db: Session = Depends(get_db)):
     
     db.delete(t)
     db.commit()
+    bump_referentiel_version("taches")
     return {"status": "deleted"}
 
 @router.delete("/taches/centre/{centre_id}")
@@ -148,10 +151,12 @@ def delete_taches_by_centre(centre_id: int, db: Session = Depends(get_db)):
     # Delete tasks associated with these CentrePoste IDs
     result = db.query(db_models.Tache).filter(db_models.Tache.centre_poste_id.in_(cp_ids)).delete(synchronize_session=False)
     db.commit()
+    bump_referentiel_version("taches")
     return {"status": "deleted", "count": result}
 
 def _process_import_taches(content: bytes, centre_id: int, db: Session, poste_id: Optional[int] = None):
     # This function isolates the logic of processing the excel file from bytes.
+    import openpyxl
     wb = openpyxl.load_workbook(BytesIO(content))
     ws = wb.active
     
@@ -393,6 +398,7 @@ def _process_import_taches(content: bytes, centre_id: int, db: Session, poste_id
 
     try:
         db.commit()
+        bump_referentiel_version("taches", "postes")
     except Exception as e:
         db.rollback()
         return {
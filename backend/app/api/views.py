@@ -1,10 +1,10 @@
 ﻿# app/api/views.py
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import text
+from sqlalchemy import text, bindparam
 from typing import Optional
 from app.core.db import get_db
-from app.services.simulation import calculer_simulation, calculer_heures_nettes
+from app.services.simulation import calculer_simulation, calculer_heures_nettes, calculer_fte
 from pydantic import BaseModel
 
 router = APIRouter(tags=["views"])
@@ -32,6 +32,164 @@ class VueIntervenantResponse(BaseModel):
     total_ecart: int
 
 
+MAX_CENTRES_BATCH = 50
+
+
+def _charger_vues_intervenant(
+    db: Session,
+    centre_ids: list[int],
+    volumes_input: dict,
+    volumes_mensuels: dict,
+    productivite: float,
+    heures_net: Optional[float],
+) -> dict:
+    """
+    Vue intervenant pour plusieurs centres en 3 requêtes (centres, postes, tâches),
+    quel que soit le nombre de postes : {centre_id: VueIntervenantResponse}.
+
+    Les tâches sont regroupées par poste en mémoire et évaluées en une seule
+    passe du moteur ; les heures sont ensuite ventilées par poste via
+    heures_par_poste (clé centre_poste_id).
+    """
+    ids = sorted({int(c) for c in centre_ids})
+    if not ids:
+        return {}
+
+    # 1️⃣ Centres
+    centres_rows = db.execute(
+        text("SELECT id, label, CAST(cas AS FLOAT) as cas FROM dbo.centres WHERE id IN :ids")
+        .bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids}
+    ).mappings().all()
+
+    # 2️⃣ Postes des centres avec effectifs actuels
+    postes_rows = db.execute(text("""
+        SELECT 
+            cp.centre_id,
+            p.id as poste_id,
+            p.label as poste_label,
+            p.type_poste,
+            COALESCE(cp.effectif_actuel, 0) as effectif_actuel
+        FROM dbo.centre_postes cp
+        INNER JOIN dbo.postes p ON p.id = cp.poste_id
+        WHERE cp.centre_id IN :ids
+        ORDER BY cp.centre_id, p.label
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": ids}).mappings().all()
+
+    # 3️⃣ Toutes les tâches des centres (ordre par poste identique à l'ancien chargement par poste)
+    taches_rows = db.execute(text("""
+        SELECT 
+            t.id,
+            t.nom_tache,
+            t.phase,
+            t.unite_mesure,
+            t.moyenne_min,
+            t.min_min,
+            t.moy_sec,
+            t.ordre,
+            t.base_calcul,
+            t.produit,
+            t.centre_poste_id,
+            cp.centre_id,
+            cp.poste_id
+        FROM dbo.taches t
+        INNER JOIN dbo.centre_postes cp ON cp.id = t.centre_poste_id
+        WHERE cp.centre_id IN :ids
+        ORDER BY cp.centre_id, cp.poste_id, t.ordre, t.nom_tache
+    """).bindparams(bindparam("ids", expanding=True)), {"ids": ids}).mappings().all()
+
+    # 4️⃣ Regroupement par poste en mémoire
+    taches = []
+    poste_de_cp = {}  # centre_poste_id -> (centre_id, poste_id)
+    for r in taches_rows:
+        t = dict(r)
+        poste_de_cp[t["centre_poste_id"]] = (t.pop("centre_id"), t["poste_id"])
+        taches.append(t)
+
+    # 5️⃣ Une seule passe moteur : les volumes et heures nettes sont communs à tous les postes
+    heures_par_poste = {}
+    if taches:
+        resultat = calculer_simulation(
+            taches=taches,
+            volumes=volumes_input,
+            productivite=productivite,
+            heures_net_input=heures_net,
+            volumes_mensuels=volumes_mensuels
+        )
+        for cp_id, heures in resultat.heures_par_poste.items():
+            key = poste_de_cp[cp_id]
+            heures_par_poste[key] = heures_par_poste.get(key, 0.0) + heures
+
+    heures_net_calculees = calculer_heures_nettes(productivite, heures_net)
+
+    postes_par_centre = {}
+    for poste in postes_rows:
+        postes_par_centre.setdefault(poste["centre_id"], []).append(poste)
+
+    vues = {}
+    for centre_row in centres_rows:
+        centre_id = centre_row["id"]
+        postes_etp = []
+        total_etp_calcule = 0.0
+        total_etp_arrondi = 0
+        total_effectif_actuel = 0
+
+        for poste in postes_par_centre.get(centre_id, []):
+            poste_id = poste["poste_id"]
+            total_heures = heures_par_poste.get((centre_id, poste_id), 0.0)
+            fte_calcule, fte_arrondi = calculer_fte(total_heures, heures_net_calculees)
+            fte_calcule = round(fte_calcule, 2)
+
+            effectif_actuel = int(poste["effectif_actuel"])
+            ecart = fte_arrondi - effectif_actuel
+
+            postes_etp.append(PosteETP(
+                poste_id=poste_id,
+                poste_label=poste["poste_label"],
+                type_poste=poste["type_poste"],
+                effectif_actuel=effectif_actuel,
+                etp_calcule=fte_calcule,
+                etp_arrondi=fte_arrondi,
+                ecart=ecart,
+                total_heures=round(total_heures, 2)
+            ))
+
+            # Totaux
+            total_etp_calcule += fte_calcule
+            total_etp_arrondi += fte_arrondi
+            total_effectif_actuel += effectif_actuel
+
+        vues[centre_id] = VueIntervenantResponse(
+            centre_id=centre_id,
+            centre_label=centre_row["label"],
+            cas=float(centre_row["cas"]) if centre_row["cas"] is not None else None,
+            postes=postes_etp,
+            total_etp_calcule=round(total_etp_calcule, 2),
+            total_etp_arrondi=total_etp_arrondi,
+            total_effectif_actuel=total_effectif_actuel,
+            total_ecart=total_etp_arrondi - total_effectif_actuel
+        )
+
+    return vues
+
+
+def _volumes_vue(sacs, colis, scelle, courrier_ordinaire, courrier_recommande, ebarkia, lrh, amana):
+    """Volumes journaliers (sacs/colis/scellés) et annuels → mensuels attendus par le moteur."""
+    volumes_input = {
+        "sacs": sacs,
+        "colis": colis,
+        "scelle": scelle
+    }
+    volumes_mensuels = {
+        "courrier_ordinaire": courrier_ordinaire / 12,
+        "courrier_recommande": courrier_recommande / 12,
+        "ebarkia": ebarkia / 12,
+        "lrh": lrh / 12,
+        "amana": amana / 12,
+    }
+    return volumes_input, volumes_mensuels
+
+
 @router.get("/vue-intervenant", response_model=VueIntervenantResponse)
 def get_vue_intervenant(
     centre_id: int = Query(..., description="ID du centre"),
@@ -62,138 +220,62 @@ def get_vue_intervenant(
     """
     
     try:
-        # 1️⃣ Récupérer les infos du centre
-        centre_row = db.execute(
-            text("SELECT id, label, CAST(cas AS FLOAT) as cas FROM dbo.centres WHERE id = :centre_id"),
-            {"centre_id": centre_id}
-        ).mappings().first()
-        
-        if not centre_row:
+        volumes_input, volumes_mensuels = _volumes_vue(
+            sacs, colis, scelle, courrier_ordinaire, courrier_recommande, ebarkia, lrh, amana
+        )
+        vues = _charger_vues_intervenant(
+            db, [centre_id], volumes_input, volumes_mensuels, productivite, heures_net
+        )
+        if centre_id not in vues:
             raise HTTPException(status_code=404, detail=f"Centre {centre_id} introuvable")
+        return vues[centre_id]
         
-        centre_label = centre_row["label"]
-        cas_val = float(centre_row["cas"]) if centre_row["cas"] is not None else None
-        
-        # 2️⃣ Récupérer tous les postes du centre avec effectifs actuels
-        postes_rows = db.execute(text("""
-            SELECT 
-                p.id as poste_id,
-                p.label as poste_label,
-                p.type_poste,
-                COALESCE(cp.effectif_actuel, 0) as effectif_actuel
-            FROM dbo.centre_postes cp
-            INNER JOIN dbo.postes p ON p.id = cp.poste_id
-            WHERE cp.centre_id = :centre_id
-            ORDER BY p.label
-        """), {"centre_id": centre_id}).mappings().all()
-        
-        if not postes_rows:
-            # Aucun poste configuré pour ce centre
-            return VueIntervenantResponse(
-                centre_id=centre_id,
-                centre_label=centre_label,
-                cas=cas_val,
-                postes=[],
-                total_etp_calcule=0.0,
-                total_etp_arrondi=0,
-                total_effectif_actuel=0,
-                total_ecart=0
-            )
-        
-        # 3️⃣ Convertir volumes annuels → mensuels
-        volumes_mensuels = {
-            "courrier_ordinaire": courrier_ordinaire / 12,
-            "courrier_recommande": courrier_recommande / 12,
-            "ebarkia": ebarkia / 12,
-            "lrh": lrh / 12,
-            "amana": amana / 12,
-        }
-        
-        # 4️⃣ Calculer les heures nettes
-        heures_net_calculees = calculer_heures_nettes(productivite, heures_net)
-        
-        # 5️⃣ Pour chaque poste, récupérer ses tâches et calculer l'ETP
-        postes_etp = []
-        total_etp_calcule = 0.0
-        total_etp_arrondi = 0
-        total_effectif_actuel = 0
-        
-        for poste in postes_rows:
-            poste_id = poste["poste_id"]
-            
-            # Récupérer les tâches de ce poste dans ce centre
-            taches_rows = db.execute(text("""
-                SELECT 
-                    t.id,
-                    t.nom_tache,
-                    t.phase,
-                    t.unite_mesure,
-                    t.moyenne_min,
-                    t.min_min,
-                    t.moy_sec,
-                    t.ordre,
-                    t.base_calcul,
-                    t.produit,
-                    t.centre_poste_id
-                FROM dbo.taches t
-                INNER JOIN dbo.centre_postes cp ON cp.id = t.centre_poste_id
-                WHERE cp.centre_id = :centre_id 
-                  AND cp.poste_id = :poste_id
-                ORDER BY t.ordre, t.nom_tache
-            """), {
-                "centre_id": centre_id,
-                "poste_id": poste_id
-            }).mappings().all()
-            
-            taches = [dict(r) for r in taches_rows]
-            
-            # Simuler pour ce poste
-            volumes_input = {
-                "sacs": sacs,
-                "colis": colis,
-                "scelle": scelle
-            }
-            
-            resultat = calculer_simulation(
-                taches=taches,
-                volumes=volumes_input,
-                productivite=productivite,
-                heures_net_input=heures_net,
-                volumes_mensuels=volumes_mensuels
-            )
-            
-            effectif_actuel = int(poste["effectif_actuel"])
-            ecart = resultat.fte_arrondi - effectif_actuel
-            
-            postes_etp.append(PosteETP(
-                poste_id=poste_id,
-                poste_label=poste["poste_label"],
-                type_poste=poste["type_poste"],
-                effectif_actuel=effectif_actuel,
-                etp_calcule=resultat.fte_calcule,
-                etp_arrondi=resultat.fte_arrondi,
-                ecart=ecart,
-                total_heures=resultat.total_heures
-            ))
-            
-            # Totaux
-            total_etp_calcule += resultat.fte_calcule
-            total_etp_arrondi += resultat.fte_arrondi
-            total_effectif_actuel += effectif_actuel
-        
-        total_ecart = total_etp_arrondi - total_effectif_actuel
-        
-        return VueIntervenantResponse(
-            centre_id=centre_id,
-            centre_label=centre_label,
-            cas=cas_val,
-            postes=postes_etp,
-            total_etp_calcule=round(total_etp_calcule, 2),
-            total_etp_arrondi=total_etp_arrondi,
-            total_effectif_actuel=total_effectif_actuel,
-            total_ecart=total_ecart
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors du calcul de la vue intervenant: {str(e)}"
         )
-        
+
+
+@router.get("/vue-intervenant/batch", response_model=list[VueIntervenantResponse])
+def get_vue_intervenant_batch(
+    centre_ids: list[int] = Query(..., description="IDs des centres (?centre_ids=1&centre_ids=2)"),
+    sacs: float = Query(0, ge=0),
+    colis: float = Query(0, ge=0),
+    scelle: float = Query(0, ge=0),
+    courrier_ordinaire: float = Query(0, ge=0, description="Volume annuel CO"),
+    courrier_recommande: float = Query(0, ge=0, description="Volume annuel CR"),
+    ebarkia: float = Query(0, ge=0, description="Volume annuel"),
+    lrh: float = Query(0, ge=0, description="Volume annuel"),
+    amana: float = Query(0, ge=0, description="Volume annuel"),
+    productivite: float = Query(100, ge=0, le=100),
+    heures_net: Optional[float] = Query(None, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Vue intervenant pour plusieurs centres avec les mêmes volumes,
+    en 3 requêtes au total. Résultats dans l'ordre des centre_ids demandés.
+    """
+    if len(centre_ids) > MAX_CENTRES_BATCH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Maximum {MAX_CENTRES_BATCH} centres par batch"
+        )
+
+    try:
+        volumes_input, volumes_mensuels = _volumes_vue(
+            sacs, colis, scelle, courrier_ordinaire, courrier_recommande, ebarkia, lrh, amana
+        )
+        vues = _charger_vues_intervenant(
+            db, centre_ids, volumes_input, volumes_mensuels, productivite, heures_net
+        )
+        manquants = [cid for cid in dict.fromkeys(centre_ids) if cid not in vues]
+        if manquants:
+            raise HTTPException(status_code=404, detail=f"Centres introuvables: {manquants}")
+        return [vues[cid] for cid in dict.fromkeys(centre_ids)]
+
     except HTTPException:
         raise
     except Exception as e:
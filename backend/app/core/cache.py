@@ -7,48 +7,265 @@ Ce module fournit des décorateurs et fonctions utilitaires pour :
 - Gérer les clés de cache de manière cohérente
 """
 
-import redis
 from functools import wraps
 import json
 import hashlib
-from typing import Optional, Callable, Any, Union
+import inspect
+import threading
+import time
+import fnmatch
+from collections import OrderedDict, defaultdict
+from typing import Optional, Callable, Any, Union, Iterable, Dict, List
 import logging
 from datetime import timedelta
 
-logger = logging.getLogger(__name__)
+from sqlalchemy.orm import Session
 
-# Configuration Redis (à adapter selon votre environnement)
-REDIS_HOST = "localhost"
-REDIS_PORT = 6379
-REDIS_DB = 0
-REDIS_PASSWORD = None  # Si nécessaire
+from app.core.config import settings
 
-# Initialisation du client Redis
 try:
-    redis_client = redis.Redis(
-        host=REDIS_HOST,
-        port=REDIS_PORT,
-        db=REDIS_DB,
-        password=REDIS_PASSWORD,
-        decode_responses=True,
-        socket_connect_timeout=5,
-        socket_timeout=5,
-        retry_on_timeout=True
-    )
-    # Test de connexion
-    redis_client.ping()
-    logger.info("✅ Connexion Redis établie avec succès")
-except redis.ConnectionError as e:
-    logger.warning(f"⚠️ Redis non disponible : {e}. Le cache sera désactivé.")
-    redis_client = None
-except Exception as e:
-    logger.error(f"❌ Erreur Redis : {e}")
-    redis_client = None
+    import orjson
+except ImportError:  # Repli sur json (plus lent)
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Cache local (L1) devant Redis : par processus, LRU + TTL
+L1_MAXSIZE = 1024          # Nombre max d'entrées
+L1_TTL = 60                # TTL max en secondes (borne la durée de données périmées entre workers)
+
+# Verrou Redis anti-"stampede" : un seul processus recalcule une clé manquante
+LOCK_TIMEOUT = 30          # Durée de vie du verrou (secondes)
+LOCK_WAIT = 10             # Attente max du résultat calculé par un autre processus (secondes)
+LOCK_POLL = 0.05
+
+# --- Client Redis (connexion en arrière-plan, jamais à l'import) ---
+# None tant que Redis n'est pas joignable : seul le cache local est utilisé.
+redis_client = None
+_connect_lock = threading.Lock()
+_connector: Optional[threading.Thread] = None
+_on_connect: List[Callable] = []
+
+
+def _connect_loop():
+    """Thread de connexion : réessaie toutes les REDIS_RETRY_INTERVAL secondes jusqu'au succès."""
+    global redis_client, _connector
+    import redis  # Import différé : hors du chemin de démarrage
+    warned = False
+    while True:
+        try:
+            client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                password=settings.REDIS_PASSWORD,
+                decode_responses=True,
+                socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT,
+                socket_timeout=5,
+                retry_on_timeout=True
+            )
+            client.ping()
+        except Exception as e:
+            if not warned:
+                logger.warning(f"⚠️ Redis non disponible : {e}. Seul le cache local sera utilisé (nouvelle tentative toutes les {settings.REDIS_RETRY_INTERVAL}s).")
+                warned = True
+            time.sleep(settings.REDIS_RETRY_INTERVAL)
+            continue
+
+        with _connect_lock:
+            redis_client = client
+            _connector = None
+            callbacks = list(_on_connect)
+        logger.info("✅ Connexion Redis établie avec succès")
+        for callback in callbacks:
+            try:
+                callback(client)
+            except Exception as e:
+                logger.error(f"❌ Erreur callback connexion Redis : {e}")
+        return
+
+
+def _start_connector():
+    global _connector
+    if not settings.REDIS_ENABLED:
+        return
+    with _connect_lock:
+        if _connector is None and redis_client is None:
+            _connector = threading.Thread(target=_connect_loop, name="redis-connect", daemon=True)
+            _connector.start()
+
+
+def get_redis():
+    """
+    Client Redis connecté, ou None. Le premier appel lance la connexion
+    en arrière-plan : l'appelant n'attend jamais Redis.
+    """
+    client = redis_client
+    if client is None:
+        _start_connector()
+    return client
+
+
+def on_redis_connect(callback: Callable):
+    """Appelle callback(client) à chaque connexion Redis (immédiatement si déjà connecté)."""
+    with _connect_lock:
+        _on_connect.append(callback)
+        client = redis_client
+    if client is not None:
+        callback(client)
+    else:
+        _start_connector()
+
+
+def _connection_error(e: Exception):
+    """Perte de connexion pendant une opération : retour au cache local et reconnexion en arrière-plan."""
+    global redis_client
+    import redis
+    if isinstance(e, (redis.ConnectionError, redis.TimeoutError)):
+        with _connect_lock:
+            redis_client = None
+        _start_connector()
+
+
+# --- Sérialisation (orjson si disponible, sinon json) ---
+if orjson is not None:
+    _ORJSON_OPTS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def _dumps(value: Any) -> str:
+        # datetime via default=str : même rendu que json.dumps(default=str)
+        return orjson.dumps(value, default=str, option=_ORJSON_OPTS).decode("utf-8")
+
+    _loads = orjson.loads
+else:
+    def _dumps(value: Any) -> str:
+        return json.dumps(value, default=str, ensure_ascii=False)
+
+    _loads = json.loads
+
+
+# --- Cache local (L1) ---
+class _LocalCache:
+    """LRU + TTL en mémoire, partagé par les threads du processus. Stocke les valeurs sérialisées."""
+
+    def __init__(self, maxsize: int = L1_MAXSIZE):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires, payload = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: str, ttl: float):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, payload)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_pattern(self, pattern: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if fnmatch.fnmatchcase(k, pattern)]
+            for k in keys:
+                del self._data[k]
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+_l1 = _LocalCache()
+
+
+# --- Single-flight : un seul calcul par clé et par processus ---
+class _Flight:
+    __slots__ = ("event", "value", "error")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class _SingleFlight:
+    """Les appels concurrents sur une même clé attendent le résultat du premier."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights: Dict[str, _Flight] = {}
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+            return flight.value
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.event.set()
+
+
+_flights = _SingleFlight()
+
+
+# --- Statistiques par préfixe ---
+_stats_lock = threading.Lock()
+_stats: Dict[str, Dict[str, int]] = defaultdict(lambda: {"l1_hits": 0, "redis_hits": 0, "misses": 0, "errors": 0})
+
+
+def _count(prefix: str, counter: str):
+    with _stats_lock:
+        _stats[prefix][counter] += 1
+
+
+def _prefix_stats() -> dict:
+    with _stats_lock:
+        out = {}
+        for prefix, c in _stats.items():
+            total = c["l1_hits"] + c["redis_hits"] + c["misses"]
+            out[prefix] = {**c, "hit_rate": ((c["l1_hits"] + c["redis_hits"]) / total * 100) if total else 0.0}
+        return out
+
+
+# --- Clés ---
+def _key_part(value: Any) -> str:
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value, sort_keys=True, default=str)
+    return str(value)
 
 
 def _generate_cache_key(*args, **kwargs) -> str:
     """
     Génère une clé de cache unique basée sur les arguments
+    (les sessions SQLAlchemy sont ignorées : leur repr change à chaque requête)
     
     Args:
         *args: Arguments positionnels
@@ -57,107 +274,170 @@ def _generate_cache_key(*args, **kwargs) -> str:
     Returns:
         str: Hash MD5 des arguments
     """
-    # Convertir les arguments en chaîne
-    key_parts = []
-    
-    for arg in args:
-        if isinstance(arg, (dict, list)):
-            key_parts.append(json.dumps(arg, sort_keys=True, default=str))
-        else:
-            key_parts.append(str(arg))
-    
-    for k, v in sorted(kwargs.items()):
-        if isinstance(v, (dict, list)):
-            key_parts.append(f"{k}={json.dumps(v, sort_keys=True, default=str)}")
-        else:
-            key_parts.append(f"{k}={v}")
-    
+    key_parts = [_key_part(arg) for arg in args if not isinstance(arg, Session)]
+    key_parts += [f"{k}={_key_part(v)}" for k, v in sorted(kwargs.items()) if not isinstance(v, Session)]
     key_data = "|".join(key_parts)
     return hashlib.md5(key_data.encode()).hexdigest()
 
 
+def _make_key_function(func: Callable, ignore: Iterable[str], key_args: Optional[Iterable[str]]) -> Callable:
+    """
+    Construit la fonction de clé d'une fonction décorée : arguments liés par nom
+    (f(1) et f(x=1) donnent la même clé), valeurs par défaut incluses,
+    sessions et arguments `ignore` exclus, ou seulement `key_args` si fourni.
+    """
+    sig = inspect.signature(func)
+    ignore = set(ignore)
+    keep = set(key_args) if key_args is not None else None
+
+    def build(*args, **kwargs) -> str:
+        bound = sig.bind(*args, **kwargs)
+        bound.apply_defaults()
+        parts = {
+            name: value for name, value in bound.arguments.items()
+            if name not in ignore and (keep is None or name in keep) and not isinstance(value, Session)
+        }
+        return _generate_cache_key(**parts)
+
+    return build
+
+
+def _wait_for_value(client, full_key: str) -> Optional[str]:
+    """Attend qu'un autre processus (détenteur du verrou) publie la valeur."""
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL)
+        cached = client.get(full_key)
+        if cached:
+            return cached
+        if not client.exists(f"lock:{full_key}"):
+            return None
+    return None
+
+
 def redis_cache(
     ttl: Union[int, timedelta] = 3600,
     prefix: str = "cache",
-    key_builder: Optional[Callable] = None
+    key_builder: Optional[Callable] = None,
+    ignore: Iterable[str] = (),
+    key_args: Optional[Iterable[str]] = None,
+    local_ttl: Optional[int] = None
 ):
     """
-    Décorateur pour mettre en cache les résultats de fonction dans Redis
+    Décorateur pour mettre en cache les résultats de fonction (L1 mémoire locale + Redis)
     
     Args:
         ttl: Durée de vie du cache en secondes (ou timedelta)
         prefix: Préfixe pour la clé de cache
         key_builder: Fonction personnalisée pour générer la clé de cache
+        ignore: Noms d'arguments exclus de la clé (les Session le sont toujours)
+        key_args: Si fourni, seuls ces arguments composent la clé
+        local_ttl: TTL du cache local (défaut: min(ttl, L1_TTL) ; 0 = désactivé)
+        
+    Les appels concurrents sur une clé manquante ne calculent qu'une fois
+    (par processus, et entre processus via un verrou Redis).
         
     Usage:
         @redis_cache(ttl=3600, prefix="ref")
-        def get_data(param1, param2):
-            return expensive_operation(param1, param2)
+        def get_data(db: Session, param1, param2):
+            return expensive_operation(db, param1, param2)
     """
     if isinstance(ttl, timedelta):
         ttl = int(ttl.total_seconds())
+    if local_ttl is None:
+        local_ttl = min(ttl, L1_TTL)
     
     def decorator(func: Callable) -> Callable:
+        build_key = key_builder or _make_key_function(func, ignore, key_args)
+
+        def full_key_for(*args, **kwargs) -> str:
+            return f"{prefix}:{func.__name__}:{build_key(*args, **kwargs)}"
+
+        def load_or_compute(full_key: str, args, kwargs) -> str:
+            # Un autre appel a pu remplir le cache local pendant l'attente
+            if local_ttl:
+                payload = _l1.get(full_key)
+                if payload is not None:
+                    _count(prefix, "l1_hits")
+                    return payload
+
+            lock_key = None
+            client = get_redis()
+            if client is not None:
+                try:
+                    cached = client.get(full_key)
+                    if not cached and not client.set(f"lock:{full_key}", "1", nx=True, ex=LOCK_TIMEOUT):
+                        # Calcul en cours dans un autre processus
+                        cached = _wait_for_value(client, full_key)
+                    elif not cached:
+                        lock_key = f"lock:{full_key}"
+                    if cached:
+                        logger.debug(f"✅ Cache HIT: {full_key[:50]}...")
+                        _count(prefix, "redis_hits")
+                        if local_ttl:
+                            _l1.set(full_key, cached, local_ttl)
+                        return cached
+                except Exception as e:
+                    _count(prefix, "errors")
+                    logger.warning(f"⚠️ Erreur lecture cache: {e}")
+                    _connection_error(e)
+                    client = None
+
+            logger.debug(f"❌ Cache MISS: {full_key[:50]}...")
+            _count(prefix, "misses")
+            try:
+                payload = _dumps(func(*args, **kwargs))
+                if local_ttl:
+                    _l1.set(full_key, payload, local_ttl)
+                if client is not None:
+                    try:
+                        client.setex(full_key, ttl, payload)
+                        logger.debug(f"💾 Cache SET: {full_key[:50]}... (TTL: {ttl}s)")
+                    except Exception as e:
+                        _count(prefix, "errors")
+                        logger.warning(f"⚠️ Erreur écriture cache: {e}")
+                        _connection_error(e)
+                return payload
+            finally:
+                if lock_key is not None:
+                    try:
+                        client.delete(lock_key)
+                    except Exception:
+                        pass
+
         @wraps(func)
         def wrapper(*args, **kwargs) -> Any:
-            # Si Redis n'est pas disponible, exécuter directement
-            if redis_client is None:
+            # Sans Redis ni cache local, exécuter directement
+            if not local_ttl and get_redis() is None:
                 return func(*args, **kwargs)
             
-            # Générer la clé de cache
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                cache_key = _generate_cache_key(*args, **kwargs)
-            
-            full_key = f"{prefix}:{func.__name__}:{cache_key}"
+            full_key = full_key_for(*args, **kwargs)
             
-            # Tenter de récupérer depuis le cache
-            try:
-                cached = redis_client.get(full_key)
-                if cached:
-                    logger.debug(f"✅ Cache HIT: {full_key[:50]}...")
-                    return json.loads(cached)
-                else:
-                    logger.debug(f"❌ Cache MISS: {full_key[:50]}...")
-            except Exception as e:
-                logger.warning(f"⚠️ Erreur lecture cache: {e}")
-            
-            # Exécuter la fonction si pas en cache
-            result = func(*args, **kwargs)
-            
-            # Stocker dans le cache
-            try:
-                redis_client.setex(
-                    full_key,
-                    ttl,
-                    json.dumps(result, default=str, ensure_ascii=False)
-                )
-                logger.debug(f"💾 Cache SET: {full_key[:50]}... (TTL: {ttl}s)")
-            except Exception as e:
-                logger.warning(f"⚠️ Erreur écriture cache: {e}")
-            
-            return result
+            if local_ttl:
+                payload = _l1.get(full_key)
+                if payload is not None:
+                    _count(prefix, "l1_hits")
+                    return _loads(payload)
+
+            # Chaque appelant désérialise sa propre copie (pas d'objet partagé mutable)
+            return _loads(_flights.do(full_key, lambda: load_or_compute(full_key, args, kwargs)))
         
         # Ajouter une méthode pour invalider le cache de cette fonction
         def invalidate(*args, **kwargs):
             """Invalide le cache pour ces arguments spécifiques"""
-            if redis_client is None:
+            full_key = full_key_for(*args, **kwargs)
+            _l1.delete(full_key)
+            client = get_redis()
+            if client is None:
                 return
-            
-            if key_builder:
-                cache_key = key_builder(*args, **kwargs)
-            else:
-                cache_key = _generate_cache_key(*args, **kwargs)
-            
-            full_key = f"{prefix}:{func.__name__}:{cache_key}"
             try:
-                redis_client.delete(full_key)
+                client.delete(full_key)
                 logger.info(f"🗑️ Cache invalidé: {full_key[:50]}...")
             except Exception as e:
                 logger.warning(f"⚠️ Erreur invalidation cache: {e}")
         
         wrapper.invalidate = invalidate
+        wrapper.cache_key = full_key_for
         return wrapper
     
     return decorator
@@ -176,15 +456,20 @@ def invalidate_cache(pattern: str) -> int:
     Usage:
         invalidate_cache("ref:*")  # Invalide tous les référentiels
         invalidate_cache("ref:get_centres:*")  # Invalide seulement get_centres
+    
+    Le cache local de ce processus est purgé pour le même pattern
+    (les autres processus expirent au plus tard après L1_TTL).
     """
-    if redis_client is None:
-        logger.warning("Redis non disponible, impossible d'invalider le cache")
-        return 0
+    local = _l1.delete_pattern(pattern)
+    client = get_redis()
+    if client is None:
+        logger.info(f"🗑️ {local} entrées de cache local invalidées (pattern: {pattern})")
+        return local
     
     try:
         deleted = 0
-        for key in redis_client.scan_iter(match=pattern):
-            redis_client.delete(key)
+        for key in client.scan_iter(match=pattern):
+            client.delete(key)
             deleted += 1
         
         logger.info(f"🗑️ {deleted} clés de cache invalidées (pattern: {pattern})")
@@ -203,12 +488,14 @@ def clear_all_cache() -> bool:
     Returns:
         bool: True si succès, False sinon
     """
-    if redis_client is None:
+    _l1.clear()
+    client = get_redis()
+    if client is None:
         logger.warning("Redis non disponible")
         return False
     
     try:
-        redis_client.flushdb()
+        client.flushdb()
         logger.warning("🗑️ TOUT le cache Redis a été vidé !")
         return True
     except Exception as e:
@@ -218,20 +505,27 @@ def clear_all_cache() -> bool:
 
 def get_cache_stats() -> dict:
     """
-    Récupère des statistiques sur le cache Redis
+    Récupère des statistiques sur le cache Redis et le cache local
     
     Returns:
-        dict: Statistiques du cache
+        dict: Statistiques du cache (dont hits/misses par préfixe : "prefixes")
     """
-    if redis_client is None:
-        return {"status": "unavailable"}
+    local = {
+        "serializer": "orjson" if orjson is not None else "json",
+        "l1_entries": len(_l1),
+        "prefixes": _prefix_stats(),
+    }
+    client = get_redis()
+    if client is None:
+        return {"status": "unavailable", **local}
     
     try:
-        info = redis_client.info()
+        info = client.info()
         return {
+            **local,
             "status": "connected",
             "used_memory": info.get("used_memory_human", "N/A"),
-            "total_keys": redis_client.dbsize(),
+            "total_keys": client.dbsize(),
             "hits": info.get("keyspace_hits", 0),
             "misses": info.get("keyspace_misses", 0),
             "hit_rate": (
@@ -241,7 +535,7 @@ def get_cache_stats() -> dict:
         }
     except Exception as e:
         logger.error(f"❌ Erreur récupération stats: {e}")
-        return {"status": "error", "message": str(e)}
+        return {"status": "error", "message": str(e), **local}
 
 
 # Décorateurs spécialisés pour différents types de données
@@ -258,8 +552,9 @@ def cache_simulation(ttl: int = 1800):
     """
     Cache spécifique pour les simulations (30min par défaut)
     Les simulations peuvent être recalculées plus fréquemment
+    (pas de cache local : résultats volumineux)
     """
-    return redis_cache(ttl=ttl, prefix="sim")
+    return redis_cache(ttl=ttl, prefix="sim", local_ttl=0)
 
 
 def cache_user_data(ttl: int = 300):
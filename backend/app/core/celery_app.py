@@ -3,19 +3,20 @@ Configuration Celery pour les tâches asynchrones
 
 Ce module configure Celery pour exécuter des tâches en arrière-plan,
 notamment pour les simulations lourdes (Direction, Nationale).
+
+Worker : celery -A app.core.celery_app worker -Q simulations,maintenance
 """
 
 from celery import Celery
 from celery.schedules import crontab
-import os
+
+from app.core.config import settings
 
 # Configuration Redis comme broker et backend
-REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = os.getenv("REDIS_PORT", "6379")
-REDIS_DB = os.getenv("REDIS_DB", "0")
+_REDIS_URL = f"redis://{settings.REDIS_HOST}:{settings.REDIS_PORT}"
 
-CELERY_BROKER_URL = f"redis://{REDIS_HOST}:{REDIS_PORT}/1"
-CELERY_RESULT_BACKEND = f"redis://{REDIS_HOST}:{REDIS_PORT}/2"
+CELERY_BROKER_URL = settings.CELERY_BROKER_URL or f"{_REDIS_URL}/1"
+CELERY_RESULT_BACKEND = settings.CELERY_RESULT_BACKEND or f"{_REDIS_URL}/2"
 
 # Initialisation de l'application Celery
 celery_app = Celery(
@@ -24,7 +25,6 @@ celery_app = Celery(
     backend=CELERY_RESULT_BACKEND,
     include=[
         "app.tasks.simulation_tasks",
-        "app.tasks.export_tasks"
     ]
 )
 
@@ -45,11 +45,11 @@ celery_app.conf.update(
     
     # Tracking
     task_track_started=True,
-    task_send_sent_event=True,
     
     # Résultats
     result_expires=3600,        # Les résultats expirent après 1h
     result_extended=True,
+    result_compression='gzip',  # Résultats batch (par centre) compressés dans le backend
     
     # Worker
     worker_prefetch_multiplier=4,
@@ -62,27 +62,30 @@ celery_app.conf.update(
     # Monitoring
     worker_send_task_events=True,
     task_send_sent_event=True,
+
+    # Mode local (tests, sans worker) : tâches exécutées dans le processus appelant
+    task_always_eager=settings.CELERY_ALWAYS_EAGER,
+    task_eager_propagates=True,
 )
 
 # Tâches périodiques (optionnel)
 celery_app.conf.beat_schedule = {
     # Nettoyage du cache tous les jours à 2h du matin
     'cleanup-cache-daily': {
-        'task': 'app.tasks.maintenance_tasks.cleanup_old_cache',
+        'task': 'maintenance.cleanup_old_cache',
         'schedule': crontab(hour=2, minute=0),
     },
     # Nettoyage des résultats de simulation anciens
     'cleanup-simulations-weekly': {
-        'task': 'app.tasks.maintenance_tasks.cleanup_old_simulations',
+        'task': 'maintenance.cleanup_old_simulations',
         'schedule': crontab(day_of_week=0, hour=3, minute=0),  # Dimanche 3h
     },
 }
 
 # Routes des tâches (optionnel, pour répartir les tâches sur différentes queues)
 celery_app.conf.task_routes = {
-    'app.tasks.simulation_tasks.*': {'queue': 'simulations'},
-    'app.tasks.export_tasks.*': {'queue': 'exports'},
-    'app.tasks.maintenance_tasks.*': {'queue': 'maintenance'},
+    'simulation.*': {'queue': 'simulations'},
+    'maintenance.*': {'queue': 'maintenance'},
 }
 
 
@@ -8,7 +8,40 @@ class Settings(BaseSettings):
     DB_NAME: str = "simulateur"
     DB_USER: str = "sa"
     DB_PASSWORD: str = "Dev@2000"
-    
+
+    # Pool de connexions (API) et pool séparé des workers Celery
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30              # Secondes d'attente max d'une connexion libre
+    DB_POOL_RECYCLE: int = 1800            # Recycle les connexions de plus de 30 min
+    DB_POOL_PRE_PING: bool = True
+    DB_WORKER_POOL_SIZE: int = 2
+    DB_WORKER_MAX_OVERFLOW: int = 2
+    DB_FAST_EXECUTEMANY: bool = True
+    DB_ECHO: bool = False                  # Logs SQL (DB_ECHO=1)
+
+    # Journal d'accès / erreurs (écriture en arrière-plan, rotation)
+    REQUEST_LOG_FILE: str = "backend_requests.log"
+    ERROR_LOG_FILE: str = "backend_error.log"
+    REQUEST_LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    REQUEST_LOG_BACKUPS: int = 5
+
+    # Trace des moteurs (debug=True / en-tête X-Debug-Trace) ; TRACE_ALL=1 : toutes les requêtes + stdout
+    TRACE_ALL: bool = False
+    TRACE_MAX_LINES: int = 20000
+
+    # Redis (cache partagé, invalidations) : connexion en arrière-plan, jamais bloquante au démarrage
+    REDIS_ENABLED: bool = True
+    REDIS_HOST: str = "localhost"
+    REDIS_PORT: int = 6379
+    REDIS_DB: int = 0
+    REDIS_PASSWORD: Optional[str] = None
+    REDIS_CONNECT_TIMEOUT: float = 2.0
+    REDIS_RETRY_INTERVAL: int = 30
+
+    # Snapshot des référentiels : rechargement forcé après ce délai si l'abonnement Redis est inactif
+    REFERENTIEL_MAX_AGE: int = 120
+
     # API
     API_V1_PREFIX: str = "/api"
     PROJECT_NAME: str = "Simulateur RH API"
@@ -16,6 +49,21 @@ class Settings(BaseSettings):
     
     # CORS
     ALLOWED_ORIGINS: list = ["http://localhost:3000", "http://127.0.0.1:3000"]
+
+    # Simulation batch : calcul parallèle par centre
+    BATCH_WORKERS: int = 0                 # 0 = nombre de CPU
+    BATCH_PARALLEL_MIN_CENTRES: int = 16   # En dessous, calcul dans le thread courant
+
+    # Celery : simulations asynchrones (broker/backend par défaut sur REDIS_HOST, bases 1 et 2)
+    CELERY_BROKER_URL: Optional[str] = None
+    CELERY_RESULT_BACKEND: Optional[str] = None
+    CELERY_ALWAYS_EAGER: bool = False      # Exécution locale et synchrone (tests, sans worker)
+    CELERY_CHUNK_SIZE: int = 8             # Centres par tâche de calcul (fan-out batch)
+
+    # Simulations asynchrones : auto (Celery si Redis + worker, sinon local) | celery | local
+    JOB_BACKEND: str = "auto"
+    JOB_MAX_CONCURRENT: int = 2            # Jobs locaux exécutés simultanément (les autres attendent)
+    JOB_RESULT_TTL: int = 3600             # Conservation des jobs locaux terminés (s)
     
     @property
     def DATABASE_URL(self) -> str:
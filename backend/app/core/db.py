@@ -1,8 +1,10 @@
- # Configuration de la base de données
+# Configuration de la base de données
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
-from sqlalchemy.pool import NullPool
-from typing import Generator
+from sqlalchemy.pool import QueuePool
+from typing import Generator, Optional
+import threading
+import time
 import urllib
 
 from app.core.config import settings
@@ -11,16 +13,106 @@ from app.core.config import settings
 params = urllib.parse.quote_plus(settings.DATABASE_URL)
 SQLALCHEMY_DATABASE_URL = f"mssql+pyodbc:///?odbc_connect={params}"
 
+
+class _PoolStats:
+    """Compteurs d'attente à l'obtention d'une connexion (partagés par un pool et ses recréations)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool mesurant le temps d'obtention d'une connexion (attente + ouverture éventuelle)."""
+
+    def __init__(self, *args, stats: Optional[_PoolStats] = None, **kw):
+        super().__init__(*args, **kw)
+        self.stats = stats or _PoolStats()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+    def _do_get(self):
+        t0 = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            self.stats.record(time.perf_counter() - t0)
+
+
+def create_db_engine(pool_size: int, max_overflow: int):
+    """Moteur MSSQL avec pool de connexions (paramètres DB_* de la configuration)."""
+    return create_engine(
+        SQLALCHEMY_DATABASE_URL,
+        poolclass=TimedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        echo=settings.DB_ECHO,  # Logs SQL : DB_ECHO=1
+        fast_executemany=settings.DB_FAST_EXECUTEMANY,
+        connect_args={"timeout": 30, "autocommit": True}
+    )
+
+
 # Créer le moteur
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    poolclass=NullPool,
-    echo=True,  # Active les logs SQL
-    connect_args={"timeout": 30, "autocommit": True}
-)
+engine = create_db_engine(settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Moteur des workers Celery : petit pool séparé, créé à la première utilisation
+_worker_engine = None
+_worker_lock = threading.Lock()
+WorkerSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+
+def get_worker_engine():
+    global _worker_engine
+    if _worker_engine is None:
+        with _worker_lock:
+            if _worker_engine is None:
+                _worker_engine = create_db_engine(settings.DB_WORKER_POOL_SIZE, settings.DB_WORKER_MAX_OVERFLOW)
+                WorkerSessionLocal.configure(bind=_worker_engine)
+    return _worker_engine
+
+
+def get_worker_session():
+    """Session pour les tâches de fond (pool worker)."""
+    get_worker_engine()
+    return WorkerSessionLocal()
+
+
+def pool_status(eng=None) -> dict:
+    """Métriques du pool : connexions sorties, débordement, attente à l'obtention."""
+    pool = (eng or engine).pool
+    stats = getattr(pool, "stats", None)
+    status = {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "checked_in": pool.checkedin(),
+        "overflow": max(0, pool.overflow()),
+    }
+    if stats is not None:
+        status.update({
+            "checkouts": stats.checkouts,
+            "wait_avg_ms": round(stats.total_wait / stats.checkouts * 1000.0, 3) if stats.checkouts else 0.0,
+            "wait_max_ms": round(stats.max_wait * 1000.0, 3),
+        })
+    return status
+
+
 # Base pour les modèles
 class Base(DeclarativeBase):
     pass
@@ -31,4 +123,4 @@ def get_db() -> Generator:
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,191 @@
+"""
+Journal d'accès structuré (une ligne par requête) sans I/O sur la boucle d'événements.
+
+Les enregistrements passent par une `QueueHandler` ; un thread `QueueListener`
+écrit dans des fichiers à rotation. Chaque requête reçoit un identifiant
+(`X-Request-ID`, repris s'il est fourni) et ses temps : total, base de données
+(événements SQLAlchemy) et moteurs de calcul (`track_engine_time`).
+"""
+
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import queue
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from functools import wraps
+from typing import Optional
+
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.core.tracing import enable_request_tracing
+
+access_logger = logging.getLogger("simulateur.access")
+error_logger = logging.getLogger("simulateur.error")
+
+
+class RequestTimings:
+    """Temps cumulés d'une requête (objet partagé avec les threads du threadpool)."""
+    __slots__ = ("request_id", "db_time", "db_queries", "engine_time", "_engine_depth")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.db_time = 0.0
+        self.db_queries = 0
+        self.engine_time = 0.0
+        self._engine_depth = 0
+
+
+_current: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+
+def current_request_id() -> Optional[str]:
+    t = _current.get()
+    return t.request_id if t else None
+
+
+@contextmanager
+def track_engine_time():
+    """Ajoute la durée du bloc au temps moteur de la requête courante (appels imbriqués comptés une fois)."""
+    t = _current.get()
+    if t is None:
+        yield
+        return
+    t._engine_depth += 1
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t._engine_depth -= 1
+        if t._engine_depth == 0:
+            t.engine_time += time.perf_counter() - t0
+
+
+def timed_engine(func):
+    """Décorateur : compte l'appel dans le temps moteur de la requête."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with track_engine_time():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+# --- Temps base de données (événements du moteur SQLAlchemy) ---
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_query_start")
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    t = _current.get()
+    if t is not None:
+        t.db_time += elapsed
+        t.db_queries += 1
+
+
+def instrument_engine(engine):
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# --- Écriture en arrière-plan ---
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def _rotating(path: str) -> logging.Handler:
+    h = logging.handlers.RotatingFileHandler(
+        path, maxBytes=settings.REQUEST_LOG_MAX_BYTES, backupCount=settings.REQUEST_LOG_BACKUPS,
+        encoding="utf-8", delay=True
+    )
+    h.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+    return h
+
+
+def setup_request_logging():
+    """Branche les loggers d'accès/erreurs sur une file et démarre le thread d'écriture (idempotent)."""
+    global _listener
+    if _listener is not None:
+        return
+    q: queue.Queue = queue.Queue(-1)
+    for lg in (access_logger, error_logger):
+        lg.setLevel(logging.INFO)
+        lg.propagate = False
+        lg.addHandler(logging.handlers.QueueHandler(q))
+
+    access_file = _rotating(settings.REQUEST_LOG_FILE)
+    access_file.addFilter(logging.Filter(access_logger.name))
+    error_file = _rotating(settings.ERROR_LOG_FILE)
+    error_file.addFilter(logging.Filter(error_logger.name))
+    console = logging.StreamHandler(sys.stderr)  # Traceback complet dans le terminal
+    console.addFilter(logging.Filter(error_logger.name))
+
+    _listener = logging.handlers.QueueListener(q, access_file, error_file, console, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_request_logging)
+
+
+def stop_request_logging():
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_exception(exc: BaseException, method: str, path: str):
+    error_logger.error(
+        "rid=%s method=%s path=%s error=%r", current_request_id() or "-", method, path, exc,
+        exc_info=(type(exc), exc, exc.__traceback__)
+    )
+
+
+class RequestLogMiddleware:
+    """Middleware ASGI : identifiant de requête, en-tête X-Request-ID et ligne d'accès temporisée."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        rid = None
+        for k, v in scope.get("headers", ()):
+            if k == b"x-request-id":
+                rid = v.decode("latin-1")[:64]
+            elif k == b"x-debug-trace" and v.strip().lower() in (b"1", b"true", b"yes"):
+                enable_request_tracing()
+        timings = RequestTimings(rid or uuid.uuid4().hex[:16])
+        # Pas de reset : chaque requête a son propre contexte, et le handler d'erreurs
+        # (exécuté en dehors de ce middleware) doit encore voir l'identifiant.
+        _current.set(timings)
+        t0 = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", timings.request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception as exc:
+            # Exceptions non gérées : journalisées ici (le handler global n'est pas appelé en mode debug)
+            log_exception(exc, scope.get("method"), scope.get("path"))
+            raise
+        finally:
+            access_logger.info(
+                "rid=%s method=%s path=%s status=%s total_ms=%.1f db_ms=%.1f db_queries=%d engine_ms=%.1f",
+                timings.request_id, scope.get("method"), scope.get("path"), status,
+                (time.perf_counter() - t0) * 1000.0, timings.db_time * 1000.0, timings.db_queries,
+                timings.engine_time * 1000.0
+            )
@@ -0,0 +1,91 @@
+"""
+Trace des moteurs de simulation (remplace les print du chemin de calcul).
+
+Inactive par défaut : `trace()` retourne immédiatement et les messages passés
+sous forme de lambda ne sont jamais formatés. Activée pour une requête
+(`debug=True` ou en-tête `X-Debug-Trace: 1`) ou globalement (`TRACE_ALL=1`),
+elle collecte les lignes, renvoyées dans `debug_info["trace"]`.
+"""
+
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from typing import Any, List, Optional
+
+from app.core.config import settings
+
+_lines: contextvars.ContextVar[Optional[List[str]]] = contextvars.ContextVar("trace_lines", default=None)
+
+
+def is_tracing() -> bool:
+    return _lines.get() is not None or settings.TRACE_ALL
+
+
+def trace(*parts: Any):
+    """
+    Ajoute une ligne à la trace courante (no-op si inactive).
+    Un seul argument appelable est évalué paresseusement : trace(lambda: f"...").
+    Plusieurs arguments sont joints comme print().
+    """
+    lines = _lines.get()
+    if lines is None and not settings.TRACE_ALL:
+        return
+    if len(parts) == 1 and callable(parts[0]):
+        line = str(parts[0]())
+    else:
+        line = " ".join(str(p) for p in parts)
+    if settings.TRACE_ALL:
+        print(line)
+    if lines is not None and len(lines) < settings.TRACE_MAX_LINES:
+        lines.append(line)
+
+
+@contextmanager
+def tracing(enabled: bool = True):
+    """
+    Active la collecte pour le bloc si `enabled` (ou réutilise une trace déjà active).
+    Produit la liste des lignes collectées, ou None si la trace est inactive.
+    """
+    current = _lines.get()
+    if current is not None or not enabled:
+        yield current
+        return
+    token = _lines.set([])
+    try:
+        yield _lines.get()
+    finally:
+        _lines.reset(token)
+
+
+def enable_request_tracing() -> List[str]:
+    """Active la trace pour tout le contexte courant (requête) et retourne sa liste de lignes."""
+    lines: List[str] = []
+    _lines.set(lines)
+    return lines
+
+
+def with_trace(debug_info: Optional[dict], lines: Optional[List[str]]) -> Optional[dict]:
+    """Ajoute les lignes collectées à un dict debug_info (inchangé si la trace est inactive)."""
+    if lines is None:
+        return debug_info
+    info = dict(debug_info or {})
+    info["trace"] = list(lines)
+    return info
+
+
+def collect_trace(func):
+    """
+    Décorateur des points d'entrée moteur : active la trace si l'appel reçoit debug=True
+    et ajoute les lignes au `debug_info` du résultat (attribut ou clé).
+    """
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with tracing(bool(kwargs.get("debug"))) as lines:
+            result = func(*args, **kwargs)
+        if lines is not None:
+            if isinstance(result, dict):
+                result["debug_info"] = with_trace(result.get("debug_info"), lines)
+            elif hasattr(result, "debug_info"):
+                result.debug_info = with_trace(result.debug_info, lines)
+        return result
+    return wrapper
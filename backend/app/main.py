@@ -26,14 +26,20 @@ from app.api.cna import router as cna_router # 🆕 CNA Standalone Module
 from app.api.cci import router as cci_router # 🆕 CCI Standalone Module
 from app.api.batch_simulation import router as batch_router # 🆕 Simulation Régionale/Nationale
 from app.api.sites_mgmt import router as sites_mgmt_router # 🆕 Sites Rattachés Module
+from app.api.health import public_router as health_router
+from app.api.simulation_async import router as simulation_async_router
+from app.tasks.jobs import shutdown_local_backend
 
-from app.core.db import engine, Base, get_db
-from app.models import db_models, scoring_models, categorisation_models
+from app.core.db import engine, get_db
+from app.core.request_log import (
+    RequestLogMiddleware, setup_request_logging, instrument_engine, current_request_id
+)
+from app.services.referentiel_snapshot import start_referentiel_listener, stop_referentiel_listener
+from app.models import db_models, scoring_models, categorisation_models  # Mappers (relations inter-modules)
 # ...
 
 
-# Create tables if they don't exist
-Base.metadata.create_all(bind=engine)
+# Création des tables : commande explicite (python scripts/create_tables.py), plus au démarrage
 
 
 # Force Reload Trigger
@@ -55,24 +61,16 @@ def get_routes():
 
 @app.exception_handler(Exception)
 async def debug_exception_handler(request: Request, exc: Exception):
-    import traceback
-    with open("backend_error.log", "a", encoding="utf-8") as f:
-        f.write("-" * 80 + "\n")
-        f.write(f"Exception: {str(exc)}\n")
-        traceback.print_exc(file=f)
-    traceback.print_exc()  # ✅ affiche le traceback complet dans le terminal
+    # Traceback déjà journalisé (fichier + terminal) par RequestLogMiddleware
     return JSONResponse(
         status_code=500,
-        content={"error": str(exc), "where": "unhandled_exception"}
+        content={"error": str(exc), "where": "unhandled_exception", "request_id": current_request_id()}
     )
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    with open("backend_requests.log", "a", encoding="utf-8") as f:
-        f.write(f"REQUEST: {request.method} {request.url}\n")
-    response = await call_next(request)
-    with open("backend_requests.log", "a", encoding="utf-8") as f:
-        f.write(f"RESPONSE: {response.status_code}\n")
-    return response
+
+# Journal d'accès : request id + temps total / BDD / moteur par requête
+setup_request_logging()
+instrument_engine(engine)
+app.add_middleware(RequestLogMiddleware)
 
 # Configuration CORS
 app.add_middleware(
@@ -117,7 +115,7 @@ app.include_router(ccp_router, prefix="/api") # ✅ CCP Standalone Module
 app.include_router(cna_router, prefix="/api") # ✅ CNA Standalone Module
 app.include_router(cci_router, prefix="/api") # ✅ CCI Standalone Module
 app.include_router(batch_router, prefix="/api") # ✅ Simulation Régionale/Nationale
-#app.include_router(views_router, prefix="/api")
+app.include_router(views_router, prefix="/api") # ✅ Vue intervenant (unitaire + batch)
 from app.api.taches_mgmt import router as taches_mgmt_router # 🆕 Taches Management
 from app.api.postes_mgmt import router as postes_mgmt_router # 🆕 Postes Management
 
@@ -137,7 +135,10 @@ print("--- MOUNTING SITES MGMT ROUTER ---")
 app.include_router(sites_mgmt_router, prefix="/api")
 print("--- SITES MGMT ROUTER MOUNTED ---")
 
+app.include_router(health_router) # ✅ /health uniquement (+ métriques pool DB)
+
 app.include_router(simuler_centre_par_type_router, prefix="/api")
+app.include_router(simulation_async_router)  # /api/async : simulations batch via Celery
 
 
 # Import Fallback
@@ -149,6 +150,8 @@ def secours_global_postes(db: Session = Depends(get_db)):
 
 @app.on_event("startup")
 async def startup_event():
+    # Invalidation du snapshot référentiel entre workers (Redis pub/sub)
+    start_referentiel_listener()
     print("\n" + "="*50)
     print("REGISTERED ROUTES:")
     for route in app.routes:
@@ -157,6 +160,12 @@ async def startup_event():
     print("="*50 + "\n")
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    stop_referentiel_listener()
+    shutdown_local_backend()
+
+
 @app.get("/")
 def root():
 
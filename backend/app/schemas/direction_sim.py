@@ -200,4 +200,5 @@ class NationalSimResponse(BaseModel):
     kpisNationaux: NationalKPIs
     regionsData: List[NationalRegionStats]
     centres: Optional[List[NationalCentreStats]] = []
-    postes: Optional[List[NationalPosteStats]] = []
\ No newline at end of file
+    postes: Optional[List[NationalPosteStats]] = []
+    run_id: Optional[str] = None # Cube de résultats (vues /simulation/national/cube/{run_id})
\ No newline at end of file
@@ -114,7 +114,7 @@ class TacheDetail(BaseModel):
 
 class PosteResultat(BaseModel):
     id: int
-    centre_poste_id: int
+    centre_poste_id: Optional[int] = None  # None : ligne consolidée multi-centres
     poste_label: str
     etp_calcule: float
     etp_arrondi: int
@@ -152,4 +152,27 @@ class SimulationResponse(BaseModel):
     
     # Calculated Logic Breakdown
     total_mod_calcule: Optional[float] = 0 # Simulated Workload
-    
\ No newline at end of file
+    
+    # 🆕 Trace moteur (debug=True / X-Debug-Trace)
+    debug_info: Optional[dict] = None
+
+
+class CentreSimulationResultat(BaseModel):
+    """Résultat d'un centre dans une simulation multi-centres."""
+    centre_id: int
+    centre_label: Optional[str] = None
+    total_heures: float
+    heures_net_jour: float
+    fte_calcule: float
+    fte_arrondi: int
+    effectif_actuel: float = 0.0
+    ecart: float = 0.0
+    postes: List[PosteResultat] = []
+
+
+class MultiCentresSimulationResponse(SimulationResponse):
+    """
+    Simulation multi-centres : totaux et `postes` consolidés (un PosteResultat par
+    poste du référentiel, id = poste_id), détail par centre dans `centres`.
+    """
+    centres: List[CentreSimulationResultat] = []
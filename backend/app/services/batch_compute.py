@@ -0,0 +1,318 @@
+# backend/app/services/batch_compute.py
+"""
+Calcul pur des simulations batch (aucun accès BDD).
+
+Les données de chaque centre (plan compilé, grille, paramètres, effectifs) sont
+pré-chargées par l'appelant ; les jobs sont ensuite répartis sur un pool de
+processus par paquets, puis les résultats sont fusionnés dans l'ordre d'entrée.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict
+from typing import Callable, Iterator, List, Dict, Any, Optional, Tuple
+
+from app.core.config import settings
+from app.core.request_log import timed_engine
+from app.services.bandoeng_engine import evaluate_bandoeng_plan, BandoengInputVolumes
+from app.services.referentiel_snapshot import referentiel_partage, referentiel_version
+
+MOI_TYPES = ("MOI", "INDIRECT", "STRUCTURE")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _worker_count() -> int:
+    return settings.BATCH_WORKERS or os.cpu_count() or 1
+
+
+def get_batch_pool() -> ProcessPoolExecutor:
+    """Pool de processus partagé, créé au premier batch."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=_worker_count())
+        return _pool
+
+
+def reset_batch_pool() -> None:
+    """Abandonne le pool courant (ex: pool cassé après la mort d'un worker)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _rpp_match_etp(rpp: dict, lab: str) -> float:
+    if not lab:
+        return 0.0
+    L = str(lab).strip()
+    if L in rpp:
+        return float(rpp[L] or 0)
+    lu = L.upper()
+    for k, v in rpp.items():
+        if str(k).strip().upper() == lu:
+            return float(v or 0)
+    return 0.0
+
+
+def compute_centre(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Simule un centre à partir de son job pré-chargé et renvoie l'entrée `par_centre`
+    (ou {"error": ...}). `rows_postes` = [(effectif_actuel, aps, type_poste, label, charge_salaire)].
+    """
+    try:
+        rows_postes = job["rows_postes"]
+        actual_moi = 0.0
+        actual_mod = 0.0
+        actual_aps = 0.0
+        actual_aps_mod = 0.0
+        effectifs_par_poste: dict = {}
+        for eff, aps, type_poste, poste_label, _charge in rows_postes:
+            eff_val = float(eff or 0)
+            aps_val = float(aps or 0)
+            total_poste = eff_val + aps_val
+            is_moi = (type_poste or "").upper() in MOI_TYPES
+            if is_moi:
+                actual_moi += eff_val
+            else:
+                actual_mod += eff_val
+                actual_aps_mod += aps_val
+            actual_aps += aps_val
+            if not is_moi and total_poste > 0 and poste_label:
+                effectifs_par_poste[poste_label] = round(total_poste, 2)
+
+        result = evaluate_bandoeng_plan(
+            job["plan"],
+            BandoengInputVolumes(grid_values=job["grid_values"]),
+            job["params"],
+            excluded_task_ids=job.get("excluded_task_ids"),
+            excluded_task_quadruplets=job.get("excluded_task_quadruplets"),
+            vectorized=True,
+            with_tasks=False,  # Seuls les agrégats sont restitués en batch
+        )
+        rpp = result.ressources_par_poste or {}
+
+        postes_chiffrage: list = []
+        for eff, aps, type_poste, poste_label, charge_salaire in rows_postes:
+            total_poste = float(eff or 0) + float(aps or 0)
+            if (type_poste or "").upper() in MOI_TYPES:
+                continue
+            plab = (poste_label or "").strip()
+            if not plab:
+                continue
+            sim_etp = int(round(_rpp_match_etp(rpp, plab)))
+            if total_poste <= 0 and sim_etp <= 0:
+                continue
+            postes_chiffrage.append({
+                "label": plab,
+                "type_poste": type_poste or "",
+                "charge_salaire": float(charge_salaire or 0),
+                "actuel_etp": round(total_poste, 2),
+                "simule_etp": sim_etp,
+            })
+
+        fte_calcule = round(result.fte_calcule, 2)
+        # Cohérence visuelle: `arrondi` doit correspondre à `calculé`
+        fte_arrondi = int(round(fte_calcule))
+
+        return {
+            "centre_id": job["centre_id"],
+            "centre_label": job["centre_label"],
+            "region_id": job["region_id"],
+            "region_label": job["region_label"],
+            "fte_calcule": fte_calcule,
+            "fte_arrondi": fte_arrondi,
+            "fte_total_calcule": fte_calcule,
+            "fte_total_arrondi": fte_arrondi,
+            "actual_moi": round(actual_moi, 2),
+            "actual_mod": round(actual_mod, 2),
+            "actual_aps": round(actual_aps, 2),
+            "actual_aps_mod": round(actual_aps_mod, 2),
+            "total_heures": round(result.total_heures, 2),
+            "ressources_par_poste": result.ressources_par_poste,
+            "effectifs_par_poste": effectifs_par_poste,
+            "postes_chiffrage": postes_chiffrage,
+        }
+    except Exception as e:
+        return {"error": str(e), "sheet": job.get("sheet"), "centre": job.get("centre_label")}
+
+
+def map_chunk(fn: Callable[[Any], Any], jobs: List[Any]) -> List[Any]:
+    """Point d'entrée des workers : un paquet de jobs par aller-retour."""
+    return [fn(job) for job in jobs]
+
+
+def iter_map_parallel(fn: Callable[[Any], Any], jobs: List[Any]) -> Iterator[Tuple[int, Any]]:
+    """
+    Applique `fn` (fonction de module, picklable) aux jobs et produit (index, résultat)
+    au fil de l'eau, paquet par paquet, en parallèle si le lot est assez gros.
+    Bloquant : hors de la boucle asyncio.
+    """
+    workers = _worker_count()
+    if workers <= 1 or len(jobs) < settings.BATCH_PARALLEL_MIN_CENTRES:
+        for i, job in enumerate(jobs):
+            yield i, fn(job)
+        return
+
+    # ~4 paquets par worker : équilibre la charge sans multiplier la sérialisation
+    size = max(1, -(-len(jobs) // (workers * 4)))
+    starts = list(range(0, len(jobs), size))
+    pending = set(starts)
+    try:
+        pool = get_batch_pool()
+        futures = {pool.submit(map_chunk, fn, jobs[i:i + size]): i for i in starts}
+        for fut in as_completed(futures):
+            start = futures[fut]
+            part = fut.result()
+            pending.discard(start)
+            for k, res in enumerate(part):
+                yield start + k, res
+    except Exception as e:
+        print(f"⚠️ Pool batch indisponible ({e}), calcul séquentiel")
+        reset_batch_pool()
+        for start in sorted(pending):
+            for k, job in enumerate(jobs[start:start + size]):
+                yield start + k, fn(job)
+
+
+def iter_compute_centres(jobs: List[Dict[str, Any]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """Calcule les jobs batch et produit (index, résultat) au fil de l'eau."""
+    return iter_map_parallel(compute_centre, jobs)
+
+
+def compute_centres(jobs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Calcule tous les jobs ; résultats dans l'ordre des jobs."""
+    out: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    for i, res in iter_compute_centres(jobs):
+        out[i] = res
+    return out
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Batch incrémental : résultats par centre mis en cache par empreinte
+# ─────────────────────────────────────────────────────────────────────────────
+RESULT_CACHE_TTL_SECONDS = 6 * 3600
+RESULT_CACHE_MAX_ENTRIES = 5000
+
+_result_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def _sha(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def content_hash(job: Dict[str, Any]) -> str:
+    """Empreinte du contenu de l'onglet : paramètres + grille parsés, identité du centre."""
+    return _sha(json.dumps({
+        "centre": [job["centre_id"], job["centre_label"], job["region_id"], job["region_label"]],
+        "grid": job["grid_values"],
+        "params": asdict(job["params"]),
+    }, sort_keys=True, default=str))
+
+
+def _plan_digest(plan) -> str:
+    """Empreinte des tâches compilées, calculée une fois par plan (partagé entre onglets et modes)."""
+    digest = getattr(plan, "_digest", None)
+    if digest is None:
+        digest = plan._digest = _sha(repr((plan.tasks, plan.actual_moi)))
+    return digest
+
+
+def referential_stamp(job: Dict[str, Any]) -> str:
+    """
+    Version du référentiel du centre : tâches compilées (mapping des postes inclus),
+    effectifs et exclusions. Change dès qu'une de ces données change en BDD.
+
+    Invalidations reçues des autres processus : les numéros de version suffisent
+    (toute écriture des sections concernées les incrémente). Sinon, empreinte du
+    contenu, celle du plan n'étant calculée qu'une fois.
+    """
+    exclusions = (
+        sorted(job.get("excluded_task_ids") or []),
+        sorted(job.get("excluded_task_quadruplets") or []),
+    )
+    if referentiel_partage():
+        version = referentiel_version("taches", "postes", "mappings", "exclusions")
+        return repr((job["centre_id"], job.get("process_mode"), version, exclusions))
+    return _sha(repr((_plan_digest(job["plan"]), job["rows_postes"], exclusions)))
+
+
+def job_fingerprint(job: Dict[str, Any]) -> str:
+    return _sha(content_hash(job) + "|" + referential_stamp(job))
+
+
+def clear_result_cache() -> None:
+    with _result_cache_lock:
+        _result_cache.clear()
+
+
+def iter_centres_incremental(
+    jobs: List[Dict[str, Any]],
+    force: bool = False
+) -> Iterator[Tuple[int, Dict[str, Any], bool]]:
+    """
+    Produit (index, résultat, réutilisé) : d'abord les onglets inchangés depuis le
+    dernier batch (cache), puis les autres au fil du calcul.
+    """
+    now = time.monotonic()
+    fingerprints = [job_fingerprint(job) for job in jobs]
+    hits: List[Tuple[int, Dict[str, Any]]] = []
+    misses: List[int] = []
+
+    with _result_cache_lock:
+        for i, fp in enumerate(fingerprints):
+            entry = None if force else _result_cache.get(fp)
+            if entry is not None and now - entry[1] < RESULT_CACHE_TTL_SECONDS:
+                _result_cache.move_to_end(fp)
+                hits.append((i, dict(entry[0])))
+            else:
+                misses.append(i)
+
+    for i, res in hits:
+        yield i, res, True
+
+    for k, res in iter_compute_centres([jobs[i] for i in misses]):
+        i = misses[k]
+        if "error" not in res:
+            with _result_cache_lock:
+                _result_cache[fingerprints[i]] = (dict(res), now)
+                _result_cache.move_to_end(fingerprints[i])
+                while len(_result_cache) > RESULT_CACHE_MAX_ENTRIES:
+                    _result_cache.popitem(last=False)
+        yield i, res, False
+
+
+@timed_engine
+def compute_centres_incremental(
+    jobs: List[Dict[str, Any]],
+    force: bool = False
+) -> Tuple[List[Dict[str, Any]], List[bool]]:
+    """
+    Comme compute_centres, mais ne recalcule que les onglets dont le contenu ou le
+    référentiel a changé depuis le dernier batch. Retourne (résultats, réutilisé par job).
+    """
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    reused = [False] * len(jobs)
+    for i, res, was_cached in iter_centres_incremental(jobs, force):
+        results[i] = res
+        reused[i] = was_cached
+    return results, reused
+
+
+def incremental_report(jobs: List[Dict[str, Any]], reused: List[bool]) -> Dict[str, Any]:
+    """Centres recalculés vs réutilisés, pour la réponse du batch."""
+    return {
+        "recalcules": reused.count(False),
+        "reutilises": reused.count(True),
+        "centres_recalcules": [job["centre_id"] for job, r in zip(jobs, reused) if not r],
+        "centres_reutilises": [job["centre_id"] for job, r in zip(jobs, reused) if r],
+    }
@@ -0,0 +1,99 @@
+# app/services/centre_loaders.py
+"""
+Chargements ensemblistes par liste de centres (simulations nationale, direction
+et multi-centres data-driven).
+
+Une liste d'IDs ou de libellés est passée au serveur en UN paramètre (tableau
+JSON) dépaqueté côté SQL : OPENJSON sur SQL Server, json_each sur SQLite. Le
+texte SQL reste identique quel que soit le nombre de centres : un seul plan dans
+le cache de plans MSSQL (au lieu d'un texte unique par liste concaténée), pas de
+limite des 2100 paramètres ni d'échappement manuel des libellés.
+
+OPENJSON exige SQL Server 2016+ et un niveau de compatibilité de la base >= 130
+(ALTER DATABASE ... SET COMPATIBILITY_LEVEL = 130) : en dessous, la fonction
+n'est pas reconnue.
+"""
+
+import json
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+
+def valeurs_json(values: Iterable[Any]) -> str:
+    """Valeur du paramètre d'ensemble : tableau JSON."""
+    return json.dumps(list(values), ensure_ascii=False)
+
+
+def ensemble(db: Session, param: str, sql_type: str = "INT") -> str:
+    """
+    Sous-requête `(SELECT val ...)` des éléments du paramètre JSON `:param`,
+    à utiliser dans `IN` ou en jointure.
+    """
+    if db.get_bind().dialect.name == "mssql":
+        if sql_type.upper() == "INT":
+            return f"(SELECT CAST([value] AS INT) AS val FROM OPENJSON(:{param}))"
+        # Collation de la base : comparable aux colonnes quelle que soit leur collation
+        return f"(SELECT CAST([value] AS NVARCHAR(4000)) COLLATE DATABASE_DEFAULT AS val FROM OPENJSON(:{param}))"
+    return f"(SELECT value AS val FROM json_each(:{param}))"
+
+
+def load_taches_centres(db: Session, centre_ids: List[int]) -> Dict[int, List[Dict[str, Any]]]:
+    """Tâches (avec poste) des centres en une requête : {centre_id: [dict]}."""
+    tasks_by_centre: Dict[int, List[Dict[str, Any]]] = {cid: [] for cid in centre_ids}
+    if not centre_ids:
+        return tasks_by_centre
+
+    sql_tasks = f"""
+        SELECT t.*,
+               p.label as poste_code,
+               p.label as nom_poste,
+               p.type_poste,
+               cp.centre_id,
+               cp.poste_id
+        FROM dbo.taches t
+        JOIN dbo.centre_postes cp ON cp.id = t.centre_poste_id
+        JOIN dbo.postes p ON p.id = cp.poste_id
+        WHERE cp.centre_id IN {ensemble(db, "ids")}
+    """
+    rows = db.execute(text(sql_tasks), {"ids": valeurs_json(int(cid) for cid in centre_ids)}).mappings().all()
+    for r in rows:
+        tasks_by_centre[r.centre_id].append(dict(r))
+    return tasks_by_centre
+
+
+def load_postes_centres(db: Session, centre_ids: List[int]) -> list:
+    """Postes des centres (effectif actuel, type) en une requête."""
+    if not centre_ids:
+        return []
+    sql_postes = f"""
+        SELECT cp.centre_id,
+               cp.id as cp_id,
+               cp.poste_id,
+               p.label as nom_poste,
+               p.type_poste,
+               cp.effectif_actuel
+        FROM dbo.centre_postes cp
+        JOIN dbo.postes p ON p.id = cp.poste_id
+        WHERE cp.centre_id IN {ensemble(db, "ids")}
+    """
+    return db.execute(text(sql_postes), {"ids": valeurs_json(int(cid) for cid in centre_ids)}).mappings().all()
+
+
+def load_centres_par_labels(db: Session, labels: Iterable[str]) -> list:
+    """Centres (id, label) dont le libellé est exactement l'un de `labels`."""
+    labels = [l for l in labels if l]
+    if not labels:
+        return []
+    sql_lookup = f"SELECT id, label FROM dbo.centres WHERE label IN {ensemble(db, 'labels', 'NVARCHAR')}"
+    return db.execute(text(sql_lookup), {"labels": valeurs_json(labels)}).mappings().all()
+
+
+def load_centres_infos(db: Session, centre_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Libellé et catégorie des centres en une requête : {centre_id: dict}."""
+    if not centre_ids:
+        return {}
+    sql_centres = f"SELECT id, label, categorie_id FROM dbo.centres WHERE id IN {ensemble(db, 'ids')}"
+    rows = db.execute(text(sql_centres), {"ids": valeurs_json(int(cid) for cid in centre_ids)}).mappings().all()
+    return {r.id: dict(r) for r in rows}
@@ -11,6 +11,7 @@ from dataclasses import dataclass, field
 from sqlalchemy.orm import Session
 
 from app.models.db_models import Tache, CentrePoste
+from app.services.referentiel_snapshot import get_poste_map
 
 
 @dataclass
@@ -225,11 +226,8 @@ def run_cndp_simulation(
     
     taches = query.all()
 
-    # ✅ Pre-fetch Poste labels by Code (for role-based logic)
-    poste_map = {}
-    postes_data = db.query(Poste.Code, Poste.label).filter(Poste.Code != None).all()
-    for code, label in postes_data:
-        poste_map[str(code)] = str(label)
+    # ✅ Poste labels by Code (for role-based logic), snapshot référentiel
+    poste_map = get_poste_map(db)
     
     # Calculate hours for each task
     task_results: List[CNDPTaskResult] = []
@@ -0,0 +1,366 @@
+# app/services/direction_engine.py
+"""
+Évaluation d'une direction entière en une passe (moteur `calculer_simulation`).
+
+Les tâches de tous les centres sont compilées une fois en colonnes : type de
+volume (collecte, colis, sacs, flux courrier...), minutes moyennes, éligibilité
+au fallback AMANA, facteur distribution et poste (centre_poste_id). Seuls ces
+éléments dépendent des tâches ; les volumes/jour ne dépendent que du centre
+(`contexte_volumes`). L'évaluation résout donc une petite table de volumes par
+centre puis calcule toutes les heures de la direction en opérations tableaux,
+avec les mêmes résultats que `calculer_simulation` centre par centre (sans le
+détail par tâche).
+
+Le plan compilé est mis en cache par liste de centres, pour la version "taches"
+du snapshot référentiel (invalidation : bump_referentiel_version("taches")).
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:  # Mode vectorisé indisponible : repli sur la boucle scalaire
+    np = None
+
+from app.core.tracing import trace
+from app.schemas.models import SimulationResponse
+from app.services.centre_loaders import load_taches_centres
+from app.services.referentiel_snapshot import referentiel_version, referentiel_partage
+from app.services.simulation import ADMIN_FLUX, ADMIN_KEYWORDS, FLUX_MAP, calculer_fte
+from app.services.simulation_shared import regroup_tasks_for_scenarios
+from app.services.utils import normalize_unit
+
+# Types de volume d'une tâche (indices de la table de volumes d'un centre)
+KIND_ZERO = 0        # machine, unité inconnue, courrier MAG (admin)
+KIND_COLLECTE = 1    # collecte colis : colis / colis_par_collecte
+KIND_COLIS = 2
+KIND_SAC = 3
+KIND_CO = 4
+KIND_CR = 5
+KIND_EB = 6
+KIND_LRH = 7
+KIND_COURRIER = 8    # courrier sans flux précis : total courrier/jour
+N_KINDS = 9
+
+# Flux de ventilation des heures (cube national) : le type de volume de la tâche,
+# ou AMANA quand la tâche n'est valorisée que par le fallback AMANA-only
+FLUX_AMANA = N_KINDS
+FLUX_LABELS = ("AUTRE", "COLLECTE", "COLIS", "SACS", "CO", "CR", "EBARKIA", "LRH", "COURRIER", "AMANA")
+
+_COURRIER_KINDS = {"ordinaire": KIND_CO, "recommande": KIND_CR, "ebarkia": KIND_EB, "lrh": KIND_LRH}
+
+
+def classer_tache(t: Dict[str, Any]) -> Tuple[int, bool, bool]:
+    """
+    Partie de la boucle de `calculer_simulation` indépendante des volumes :
+    (type de volume, éligible au fallback AMANA-only, tâche de distribution).
+    """
+    nom_lower = (t.get("nom_tache") or "N/A").strip().lower()
+    unite = normalize_unit(t.get("unite_mesure", ""))
+    type_flux_raw = (t.get("type_flux") or "").strip().lower()
+    type_flux = FLUX_MAP.get(type_flux_raw, type_flux_raw)
+
+    is_courrier_task = (
+        "courrier" in nom_lower
+        or unite in ("courrier", "courriers", "courrier_recommande")
+        or type_flux in {"ordinaire", "recommande", "ebarkia", "lrh"}
+    )
+    has_amana_tag = (
+        "amana" in nom_lower
+        or type_flux == "amana"
+        or unite in ("colis_amana", "amana")
+    )
+
+    if ("collecte" in nom_lower) and ("colis" in nom_lower):
+        kind = KIND_COLLECTE
+    elif unite in ("colis", "colis_amana", "amana"):
+        kind = KIND_COLIS
+    elif unite in ("sac", "sacs"):
+        kind = KIND_SAC
+    elif unite in ("courrier", "courriers", "courrier_recommande"):
+        kind = KIND_ZERO if type_flux in ADMIN_FLUX else _COURRIER_KINDS.get(type_flux, KIND_COURRIER)
+    else:
+        kind = KIND_ZERO
+
+    fallback_amana = (
+        type_flux not in ADMIN_FLUX
+        and not any(k in nom_lower for k in ADMIN_KEYWORDS)
+        and unite != "machine"
+        and not is_courrier_task
+        and has_amana_tag
+    )
+    distribution = "distribution" in (t.get("famille_uo") or "").lower()
+    return kind, fallback_amana, distribution
+
+
+@dataclass
+class DirectionPlan:
+    """Tâches compilées d'un ensemble de centres (une entrée par tâche, centres contigus)."""
+    centre_ids: List[int]
+    kind: Any
+    moyenne_min: Any
+    fallback_amana: Any
+    distribution: Any
+    centre_idx: Any
+    slot: Any
+    slot_keys: List[Tuple[int, Any]]   # slot -> (centre_id, centre_poste_id)
+    failed: Dict[int, str] = field(default_factory=dict)  # centre_id -> erreur de compilation
+
+
+def compile_direction_plan(tasks_by_centre: Dict[int, List[Dict[str, Any]]], regroup: bool = True) -> DirectionPlan:
+    """
+    Compile les tâches de chaque centre (après regroupement des courriers si `regroup`).
+    Un centre dont les tâches sont invalides est marqué en échec, comme l'exception
+    qu'aurait levée le moteur pour ce centre.
+    """
+    centre_ids = list(tasks_by_centre.keys())
+    kind, mm, fallback, dist, centre_idx, slot = [], [], [], [], [], []
+    slot_keys: List[Tuple[int, Any]] = []
+    slot_t: Dict[Tuple[int, Any], int] = {}
+    failed: Dict[int, str] = {}
+
+    for ci, cid in enumerate(centre_ids):
+        try:
+            taches = tasks_by_centre[cid] or []
+            if regroup:
+                taches = regroup_tasks_for_scenarios(taches)
+            rows = []
+            for t in taches:
+                k, fb, d = classer_tache(t)
+                cp_key = t.get("centre_poste_id") or t.get("centrePosteId") or "NA"
+                rows.append((k, float(t.get("moyenne_min", 0) or 0), fb, d, cp_key))
+        except Exception as e:
+            failed[cid] = str(e)
+            continue
+
+        for k, m, fb, d, cp_key in rows:
+            kind.append(k)
+            mm.append(m)
+            fallback.append(fb)
+            dist.append(d)
+            centre_idx.append(ci)
+            key = (cid, cp_key)
+            idx = slot_t.get(key)
+            if idx is None:
+                idx = slot_t[key] = len(slot_keys)
+                slot_keys.append(key)
+            slot.append(idx)
+
+    if np is not None:
+        kind = np.array(kind, dtype=np.intp)
+        mm = np.array(mm, dtype=np.float64)
+        fallback = np.array(fallback, dtype=bool)
+        dist = np.array(dist, dtype=bool)
+        centre_idx = np.array(centre_idx, dtype=np.intp)
+        slot = np.array(slot, dtype=np.intp)
+
+    return DirectionPlan(
+        centre_ids=centre_ids, kind=kind, moyenne_min=mm, fallback_amana=fallback,
+        distribution=dist, centre_idx=centre_idx, slot=slot, slot_keys=slot_keys, failed=failed,
+    )
+
+
+def _volume_table(ctx: Dict[str, Any]) -> List[float]:
+    """Volume/jour de chaque type de tâche pour un centre (mêmes règles que calculer_simulation)."""
+    colis = ctx["colis"]
+    sacs = ctx["sacs"]
+    amana_colis_jour = ctx["amana_colis_jour"]
+
+    table = [0.0] * N_KINDS
+    if colis > 0:
+        table[KIND_COLLECTE] = colis / max(1.0, float(ctx["colis_par_collecte"] or 1.0))
+        table[KIND_COLIS] = colis
+    elif amana_colis_jour > 0:
+        table[KIND_COLIS] = amana_colis_jour
+
+    if sacs > 0:
+        table[KIND_SAC] = sacs
+    elif colis > 0:
+        table[KIND_SAC] = colis / ctx["colis_amana_par_sac"]
+    elif amana_colis_jour > 0:
+        table[KIND_SAC] = ctx["amana_sacs_jour"]
+
+    # AMANA-only : toutes les tâches courrier sont ignorées
+    if not ctx["amana_only"]:
+        table[KIND_CO] = ctx["co_jour"]
+        table[KIND_CR] = ctx["cr_jour"]
+        table[KIND_EB] = ctx["eb_jour"]
+        table[KIND_LRH] = ctx["lrh_jour"]
+        table[KIND_COURRIER] = ctx["courrier_total_jour"]
+    return table
+
+
+def _heures_scalaires(plan: DirectionPlan, tables, amana, facteur, par_flux=False):
+    totals = [0.0] * len(plan.centre_ids)
+    par_slot = [0.0] * len(plan.slot_keys)
+    slot_flux = [0.0] * (len(plan.slot_keys) * len(FLUX_LABELS)) if par_flux else None
+    for i in range(len(plan.kind)):
+        ci = plan.centre_idx[i]
+        if tables[ci] is None:
+            continue
+        flux = plan.kind[i]
+        vol = tables[ci][flux]
+        if vol <= 0 and amana[ci] > 0 and plan.fallback_amana[i]:
+            vol = amana[ci]
+            flux = FLUX_AMANA
+        if vol <= 0:
+            continue
+        heures = plan.moyenne_min[i] * vol / 60.0
+        if plan.distribution[i] and facteur != 1.0:
+            heures *= facteur
+        totals[ci] += heures
+        par_slot[plan.slot[i]] += heures
+        if par_flux:
+            slot_flux[plan.slot[i] * len(FLUX_LABELS) + flux] += heures
+    return totals, par_slot, slot_flux
+
+
+def _heures_vectorisees(plan: DirectionPlan, tables, amana, facteur, par_flux=False):
+    n_centres = len(plan.centre_ids)
+    valid = np.array([t is not None for t in tables], dtype=bool)
+    table = np.array([t if t is not None else [0.0] * N_KINDS for t in tables], dtype=np.float64).reshape(n_centres, N_KINDS)
+    amana_arr = np.asarray(amana, dtype=np.float64)
+
+    ci = plan.centre_idx
+    vol = table[ci, plan.kind]
+    # Fallback AMANA-only (amana[ci] > 0 uniquement pour les centres AMANA-only)
+    fallback = (vol <= 0) & plan.fallback_amana & (amana_arr[ci] > 0)
+    vol = np.where(fallback, amana_arr[ci], vol)
+    heures = plan.moyenne_min * vol / 60.0
+    if facteur != 1.0:
+        heures = np.where(plan.distribution, heures * facteur, heures)
+    heures = np.where((vol > 0) & valid[ci], heures, 0.0)
+
+    # bincount cumule dans l'ordre des tâches : mêmes sommes que la boucle du moteur
+    totals = np.bincount(ci, weights=heures, minlength=n_centres)
+    par_slot = np.bincount(plan.slot, weights=heures, minlength=len(plan.slot_keys))
+    slot_flux = None
+    if par_flux:
+        flux = np.where(fallback, FLUX_AMANA, plan.kind)
+        slot_flux = np.bincount(
+            plan.slot * len(FLUX_LABELS) + flux, weights=heures,
+            minlength=len(plan.slot_keys) * len(FLUX_LABELS),
+        ).tolist()
+    return totals.tolist(), par_slot.tolist(), slot_flux
+
+
+def _evaluer(plan: DirectionPlan, contexts, taux_complexite, nature_geo, vectorized, par_flux):
+    tables, amana = [], []
+    for cid in plan.centre_ids:
+        ctx = contexts.get(cid)
+        if ctx is None or cid in plan.failed:
+            tables.append(None)
+            amana.append(0.0)
+            continue
+        tables.append(_volume_table(ctx))
+        amana.append(ctx["amana_colis_jour"] if ctx["amana_only"] else 0.0)
+
+    facteur = float(taux_complexite) * float(nature_geo)
+    if vectorized and np is not None and len(plan.kind):
+        totals, par_slot, slot_flux = _heures_vectorisees(plan, tables, amana, facteur, par_flux)
+    else:
+        totals, par_slot, slot_flux = _heures_scalaires(plan, tables, amana, facteur, par_flux)
+
+    heures_par_poste: Dict[int, Dict[Any, float]] = {cid: {} for cid in plan.centre_ids}
+    for (cid, cp_key), heures in zip(plan.slot_keys, par_slot):
+        if heures != 0.0:
+            heures_par_poste[cid][cp_key] = heures
+
+    out: Dict[int, Optional[SimulationResponse]] = {}
+    for ci, cid in enumerate(plan.centre_ids):
+        if tables[ci] is None:
+            trace(lambda: f"⚠️ Centre {cid} non évalué: {plan.failed.get(cid, 'volumes invalides')}")
+            out[cid] = None
+            continue
+        heures_net = contexts[cid]["heures_net"]
+        fte_calcule, fte_arrondi = calculer_fte(totals[ci], heures_net)
+        out[cid] = SimulationResponse(
+            details_taches=[],
+            total_heures=round(totals[ci], 2),
+            heures_net_jour=round(heures_net, 2),
+            fte_calcule=round(fte_calcule, 2),
+            fte_arrondi=fte_arrondi,
+            heures_par_poste=heures_par_poste[cid],
+        )
+
+    flux_par_centre: Dict[int, List[Tuple[Any, str, float]]] = {}
+    if par_flux:
+        n_flux = len(FLUX_LABELS)
+        for s, (cid, cp_key) in enumerate(plan.slot_keys):
+            if out[cid] is None:
+                continue
+            rows = flux_par_centre.setdefault(cid, [])
+            for f in range(n_flux):
+                heures = slot_flux[s * n_flux + f]
+                if heures != 0.0:
+                    rows.append((cp_key, FLUX_LABELS[f], heures))
+    return out, flux_par_centre
+
+
+def evaluate_direction_plan(
+    plan: DirectionPlan,
+    contexts: Dict[int, Optional[Dict[str, Any]]],
+    *,
+    taux_complexite: float = 1.0,
+    nature_geo: float = 1.0,
+    vectorized: bool = True,
+) -> Dict[int, Optional[SimulationResponse]]:
+    """
+    Évalue tous les centres du plan. `contexts[cid]` = `contexte_volumes(...)` du centre
+    (None si ses volumes sont invalides). Retourne {centre_id: SimulationResponse sans
+    details_taches}, ou None pour un centre en échec.
+    """
+    out, _ = _evaluer(plan, contexts, taux_complexite, nature_geo, vectorized, par_flux=False)
+    return out
+
+
+def evaluate_direction_plan_par_flux(
+    plan: DirectionPlan,
+    contexts: Dict[int, Optional[Dict[str, Any]]],
+    *,
+    taux_complexite: float = 1.0,
+    nature_geo: float = 1.0,
+    vectorized: bool = True,
+) -> Tuple[Dict[int, Optional[SimulationResponse]], Dict[int, List[Tuple[Any, str, float]]]]:
+    """
+    Comme `evaluate_direction_plan`, avec en plus la ventilation des heures par poste
+    et par flux (FLUX_LABELS) : {centre_id: [(centre_poste_id, flux, heures)]}.
+    """
+    return _evaluer(plan, contexts, taux_complexite, nature_geo, vectorized, par_flux=True)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Chargement + cache des plans
+# ─────────────────────────────────────────────────────────────────────────────
+PLAN_CACHE_TTL_SECONDS = 120   # Filet de sécurité sans abonnement pub/sub (multi-workers sans Redis)
+PLAN_CACHE_MAX_ENTRIES = 64
+_plan_cache: "OrderedDict[tuple, tuple]" = OrderedDict()
+_plan_cache_lock = threading.Lock()
+
+
+def get_direction_plan(db: Session, centre_ids: List[int]) -> DirectionPlan:
+    """Plan compilé des centres depuis le cache, ou chargé et compilé."""
+    key = tuple(centre_ids)
+    version = referentiel_version("taches")
+    now = time.monotonic()
+    with _plan_cache_lock:
+        entry = _plan_cache.get(key)
+        if entry is not None and entry[2] == version and (
+            referentiel_partage() or now - entry[1] < PLAN_CACHE_TTL_SECONDS
+        ):
+            _plan_cache.move_to_end(key)
+            return entry[0]
+
+    plan = compile_direction_plan(load_taches_centres(db, centre_ids))
+    with _plan_cache_lock:
+        _plan_cache[key] = (plan, now, version)
+        _plan_cache.move_to_end(key)
+        while len(_plan_cache) > PLAN_CACHE_MAX_ENTRIES:
+            _plan_cache.popitem(last=False)
+    return plan
@@ -18,8 +18,12 @@ from sqlalchemy import text
 from fastapi import HTTPException
 import traceback
 
-# Moteur de calcul central
-from app.services.simulation import calculer_simulation
+# Moteur de calcul central (évaluation colonne de toute la direction)
+from app.core.tracing import trace
+from app.schemas.models import VolumesInput
+from app.services.centre_loaders import load_postes_centres
+from app.services.simulation import contexte_volumes
+from app.services.direction_engine import get_direction_plan, evaluate_direction_plan
 
 # Schemas
 from app.schemas.direction_sim import (
@@ -85,7 +89,7 @@ def convert_volumes_matriciels_to_classic(volumes_matriciels: List) -> Dict[str,
             key = flux_mapping[flux_id]
             result[key] += volume
     
-    print(f"📊 Volumes matriciels convertis: {result}")
+    trace(lambda: f"📊 Volumes matriciels convertis: {result}")
     return result
 
 def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequest) -> DirectionSimResponse:
@@ -94,7 +98,8 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
     Logique : 
     1. Récupère les centres de la direction.
     2. Pour chaque centre, récupère les volumes (Excel > DB > 0).
-    3. Applique la simulation via 'calculer_simulation' (moteur unique).
+    3. Applique le moteur unique ('calculer_simulation') à toute la direction en une
+       passe via le plan compilé des tâches (app.services.direction_engine).
     4. Agrège les résultats.
     """
     print(f"🔹 [V2] DEBUT Simulation Direction ID={request.direction_id}")
@@ -134,43 +139,13 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
     print(f"🔹 [V2] {len(centre_ids)} centres identifiés pour la simulation.")
 
     # 3. Récupérer les données Techniques (Postes, Tâches) en un bloc optimisé
-    tasks_by_centre = {cid: [] for cid in centre_ids}
+    # Tâches : plan compilé partagé (une requête, mis en cache tant que les tâches ne changent pas)
+    plan = get_direction_plan(db, centre_ids)
     postes_info_by_centre = {cid: [] for cid in centre_ids}
     
     if centre_ids:
-        # Tâches
-        # Expansion manuelle pour éviter erreur TVP PyODBC
-        ids_str = ",".join(str(cid) for cid in centre_ids)
-
-        # Tâches (Correction Jointures et Noms colonnes)
-        sql_tasks = f"""
-            SELECT t.*, 
-                   p.label as poste_code, 
-                   p.label as nom_poste, 
-                   p.type_poste, 
-                   cp.centre_id
-            FROM dbo.taches t
-            JOIN dbo.centre_postes cp ON cp.id = t.centre_poste_id
-            JOIN dbo.postes p ON p.id = cp.poste_id
-            WHERE cp.centre_id IN ({ids_str})
-        """
-        # Note: on n'utilise plus de paramètres liés pour la liste
-        t_rows = db.execute(text(sql_tasks)).mappings().all()
-        for r in t_rows:
-            tasks_by_centre[r.centre_id].append(dict(r))
-            
-        # Postes (Effectifs Actuels - Correction Noms colonnes)
-        sql_postes = f"""
-            SELECT cp.centre_id, 
-                   cp.id as cp_id,
-                   p.label as nom_poste, 
-                   p.type_poste, 
-                   cp.effectif_actuel
-            FROM dbo.centre_postes cp
-            JOIN dbo.postes p ON p.id = cp.poste_id
-            WHERE cp.centre_id IN ({ids_str})
-        """
-        p_rows = db.execute(text(sql_postes)).mappings().all()
+        # Postes (Effectifs Actuels) : une requête, IDs passés en un paramètre
+        p_rows = load_postes_centres(db, centre_ids)
         for r in p_rows:
             if r.centre_id not in postes_info_by_centre:
                 postes_info_by_centre[r.centre_id] = []
@@ -239,16 +214,15 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
         except Exception as e:
             print(f"⚠️ [V2] Erreur chargement refs volumes: {e}")
 
-    # 6. Boucle de Simulation par Centre
-    results = []
+    # 6. Volumes par centre puis évaluation de toute la direction en une passe
     global_p = request.global_params
+    productivite = float(global_p.productivite or 100)
+    idle_minutes = float(global_p.idle_minutes or 0)
     
-    from app.services.simulation_shared import regroup_tasks_for_scenarios
     from app.schemas.direction_sim import PosteDetail
 
+    contexts = {}
     for cid in centre_ids:
-        centre_data = centres_map[cid]
-        
         # A. Volumes
         vol_import = matched_volumes.get(cid)
         vol_matriciels = matched_volumes_matriciels.get(cid)
@@ -259,7 +233,7 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
         
         # Priorité 1: Volumes matriciels (nouveau format)
         if vol_matriciels:
-            print(f"🔹 Centre {cid}: Utilisation volumes matriciels ({len(vol_matriciels)} entrées)")
+            trace(lambda: f"🔹 Centre {cid}: Utilisation volumes matriciels ({len(vol_matriciels)} entrées)")
             raw_v = convert_volumes_matriciels_to_classic(vol_matriciels)
         
         # Priorité 2: Volumes classiques (ancien format Excel)
@@ -321,40 +295,44 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
             "amana": raw_v["amana"],
         }
 
-        # C. Calcul
-        sim_heures_par_poste = {}
-        sim_heures_net = 7.5
-        etp_calc = 0.0
-        heures_calc = 0.0
-        
+        # C. Contexte moteur du centre (volumes/jour, heures nettes : 8h * prod - idle)
         try:
-            # Regroupement des tâches (ex: tous courriers -> 1 tâche)
-            taches_du_centre = tasks_by_centre.get(cid, [])
-            c_tasks = regroup_tasks_for_scenarios(taches_du_centre)
-            
-            # Appel moteur
-            sim_res = calculer_simulation(
-                taches=c_tasks,
-                volumes=volumes_input_dict,
-                productivite=float(global_p.productivite or 100),
-                heures_net_input=None, # Laisser le moteur calculer (8h * prod - idle)
-                idle_minutes=float(global_p.idle_minutes or 0),
+            contexts[cid] = contexte_volumes(
+                VolumesInput(**volumes_input_dict),
+                productivite,
+                None,
+                idle_minutes,
                 volumes_annuels=volumes_annuels_dict
             )
-            
-            etp_calc = float(getattr(sim_res, "fte_calcule", 0) or 0)
-            heures_calc = float(getattr(sim_res, "total_heures", 0) or 0)
-            sim_heures_par_poste = getattr(sim_res, "heures_par_poste", {}) or {}
-            sim_heures_net = float(getattr(sim_res, "heures_net_jour", 7.5))
-            if sim_heures_net <= 0: sim_heures_net = 7.5
-            
         except Exception as e:
             print(f"⚠️ Erreur calcul centre {cid}: {e}")
+            contexts[cid] = None
+
+    sim_by_centre = evaluate_direction_plan(plan, contexts)
+
+    # D. Résultats et Détails Postes (tableaux par centre pour KPI et graphiques)
+    results = []
+    etp_actuel_arr = []
+    etp_calcule_arr = []
+    ecart_arr = []
+    categorie_arr = []
+    for cid in centre_ids:
+        centre_data = centres_map[cid]
+        sim_res = sim_by_centre.get(cid)
+        if sim_res is not None:
+            etp_calc = float(sim_res.fte_calcule or 0)
+            heures_calc = float(sim_res.total_heures or 0)
+            sim_heures_par_poste = sim_res.heures_par_poste or {}
+            sim_heures_net = float(sim_res.heures_net_jour)
+            if sim_heures_net <= 0: sim_heures_net = 7.5
+        else:
+            if cid in plan.failed:
+                print(f"⚠️ Erreur calcul centre {cid}: {plan.failed[cid]}")
             etp_calc = 0.0
             heures_calc = 0.0
             sim_heures_par_poste = {}
+            sim_heures_net = 7.5
 
-        # D. Résultats et Détails Postes
         centre_postes_list = postes_info_by_centre.get(cid, [])
         if isinstance(centre_postes_list, dict): # Fallback si ancienne structure map
             centre_postes_list = []
@@ -380,20 +358,25 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
                 type_poste=p.get("type", "")
             ))
         
+        etp_actuel_arr.append(round(etp_actuel, 2))
+        etp_calcule_arr.append(round(etp_calc, 2))
+        ecart_arr.append(round(etp_calc - etp_actuel, 2))
+        categorie_arr.append(cat)
+
         results.append(CentreResultRow(
             centre_id=cid,
             centre_label=centre_data["label"],
             categorie=cat,
-            etp_actuel=round(etp_actuel, 2),
-            etp_calcule=round(etp_calc, 2),
-            ecart=round(etp_calc - etp_actuel, 2),
+            etp_actuel=etp_actuel_arr[-1],
+            etp_calcule=etp_calcule_arr[-1],
+            ecart=ecart_arr[-1],
             heures_calc=heures_calc,
             details_postes=details_postes        
         ))
 
     # 7. KPI Globaux
-    total_actuel = sum(r.etp_actuel for r in results)
-    total_calc = sum(r.etp_calcule for r in results)
+    total_actuel = sum(etp_actuel_arr)
+    total_calc = sum(etp_calcule_arr)
     
     kpis = DirectionKPIs(
         nb_centres=len(results),
@@ -404,11 +387,11 @@ def process_direction_simulation_v2_clean(db: Session, request: DirectionSimRequ
     
     # Charts
     dist_map = {}
-    for r in results: dist_map[r.categorie] = dist_map.get(r.categorie, 0) + r.etp_calcule
+    for cat, etp in zip(categorie_arr, etp_calcule_arr): dist_map[cat] = dist_map.get(cat, 0) + etp
     chart_dist = [ChartDataPoint(name=k, value=round(v, 2)) for k, v in dist_map.items()]
     
-    top_5 = sorted(results, key=lambda x: x.ecart, reverse=True)[:5]
-    chart_top = [ChartDataPoint(name=r.centre_label, value=r.ecart) for r in top_5]
+    top_5 = sorted(range(len(results)), key=lambda i: ecart_arr[i], reverse=True)[:5]
+    chart_top = [ChartDataPoint(name=results[i].centre_label, value=ecart_arr[i]) for i in top_5]
     
     report = ImportReport(
         total_lignes=len(request.volumes),
@@ -0,0 +1,86 @@
+# backend/app/services/excel_reader.py
+"""
+Lecture Excel en flux (lecture seule) pour les imports et la simulation batch.
+
+Les classeurs sont ouverts une seule fois en mode `read_only` : les lignes sont
+lues à la demande, feuille par feuille, sans charger tout le classeur en mémoire.
+"""
+
+import io
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+
+def open_workbook(content: bytes):
+    """Ouvre un classeur en lecture seule (valeurs calculées). Penser à `wb.close()`."""
+    import openpyxl
+    return openpyxl.load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+
+
+def iter_sheets(wb, skip: Iterable[str] = ()) -> Iterator[Tuple[str, Any]]:
+    """Itère les feuilles (nom, feuille) dans l'ordre du classeur."""
+    skipped = set(skip)
+    for name in wb.sheetnames:
+        if name not in skipped:
+            yield name, wb[name]
+
+
+def iter_rows(ws, min_row: int = 1, max_col: Optional[int] = None) -> Iterator[Tuple[int, tuple]]:
+    """Lignes (numéro Excel, valeurs) à partir de min_row, lues en flux."""
+    for row_idx, values in enumerate(ws.iter_rows(min_row=min_row, max_col=max_col, values_only=True), start=min_row):
+        yield row_idx, values
+
+
+def _is_empty(values: tuple) -> bool:
+    return all(v is None or (isinstance(v, str) and not v.strip()) for v in values)
+
+
+def iter_records(
+    ws,
+    required: Iterable[str],
+    header_scan_rows: int = 5
+) -> Iterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Détecte la ligne d'en-tête (première ligne, parmi les `header_scan_rows` premières,
+    contenant toutes les colonnes `required`) puis produit (numéro Excel, {colonne: valeur})
+    pour chaque ligne non vide, dans la même passe.
+    """
+    required = [str(r) for r in required]
+    header: Optional[List[str]] = None
+    for row_idx, values in iter_rows(ws):
+        if header is None:
+            names = [str(v).strip() if v is not None else "" for v in values]
+            if all(r in names for r in required):
+                header = names
+            elif row_idx >= header_scan_rows:
+                raise ValueError(f"En-têtes introuvables (attendues: {', '.join(required)})")
+            continue
+        if _is_empty(values):
+            continue
+        yield row_idx, {name: values[i] if i < len(values) else None for i, name in enumerate(header) if name}
+    if header is None:
+        raise ValueError(f"En-têtes introuvables (attendues: {', '.join(required)})")
+
+
+class _Cell:
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+
+class SheetWindow:
+    """
+    Plage bornée d'une feuille lue en une passe, avec le même accès que
+    `ws.cell(row=, column=).value` (l'accès aléatoire est très lent en read_only).
+    """
+
+    def __init__(self, ws, max_row: int, max_col: int):
+        self._rows = [tuple(r) for r in ws.iter_rows(min_row=1, max_row=max_row, max_col=max_col, values_only=True)]
+
+    def cell(self, row: int, column: int) -> _Cell:
+        if 1 <= row <= len(self._rows):
+            values = self._rows[row - 1]
+            if 1 <= column <= len(values):
+                return _Cell(values[column - 1])
+        return _Cell(None)
@@ -1,4 +1,3 @@
-import pandas as pd
 import os
 from typing import List, Optional
 from app.models.db_models import Tache, CentrePoste, Poste
@@ -40,6 +39,7 @@ def load_tasks_from_excel(typology: str) -> List[Tache]:
     - Responsable (to link to CentrePoste/Poste)
     - Phase (optional but important for calculation)
     """
+    import pandas as pd
     file_path = get_template_path(typology)
     if not file_path:
         return []
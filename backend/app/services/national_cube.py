@@ -0,0 +1,497 @@
+# app/services/national_cube.py
+"""
+Cube de résultats d'une simulation nationale : centre × poste × flux.
+
+Chaque run national produit un cube en colonnes (heures / ETP calculé par
+centre_poste et par flux, effectif actuel par centre_poste, ETP calculé par
+centre) identifié par un `run_id` : l'empreinte des entrées du run et des
+versions du référentiel. Les vues direction / région / typologie / centre /
+poste / flux sont des agrégations du cube (quelques millisecondes), sans
+relancer la simulation.
+
+Stockage : cache local par processus (LRU + TTL) et copie Redis compressée
+(colonnes JSON + zlib) pour les autres workers. Un run aux entrées identiques
+réutilise le cube tant que le référentiel n'a pas changé.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+try:
+    import numpy as np
+except ImportError:  # Agrégations en Python pur
+    np = None
+
+from app.core.cache import get_redis
+from app.services.referentiel_snapshot import referentiel_partage
+
+logger = logging.getLogger(__name__)
+
+CUBE_TTL_SECONDS = 6 * 3600        # Durée de vie d'un run (drill-down)
+CUBE_REUSE_TTL_SECONDS = 120       # Réutilisation pour un nouveau run sans pub/sub référentiel
+CUBE_MAX_ENTRIES = 16
+REDIS_PREFIX = "national_cube:"
+
+AXES = ("direction", "region", "typologie", "centre", "poste", "flux")
+SANS_VALEUR = "N/A"
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Dimensions : tous les centres et centre_postes du référentiel
+# ─────────────────────────────────────────────────────────────────────────────
+@dataclass
+class CubeDimensions:
+    centres: List[Dict[str, Any]]
+    centre_postes: List[Dict[str, Any]]
+    directions: List[Dict[str, Any]]
+    total_actuel: float
+    actuel_par_centre: Dict[int, float]
+    centre_by_id: Dict[int, Dict[str, Any]]
+
+    def empreinte(self) -> str:
+        """Empreinte des dimensions (rattachements, libellés, effectifs actuels)."""
+        return _sha(json.dumps([self.centres, self.centre_postes, self.directions], default=str))
+
+
+def load_cube_dimensions(db: Session) -> CubeDimensions:
+    """Centres (direction, région, typologie), centre_postes (poste, actuel) et directions : 3 requêtes."""
+    centres = [dict(r) for r in db.execute(text("""
+        SELECT c.id, c.label, c.typologie, c.direction_id, d.label AS direction_label,
+               c.region_id, r.label AS region_label
+        FROM dbo.centres c
+        LEFT JOIN dbo.directions d ON d.id = c.direction_id
+        LEFT JOIN dbo.regions r ON r.id = c.region_id
+        ORDER BY c.id
+    """)).mappings().all()]
+    centre_postes = [dict(r) for r in db.execute(text("""
+        SELECT cp.id, cp.centre_id, p.label AS poste_label, p.type_poste,
+               COALESCE(cp.effectif_actuel, 0) AS actuel
+        FROM dbo.centre_postes cp
+        LEFT JOIN dbo.postes p ON p.id = cp.poste_id
+        ORDER BY cp.centre_id, cp.id
+    """)).mappings().all()]
+    directions = [dict(r) for r in db.execute(
+        text("SELECT id, label, code FROM dbo.directions ORDER BY label")
+    ).mappings().all()]
+
+    actuel_par_centre: Dict[int, float] = {}
+    total_actuel = 0.0
+    for cp in centre_postes:
+        actuel = float(cp["actuel"] or 0)
+        total_actuel += actuel
+        actuel_par_centre[cp["centre_id"]] = actuel_par_centre.get(cp["centre_id"], 0.0) + actuel
+
+    return CubeDimensions(
+        centres=centres,
+        centre_postes=centre_postes,
+        directions=directions,
+        total_actuel=total_actuel,
+        actuel_par_centre=actuel_par_centre,
+        centre_by_id={c["id"]: c for c in centres},
+    )
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Cube
+# ─────────────────────────────────────────────────────────────────────────────
+@dataclass
+class NationalCube:
+    """
+    Colonnes :
+      centres : id, label, direction_id, direction_label, region_id, region_label,
+                typologie, simule, etp_calcule, heures
+      postes  : id (centre_poste), centre (index), label, type, actuel
+      faits   : centre (index), poste (index, -1 si inconnu), flux (index meta["flux"]),
+                heures, etp (= heures / heures nettes du centre)
+    """
+    run_id: str
+    cree_le: float
+    meta: Dict[str, Any]
+    centres: Dict[str, list]
+    postes: Dict[str, list]
+    faits: Dict[str, list]
+    _axes: Dict[str, tuple] = field(default_factory=dict, repr=False)
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(json.dumps({
+            "run_id": self.run_id, "cree_le": self.cree_le, "meta": self.meta,
+            "centres": self.centres, "postes": self.postes, "faits": self.faits,
+        }, default=str).encode("utf-8"))
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "NationalCube":
+        d = json.loads(zlib.decompress(raw).decode("utf-8"))
+        return cls(run_id=d["run_id"], cree_le=d["cree_le"], meta=d["meta"],
+                   centres=d["centres"], postes=d["postes"], faits=d["faits"])
+
+    def resume(self) -> Dict[str, Any]:
+        meta = {k: v for k, v in self.meta.items() if k != "response"}
+        return {
+            "run_id": self.run_id,
+            "cree_le": self.cree_le,
+            "centres": len(self.centres["id"]),
+            "centres_simules": sum(self.centres["simule"]),
+            "postes": len(self.postes["id"]),
+            "faits": len(self.faits["heures"]),
+            "axes": list(AXES),
+            **meta,
+        }
+
+    # --- Codes des axes (dictionnaire clé -> index), calculés à la première vue ---
+    def _axe_centres(self, axe: str) -> Tuple[list, list, list]:
+        """(code par centre, clés, libellés) pour un axe de niveau centre."""
+        cached = self._axes.get(axe)
+        if cached is not None:
+            return cached
+        c = self.centres
+        if axe == "direction":
+            pairs = zip(c["direction_id"], c["direction_label"])
+        elif axe == "region":
+            pairs = zip(c["region_id"], c["region_label"])
+        elif axe == "typologie":
+            pairs = ((t, t) for t in c["typologie"])
+        else:
+            pairs = zip(c["id"], c["label"])
+        self._axes[axe] = _encoder(pairs)
+        return self._axes[axe]
+
+    def _axe_postes(self) -> Tuple[list, list, list]:
+        """(code par centre_poste, libellés de poste, types) ; le dernier code = poste inconnu."""
+        cached = self._axes.get("poste")
+        if cached is not None:
+            return cached
+        codes, cles, _ = _encoder((lbl, lbl) for lbl in self.postes["label"])
+        types: Dict[str, str] = {}
+        for lbl, typ in zip(self.postes["label"], self.postes["type"]):
+            types.setdefault(lbl, typ)
+        if SANS_VALEUR not in cles:
+            cles.append(SANS_VALEUR)
+        self._axes["poste"] = (codes, cles, [types.get(k, SANS_VALEUR) for k in cles])
+        return self._axes["poste"]
+
+
+def _encoder(pairs: Iterable[Tuple[Any, Any]]) -> Tuple[list, list, list]:
+    index: Dict[Any, int] = {}
+    codes, cles, labels = [], [], []
+    for cle, label in pairs:
+        code = index.get(cle)
+        if code is None:
+            code = index[cle] = len(cles)
+            cles.append(cle)
+            labels.append(label if label is not None else SANS_VALEUR)
+        codes.append(code)
+    return codes, cles, labels
+
+
+class CubeBuilder:
+    """Accumule les résultats centre par centre d'un run, puis construit le cube."""
+
+    def __init__(self, dims: CubeDimensions, flux_labels: Iterable[str]):
+        self.dims = dims
+        self.flux_labels = list(flux_labels)
+        self._flux_index = {f: i for i, f in enumerate(self.flux_labels)}
+        self._centre_index = {c["id"]: i for i, c in enumerate(dims.centres)}
+        self._cp_index = {cp["id"]: i for i, cp in enumerate(dims.centre_postes) if cp["centre_id"] in self._centre_index}
+        n = len(dims.centres)
+        self._simule = [0] * n
+        self._etp = [0.0] * n
+        self._heures = [0.0] * n
+        self._faits: Dict[str, list] = {"centre": [], "poste": [], "flux": [], "heures": [], "etp": []}
+
+    def ajouter_centre(
+        self,
+        centre_id: int,
+        etp_calcule: float,
+        heures: float,
+        heures_net: float,
+        ventilation: Iterable[Tuple[Any, str, float]],
+    ):
+        """`ventilation` = [(centre_poste_id, flux, heures)] du centre ; un centre ajouté deux fois est remplacé."""
+        ci = self._centre_index.get(centre_id)
+        if ci is None:
+            return
+        if self._simule[ci]:
+            self._retirer_faits(ci)
+        self._simule[ci] = 1
+        self._etp[ci] = float(etp_calcule)
+        self._heures[ci] = float(heures)
+        for cp_id, flux, h in ventilation:
+            fi = self._flux_index.get(flux)
+            if fi is None:
+                fi = self._flux_index[flux] = len(self.flux_labels)
+                self.flux_labels.append(flux)
+            self._faits["centre"].append(ci)
+            self._faits["poste"].append(self._cp_index.get(cp_id, -1))
+            self._faits["flux"].append(fi)
+            self._faits["heures"].append(float(h))
+            self._faits["etp"].append(float(h) / heures_net if heures_net > 0 else 0.0)
+
+    def _retirer_faits(self, ci: int):
+        garder = [k for k, c in enumerate(self._faits["centre"]) if c != ci]
+        self._faits = {col: [vals[k] for k in garder] for col, vals in self._faits.items()}
+
+    def construire(self, run_id: str, meta: Dict[str, Any]) -> NationalCube:
+        d = self.dims
+        centres = {
+            "id": [c["id"] for c in d.centres],
+            "label": [c["label"] for c in d.centres],
+            "direction_id": [c["direction_id"] for c in d.centres],
+            "direction_label": [c["direction_label"] or "Sans Direction" for c in d.centres],
+            "region_id": [c["region_id"] for c in d.centres],
+            "region_label": [c["region_label"] for c in d.centres],
+            "typologie": [c["typologie"] or SANS_VALEUR for c in d.centres],
+            "simule": self._simule,
+            "etp_calcule": self._etp,
+            "heures": self._heures,
+        }
+        cps = [cp for cp in d.centre_postes if cp["id"] in self._cp_index]
+        postes = {
+            "id": [cp["id"] for cp in cps],
+            "centre": [self._centre_index[cp["centre_id"]] for cp in cps],
+            "label": [(cp["poste_label"] or SANS_VALEUR).strip() for cp in cps],
+            "type": [cp["type_poste"] or SANS_VALEUR for cp in cps],
+            "actuel": [float(cp["actuel"] or 0) for cp in cps],
+        }
+        meta = dict(meta, flux=self.flux_labels)
+        return NationalCube(run_id=run_id, cree_le=time.time(), meta=meta,
+                            centres=centres, postes=postes, faits=self._faits)
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Vues (slices)
+# ─────────────────────────────────────────────────────────────────────────────
+def _col(values, dtype=None):
+    return np.asarray(values, dtype=dtype) if np is not None else list(values)
+
+
+def _take(values, idx):
+    if np is not None:
+        return np.asarray(values)[np.asarray(idx, dtype=np.intp)] if len(idx) else np.asarray([], dtype=np.asarray(values).dtype)
+    return [values[i] for i in idx]
+
+
+def _egal(values, cible):
+    if np is not None:
+        return np.asarray(values) == cible
+    return [v == cible for v in values]
+
+
+def _et(a, b):
+    if np is not None:
+        return np.logical_and(a, b)
+    return [x and y for x, y in zip(a, b)]
+
+
+def _somme_par(codes, poids, masque, n: int) -> List[float]:
+    if np is not None:
+        m = np.asarray(masque, dtype=bool)
+        if not len(m):
+            return [0.0] * n
+        return np.bincount(np.asarray(codes, dtype=np.intp)[m],
+                           weights=np.asarray(poids, dtype=np.float64)[m], minlength=n).tolist()
+    out = [0.0] * n
+    for c, w, ok in zip(codes, poids, masque):
+        if ok:
+            out[c] += w
+    return out
+
+
+def _centres_distincts(codes, centres, masque, n: int, n_centres: int) -> List[int]:
+    if np is not None:
+        m = np.asarray(masque, dtype=bool)
+        if not m.any():
+            return [0] * n
+        paires = np.unique(np.asarray(codes, dtype=np.int64)[m] * n_centres + np.asarray(centres, dtype=np.int64)[m])
+        return np.bincount(paires // n_centres, minlength=n).tolist()
+    vus = [set() for _ in range(n)]
+    for c, ci, ok in zip(codes, centres, masque):
+        if ok:
+            vus[c].add(ci)
+    return [len(v) for v in vus]
+
+
+def _code_filtre(cles: list, valeur: Any) -> int:
+    """Index de `valeur` dans les clés d'un axe (comparaison tolérante int/str), -1 si absente."""
+    for i, cle in enumerate(cles):
+        if cle == valeur or (cle is not None and str(cle).strip().upper() == str(valeur).strip().upper()):
+            return i
+    return -1
+
+
+def slice_cube(cube: NationalCube, by: str, filtres: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Agrège le cube selon l'axe `by` (AXES), après filtres optionnels :
+    direction_id, region_id, typologie, centre_id, poste (libellé), flux.
+
+    Sans axe ni filtre poste/flux, l'ETP calculé est celui des centres (comme les
+    totaux du run) et l'effectif actuel couvre tous les centres du périmètre. Sinon
+    les mesures viennent des faits poste × flux ; l'effectif actuel n'existe pas par flux.
+    Le facteur de scénario du run est appliqué à l'ETP calculé.
+    """
+    if by not in AXES:
+        raise ValueError(f"Axe inconnu '{by}' (attendu : {', '.join(AXES)})")
+    filtres = {k: v for k, v in (filtres or {}).items() if v is not None}
+    facteur = float(cube.meta.get("facteur_scenario", 1.0))
+    c, p, f = cube.centres, cube.postes, cube.faits
+    n_centres = len(c["id"])
+
+    # 1. Périmètre des centres
+    centre_ok = _col([True] * n_centres, bool)
+    for axe, cle in (("direction", "direction_id"), ("region", "region_id"), ("typologie", "typologie"), ("centre", "centre_id")):
+        if cle in filtres:
+            codes, cles, _ = cube._axe_centres(axe)
+            centre_ok = _et(centre_ok, _egal(codes, _code_filtre(cles, filtres[cle])))
+
+    poste_codes, poste_cles, poste_types = cube._axe_postes()
+    poste_inconnu = len(poste_cles) - 1
+    niveau_poste = by in ("poste", "flux") or "poste" in filtres or "flux" in filtres
+
+    if by == "poste":
+        cles, labels = poste_cles, poste_cles
+    elif by == "flux":
+        cles = labels = list(cube.meta["flux"])
+    else:
+        codes_centre, cles, labels = cube._axe_centres(by)
+    n = len(cles)
+
+    if not niveau_poste:
+        simule_ok = _et(centre_ok, _col(c["simule"], bool))
+        heures = _somme_par(codes_centre, c["heures"], simule_ok, n)
+        etp = _somme_par(codes_centre, c["etp_calcule"], simule_ok, n)
+        nb = _somme_par(codes_centre, [1.0] * n_centres, centre_ok, n)
+        nb_simules = _somme_par(codes_centre, [1.0] * n_centres, simule_ok, n)
+        cp_ok = _take(centre_ok, p["centre"])
+        actuel = _somme_par(_take(codes_centre, p["centre"]), p["actuel"], cp_ok, n)
+    else:
+        # 2. Faits poste × flux du périmètre
+        fait_poste = _col([poste_codes[k] if k >= 0 else poste_inconnu for k in f["poste"]], None)
+        fait_ok = _take(centre_ok, f["centre"])
+        cp_ok = _take(centre_ok, p["centre"])
+        if "poste" in filtres:
+            code_p = _code_filtre(poste_cles, filtres["poste"])
+            fait_ok = _et(fait_ok, _egal(fait_poste, code_p))
+            cp_ok = _et(cp_ok, _egal(poste_codes, code_p))
+        if "flux" in filtres:
+            fait_ok = _et(fait_ok, _egal(f["flux"], _code_filtre(cube.meta["flux"], filtres["flux"])))
+
+        if by == "poste":
+            codes_faits, codes_cp = fait_poste, poste_codes
+        elif by == "flux":
+            codes_faits, codes_cp = f["flux"], None
+        else:
+            codes_faits, codes_cp = _take(codes_centre, f["centre"]), _take(codes_centre, p["centre"])
+
+        heures = _somme_par(codes_faits, f["heures"], fait_ok, n)
+        etp = _somme_par(codes_faits, f["etp"], fait_ok, n)
+        nb_simules = _centres_distincts(codes_faits, f["centre"], fait_ok, n, max(n_centres, 1))
+        if codes_cp is None or "flux" in filtres:
+            actuel = None
+            nb = nb_simules
+        else:
+            actuel = _somme_par(codes_cp, p["actuel"], cp_ok, n)
+            nb = _centres_distincts(codes_cp, p["centre"], cp_ok, n, max(n_centres, 1))
+
+    rows = []
+    for i in range(n):
+        etp_i = etp[i] * facteur
+        act_i = actuel[i] if actuel is not None else None
+        if not nb[i] and not heures[i] and not act_i:
+            continue
+        row = {
+            "cle": cles[i],
+            "label": labels[i],
+            "centres": int(nb[i]),
+            "centres_simules": int(nb_simules[i]),
+            "heures": round(heures[i], 2),
+            "etp_calcule": round(etp_i, 2),
+            "etp_actuel": round(act_i, 2) if act_i is not None else None,
+            "ecart": round(etp_i - act_i, 2) if act_i is not None else None,
+        }
+        if by == "poste":
+            row["type_poste"] = poste_types[i]
+        rows.append(row)
+    rows.sort(key=lambda r: str(r["label"]))
+    return rows
+
+
+# ─────────────────────────────────────────────────────────────────────────────
+# Identifiant de run + stockage
+# ─────────────────────────────────────────────────────────────────────────────
+_cube_cache: "OrderedDict[str, NationalCube]" = OrderedDict()
+_cube_cache_lock = threading.Lock()
+
+
+def _sha(text_: str) -> str:
+    return hashlib.sha256(text_.encode("utf-8")).hexdigest()
+
+
+def cube_run_id(*parts: Any) -> str:
+    """Identifiant de run : empreinte des entrées (requête, volumes, dimensions, versions du référentiel)."""
+    return _sha(json.dumps(parts, sort_keys=True, default=str))[:32]
+
+
+def store_cube(cube: NationalCube):
+    with _cube_cache_lock:
+        _cube_cache[cube.run_id] = cube
+        _cube_cache.move_to_end(cube.run_id)
+        while len(_cube_cache) > CUBE_MAX_ENTRIES:
+            _cube_cache.popitem(last=False)
+    client = get_redis()
+    if client is None:
+        return
+    try:
+        client.setex(REDIS_PREFIX + cube.run_id, CUBE_TTL_SECONDS, base64.b64encode(cube.to_bytes()).decode("ascii"))
+    except Exception as e:
+        logger.warning(f"⚠️ Cube national {cube.run_id} non copié dans Redis : {e}")
+
+
+def get_cube(run_id: str, reutilisation: bool = False) -> Optional[NationalCube]:
+    """
+    Cube du run (cache local, sinon Redis), ou None s'il a expiré.
+    `reutilisation` : pour servir un nouveau run, le cube doit aussi être récent
+    si les versions du référentiel ne sont pas partagées entre workers.
+    """
+    with _cube_cache_lock:
+        cube = _cube_cache.get(run_id)
+        if cube is not None:
+            _cube_cache.move_to_end(run_id)
+
+    if cube is None:
+        client = get_redis()
+        if client is not None:
+            try:
+                raw = client.get(REDIS_PREFIX + run_id)
+            except Exception as e:
+                logger.warning(f"⚠️ Lecture Redis du cube {run_id} impossible : {e}")
+                raw = None
+            if raw:
+                cube = NationalCube.from_bytes(base64.b64decode(raw))
+                with _cube_cache_lock:
+                    _cube_cache[run_id] = cube
+                    while len(_cube_cache) > CUBE_MAX_ENTRIES:
+                        _cube_cache.popitem(last=False)
+
+    if cube is None:
+        return None
+    age = time.time() - cube.cree_le
+    if age >= CUBE_TTL_SECONDS:
+        return None
+    if reutilisation and not referentiel_partage() and age >= CUBE_REUSE_TTL_SECONDS:
+        return None
+    return cube
+
+
+def clear_cube_cache():
+    with _cube_cache_lock:
+        _cube_cache.clear()
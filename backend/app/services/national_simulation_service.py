@@ -3,13 +3,16 @@
 from typing import Dict, List, Optional
 from sqlalchemy.orm import Session
 from sqlalchemy import text
-from app.services.bandoeng_engine import run_bandoeng_simulation, BandoengInputVolumes, BandoengParameters
+from app.services.bandoeng_engine import run_bandoeng_simulation, BandoengInputVolumes, BandoengParameters, detect_flux
 from app.schemas.volumes_ui import VolumesUIInput, VolumeItem, GuichetVolumesInput
 
 # Schemas
 from app.schemas.direction_sim import VolumeMatriciel, CentreSimulationData, CentreParams
 from app.models.db_models import CentrePoste, Poste
 from app.services.taches_service import auto_import_tasks_if_empty
+from app.services.centre_loaders import ensemble, valeurs_json
+from app.services.national_cube import CubeBuilder, cube_run_id, get_cube, load_cube_dimensions, store_cube
+from app.services.referentiel_snapshot import SECTIONS, referentiel_version
 
 # Mappings (ID -> CODE)
 FLUX_ID_MAP = {1: "AMANA", 2: "CO", 3: "CR", 4: "E-BARKIA", 5: "LRH"}
@@ -91,7 +94,6 @@ def process_national_simulation(
         return _empty_response()
 
     # --- 2. Récupérer métadonnées des centres (Direction, Catégorie) ---
-    ids_str = ",".join(str(cid) for cid in centre_ids)
     sql_centres = f"""
         SELECT c.id, c.label, c.direction_id, d.label as direction_label, cat.label as categorie_label,
                COALESCE((SELECT SUM(effectif_actuel) FROM dbo.centre_postes WHERE centre_id = c.id), 0) as etp_actuel_bulk,
@@ -99,10 +101,23 @@ def process_national_simulation(
         FROM dbo.centres c
         LEFT JOIN dbo.directions d ON d.id = c.direction_id
         LEFT JOIN dbo.categories cat ON cat.id = c.categorie_id
-        WHERE c.id IN ({ids_str})
+        WHERE c.id IN {ensemble(db, "ids")}
     """
-    centres_rows = db.execute(text(sql_centres)).mappings().all()
+    centres_rows = db.execute(text(sql_centres), {"ids": valeurs_json(centre_ids)}).mappings().all()
     centres_map = {r.id: dict(r) for r in centres_rows}
+
+    # --- 2b. Cube de résultats : un run identique (entrées + référentiel) est réutilisé ---
+    dims = load_cube_dimensions(db)
+    run_id = cube_run_id(
+        "national_bandoeng",
+        [[cid, _payload_json(centres_payload[cid])] for cid in centre_ids],
+        global_params, dims.empreinte(), referentiel_version(*SECTIONS),
+    )
+    cube = get_cube(run_id, reutilisation=True)
+    if cube is not None and "response" in cube.meta:
+        print(f"🌍 [NATIONAL] Run {run_id} réutilisé (cube en cache)")
+        return dict(cube.meta["response"])
+    builder = CubeBuilder(dims, ("AMANA", "CO", "CR", "AUTRE"))
     
     # --- 3. Boucle de Simulation ---
     results_by_direction = {}
@@ -394,6 +409,17 @@ def process_national_simulation(
             })
             
             
+            # Cube : heures par centre_poste et par flux du produit
+            ventilation = {}
+            for t in sim_res.tasks:
+                flux = detect_flux(t.produit).upper()
+                key = (t.centre_poste_id, "AUTRE" if flux == "GENERAL" else flux)
+                ventilation[key] = ventilation.get(key, 0.0) + float(t.heures_calculees or 0)
+            builder.ajouter_centre(
+                cid, etp_cible_arrondi, heures_mod, float(sim_res.heures_net_jour or 0),
+                [(cp_id, flux, h) for (cp_id, flux), h in ventilation.items()],
+            )
+
             # Agreg Postes (Conserve le lien avec le centre pour le modal)
             for p in sim_res.postes:
                 lbl = (p.poste_label or "Inconnu").strip()
@@ -451,7 +477,7 @@ def process_national_simulation(
     centres_output.sort(key=lambda x: x['nom'])
     postes_list.sort(key=lambda x: x['poste_label'])
     
-    return {
+    result = {
         "centres_simules": centres_simules,
         "centres_simules": centres_simules,
         "directions": directions_list,
@@ -464,7 +490,20 @@ def process_national_simulation(
             "heures_totales": round(total_heures, 2),
             "centres_total": centres_simules,
             "directions_total": len(directions_list)
-        }
+        },
+        "run_id": run_id
+    }
+    store_cube(builder.construire(run_id, {"service": "national_bandoeng", "response": result}))
+    return result
+
+
+def _payload_json(payload: dict) -> dict:
+    """Entrées d'un centre sérialisables (empreinte du run)."""
+    params = payload.get("params")
+    return {
+        "volumes": [v.model_dump() if hasattr(v, "model_dump") else v for v in payload.get("volumes") or []],
+        "grid_values": payload.get("grid_values"),
+        "params": params.model_dump() if hasattr(params, "model_dump") else params,
     }
 
 def _empty_response():
@@ -388,7 +388,7 @@ def invalidate_referentiel_cache(
 
 # Exemple d'utilisation
 if __name__ == "__main__":
-    from app.core.database import SessionLocal
+    from app.core.db import SessionLocal
     
     db = SessionLocal()
     
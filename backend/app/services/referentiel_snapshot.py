@@ -0,0 +1,253 @@
+"""
+Snapshot en mémoire des référentiels relus à chaque simulation :
+libellés des postes (Code → label), mappings du mode recommandé,
+exclusions du mode optimisé et sites rattachés.
+
+Chaque section porte une version croissante, incrémentée par les endpoints
+d'écriture via `bump_referentiel_version(...)` (après commit). Une section
+n'est rechargée que si sa version a changé ; les structures servies sont en
+lecture seule et partagées entre threads. La section "taches" n'a pas de
+données ici : sa version sert de clé au cache des plans compilés Bandoeng.
+
+En multi-workers, les incréments sont diffusés par Redis pub/sub
+(`start_referentiel_listener`). Sans abonnement actif, une section est
+aussi rechargée après REFERENTIEL_MAX_AGE secondes.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session, aliased
+
+from app.core.cache import get_redis, on_redis_connect
+from app.core.config import settings
+from app.models.db_models import Poste, MappingPosteRecommande, TacheExclueOptimisee, AttachedSite
+
+logger = logging.getLogger(__name__)
+
+SECTIONS = ("taches", "postes", "mappings", "exclusions", "sites")
+CHANNEL = "referentiel:invalidate"
+
+# Identifiant du processus : ignore ses propres messages pub/sub
+_ORIGIN = uuid.uuid4().hex
+
+_lock = threading.Lock()
+_versions: Dict[str, int] = {s: 0 for s in SECTIONS}
+_loaded: Dict[str, Tuple[int, float, Any]] = {}   # section -> (version, chargé à, valeur)
+_listener_alive = threading.Event()
+_listener_stop = threading.Event()
+_listener_thread: Optional[threading.Thread] = None
+
+
+class FrozenDict(dict):
+    """Dict en lecture seule (partagé entre requêtes) ; picklé comme un dict ordinaire."""
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Référentiel en lecture seule")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+class ExclusionsSnapshot:
+    """Exclusions du mode optimisé : ids de tâches par centre, quadruplets bruts par catégorie."""
+    __slots__ = ("ids_by_centre", "quads_by_categorie")
+
+    def __init__(self, ids_by_centre: Dict[int, tuple], quads_by_categorie: Dict[Optional[int], tuple]):
+        self.ids_by_centre = FrozenDict(ids_by_centre)
+        self.quads_by_categorie = FrozenDict(quads_by_categorie)
+
+
+# --- Versions ---
+def _check(sections) -> tuple:
+    sections = tuple(sections) or SECTIONS
+    unknown = [s for s in sections if s not in _versions]
+    if unknown:
+        raise ValueError(f"Sections de référentiel inconnues: {unknown}")
+    return sections
+
+
+def referentiel_version(*sections: str) -> tuple:
+    """Versions courantes des sections demandées (toutes si aucune)."""
+    sections = _check(sections)
+    with _lock:
+        return tuple(_versions[s] for s in sections)
+
+
+def referentiel_partage() -> bool:
+    """True si les invalidations des autres processus sont reçues (abonnement pub/sub actif)."""
+    return _listener_alive.is_set()
+
+
+def _bump_local(sections: tuple):
+    with _lock:
+        for s in sections:
+            _versions[s] += 1
+            _loaded.pop(s, None)
+
+
+def bump_referentiel_version(*sections: str) -> tuple:
+    """
+    Invalide les sections modifiées (toutes si aucune) dans ce processus et,
+    si Redis est disponible, dans les autres workers. À appeler après commit.
+    """
+    sections = _check(sections)
+    _bump_local(sections)
+    client = get_redis()
+    if client is not None:
+        try:
+            client.publish(CHANNEL, f"{_ORIGIN}:{','.join(sections)}")
+        except Exception as e:
+            logger.warning(f"⚠️ Diffusion invalidation référentiel impossible: {e}")
+    return referentiel_version(*sections)
+
+
+# --- Chargement des sections ---
+def _section(section: str, db: Session, loader: Callable[[Session], Any]) -> Any:
+    now = time.monotonic()
+    with _lock:
+        version = _versions[section]
+        entry = _loaded.get(section)
+    if entry is not None and entry[0] == version and (
+        referentiel_partage() or now - entry[1] < settings.REFERENTIEL_MAX_AGE
+    ):
+        return entry[2]
+
+    value = loader(db)
+    with _lock:
+        # Une écriture pendant le chargement rend la valeur obsolète : non conservée
+        if _versions[section] == version:
+            _loaded[section] = (version, now, value)
+    return value
+
+
+def _load_postes(db: Session) -> FrozenDict:
+    return FrozenDict(
+        (str(code), str(label))
+        for code, label in db.query(Poste.Code, Poste.label).filter(Poste.Code != None).all()
+    )
+
+
+def _load_mappings(db: Session) -> FrozenDict:
+    source = aliased(Poste)
+    cible = aliased(Poste)
+    rows = (
+        db.query(source.Code, cible.Code)
+        .select_from(MappingPosteRecommande)
+        .join(source, MappingPosteRecommande.poste_source_id == source.id)
+        .join(cible, MappingPosteRecommande.poste_cible_id == cible.id)
+        .order_by(MappingPosteRecommande.id)
+        .all()
+    )
+    return FrozenDict((src, dst) for src, dst in rows)
+
+
+def _load_exclusions(db: Session) -> ExclusionsSnapshot:
+    ids_by_centre: Dict[int, list] = {}
+    quads_by_categorie: Dict[Optional[int], list] = {}
+    rows = db.query(
+        TacheExclueOptimisee.centre_id,
+        TacheExclueOptimisee.tache_id,
+        TacheExclueOptimisee.categorie_id,
+        TacheExclueOptimisee.nom_tache,
+        TacheExclueOptimisee.produit,
+        TacheExclueOptimisee.famille_uo,
+        TacheExclueOptimisee.unite_mesure,
+    ).all()
+    for centre_id, tache_id, categorie_id, nom, produit, famille, unite in rows:
+        if centre_id is not None and tache_id is not None:
+            ids_by_centre.setdefault(centre_id, []).append(tache_id)
+        if nom is not None:
+            quads_by_categorie.setdefault(categorie_id, []).append((nom, produit, famille, unite))
+    return ExclusionsSnapshot(
+        {k: tuple(v) for k, v in ids_by_centre.items()},
+        {k: tuple(v) for k, v in quads_by_categorie.items()},
+    )
+
+
+def _load_sites(db: Session) -> FrozenDict:
+    sites: Dict[int, list] = {}
+    for s in db.query(AttachedSite.id, AttachedSite.label, AttachedSite.code, AttachedSite.centre_id).order_by(AttachedSite.id).all():
+        sites.setdefault(s.centre_id, []).append(
+            FrozenDict(id=s.id, label=s.label, code=s.code, centre_id=s.centre_id)
+        )
+    return FrozenDict((k, tuple(v)) for k, v in sites.items())
+
+
+def get_poste_map(db: Session) -> FrozenDict:
+    """Libellés des postes par Code."""
+    return _section("postes", db, _load_postes)
+
+
+def get_role_mapping(db: Session) -> FrozenDict:
+    """Mapping des responsables {code source: code cible} du mode recommandé."""
+    return _section("mappings", db, _load_mappings)
+
+
+def get_exclusions_optimisees(db: Session) -> ExclusionsSnapshot:
+    """Exclusions du mode optimisé (toutes catégories et centres)."""
+    return _section("exclusions", db, _load_exclusions)
+
+
+def get_sites_rattaches(db: Session) -> FrozenDict:
+    """Sites rattachés par centre (tuples de dicts id/label/code/centre_id)."""
+    return _section("sites", db, _load_sites)
+
+
+# --- Invalidation inter-processus (Redis pub/sub) ---
+def _listen(pubsub):
+    while not _listener_stop.is_set():
+        try:
+            if not _listener_alive.is_set():
+                pubsub.subscribe(CHANNEL)
+                # Messages éventuellement manqués pendant la coupure : tout recharger
+                _bump_local(SECTIONS)
+                _listener_alive.set()
+            message = pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            if not message:
+                continue
+            data = message.get("data") or ""
+            origin, _, sections = str(data).partition(":")
+            if origin == _ORIGIN:
+                continue
+            sections = tuple(s for s in sections.split(",") if s in _versions) or SECTIONS
+            _bump_local(sections)
+            logger.info(f"🔄 Référentiel invalidé par un autre worker: {', '.join(sections)}")
+        except Exception as e:
+            if _listener_alive.is_set():
+                logger.warning(f"⚠️ Abonnement invalidations référentiel perdu: {e}")
+            _listener_alive.clear()
+            _listener_stop.wait(5)
+    _listener_alive.clear()
+
+
+def _start_listener_thread(client):
+    global _listener_thread
+    with _lock:
+        if _listener_thread is not None:
+            return
+        _listener_thread = threading.Thread(
+            target=_listen, args=(client.pubsub(),), name="referentiel-listener", daemon=True
+        )
+    _listener_thread.start()
+
+
+def start_referentiel_listener():
+    """Démarre le thread d'écoute des invalidations dès que Redis est connecté (sans attendre)."""
+    on_redis_connect(_start_listener_thread)
+
+
+def stop_referentiel_listener():
+    """Arrête le thread d'écoute (arrêt de l'application)."""
+    global _listener_thread
+    if _listener_thread is not None:
+        _listener_stop.set()
+        _listener_thread.join(timeout=5)
+        _listener_thread = None
+        _listener_stop.clear()
@@ -3,12 +3,28 @@ from typing import List, Dict, Optional, Union, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import text, func
 
+from app.core.tracing import trace, collect_trace
 from app.schemas.models import VolumesInput, SimulationResponse, TacheDetail, VolumeItem
 from app.models.db_models import VolumeSimulation, Tache, CentrePoste, Poste, Flux, VolumeSens, VolumeSegment
 from app.services.utils import normalize_unit, round_half_up
 
 JOURS_OUVRES_AN = 264  # jours ouvrés/an  # 22 jours * 12 mois
 
+# tâches admin/support à exclure du fallback AMANA
+ADMIN_KEYWORDS = {
+    "suivi", "etat", "pointage", "rapport", "canevas", "bp intelligente",
+    "gardiennage", "femmes de ménage", "réalisations commerciales", "absences"
+}
+
+# Mapping DB -> logique
+FLUX_MAP = {
+    "co": "ordinaire",
+    "cr": "recommande",
+    "eb": "ebarkia",
+    "lrh": "lrh",
+}
+ADMIN_FLUX = {"mag"}
+
 
 def _coerce_volumes(volumes: Union[VolumesInput, Dict]) -> VolumesInput:
     """Accepte soit un VolumesInput soit un dict venant du front."""
@@ -54,50 +70,30 @@ def calculer_heures_nettes(productivite: float, heures_net_input: Optional[float
     return (8.5 * float(productivite or 0)) / 100.0
 
 
-def calculer_simulation(
-    taches: List[Dict[str, Any]],
-    volumes: Union[VolumesInput, Dict],
+def calculer_fte(total_heures: float, heures_net: float) -> tuple:
+    """ETP (non arrondi, arrondi métier) pour un total d'heures/jour donné."""
+    fte_calcule = total_heures / heures_net if heures_net > 0 else 0.0
+
+    # Arrondi métier aligné VueIntervenant
+    if fte_calcule <= 0.1:
+        fte_arrondi = 0
+    else:
+        fte_arrondi = round_half_up(fte_calcule)
+    return fte_calcule, fte_arrondi
+
+
+def contexte_volumes(
+    volumes_obj: VolumesInput,
     productivite: float,
     heures_net_input: Optional[float] = None,
-    idle_minutes: Optional[float] = None,  # 🔹 marge d'inactivité (min/jour)
-    *,
-    taux_complexite: float = 1.0,
-    nature_geo: float = 1.0,
+    idle_minutes: Optional[float] = None,
     volumes_annuels: Optional[Dict[str, float]] = None,
     volumes_mensuels: Optional[Dict[str, float]] = None,
-) -> SimulationResponse:
+) -> Dict[str, Any]:
     """
-    Logique commune VueIntervenant / VueCentre :
-
-    - AMANA-only : on ignore toutes les tâches courrier CO/CR/EB/LRH et les mixtes courrier.
-    - Fallback AMANA sur unités inconnues uniquement si la tâche est tag AMANA (et jamais pour MAG/admin/machine).
-    - Pas de fallback courrier -> AMANA.
-    - Pour AMANA :
-        * unité = COLIS  -> volume_jour = colis/jour (AMANA ou classiques)
-        * unité = SACS   -> volume_jour = sacs/jour = colis/jour / colis_amana_par_sac
-
-    - idle_minutes (marge d'inactivité, en minutes/jour) :
-        * converti en heures
-        * soustrait des heures nettes théoriques
-        
-    - taux_complexite / nature_geo :
-        * Multiplicateurs appliqués aux tâches de "Distribution"
+    Partie de calculer_simulation indépendante des tâches : volumes/jour par flux
+    (ED% et fallback sacs appliqués), ratios, cas AMANA-only et heures nettes.
     """
-
-    volumes_obj = _coerce_volumes(volumes)
-    
-    # 🔍 DEBUG COMPLET : Afficher TOUS les paramètres reçus
-    print("=" * 80, flush=True)
-    print("🔍 DEBUG SIMULATION - PARAMÈTRES REÇUS:", flush=True)
-    print(f"   colis_amana_par_sac: {volumes_obj.colis_amana_par_sac}", flush=True)
-    print(f"   courriers_par_sac: {volumes_obj.courriers_par_sac}", flush=True)
-    print(f"   sacs (fournis): {getattr(volumes_obj, 'sacs', 'ABSENT')}", flush=True)
-    print(f"   ed_percent (obj): {getattr(volumes_obj, 'ed_percent', 'ABSENT')}", flush=True)
-    print(f"   taux_complexite: {taux_complexite}", flush=True)
-    print(f"   nature_geo: {nature_geo}", flush=True)
-    print(f"   volumes_annuels: {volumes_annuels}", flush=True)
-    print("=" * 80, flush=True)
-    
     # 🆕 Extraction de ED% (priorité: volumes_annuels > volumes_obj)
     ed_percent_from_obj = float(getattr(volumes_obj, "ed_percent", 0) or 0)
     ed_percent_from_annuels = 0.0
@@ -108,13 +104,13 @@ def calculer_simulation(
     
     sacs_fournis = float(getattr(volumes_obj, "sacs", 0) or 0)
     
-    print(f"🔍 ED% FINAL UTILISÉ: {ed_percent}%", flush=True)
-    print(f"🔍 SACS FOURNIS: {sacs_fournis}", flush=True)
+    trace(lambda: f"🔍 ED% FINAL UTILISÉ: {ed_percent}%")
+    trace(lambda: f"🔍 SACS FOURNIS: {sacs_fournis}")
     
     if ed_percent > 0:
-        print(f"✅ ED% ACTIF: {ed_percent}% de colis en dehors → sacs fournis={sacs_fournis}", flush=True)
+        trace(lambda: f"✅ ED% ACTIF: {ed_percent}% de colis en dehors → sacs fournis={sacs_fournis}")
     else:
-        print(f"⚠️  ED% INACTIF (0%)", flush=True)
+        trace(f"⚠️  ED% INACTIF (0%)")
 
     # 🔹 Gestion des ratios avec valeurs par défaut
     colis_amana_par_sac = (
@@ -174,18 +170,18 @@ def calculer_simulation(
     
     # Log si ED% est actif
     if ed_percent > 0 and amana_colis_jour_brut > 0:
-        print(f"🆕 ED% APPLICATION: {amana_colis_jour_brut:.2f} colis/j × {pourc_sac}% = {amana_colis_jour:.2f} colis en sac/j", flush=True)
+        trace(lambda: f"🆕 ED% APPLICATION: {amana_colis_jour_brut:.2f} colis/j × {pourc_sac}% = {amana_colis_jour:.2f} colis en sac/j")
     
     # 🔹 PRIORITÉ : Utiliser les sacs fournis par le frontend (déjà calculés avec ED%)
     # Si sacs_fournis > 0, on l'utilise directement (le frontend a déjà appliqué ED%)
     # Sinon, on calcule à partir de amana_colis_jour
     if sacs_fournis > 0:
         amana_sacs_jour = sacs_fournis
-        print(f"🆕 SACS FOURNIS (avec ED%): {amana_sacs_jour:.2f} sacs/j (fourni par frontend)", flush=True)
+        trace(lambda: f"🆕 SACS FOURNIS (avec ED%): {amana_sacs_jour:.2f} sacs/j (fourni par frontend)")
     else:
         amana_sacs_jour = amana_colis_jour / colis_amana_par_sac if amana_colis_jour > 0 else 0.0
         if amana_sacs_jour > 0:
-            print(f"🆕 SACS CALCULÉS: {amana_sacs_jour:.2f} sacs/j (calculé: {amana_colis_jour:.2f} colis ÷ {colis_amana_par_sac})", flush=True)
+            trace(lambda: f"🆕 SACS CALCULÉS: {amana_sacs_jour:.2f} sacs/j (calculé: {amana_colis_jour:.2f} colis ÷ {colis_amana_par_sac})")
 
     # Fallback "pas de volumes courrier fournis" : dérive du nombre de sacs
     if courrier_total_jour <= 0:
@@ -199,10 +195,6 @@ def calculer_simulation(
     idle_heures = idle_min / 60.0
     heures_net = max(0.0, heures_brutes - idle_heures)
 
-    details_taches: List[TacheDetail] = []
-    heures_par_poste: Dict[Union[str, int], float] = {}
-    total_heures_acc = 0.0
-
     # Cas "AMANA only"
     amana_only = (
         amana_colis_jour > 0
@@ -214,20 +206,86 @@ def calculer_simulation(
         and float(getattr(volumes_obj, "sacs", 0) or 0) == 0
     )
 
-    # tâches admin/support à exclure du fallback AMANA
-    ADMIN_KEYWORDS = {
-        "suivi", "etat", "pointage", "rapport", "canevas", "bp intelligente",
-        "gardiennage", "femmes de ménage", "réalisations commerciales", "absences"
+    return {
+        "sacs": float(getattr(volumes_obj, "sacs", 0) or 0),
+        "colis": float(getattr(volumes_obj, "colis", 0) or 0),
+        "colis_par_collecte": getattr(volumes_obj, "colis_par_collecte", None),
+        "colis_amana_par_sac": colis_amana_par_sac,
+        "co_jour": co_jour,
+        "cr_jour": cr_jour,
+        "eb_jour": eb_jour,
+        "lrh_jour": lrh_jour,
+        "courrier_total_jour": courrier_total_jour,
+        "amana_colis_jour": amana_colis_jour,
+        "amana_sacs_jour": amana_sacs_jour,
+        "amana_only": amana_only,
+        "heures_net": heures_net,
     }
 
-    # Mapping DB -> logique
-    FLUX_MAP = {
-        "co": "ordinaire",
-        "cr": "recommande",
-        "eb": "ebarkia",
-        "lrh": "lrh",
-    }
-    ADMIN_FLUX = {"mag"}
+
+@collect_trace
+def calculer_simulation(
+    taches: List[Dict[str, Any]],
+    volumes: Union[VolumesInput, Dict],
+    productivite: float,
+    heures_net_input: Optional[float] = None,
+    idle_minutes: Optional[float] = None,  # 🔹 marge d'inactivité (min/jour)
+    *,
+    taux_complexite: float = 1.0,
+    nature_geo: float = 1.0,
+    volumes_annuels: Optional[Dict[str, float]] = None,
+    volumes_mensuels: Optional[Dict[str, float]] = None,
+) -> SimulationResponse:
+    """
+    Logique commune VueIntervenant / VueCentre :
+
+    - AMANA-only : on ignore toutes les tâches courrier CO/CR/EB/LRH et les mixtes courrier.
+    - Fallback AMANA sur unités inconnues uniquement si la tâche est tag AMANA (et jamais pour MAG/admin/machine).
+    - Pas de fallback courrier -> AMANA.
+    - Pour AMANA :
+        * unité = COLIS  -> volume_jour = colis/jour (AMANA ou classiques)
+        * unité = SACS   -> volume_jour = sacs/jour = colis/jour / colis_amana_par_sac
+
+    - idle_minutes (marge d'inactivité, en minutes/jour) :
+        * converti en heures
+        * soustrait des heures nettes théoriques
+        
+    - taux_complexite / nature_geo :
+        * Multiplicateurs appliqués aux tâches de "Distribution"
+    """
+
+    volumes_obj = _coerce_volumes(volumes)
+    
+    # 🔍 DEBUG COMPLET : Afficher TOUS les paramètres reçus
+    trace(lambda: "=" * 80)
+    trace("🔍 DEBUG SIMULATION - PARAMÈTRES REÇUS:")
+    trace(lambda: f"   colis_amana_par_sac: {volumes_obj.colis_amana_par_sac}")
+    trace(lambda: f"   courriers_par_sac: {volumes_obj.courriers_par_sac}")
+    trace(lambda: f"   sacs (fournis): {getattr(volumes_obj, 'sacs', 'ABSENT')}")
+    trace(lambda: f"   ed_percent (obj): {getattr(volumes_obj, 'ed_percent', 'ABSENT')}")
+    trace(lambda: f"   taux_complexite: {taux_complexite}")
+    trace(lambda: f"   nature_geo: {nature_geo}")
+    trace(lambda: f"   volumes_annuels: {volumes_annuels}")
+    trace(lambda: "=" * 80)
+    
+    ctx = contexte_volumes(
+        volumes_obj, productivite, heures_net_input, idle_minutes,
+        volumes_annuels=volumes_annuels, volumes_mensuels=volumes_mensuels,
+    )
+    colis_amana_par_sac = ctx["colis_amana_par_sac"]
+    co_jour = ctx["co_jour"]
+    cr_jour = ctx["cr_jour"]
+    eb_jour = ctx["eb_jour"]
+    lrh_jour = ctx["lrh_jour"]
+    courrier_total_jour = ctx["courrier_total_jour"]
+    amana_colis_jour = ctx["amana_colis_jour"]
+    amana_sacs_jour = ctx["amana_sacs_jour"]
+    amana_only = ctx["amana_only"]
+    heures_net = ctx["heures_net"]
+
+    details_taches: List[TacheDetail] = []
+    heures_par_poste: Dict[Union[str, int], float] = {}
+    total_heures_acc = 0.0
 
     # 🔍 DEBUG: Afficher un résumé des unités de mesure présentes
     unites_count = {}
@@ -235,14 +293,14 @@ def calculer_simulation(
         unite_normalisee = normalize_unit(t.get("unite_mesure", ""))
         unites_count[unite_normalisee] = unites_count.get(unite_normalisee, 0) + 1
     
-    print(f"🔍 UNITÉS DE MESURE DÉTECTÉES:", flush=True)
+    trace(f"🔍 UNITÉS DE MESURE DÉTECTÉES:")
     for unite, count in sorted(unites_count.items()):
-        print(f"   - {unite}: {count} tâche(s)", flush=True)
-    print(f"🔍 VOLUMES REÇUS:", flush=True)
-    print(f"   - sacs (journalier): {float(getattr(volumes_obj, 'sacs', 0) or 0)}", flush=True)
-    print(f"   - colis (journalier): {float(getattr(volumes_obj, 'colis', 0) or 0)}", flush=True)
-    print(f"   - amana_colis_jour: {amana_colis_jour}", flush=True)
-    print(f"   - colis_amana_par_sac: {colis_amana_par_sac}", flush=True)
+        trace(lambda: f"   - {unite}: {count} tâche(s)")
+    trace(f"🔍 VOLUMES REÇUS:")
+    trace(lambda: f"   - sacs (journalier): {float(getattr(volumes_obj, 'sacs', 0) or 0)}")
+    trace(lambda: f"   - colis (journalier): {float(getattr(volumes_obj, 'colis', 0) or 0)}")
+    trace(lambda: f"   - amana_colis_jour: {amana_colis_jour}")
+    trace(lambda: f"   - colis_amana_par_sac: {colis_amana_par_sac}")
 
     for t in taches:
         nom = (t.get("nom_tache") or "N/A").strip()
@@ -293,10 +351,10 @@ def calculer_simulation(
 
                 # nombre de collectes / jour = total colis / colis_par_collecte
                 volume_jour = colis_input / colis_par_collecte
-                print(f"🔍 COLLECTE COLIS: {nom} → volume_jour={volume_jour:.4f} (colis_input={colis_input}, ratio={colis_par_collecte})", flush=True)
+                trace(lambda: f"🔍 COLLECTE COLIS: {nom} → volume_jour={volume_jour:.4f} (colis_input={colis_input}, ratio={colis_par_collecte})")
             else:
                 volume_jour = 0.0
-                print(f"⚠️  COLLECTE COLIS IGNORÉE: {nom} → colis_input=0", flush=True)
+                trace(lambda: f"⚠️  COLLECTE COLIS IGNORÉE: {nom} → colis_input=0")
 
         # 1) COLIS
         elif unite_normalisee in ("colis", "colis_amana", "amana"):
@@ -305,26 +363,26 @@ def calculer_simulation(
             if base_colis_jour > 0:
                 # Colis classiques saisis en volume/jour
                 volume_jour = base_colis_jour
-                print(f"🔍 COLIS (classique): {nom} → volume_jour={volume_jour:.4f} (base_colis_jour={base_colis_jour})", flush=True)
+                trace(lambda: f"🔍 COLIS (classique): {nom} → volume_jour={volume_jour:.4f} (base_colis_jour={base_colis_jour})")
             elif amana_colis_jour > 0:
                 # AMANA-only ou AMANA présent : on prend le volume AMANA/jour
                 volume_jour = amana_colis_jour
-                print(f"🔍 COLIS (AMANA): {nom} → volume_jour={volume_jour:.4f} (amana_colis_jour={amana_colis_jour})", flush=True)
+                trace(lambda: f"🔍 COLIS (AMANA): {nom} → volume_jour={volume_jour:.4f} (amana_colis_jour={amana_colis_jour})")
             else:
                 volume_jour = 0.0
-                print(f"⚠️  COLIS IGNORÉ: {nom} → base_colis_jour=0, amana_colis_jour=0", flush=True)
+                trace(lambda: f"⚠️  COLIS IGNORÉ: {nom} → base_colis_jour=0, amana_colis_jour=0")
 
         # 2) SACS (avec prise en compte AMANA + ratio)
         elif unite_normalisee in ("sac", "sacs"):
             base_sacs_jour = float(getattr(volumes_obj, "sacs", 0) or 0)
             base_colis_jour = float(getattr(volumes_obj, "colis", 0) or 0)
 
-            print(f"🔍 SAC DÉTECTÉ: {nom}", flush=True)
-            print(f"   → base_sacs_jour={base_sacs_jour}", flush=True)
-            print(f"   → base_colis_jour={base_colis_jour}", flush=True)
-            print(f"   → amana_colis_jour={amana_colis_jour}", flush=True)
-            print(f"   → has_amana_tag={has_amana_tag}", flush=True)
-            print(f"   → colis_amana_par_sac={colis_amana_par_sac}", flush=True)
+            trace(lambda: f"🔍 SAC DÉTECTÉ: {nom}")
+            trace(lambda: f"   → base_sacs_jour={base_sacs_jour}")
+            trace(lambda: f"   → base_colis_jour={base_colis_jour}")
+            trace(lambda: f"   → amana_colis_jour={amana_colis_jour}")
+            trace(lambda: f"   → has_amana_tag={has_amana_tag}")
+            trace(lambda: f"   → colis_amana_par_sac={colis_amana_par_sac}")
 
             # 🔹 CORRECTION : Les tâches "sac" peuvent utiliser AMANA même sans tag explicite
             # Car les sacs sont nécessaires pour traiter les colis AMANA !
@@ -332,22 +390,22 @@ def calculer_simulation(
             # Priorité 1 : Sacs saisis directement
             if base_sacs_jour > 0:
                 volume_jour = base_sacs_jour
-                print(f"   ✅ SAC (direct): volume_jour={volume_jour:.4f} (base_sacs_jour={base_sacs_jour})", flush=True)
+                trace(lambda: f"   ✅ SAC (direct): volume_jour={volume_jour:.4f} (base_sacs_jour={base_sacs_jour})")
             
             # Priorité 2 : Conversion depuis colis classiques
             elif base_colis_jour > 0:
                 volume_jour = base_colis_jour / colis_amana_par_sac
-                print(f"   ✅ SAC (conversion colis classiques): volume_jour={volume_jour:.4f} (base_colis={base_colis_jour} / ratio={colis_amana_par_sac})", flush=True)
+                trace(lambda: f"   ✅ SAC (conversion colis classiques): volume_jour={volume_jour:.4f} (base_colis={base_colis_jour} / ratio={colis_amana_par_sac})")
             
             # Priorité 3 : Conversion depuis colis AMANA (utilise amana_sacs_jour déjà calculé avec ED%)
             elif amana_colis_jour > 0:
                 volume_jour = amana_sacs_jour  # Utilise directement les sacs calculés avec ED%
-                print(f"   ✅ SAC (AMANA avec ED%): volume_jour={volume_jour:.4f} sacs/j (amana_sacs_jour calculé)", flush=True)
+                trace(lambda: f"   ✅ SAC (AMANA avec ED%): volume_jour={volume_jour:.4f} sacs/j (amana_sacs_jour calculé)")
             
             # Sinon : 0
             else:
                 volume_jour = 0.0
-                print(f"   ⚠️  SAC IGNORÉ: Aucun volume disponible (sacs=0, colis=0, amana=0)", flush=True)
+                trace(f"   ⚠️  SAC IGNORÉ: Aucun volume disponible (sacs=0, colis=0, amana=0)")
 
         # 3) COURRIERS
         elif unite_normalisee in ("courrier", "courriers", "courrier_recommande"):
@@ -355,7 +413,7 @@ def calculer_simulation(
             # MAG = admin => jamais calculé
             if type_flux in ADMIN_FLUX:
                 volume_jour = 0.0
-                print(f"⚠️  COURRIER ADMIN IGNORÉ: {nom} (type_flux={type_flux})", flush=True)
+                trace(lambda: f"⚠️  COURRIER ADMIN IGNORÉ: {nom} (type_flux={type_flux})")
             else:
                 # AMANA-only : ignorer toutes les tâches courrier
                 if not amana_only:
@@ -371,21 +429,21 @@ def calculer_simulation(
                         volume_jour = courrier_total_jour
                     
                     if volume_jour > 0:
-                        print(f"🔍 COURRIER: {nom} → volume_jour={volume_jour:.4f} (type_flux={type_flux})", flush=True)
+                        trace(lambda: f"🔍 COURRIER: {nom} → volume_jour={volume_jour:.4f} (type_flux={type_flux})")
                     else:
-                        print(f"⚠️  COURRIER IGNORÉ: {nom} → volume_jour=0 (type_flux={type_flux})", flush=True)
+                        trace(lambda: f"⚠️  COURRIER IGNORÉ: {nom} → volume_jour=0 (type_flux={type_flux})")
                 else:
-                    print(f"⚠️  COURRIER IGNORÉ (AMANA-only): {nom}", flush=True)
+                    trace(lambda: f"⚠️  COURRIER IGNORÉ (AMANA-only): {nom}")
 
         # 4) MACHINE
         elif unite_normalisee == "machine":
             volume_jour = 0.0
-            print(f"⚠️  MACHINE IGNORÉE: {nom}", flush=True)
+            trace(lambda: f"⚠️  MACHINE IGNORÉE: {nom}")
 
         # 5) UNITÉS INCONNUES / AUTRES
         else:
             volume_jour = 0.0
-            print(f"⚠️  UNITÉ INCONNUE: {nom} → unite={unite_normalisee}", flush=True)
+            trace(lambda: f"⚠️  UNITÉ INCONNUE: {nom} → unite={unite_normalisee}")
 
         # Fallback final AMANA-only (sécurisé)
         # - jamais pour MAG/admin
@@ -400,12 +458,12 @@ def calculer_simulation(
                 and has_amana_tag
             ):
                 volume_jour = amana_colis_jour
-                print(f"🔍 FALLBACK AMANA: {nom} → volume_jour={volume_jour:.4f}", flush=True)
+                trace(lambda: f"🔍 FALLBACK AMANA: {nom} → volume_jour={volume_jour:.4f}")
 
 
         if volume_jour <= 0:
             # 🔍 DEBUG: Tracer les tâches ignorées
-            print(f"⚠️  TÂCHE IGNORÉE: {nom} | unité={unite_normalisee} | volume_jour={volume_jour:.4f} | centre_poste_id={centre_poste_id}", flush=True)
+            trace(lambda: f"⚠️  TÂCHE IGNORÉE: {nom} | unité={unite_normalisee} | volume_jour={volume_jour:.4f} | centre_poste_id={centre_poste_id}")
             continue
 
         minutes_cumulees = moyenne_min * volume_jour
@@ -417,7 +475,7 @@ def calculer_simulation(
         if "distribution" in famille:
              facteur = float(taux_complexite) * float(nature_geo)
              if facteur != 1.0:
-                 print(f"   ⚖️ COMPLEXITÉ APPLIQUÉE: {nom} ({famille}) x{facteur:.2f}", flush=True)
+                 trace(lambda: f"   ⚖️ COMPLEXITÉ APPLIQUÉE: {nom} ({famille}) x{facteur:.2f}")
                  heures_calculees *= facteur
 
         total_heures_acc += heures_calculees
@@ -443,13 +501,7 @@ def calculer_simulation(
         )
 
     total_heures = total_heures_acc
-    fte_calcule = total_heures / heures_net if heures_net > 0 else 0.0
-
-    # Arrondi métier aligné VueIntervenant
-    if fte_calcule <= 0.1:
-        fte_arrondi = 0
-    else:
-        fte_arrondi = round_half_up(fte_calcule)
+    fte_calcule, fte_arrondi = calculer_fte(total_heures, heures_net)
 
     return SimulationResponse(
         details_taches=details_taches,
@@ -486,7 +538,7 @@ def calculer_simulation_sql(
     # 1. Requête principale d'agrégation
     #    Calcule les items + sommes totales
     
-    print(f"🔹 [Simulation SQL] Début calcul pour sim_id={simulation_id}. Params: Prod={productivite}, NetH={heures_net_jour}", flush=True)
+    trace(lambda: f"🔹 [Simulation SQL] Début calcul pour sim_id={simulation_id}. Params: Prod={productivite}, NetH={heures_net_jour}")
 
     sql_query = text("""
         SELECT
@@ -530,7 +582,7 @@ def calculer_simulation_sql(
     """)
     
     rows = db.execute(sql_query, {"sim_id": simulation_id}).mappings().all()
-    print(f"🔹 [Simulation SQL] {len(rows)} tâches identifiées et calculées.", flush=True)
+    trace(lambda: f"🔹 [Simulation SQL] {len(rows)} tâches identifiées et calculées.")
     
     details_taches: List[TacheDetail] = []
     heures_par_poste: Dict[int, float] = {}
@@ -553,14 +605,14 @@ def calculer_simulation_sql(
     unmatched_rows = db.execute(sql_unmatched, {"sim_id": simulation_id}).mappings().all()
     
     if unmatched_rows:
-        print(f"[Simulation SQL] {len(unmatched_rows)} volumes sans taches correspondantes:", flush=True)
+        trace(lambda: f"[Simulation SQL] {len(unmatched_rows)} volumes sans taches correspondantes:")
         for u in unmatched_rows:
-             print(f"   - Ignored: CP={u['centre_poste_id']} Flux={u['flux_id']} Sens={u['sens_id']} Seg={u['segment_id']} Vol={u['volume']}", flush=True)
+             trace(lambda: f"   - Ignored: CP={u['centre_poste_id']} Flux={u['flux_id']} Sens={u['sens_id']} Seg={u['segment_id']} Vol={u['volume']}")
 
         # DEBUG: Show what IS available in Taches for these CentrePostes
         cp_ids = {u['centre_poste_id'] for u in unmatched_rows}
         if cp_ids:
-            print(f"[Simulation SQL] Cles disponibles en base pour ces CP ({list(cp_ids)}) :", flush=True)
+            trace(lambda: f"[Simulation SQL] Cles disponibles en base pour ces CP ({list(cp_ids)}) :")
             sql_avail = text(f"""
                 SELECT DISTINCT centre_poste_id, flux_id, sens_id, segment_id 
                 FROM dbo.taches 
@@ -569,7 +621,7 @@ def calculer_simulation_sql(
             """)
             avail = db.execute(sql_avail).mappings().all()
             for a in avail:
-                print(f"   > AVAILABLE: CP={a['centre_poste_id']} Flux={a['flux_id']} Sens={a['sens_id']} Seg={a['segment_id']}", flush=True)
+                trace(lambda: f"   > AVAILABLE: CP={a['centre_poste_id']} Flux={a['flux_id']} Sens={a['sens_id']} Seg={a['segment_id']}")
 
     # Check for invalid tasks (if we were scanning tasks directly, but here we query based on Join)
     # The Join acts as a filter. We only process valid matches.
@@ -580,10 +632,10 @@ def calculer_simulation_sql(
         # Check integrity warnings on the fly ?
         # Logic says: "Si moyenne_min et moyenne_sec sont NULL, considérer duree_min = 0 et logger un warning"
         if row["moyenne_min"] is None and row["moyenne_sec"] is None:
-             print(f"⚠️ [Simulation SQL] Tâche durée indéfinie (0) : {row['nom_tache']}", flush=True)
+             trace(lambda: f"⚠️ [Simulation SQL] Tâche durée indéfinie (0) : {row['nom_tache']}")
         
         # Log detail for each row
-        print(f"   + Tâche: {row['nom_tache']} | Vol={row['volume_saisi']} | DureeMin={row['moyenne_min'] or 0}m{row['moyenne_sec'] or 0}s | Heures={h:.4f}", flush=True)
+        trace(lambda: f"   + Tâche: {row['nom_tache']} | Vol={row['volume_saisi']} | DureeMin={row['moyenne_min'] or 0}m{row['moyenne_sec'] or 0}s | Heures={h:.4f}")
 
         total_heures_necessaires += h
         
@@ -620,7 +672,7 @@ def calculer_simulation_sql(
     else:
         etp_arrondi = round_half_up(etp_calcule)
         
-    print(f"📊 [Simulation SQL] Fin calcul. H_Nec={total_heures_necessaires:.2f}, Prod={productivite}%, H_Ajust={heures_ajustees:.2f}, Cap={capacity}, ETP={etp_calcule:.2f}", flush=True)
+    trace(lambda: f"📊 [Simulation SQL] Fin calcul. H_Nec={total_heures_necessaires:.2f}, Prod={productivite}%, H_Ajust={heures_ajustees:.2f}, Cap={capacity}, ETP={etp_calcule:.2f}")
 
     # Note: The SimulationResponse expects 'total_heures' and 'heures_net_jour'.
     # Usually total_heures displayed is "heures nécessaires" (before adjustment) or "heures ajustées"?
@@ -2,6 +2,7 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.tracing import trace, collect_trace
 from app.schemas.models import (
     SimulationRequest, 
     SimulationResponse, 
@@ -53,6 +54,7 @@ class CCIVolumeContext:
              total += v.volume
         return total
 
+@collect_trace
 def calculate_cci_simulation(
     db: Session,
     request: SimulationRequest
@@ -73,7 +75,7 @@ def calculate_cci_simulation(
     
     # Inputs Spécifiques CCI - CO/CR Specific Parameters
     # ---------------------------------------------------
-    print(f"🛠️ [CCI DEBUG] Request Params: Liasse CO={request.nb_courrier_liasse_co}, Liasse CR={request.nb_courrier_liasse_cr}, Legacy={request.nbr_courrier_liasse}", flush=True)
+    trace(lambda: f"🛠️ [CCI DEBUG] Request Params: Liasse CO={request.nb_courrier_liasse_co}, Liasse CR={request.nb_courrier_liasse_cr}, Legacy={request.nbr_courrier_liasse}")
 
     # Helper to resolve parameter: Specific -> Legacy -> Default
     def resolve_param(specific_val, legacy_val, default):
@@ -186,10 +188,10 @@ def calculate_cci_simulation(
         famille = tache.famille_uo  # Flux (CO, CR...)
         produit = tache.produit     # Sens (IMPORT, EXPORT...)
         
-        print(f"\n🔍 Processing Task: {tache.nom_tache}")
-        print(f"   - Famille UO: {famille}")
-        print(f"   - Produit: {produit}")
-        print(f"   - Moyenne Min (DB): {tache.moyenne_min}")
+        trace(lambda: f"\n🔍 Processing Task: {tache.nom_tache}")
+        trace(lambda: f"   - Famille UO: {famille}")
+        trace(lambda: f"   - Produit: {produit}")
+        trace(lambda: f"   - Moyenne Min (DB): {tache.moyenne_min}")
         
         # 1. Essai de matching exact (Ex: Flux=CO, Sens=EXPORT)
         vol_annuel = ctx.get_volume(famille, produit)
@@ -256,12 +258,12 @@ def calculate_cci_simulation(
         
         # 🔍 DEBUG: Inspecter la phase si elle contient "Retour"
         if "RETOUR" in phase.upper():
-            print(f"🐛 [DEBUG PHASE] Task: '{tache.nom_tache}'")
-            print(f"   Raw Phase: '{phase}'")
-            print(f"   Norm Phase: '{phase_norm}'")
-            print(f"   ASCII Phase: {ascii(phase)}")
-            print(f"   Chars: {[ord(c) for c in phase]}")
-            print(f"   Match Condition: {phase_norm in ('Reception Retour', 'Export Retour')}")
+            trace(lambda: f"🐛 [DEBUG PHASE] Task: '{tache.nom_tache}'")
+            trace(lambda: f"   Raw Phase: '{phase}'")
+            trace(lambda: f"   Norm Phase: '{phase_norm}'")
+            trace(lambda: f"   ASCII Phase: {ascii(phase)}")
+            trace(lambda: f"   Chars: {[ord(c) for c in phase]}")
+            trace(lambda: f"   Match Condition: {phase_norm in ('Reception Retour', 'Export Retour')}")
         
         if phase_norm in ("Reception Retour", "Export Retour"):
             # Select famille-specific pct_retour
@@ -326,11 +328,11 @@ def calculate_cci_simulation(
         
         # 🔍 DEBUG: Log each task calculation
         if heures_requises > 0:
-            print(f"   ✅ Task: {tache.nom_tache[:40]:40} | Vol: {vol_applique:8.2f} | Avg: {moyenne_min:7.5f}min | Hours: {heures_requises:6.3f}h")
+            trace(lambda: f"   ✅ Task: {tache.nom_tache[:40]:40} | Vol: {vol_applique:8.2f} | Avg: {moyenne_min:7.5f}min | Hours: {heures_requises:6.3f}h")
         else:
             # Log tasks with 0 hours to help debug
             reason = "No volume" if vol_annuel == 0 else ("No avg_min" if moyenne_min == 0 else "Retour 0%")
-            print(f"   ⚠️  Task: {tache.nom_tache[:40]:40} | Vol: {vol_applique:8.2f} | Avg: {moyenne_min:7.5f}min | Hours: 0.000h | Reason: {reason}")
+            trace(lambda: f"   ⚠️  Task: {tache.nom_tache[:40]:40} | Vol: {vol_applique:8.2f} | Avg: {moyenne_min:7.5f}min | Hours: 0.000h | Reason: {reason}")
         
         # F. Agrégation Poste
         # -------------------
@@ -367,11 +369,11 @@ def calculate_cci_simulation(
     # 🔍 DEBUG: Summary of task processing
     tasks_with_hours = len([r for r in results_taches if r.heures > 0])
     tasks_with_zero = len(results_taches) - tasks_with_hours
-    print(f"\n📊 TASK SUMMARY:")
-    print(f"   Total tasks processed: {len(results_taches)}")
-    print(f"   Tasks with hours > 0: {tasks_with_hours}")
-    print(f"   Tasks with 0 hours: {tasks_with_zero}")
-    print(f"   Expected from Référentiel: 127 (if different, some tasks were not queried)\n")
+    trace(f"\n📊 TASK SUMMARY:")
+    trace(lambda: f"   Total tasks processed: {len(results_taches)}")
+    trace(lambda: f"   Tasks with hours > 0: {tasks_with_hours}")
+    trace(lambda: f"   Tasks with 0 hours: {tasks_with_zero}")
+    trace(f"   Expected from Référentiel: 127 (if different, some tasks were not queried)\n")
 
     # 5. Finalisation Resultats Postes
     # --------------------------------
@@ -424,36 +426,36 @@ def calculate_cci_simulation(
     total_aps_val = t_aps_val or 0
 
     # 🔍 DEBUG: Afficher tous les calculs
-    print("\n" + "="*80)
-    print("📊 SYNTHÈSE DES CALCULS CCI")
-    print("="*80)
-    print(f"1️⃣  CHARGE TOTALE (total_heures):")
-    print(f"    ➜ Somme de toutes les heures des tâches")
-    print(f"    ➜ Résultat: {round(total_heures_centre, 2)} heures/jour")
-    print()
-    print(f"2️⃣  CAPACITÉ NETTE PAR EMPLOYÉ (heures_net_jour):")
-    print(f"    ➜ Formule: ((480 - temps_mort) * (productivite/100)) / 60")
-    print(f"    ➜ Calcul: (({amplitude_jour_min} - {temps_mort_min}) * {productivite_pct/100}) / 60")
-    print(f"    ➜ Résultat: {round(capacite_nette_h, 2)} heures/jour/personne")
-    print()
-    print(f"3️⃣  EFFECTIF CALCULÉ (fte_calcule):")
-    print(f"    ➜ Formule: total_heures / heures_net_jour")
-    print(f"    ➜ Calcul: {round(total_heures_centre, 2)} / {round(capacite_nette_h, 2)}")
-    print(f"    ➜ Résultat: {round(fte_calcule_global, 2)} ETP")
-    print()
-    print(f"4️⃣  EFFECTIF ARRONDI (fte_arrondi):")
-    print(f"    ➜ Formule: round(fte_calcule, 2)")
-    print(f"    ➜ Résultat: {fte_arrondi_global} ETP")
-    print()
-    print(f"5️⃣  EFFECTIF APS (T_APS):")
-    print(f"    ➜ Résultat: {total_aps_val}")
-    print()
-    print(f"6️⃣  EFFECTIF MOI (DB):")
-    print(f"    ➜ Résultat: {total_moi_val}")
-    print()
-    print(f"📋 Nombre de tâches calculées: {len(results_taches)}")
-    print(f"📋 Nombre de postes: {len(final_postes)}")
-    print("="*80 + "\n")
+    trace(lambda: "\n" + "="*80)
+    trace("📊 SYNTHÈSE DES CALCULS CCI")
+    trace(lambda: "="*80)
+    trace(f"1️⃣  CHARGE TOTALE (total_heures):")
+    trace(f"    ➜ Somme de toutes les heures des tâches")
+    trace(lambda: f"    ➜ Résultat: {round(total_heures_centre, 2)} heures/jour")
+    trace("")
+    trace(f"2️⃣  CAPACITÉ NETTE PAR EMPLOYÉ (heures_net_jour):")
+    trace(f"    ➜ Formule: ((480 - temps_mort) * (productivite/100)) / 60")
+    trace(lambda: f"    ➜ Calcul: (({amplitude_jour_min} - {temps_mort_min}) * {productivite_pct/100}) / 60")
+    trace(lambda: f"    ➜ Résultat: {round(capacite_nette_h, 2)} heures/jour/personne")
+    trace("")
+    trace(f"3️⃣  EFFECTIF CALCULÉ (fte_calcule):")
+    trace(f"    ➜ Formule: total_heures / heures_net_jour")
+    trace(lambda: f"    ➜ Calcul: {round(total_heures_centre, 2)} / {round(capacite_nette_h, 2)}")
+    trace(lambda: f"    ➜ Résultat: {round(fte_calcule_global, 2)} ETP")
+    trace("")
+    trace(f"4️⃣  EFFECTIF ARRONDI (fte_arrondi):")
+    trace(f"    ➜ Formule: round(fte_calcule, 2)")
+    trace(lambda: f"    ➜ Résultat: {fte_arrondi_global} ETP")
+    trace("")
+    trace(f"5️⃣  EFFECTIF APS (T_APS):")
+    trace(lambda: f"    ➜ Résultat: {total_aps_val}")
+    trace("")
+    trace(f"6️⃣  EFFECTIF MOI (DB):")
+    trace(lambda: f"    ➜ Résultat: {total_moi_val}")
+    trace("")
+    trace(lambda: f"📋 Nombre de tâches calculées: {len(results_taches)}")
+    trace(lambda: f"📋 Nombre de postes: {len(final_postes)}")
+    trace(lambda: "="*80 + "\n")
 
     # --- OPTIMIZATION LOGIC (ARRONDI BREAKDOWN) ---
     total_mod_actuel = float(real_mod) # Using value from earlier query
@@ -9,6 +9,7 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.tracing import trace
 from app.schemas.models import (
     SimulationResponse,
     TacheDetail,
@@ -85,7 +86,7 @@ def calculate_ccp_simulation(
     """
     
     # Initialize contexts
-    print(f"DEBUG_CCP: Received volumes: {volumes}")
+    trace(lambda: f"DEBUG_CCP: Received volumes: {volumes}")
     vol_ctx = CCPVolumeContext(volumes or {})
     params = params or {}
     
@@ -348,7 +349,7 @@ def calculate_ccp_simulation(
         
         # DEBUG PRINT
         if "AGENT" in p_label:
-            print(f"DEBUG SHIFT: Task={task_name}, Label={p_label}, Param={shift_val}, Match={any(role in p_label for role in target_roles)}")
+            trace(lambda: f"DEBUG SHIFT: Task={task_name}, Label={p_label}, Param={shift_val}, Match={any(role in p_label for role in target_roles)}")
 
         # Check for EXACT match to allow list targeting
         # substring matching can be too aggressive
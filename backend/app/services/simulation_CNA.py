@@ -9,6 +9,7 @@ from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import text
 
+from app.core.tracing import trace
 from app.schemas.models import (
     SimulationResponse,
     TacheDetail,
@@ -81,7 +82,7 @@ def calculate_cna_simulation(
     """
     
     # Initialize contexts
-    print(f"DEBUG_CNA: Received volumes: {volumes}")
+    trace(lambda: f"DEBUG_CNA: Received volumes: {volumes}")
     vol_ctx = CNAVolumeContext(volumes or {})
     params = params or {}
     
@@ -3,6 +3,7 @@ import os
 import sys
 import logging
 
+from app.core.tracing import trace
 from app.schemas.models import VolumesInput, SimulationResponse, TacheDetail
 from app.services.utils import normalize_unit, round_half_up
 
@@ -73,12 +74,12 @@ def calculer_simulation(
     volumes_mensuels: Optional[Dict[str, float]] = None,
 ) -> SimulationResponse:
 
-    print("calculer_simulation() start")
-    print("Fichier en cours =", os.path.abspath(__file__))
-    print(f"Nb taches={len(taches)} | productivite={productivite} | heures_net_input={heures_net_input}")
-    print(f"Volumes payload brut={volumes}")
-    print(f"Volumes annuels={volumes_annuels} | volumes mensuels={volumes_mensuels}")
-    print("------ Nouvelle simulation ------")
+    trace("calculer_simulation() start")
+    trace("Fichier en cours =", os.path.abspath(__file__))
+    trace(lambda: f"Nb taches={len(taches)} | productivite={productivite} | heures_net_input={heures_net_input}")
+    trace(lambda: f"Volumes payload brut={volumes}")
+    trace(lambda: f"Volumes annuels={volumes_annuels} | volumes mensuels={volumes_mensuels}")
+    trace("------ Nouvelle simulation ------")
 
     volumes_obj = _coerce_volumes(volumes)
 
@@ -121,9 +122,9 @@ def calculer_simulation(
     # 3) heures nettes
     heures_net = calculer_heures_nettes(productivite, heures_net_input)
 
-    print("Volumes / jour => CO:", co_jour, " CR:", cr_jour, " EB:", eb_jour, " LRH:", lrh_jour)
-    print("AMANA => Colis/j:", amana_colis_jour, " Sacs/j:", amana_sacs_jour)
-    print("Heures nettes calculees:", heures_net)
+    trace("Volumes / jour => CO:", co_jour, " CR:", cr_jour, " EB:", eb_jour, " LRH:", lrh_jour)
+    trace("AMANA => Colis/j:", amana_colis_jour, " Sacs/j:", amana_sacs_jour)
+    trace("Heures nettes calculees:", heures_net)
 
     details_taches: List[TacheDetail] = []
     heures_par_poste: Dict[Union[str, int], float] = {}
@@ -200,7 +201,7 @@ def calculer_simulation(
 
         # Barid Pro ne doit rien compter dans cette vue (poste ignoré systématiquement)
         if "barid pro" in nom_lower:
-            print(f"[SKIP BARID PRO] {nom} (flux={type_flux_raw or 'None'})")
+            trace(lambda: f"[SKIP BARID PRO] {nom} (flux={type_flux_raw or 'None'})")
             continue
 
         # ✅ Détection robuste "courrier"
@@ -288,12 +289,10 @@ def calculer_simulation(
         total_heures_acc += heures_calculees
         heures_par_poste[centre_poste_id] = heures_par_poste.get(centre_poste_id, 0.0) + heures_calculees
 
-        print(
-            f"Tache: {nom} | unit_raw={unite_raw} | unit_norm={unite_normalisee} | "
+        trace(lambda: f"Tache: {nom} | unit_raw={unite_raw} | unit_norm={unite_normalisee} | "
             f"courrier?={is_courrier_task} | flux={type_flux_raw}->{type_flux} | "
             f"vol={volume_jour} | min={moyenne_min} | heures={round(heures_calculees, 2)} "
-            f"| poste={centre_poste_id}"
-        )
+            f"| poste={centre_poste_id}")
 
         details_taches.append(
             TacheDetail(
@@ -308,16 +307,16 @@ def calculer_simulation(
             )
         )
 
-    print("--- Heures par poste ---")
+    trace("--- Heures par poste ---")
     for pid, h in heures_par_poste.items():
-        print(f"Poste {pid} => {round(h, 2)} h")
+        trace(lambda: f"Poste {pid} => {round(h, 2)} h")
 
     total_heures = total_heures_acc
     fte_calcule = total_heures / heures_net if heures_net > 0 else 0.0
     fte_arrondi = round_half_up(fte_calcule)
 
-    print("TOTAL heures =", total_heures)
-    print("FTE calcule =", fte_calcule, " | arrondi =", fte_arrondi)
+    trace("TOTAL heures =", total_heures)
+    trace("FTE calcule =", fte_calcule, " | arrondi =", fte_arrondi)
 
     return SimulationResponse(
         details_taches=details_taches,
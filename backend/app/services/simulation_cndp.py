@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Session
 from typing import Optional
+from app.core.tracing import trace
 from app.models.db_models import Tache, CentrePoste
 from app.schemas.volumes_ui import VolumesUIInput
 from app.schemas.models import SimulationResponse, TacheDetail, PosteResultat
@@ -48,10 +49,10 @@ def calculer_simulation_cndp(
     nb_jours = volumes_ui.nb_jours_ouvres_an or 264
 
     # 3. Récupération des tâches
-    print(f"🔍 [CNDP DEBUG] centre_id={centre_id}, poste_id_filter={poste_id_filter}, Imp={vol_import}, Exp={vol_export}", flush=True)
+    trace(lambda: f"🔍 [CNDP DEBUG] centre_id={centre_id}, poste_id_filter={poste_id_filter}, Imp={vol_import}, Exp={vol_export}")
     
     if not poste_id_filter:
-        print("⚠️ [CNDP] Aucun poste sélectionné pour la simulation intervenant.", flush=True)
+        trace("⚠️ [CNDP] Aucun poste sélectionné pour la simulation intervenant.")
         return SimulationResponse(
             details_taches=[],
             total_heures=0.0,
@@ -67,7 +68,7 @@ def calculer_simulation_cndp(
     )
     
     taches = query.all()
-    print(f"🔍 [CNDP] {len(taches)} tâches trouvées pour le poste {poste_id_filter}", flush=True)
+    trace(lambda: f"🔍 [CNDP] {len(taches)} tâches trouvées pour le poste {poste_id_filter}")
     
     details_taches = []
     total_heures = 0.0
@@ -5,6 +5,7 @@ Utilise le VolumeMapper pour affecter automatiquement les volumes UI aux tâches
 """
 from typing import List, Dict, Optional, Any
 from sqlalchemy.orm import Session
+from app.core.tracing import trace
 from app.schemas.volumes_ui import VolumesUIInput, VolumeTaskMapping
 from app.schemas.models import SimulationResponse, TacheDetail
 from app.models.db_models import Tache, CentrePoste, Poste
@@ -47,16 +48,16 @@ def calculer_simulation_direct(
     ).all()
     
     if debug:
-        print(f"\n{'='*80}")
-        print(f"🔹 SIMULATION DIRECTE - Centre/Poste ID: {centre_poste_id}")
-        print(f"{'='*80}")
-        print(f"📊 Paramètres:")
-        print(f"   - Productivité: {productivite}%")
-        print(f"   - Heures/jour: {heures_par_jour}h")
-        print(f"   - Marge inactivité: {idle_minutes} min/jour")
-        print(f"   - Jours ouvrés/an: {volumes_ui.nb_jours_ouvres_an}")
-        print(f"   - Nombre de tâches: {len(taches)}")
-        print(f"{'='*80}\n")
+        trace(lambda: f"\n{'='*80}")
+        trace(lambda: f"🔹 SIMULATION DIRECTE - Centre/Poste ID: {centre_poste_id}")
+        trace(lambda: f"{'='*80}")
+        trace(f"📊 Paramètres:")
+        trace(lambda: f"   - Productivité: {productivite}%")
+        trace(lambda: f"   - Heures/jour: {heures_par_jour}h")
+        trace(lambda: f"   - Marge inactivité: {idle_minutes} min/jour")
+        trace(lambda: f"   - Jours ouvrés/an: {volumes_ui.nb_jours_ouvres_an}")
+        trace(lambda: f"   - Nombre de tâches: {len(taches)}")
+        trace(lambda: f"{'='*80}\n")
     
     # 3. Calculer les heures nettes (après marge d'inactivité)
     idle_heures = idle_minutes / 60.0
@@ -66,12 +67,12 @@ def calculer_simulation_direct(
     heures_nettes_effectives = heures_nettes * (productivite / 100.0)
     
     if debug:
-        print(f"⏱️  Heures nettes effectives:")
-        print(f"   - Heures brutes: {heures_par_jour}h")
-        print(f"   - Marge inactivité: {idle_heures:.2f}h")
-        print(f"   - Heures nettes: {heures_nettes:.2f}h")
-        print(f"   - Productivité: {productivite}%")
-        print(f"   - Heures nettes effectives: {heures_nettes_effectives:.2f}h\n")
+        trace(f"⏱️  Heures nettes effectives:")
+        trace(lambda: f"   - Heures brutes: {heures_par_jour}h")
+        trace(lambda: f"   - Marge inactivité: {idle_heures:.2f}h")
+        trace(lambda: f"   - Heures nettes: {heures_nettes:.2f}h")
+        trace(lambda: f"   - Productivité: {productivite}%")
+        trace(lambda: f"   - Heures nettes effectives: {heures_nettes_effectives:.2f}h\n")
     
     # 4. Traiter chaque tâche
     details_taches: List[TacheDetail] = []
@@ -93,9 +94,9 @@ def calculer_simulation_direct(
                 flux_code = mapper.get_flux_code(tache.flux_id)
                 sens_code = mapper.get_sens_code(tache.sens_id)
                 segment_code = mapper.get_segment_code(tache.segment_id)
-                print(f"⚠️  Tâche ignorée (volume=0): {tache.nom_tache}")
-                print(f"    → flux={flux_code}, sens={sens_code}, segment={segment_code}")
-                print(f"    → source: {source_ui}\n")
+                trace(lambda: f"⚠️  Tâche ignorée (volume=0): {tache.nom_tache}")
+                trace(lambda: f"    → flux={flux_code}, sens={sens_code}, segment={segment_code}")
+                trace(lambda: f"    → source: {source_ui}\n")
             continue
         
         # Récupérer le chrono moyen (en minutes)
@@ -104,8 +105,8 @@ def calculer_simulation_direct(
         if moyenne_min <= 0:
             taches_ignorees += 1
             if debug:
-                print(f"⚠️  Tâche ignorée (chrono=0): {tache.nom_tache}")
-                print(f"    → volume_jour={volume_jour:.2f}\n")
+                trace(lambda: f"⚠️  Tâche ignorée (chrono=0): {tache.nom_tache}")
+                trace(lambda: f"    → volume_jour={volume_jour:.2f}\n")
             continue
         
         # Calculer les heures nécessaires
@@ -152,12 +153,12 @@ def calculer_simulation_direct(
                 )
             )
             
-            print(f"✅ Tâche traitée: {tache.nom_tache}")
-            print(f"    → flux={flux_code}, sens={sens_code}, segment={segment_code}")
-            print(f"    → volume_annuel={volume_annuel:.2f}, volume_jour={volume_jour:.2f}")
-            print(f"    → chrono={moyenne_min:.2f} min")
-            print(f"    → heures={heures_calculees:.4f}h")
-            print(f"    → source: {source_ui}\n")
+            trace(lambda: f"✅ Tâche traitée: {tache.nom_tache}")
+            trace(lambda: f"    → flux={flux_code}, sens={sens_code}, segment={segment_code}")
+            trace(lambda: f"    → volume_annuel={volume_annuel:.2f}, volume_jour={volume_jour:.2f}")
+            trace(lambda: f"    → chrono={moyenne_min:.2f} min")
+            trace(lambda: f"    → heures={heures_calculees:.4f}h")
+            trace(lambda: f"    → source: {source_ui}\n")
         
         taches_traitees += 1
     
@@ -171,27 +172,27 @@ def calculer_simulation_direct(
         fte_arrondi = round_half_up(fte_calcule)
     
     if debug:
-        print(f"\n{'='*80}")
-        print(f"📊 RÉSULTATS DE LA SIMULATION")
-        print(f"{'='*80}")
-        print(f"   - Tâches traitées: {taches_traitees}")
-        print(f"   - Tâches ignorées: {taches_ignorees}")
-        print(f"   - Total heures nécessaires: {total_heures:.2f}h")
-        print(f"   - Heures nettes effectives: {heures_nettes_effectives:.2f}h")
-        print(f"   - ETP calculé: {fte_calcule:.2f}")
-        print(f"   - ETP arrondi: {fte_arrondi}")
-        print(f"{'='*80}\n")
+        trace(lambda: f"\n{'='*80}")
+        trace(f"📊 RÉSULTATS DE LA SIMULATION")
+        trace(lambda: f"{'='*80}")
+        trace(lambda: f"   - Tâches traitées: {taches_traitees}")
+        trace(lambda: f"   - Tâches ignorées: {taches_ignorees}")
+        trace(lambda: f"   - Total heures nécessaires: {total_heures:.2f}h")
+        trace(lambda: f"   - Heures nettes effectives: {heures_nettes_effectives:.2f}h")
+        trace(lambda: f"   - ETP calculé: {fte_calcule:.2f}")
+        trace(lambda: f"   - ETP arrondi: {fte_arrondi}")
+        trace(lambda: f"{'='*80}\n")
         
         # Afficher les 5 premiers mappings pour debug
-        print(f"🔍 ÉCHANTILLON DE MAPPINGS (5 premières tâches):")
+        trace(f"🔍 ÉCHANTILLON DE MAPPINGS (5 premières tâches):")
         for i, mapping in enumerate(mappings_debug[:5], 1):
-            print(f"\n{i}. {mapping.nom_tache}")
-            print(f"   → ID: {mapping.tache_id}")
-            print(f"   → Flux: {mapping.flux_code}, Sens: {mapping.sens_code}, Segment: {mapping.segment_code}")
-            print(f"   → Volume annuel: {mapping.volume_annuel:.2f}")
-            print(f"   → Volume/jour: {mapping.volume_jour:.2f}")
-            print(f"   → Source UI: {mapping.source_ui}")
-        print(f"\n{'='*80}\n")
+            trace(lambda: f"\n{i}. {mapping.nom_tache}")
+            trace(lambda: f"   → ID: {mapping.tache_id}")
+            trace(lambda: f"   → Flux: {mapping.flux_code}, Sens: {mapping.sens_code}, Segment: {mapping.segment_code}")
+            trace(lambda: f"   → Volume annuel: {mapping.volume_annuel:.2f}")
+            trace(lambda: f"   → Volume/jour: {mapping.volume_jour:.2f}")
+            trace(lambda: f"   → Source UI: {mapping.source_ui}")
+        trace(lambda: f"\n{'='*80}\n")
     
     return SimulationResponse(
         details_taches=details_taches,
@@ -1,7 +1,7 @@
 import os
-import openpyxl
 from sqlalchemy.orm import Session
 from app.models.db_models import Tache, CentrePoste, Poste, Centre, normalize_ws, sql_normalize_ws
+from app.services.referentiel_snapshot import bump_referentiel_version
 
 def auto_import_tasks_if_empty(db: Session, centre_id: int):
     """
@@ -9,6 +9,7 @@ def auto_import_tasks_if_empty(db: Session, centre_id: int):
     from an Excel template based on the center's typology.
     """
     # 1. Check if center already has tasks
+    import openpyxl
     exists = db.query(Tache).join(CentrePoste).filter(CentrePoste.centre_id == centre_id).first()
     if exists:
         return 0, []
@@ -53,6 +54,7 @@ def auto_import_tasks_if_empty(db: Session, centre_id: int):
         ws = wb.active
         created_count, failed_rows = _process_task_import_workbook(db, centre_id, ws)
         db.commit()
+        bump_referentiel_version("taches", "postes")
         return created_count, failed_rows
     except Exception as e:
         db.rollback()
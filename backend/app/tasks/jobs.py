@@ -0,0 +1,474 @@
+"""
+Backends d'exécution des simulations asynchrones (/api/async)
+
+Même API (submit / status / cancel / active / stats / health) pour :
+- CeleryJobBackend : tâches Celery (broker Redis, workers séparés)
+- LocalJobBackend  : exécution dans le processus API, sans service externe.
+  Les jobs tournent dans un pool de threads borné (JOB_MAX_CONCURRENT) hors
+  du thread de requête ; le calcul des centres passe par le pool de processus
+  batch (BATCH_WORKERS). Table des jobs en mémoire, purgée après JOB_RESULT_TTL.
+
+JOB_BACKEND = auto (défaut) : Celery si Redis est connecté et qu'un worker
+répond, local sinon. Ce module n'importe pas Celery.
+"""
+
+import importlib.util
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, Future
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Délai entre deux vérifications "un worker Celery répond-il ?" (mode auto)
+WORKER_CHECK_INTERVAL = 30
+
+
+class JobCancelled(Exception):
+    """Levée dans un job local annulé (vérifiée entre deux centres)."""
+
+
+class JobKindNotSupported(ValueError):
+    """Type de job non géré par le backend choisi."""
+
+
+def progress_meta(done: int, total: int, status: str, **extra) -> Dict[str, Any]:
+    return {
+        'progress': int(done * 100 / total) if total else 100,
+        'status': status,
+        'centres_termines': done,
+        'total_centres': total,
+        **extra
+    }
+
+
+def format_status(task_id: str, state: str, info: Any = None, result: Any = None) -> Dict[str, Any]:
+    """Réponse de GET /api/async/task/{id}, identique quel que soit le backend."""
+    response = {
+        "task_id": task_id,
+        "state": state,
+    }
+    if state == 'PENDING':
+        response.update({
+            "progress": 0,
+            "status": "En attente de démarrage...",
+            "result": None
+        })
+    elif state == 'PROGRESS':
+        info = info or {}
+        response.update({
+            "progress": info.get('progress', 0),
+            "status": info.get('status', 'Calcul en cours...'),
+            "result": None,
+            "details": info
+        })
+    elif state == 'SUCCESS':
+        response.update({
+            "progress": 100,
+            "status": "Terminé avec succès",
+            "result": result
+        })
+    elif state == 'FAILURE':
+        response.update({
+            "progress": 0,
+            "status": "Erreur lors du calcul",
+            "error": str(info),
+            "result": None
+        })
+    elif state == 'REVOKED':
+        response.update({
+            "progress": 0,
+            "status": "Annulée",
+            "result": None
+        })
+    else:
+        response.update({
+            "progress": 0,
+            "status": f"État inconnu: {state}",
+            "result": None
+        })
+    return response
+
+
+# --- Jobs exécutés par le backend local ---
+def run_batch_job(
+    content: bytes,
+    region_id: Optional[int],
+    process_mode: str,
+    force: bool,
+    report: Callable[[Dict[str, Any]], None],
+    is_cancelled: Callable[[], bool],
+) -> Dict[str, Any]:
+    """
+    Simulation batch (même résultat que simulation.batch côté Celery) :
+    pré-chargement BDD en une fois, puis calcul incrémental des centres.
+    """
+    from app.core.db import get_worker_session
+    from app.api.batch_simulation import (
+        _parse_batch_workbook, _prefetch_centres, _load_mode_context, _build_batch_jobs, _aggregate_batch
+    )
+    from app.services.batch_compute import iter_centres_incremental, incremental_report
+
+    started_at = datetime.now().isoformat()
+    db = get_worker_session()
+    try:
+        entries, errors = _parse_batch_workbook(db, content, region_id)
+        prefetch = _prefetch_centres(db, entries)
+        jobs = _build_batch_jobs(prefetch, process_mode, _load_mode_context(db, process_mode))
+    finally:
+        db.close()
+
+    total = len(jobs)
+    report(progress_meta(0, total, f'Calcul de {total} centres...'))
+    results: list = [None] * total
+    reused = [False] * total
+    for done, (i, res, was_cached) in enumerate(iter_centres_incremental(jobs, force=force), 1):
+        if is_cancelled():
+            raise JobCancelled()
+        results[i] = res
+        reused[i] = was_cached
+        report(progress_meta(done, total, f'Centre {done}/{total} calculé', current_centre=jobs[i]["centre_id"]))
+
+    data = _aggregate_batch(results, errors)
+    data['incremental'] = incremental_report(jobs, reused)
+    return {
+        'success': True,
+        'region_id': region_id,
+        'process_mode': process_mode,
+        'total_centres': total,
+        'started_at': started_at,
+        'completed_at': datetime.now().isoformat(),
+        'data': data
+    }
+
+
+def run_direction_job(
+    direction_id: int,
+    request_data: Dict[str, Any],
+    report: Callable[[Dict[str, Any]], None],
+    is_cancelled: Callable[[], bool],
+) -> Dict[str, Any]:
+    """Simulation de direction (même résultat que simulation.direction côté Celery)."""
+    from fastapi.encoders import jsonable_encoder
+    from app.core.db import get_worker_session
+    from app.schemas.direction_sim import DirectionSimRequest
+    from app.services.direction_service import process_direction_simulation_v2
+
+    report({'progress': 20, 'status': 'Chargement des données...', 'direction_id': direction_id})
+    db = get_worker_session()
+    try:
+        result = jsonable_encoder(process_direction_simulation_v2(db, DirectionSimRequest(**request_data)))
+    finally:
+        db.close()
+    return {
+        'success': True,
+        'direction_id': direction_id,
+        'completed_at': datetime.now().isoformat(),
+        'data': result
+    }
+
+
+_LOCAL_RUNNERS = {
+    "batch": run_batch_job,
+    "direction": run_direction_job,
+}
+
+
+class _LocalJob:
+    __slots__ = ("id", "kind", "state", "info", "result", "future", "cancel_event", "submitted_at", "finished_at")
+
+    def __init__(self, kind: str):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.state = "PENDING"
+        self.info: Any = None
+        self.result: Any = None
+        self.future: Optional[Future] = None
+        self.cancel_event = threading.Event()
+        self.submitted_at = datetime.now().isoformat()
+        self.finished_at: Optional[float] = None
+
+
+class LocalJobBackend:
+    """Jobs dans le processus API : pool de threads borné, table en mémoire."""
+
+    name = "local"
+
+    def __init__(self, max_workers: Optional[int] = None, result_ttl: Optional[int] = None):
+        self.max_workers = max(1, max_workers or settings.JOB_MAX_CONCURRENT)
+        self.result_ttl = settings.JOB_RESULT_TTL if result_ttl is None else result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="job")
+        self._jobs: Dict[str, _LocalJob] = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.monotonic()
+        with self._lock:
+            for job_id in [j.id for j in self._jobs.values()
+                           if j.finished_at is not None and now - j.finished_at > self.result_ttl]:
+                del self._jobs[job_id]
+
+    def _run(self, job: _LocalJob, runner: Callable, args: tuple):
+        if job.cancel_event.is_set():
+            return
+
+        def report(meta: Dict[str, Any]):
+            job.state, job.info = "PROGRESS", meta
+
+        report({'progress': 0, 'status': 'Initialisation...', 'started_at': datetime.now().isoformat()})
+        try:
+            result = runner(*args, report=report, is_cancelled=job.cancel_event.is_set)
+            job.result = {**result, 'task_id': job.id}
+            job.state, job.info = "SUCCESS", None
+            logger.info(f"✅ Job local {job.kind} {job.id} terminé")
+        except JobCancelled:
+            job.state, job.info = "REVOKED", None
+            logger.info(f"🛑 Job local {job.kind} {job.id} annulé")
+        except Exception as e:
+            logger.error(f"❌ Erreur job local {job.kind} {job.id}: {e}", exc_info=True)
+            job.state, job.info = "FAILURE", getattr(e, "detail", None) or str(e)
+        finally:
+            job.finished_at = time.monotonic()
+
+    def submit(self, kind: str, *args) -> str:
+        runner = _LOCAL_RUNNERS.get(kind)
+        if runner is None:
+            raise JobKindNotSupported(f"Job '{kind}' non disponible en exécution locale")
+        self._purge()
+        job = _LocalJob(kind)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._run, job, runner, args)
+        return job.id
+
+    def knows(self, job_id: str) -> bool:
+        with self._lock:
+            return job_id in self._jobs
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            # Même comportement que Celery pour un id inconnu
+            return format_status(job_id, "PENDING")
+        return format_status(job_id, job.state, job.info, job.result)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        state = job.state if job is not None else "PENDING"
+        if job is None or state not in ("PENDING", "PROGRESS"):
+            return {
+                "task_id": job_id,
+                "status": state,
+                "message": f"Impossible d'annuler une tâche en état {state}"
+            }
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            # Pas encore démarré : retiré de la file
+            job.state, job.finished_at = "REVOKED", time.monotonic()
+        logger.info(f"🛑 Tâche {job_id} annulée")
+        return {
+            "task_id": job_id,
+            "status": "cancelled",
+            "message": "Tâche annulée avec succès"
+        }
+
+    def active(self) -> Dict[str, Any]:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        active = [
+            {"id": j.id, "name": j.kind, "submitted_at": j.submitted_at, "progress": (j.info or {}).get("progress", 0)}
+            for j in jobs if j.state == "PROGRESS"
+        ]
+        scheduled = [{"id": j.id, "name": j.kind, "submitted_at": j.submitted_at} for j in jobs if j.state == "PENDING"]
+        return {
+            "active_tasks": {"local": active},
+            "scheduled_tasks": {"local": scheduled},
+            "total_active": len(active),
+            "total_scheduled": len(scheduled)
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for j in self._jobs.values():
+                counts[j.state] = counts.get(j.state, 0) + 1
+        return {
+            "backend": self.name,
+            "workers": {"local": {"max_concurrent": self.max_workers, "jobs": counts}},
+            "total_workers": 1
+        }
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "status": "healthy",
+            "backend": self.name,
+            "workers_online": 1,
+            "message": "Exécution locale (sans Celery)"
+        }
+
+    def shutdown(self):
+        with self._lock:
+            for job in self._jobs.values():
+                job.cancel_event.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+class CeleryJobBackend:
+    """Jobs Celery (simulation.batch / simulation.direction / simulation.centre_batch)."""
+
+    name = "celery"
+
+    @property
+    def app(self):
+        from app.core.celery_app import celery_app
+        return celery_app
+
+    def submit(self, kind: str, *args) -> str:
+        from app.tasks import simulation_tasks as tasks
+        if kind == "batch":
+            import base64
+            content, *rest = args
+            return tasks.async_batch_simulation.delay(base64.b64encode(content).decode("ascii"), *rest).id
+        if kind == "direction":
+            return tasks.async_direction_simulation.delay(*args).id
+        if kind == "centre_batch":
+            return tasks.async_centre_batch_simulation.delay(*args).id
+        raise JobKindNotSupported(f"Job '{kind}' inconnu")
+
+    def status(self, job_id: str) -> Dict[str, Any]:
+        task = self.app.AsyncResult(job_id)
+        state = task.state
+        if state == 'SUCCESS':
+            return format_status(job_id, state, result=task.result)
+        return format_status(job_id, state, task.info)
+
+    def cancel(self, job_id: str) -> Dict[str, Any]:
+        task = self.app.AsyncResult(job_id)
+        if task.state in ['PENDING', 'PROGRESS']:
+            # simulation.batch découpé en chord : job_id ne porte plus que le reducer,
+            # les paquets (ids dans la meta) sont révoqués avec lui
+            info = task.info if isinstance(task.info, dict) else {}
+            self.app.control.revoke([job_id, *info.get('paquets', [])], terminate=True)
+            logger.info(f"🛑 Tâche {job_id} annulée ({len(info.get('paquets', []))} paquets)")
+            return {
+                "task_id": job_id,
+                "status": "cancelled",
+                "message": "Tâche annulée avec succès"
+            }
+        return {
+            "task_id": job_id,
+            "status": task.state,
+            "message": f"Impossible d'annuler une tâche en état {task.state}"
+        }
+
+    def active(self) -> Dict[str, Any]:
+        inspect = self.app.control.inspect()
+        active = inspect.active()
+        scheduled = inspect.scheduled()
+        return {
+            "active_tasks": active or {},
+            "scheduled_tasks": scheduled or {},
+            "total_active": sum(len(tasks) for tasks in (active or {}).values()),
+            "total_scheduled": sum(len(tasks) for tasks in (scheduled or {}).values())
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        stats = self.app.control.inspect().stats()
+        return {
+            "backend": self.name,
+            "workers": stats or {},
+            "total_workers": len(stats or {})
+        }
+
+    def health(self) -> Dict[str, Any]:
+        stats = self.app.control.inspect().stats()
+        if stats:
+            return {
+                "status": "healthy",
+                "backend": self.name,
+                "workers_online": len(stats),
+                "message": "Celery est opérationnel"
+            }
+        return {
+            "status": "degraded",
+            "backend": self.name,
+            "workers_online": 0,
+            "message": "Aucun worker Celery détecté"
+        }
+
+    def worker_online(self) -> bool:
+        try:
+            return bool(self.app.control.ping(timeout=0.5))
+        except Exception:
+            return False
+
+
+# --- Sélection du backend ---
+_local: Optional[LocalJobBackend] = None
+_celery: Optional[CeleryJobBackend] = None
+_backends_lock = threading.Lock()
+_worker_check = [0.0, False]   # (vérifié à, worker en ligne)
+
+
+def get_local_backend() -> LocalJobBackend:
+    global _local
+    with _backends_lock:
+        if _local is None:
+            _local = LocalJobBackend()
+        return _local
+
+
+def get_celery_backend() -> Optional[CeleryJobBackend]:
+    """Backend Celery, ou None si Celery n'est pas installé."""
+    global _celery
+    with _backends_lock:
+        if _celery is None:
+            if importlib.util.find_spec("celery") is None:
+                return None
+            _celery = CeleryJobBackend()
+        return _celery
+
+
+def _celery_usable(backend: CeleryJobBackend) -> bool:
+    from app.core.cache import get_redis
+    if get_redis() is None:
+        return False
+    now = time.monotonic()
+    if now - _worker_check[0] >= WORKER_CHECK_INTERVAL:
+        _worker_check[:] = [now, backend.worker_online()]
+    return _worker_check[1]
+
+
+def get_job_backend():
+    """Backend des nouveaux jobs selon JOB_BACKEND (auto | celery | local)."""
+    mode = (settings.JOB_BACKEND or "auto").lower()
+    if mode == "local":
+        return get_local_backend()
+    celery_backend = get_celery_backend()
+    if mode == "celery":
+        if celery_backend is None:
+            raise RuntimeError("JOB_BACKEND=celery mais Celery n'est pas installé")
+        return celery_backend
+    if celery_backend is not None and _celery_usable(celery_backend):
+        return celery_backend
+    return get_local_backend()
+
+
+def backend_for(job_id: str):
+    """Backend qui porte un job existant (les jobs locaux restent locaux)."""
+    if _local is not None and _local.knows(job_id):
+        return _local
+    return get_job_backend()
+
+
+def shutdown_local_backend():
+    """Arrêt de l'application : annule les jobs locaux en cours."""
+    if _local is not None:
+        _local.shutdown()
@@ -3,16 +3,31 @@ Tâches asynchrones pour les simulations
 
 Ce module contient les tâches Celery pour exécuter les simulations
 en arrière-plan, notamment pour les vues Direction et Nationale.
+
+Simulation batch (nationale / régionale) :
+    simulation.batch        parse le classeur, puis se remplace par un chord
+    simulation.batch_chunk  calcule un paquet de centres (CELERY_CHUNK_SIZE)
+    simulation.batch_reduce agrège par région et national
+Le résultat final est porté par l'id de la tâche simulation.batch.
 """
 
-from celery import Task
-from typing import Dict, Any
+from celery import Task, chord, group
+from celery.utils import uuid
+from celery.result import allow_join_result
+from typing import Dict, Any, List, Optional
+import base64
 import logging
+import threading
 from datetime import datetime
 
+from fastapi.encoders import jsonable_encoder
+
 from app.core.celery_app import celery_app
-from app.core.database import SessionLocal
-from app.services.direction_service import process_direction_simulation
+from app.core.config import settings
+from app.core.db import get_worker_session
+from app.services.direction_service import process_direction_simulation_v2
+from app.services.batch_compute import iter_centres_incremental
+from app.tasks.jobs import progress_meta
 from app.schemas.direction_sim import DirectionSimRequest
 
 logger = logging.getLogger(__name__)
@@ -34,7 +49,7 @@ class DatabaseTask(Task):
     def db(self):
         """Récupère ou crée une session DB"""
         if self._db is None:
-            self._db = SessionLocal()
+            self._db = get_worker_session()
         return self._db
 
 
@@ -92,7 +107,7 @@ def async_direction_simulation(
         )
         
         # Exécuter la simulation
-        result = process_direction_simulation(self.db, request)
+        result = jsonable_encoder(process_direction_simulation_v2(self.db, request))
         
         # Mettre à jour le statut: calculs en cours
         self.update_state(
@@ -138,87 +153,186 @@ def async_direction_simulation(
         raise
 
 
+# Simulation batch nationale / régionale : fan-out par paquets de centres
+
+_progress_lock = threading.Lock()
+_progress: Dict[str, int] = {}
+
+
+def _advance(job_id: str, n: int = 1) -> int:
+    """
+    Compteur de centres terminés pour un job. Atomique entre workers avec le
+    backend Redis (INCRBY) ; compteur du processus sinon (mode eager, tests).
+    """
+    client = getattr(celery_app.backend, "client", None)
+    if client is not None and hasattr(client, "incrby"):
+        key = f"simulation:progress:{job_id}"
+        done = client.incrby(key, n)
+        client.expire(key, celery_app.conf.result_expires)
+        return int(done)
+    with _progress_lock:
+        _progress[job_id] = _progress.get(job_id, 0) + n
+        return _progress[job_id]
+
+
+def _clear_progress(job_id: str):
+    client = getattr(celery_app.backend, "client", None)
+    if client is not None and hasattr(client, "incrby"):
+        client.delete(f"simulation:progress:{job_id}")
+    with _progress_lock:
+        _progress.pop(job_id, None)
+
+
 @celery_app.task(
     bind=True,
     base=DatabaseTask,
-    name="simulation.nationale",
-    max_retries=2,
-    default_retry_delay=120
+    name="simulation.batch"
 )
-def async_nationale_simulation(
+def async_batch_simulation(
     self,
-    request_data: Dict[str, Any]
+    content_b64: str,
+    region_id: Optional[int] = None,
+    process_mode: str = "actuel",
+    force: bool = False
 ) -> Dict[str, Any]:
     """
-    Tâche asynchrone pour calculer une simulation nationale
-    
-    Cette tâche est particulièrement lourde car elle agrège
-    toutes les directions.
-    
+    Tâche asynchrone de simulation batch (nationale si region_id est None, régionale sinon)
+
+    Parse le classeur importé puis se remplace par un chord : un paquet de
+    CELERY_CHUNK_SIZE centres par tâche, puis agrégation par région et national.
+
     Args:
-        request_data: Données de la requête (volumes, paramètres)
-        
+        content_b64: Classeur Excel (template batch) encodé en base64
+        region_id: Filtre région (template régional)
+        process_mode: actuel | recommande | optimise
+        force: Recalcule tous les centres (ignore les résultats réutilisables)
+
     Returns:
-        Dict: Résultats de la simulation nationale
+        Dict: Résultat de simulation.batch_reduce (par_centre, par_region, national)
     """
-    logger.info(f"🚀 Démarrage simulation nationale (task_id={self.request.id})")
-    
-    try:
-        # Mettre à jour le statut
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'progress': 0,
-                'status': 'Initialisation simulation nationale...',
-                'started_at': datetime.now().isoformat()
-            }
-        )
-        
-        # TODO: Implémenter la logique de simulation nationale
-        # Pour l'instant, retourner un placeholder
-        
+    from app.api.batch_simulation import _parse_batch_workbook
+
+    job_id = self.request.id
+    scope = f"région {region_id}" if region_id else "nationale"
+    logger.info(f"🚀 Démarrage simulation batch {scope} (task_id={job_id})")
+
+    entries, errors = _parse_batch_workbook(self.db, base64.b64decode(content_b64), region_id)
+    total = len(entries)
+    size = max(1, settings.CELERY_CHUNK_SIZE)
+    chunks = [entries[i:i + size] for i in range(0, total, size)]
+    context = {
+        'task_id': job_id,
+        'region_id': region_id,
+        'process_mode': process_mode,
+        'total_centres': total,
+        'started_at': datetime.now().isoformat()
+    }
+    # La session n'est plus utile : les paquets ont chacun la leur
+    self.after_return()
+
+    if not chunks:
+        return async_batch_reduce([], errors, context)
+
+    # Ids des paquets fixés d'avance et gardés dans la meta du job : après replace(),
+    # job_id ne désigne plus que le reducer, l'annulation doit révoquer les paquets
+    chunk_ids = [uuid() for _ in chunks]
+    self.update_state(
+        state='PROGRESS',
+        meta=progress_meta(0, total, f'Calcul de {total} centres ({len(chunks)} paquets)...',
+                           nb_paquets=len(chunks), paquets=chunk_ids)
+    )
+    header = group(
+        async_batch_chunk.s(job_id, chunk, process_mode, force, total, chunk_ids).set(task_id=chunk_id)
+        for chunk, chunk_id in zip(chunks, chunk_ids)
+    )
+    pipeline = chord(header, async_batch_reduce.s(errors, context))
+    if self.request.is_eager:
+        # replace() par un chord échoue en mode eager (join interdit) : exécution directe
+        with allow_join_result():
+            return pipeline.apply_async().get()
+    return self.replace(pipeline)
+
+
+@celery_app.task(
+    bind=True,
+    base=DatabaseTask,
+    name="simulation.batch_chunk"
+)
+def async_batch_chunk(
+    self,
+    job_id: str,
+    entries: List[Dict[str, Any]],
+    process_mode: str,
+    force: bool,
+    total: int,
+    chunk_ids: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Calcule un paquet d'onglets : pré-chargement BDD du paquet, calcul centre
+    par centre et progression du job parent à chaque centre terminé.
+    chunk_ids (tous les paquets du job) est recopié dans la meta pour l'annulation.
+
+    Returns:
+        Dict: résultats par centre (ordre des onglets), centres recalculés / réutilisés
+    """
+    from app.api.batch_simulation import _prefetch_centres, _load_mode_context, _build_batch_jobs
+
+    prefetch = _prefetch_centres(self.db, entries)
+    jobs = _build_batch_jobs(prefetch, process_mode, _load_mode_context(self.db, process_mode))
+
+    results: List[Optional[Dict[str, Any]]] = [None] * len(jobs)
+    reused = [False] * len(jobs)
+    for i, res, was_cached in iter_centres_incremental(jobs, force=force):
+        results[i] = res
+        reused[i] = was_cached
+        done = _advance(job_id)
+        # Écritures concurrentes possibles : l'état final est posé par le reducer
         self.update_state(
+            task_id=job_id,
             state='PROGRESS',
-            meta={
-                'progress': 50,
-                'status': 'Agrégation des données...'
-            }
+            meta=progress_meta(done, total, f'Centre {done}/{total} calculé', current_centre=jobs[i]["centre_id"],
+                               paquets=chunk_ids or [])
         )
-        
-        # Simuler un calcul long
-        import time
-        time.sleep(2)
-        
-        result = {
-            'success': True,
-            'task_id': self.request.id,
-            'completed_at': datetime.now().isoformat(),
-            'data': {
-                'total_etp': 0,
-                'total_centres': 0,
-                'message': 'Simulation nationale à implémenter'
-            }
-        }
-        
-        logger.info("✅ Simulation nationale terminée")
-        
-        return result
-        
-    except Exception as e:
-        logger.error(f"❌ Erreur simulation nationale: {str(e)}", exc_info=True)
-        
-        self.update_state(
-            state='FAILURE',
-            meta={
-                'error': str(e),
-                'failed_at': datetime.now().isoformat()
-            }
-        )
-        
-        if self.request.retries < self.max_retries:
-            raise self.retry(exc=e)
-        
-        raise
+
+    return {
+        'results': results,
+        'recalcules': [job["centre_id"] for job, r in zip(jobs, reused) if not r],
+        'reutilises': [job["centre_id"] for job, r in zip(jobs, reused) if r],
+    }
+
+
+@celery_app.task(name="simulation.batch_reduce")
+def async_batch_reduce(
+    chunk_results: List[Dict[str, Any]],
+    errors: List[Dict[str, Any]],
+    context: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Agrège les paquets (ordre des onglets) : par centre, par région, national.
+    """
+    from app.api.batch_simulation import _aggregate_batch
+
+    computed = [r for part in chunk_results for r in part['results']]
+    recalcules = [cid for part in chunk_results for cid in part['recalcules']]
+    reutilises = [cid for part in chunk_results for cid in part['reutilises']]
+
+    data = _aggregate_batch(computed, errors)
+    data['incremental'] = {
+        'recalcules': len(recalcules),
+        'reutilises': len(reutilises),
+        'centres_recalcules': recalcules,
+        'centres_reutilises': reutilises,
+    }
+
+    _clear_progress(context['task_id'])
+    logger.info(f"✅ Simulation batch terminée : {data['national']['nb_centres']} centres, {len(data['errors'])} erreurs")
+
+    return {
+        'success': True,
+        **context,
+        'completed_at': datetime.now().isoformat(),
+        'data': data
+    }
 
 
 @celery_app.task(
@@ -301,7 +415,7 @@ def cleanup_old_simulations():
     """
     logger.info("🧹 Nettoyage des anciennes simulations...")
     
-    db = SessionLocal()
+    db = get_worker_session()
     try:
         from sqlalchemy import text
         from datetime import timedelta
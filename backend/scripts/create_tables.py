@@ -0,0 +1,31 @@
+# scripts/create_tables.py
+"""
+Création des tables manquantes (remplace le create_all exécuté au démarrage de l'API).
+À lancer après un déploiement qui ajoute des modèles :
+
+    python scripts/create_tables.py
+"""
+import sys
+import os
+
+# Add backend to path
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.db import engine, Base
+# Enregistre tous les modèles dans Base.metadata
+from app.models import db_models, scoring_models, categorisation_models, mapping_models
+
+
+def create_tables():
+    print(f"Création des tables manquantes ({len(Base.metadata.tables)} modèles)...")
+    try:
+        # N'altère pas les tables existantes
+        Base.metadata.create_all(bind=engine)
+        print("✅ Tables à jour.")
+    except Exception as e:
+        print(f"❌ Erreur création des tables: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    create_tables()
@@ -0,0 +1,53 @@
+"""
+Benchmark : temps d'import de l'application (python -X importtime).
+
+    python tests/bench_startup.py [nb_modules] [repetitions]
+
+Importe `app.main` dans un processus neuf (sans connexion Redis ni création
+de tables au démarrage) et affiche le temps total ainsi que les modules les
+plus coûteux (temps cumulé). Signale les dépendances lourdes qui ne doivent
+plus être chargées au démarrage (pandas, openpyxl, redis).
+"""
+import sys
+import os
+import re
+import subprocess
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOURDS = ("pandas", "openpyxl", "redis")
+LIGNE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def _importtime():
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=BACKEND, capture_output=True, text=True,
+        env={**os.environ, "REDIS_ENABLED": "false"},
+    )
+    if proc.returncode != 0:
+        erreurs = [l for l in proc.stderr.splitlines() if not LIGNE.match(l)]
+        raise RuntimeError(erreurs[-1] if erreurs else "import app.main en échec")
+    modules = []
+    for line in proc.stderr.splitlines():
+        m = LIGNE.match(line)
+        if m:
+            modules.append((m.group(4), int(m.group(2)) / 1000.0, len(m.group(3)) // 2))
+    return modules
+
+
+def main(nb_modules=15, repetitions=3):
+    runs = [_importtime() for _ in range(repetitions)]
+    modules = min(runs, key=lambda r: dict((n, c) for n, c, _ in r)["app.main"])
+    cumul = {n: c for n, c, _ in modules}
+
+    print(f"import app.main : {cumul['app.main']:8.1f} ms (meilleur de {repetitions})")
+    print("Modules les plus coûteux (cumulé) :")
+    for name, c, depth in sorted(modules, key=lambda m: -m[1])[:nb_modules]:
+        print(f"  {c:8.1f} ms  {'  ' * depth}{name}")
+    charges = sorted({n.split(".")[0] for n in cumul} & set(LOURDS))
+    print(f"Dépendances lourdes chargées au démarrage : {', '.join(charges) or 'aucune'}")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,65 @@
+"""
+Benchmark : coût de la trace moteur par centre (moteur data-driven, sans BDD).
+
+    python tests/bench_tracing.py [nb_taches_par_centre] [repetitions]
+
+Compare trace inactive (défaut), trace collectée (debug=True) et trace affichée
+sur stdout (TRACE_ALL, équivalent de l'ancien comportement print).
+"""
+import sys
+import os
+import time
+import contextlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.core.config import settings
+from app.core.tracing import tracing
+from app.services.simulation_data_driven import _simuler_taches_poste
+from test_volume_rules import _cases, _context
+
+
+def _centre(n_taches):
+    """Tâches réparties sur tous les produits / familles de la grille de test."""
+    cases = [t for t in _cases() if t.centre_poste.poste.label != "CHEF D'AGENCE" and t.base_calcul != "50%"]
+    taches = cases[::max(1, len(cases) // n_taches)][:n_taches]
+    for t in taches:
+        t.moyenne_min = 1.0
+        t.centre_poste.poste_id = 1
+    return taches
+
+
+def _run(taches, ctx, repetitions, collect=False):
+    t0 = time.perf_counter()
+    for _ in range(repetitions):
+        with tracing(collect):
+            _simuler_taches_poste(ctx, 1, taches, 100.0, 8.5, 0.0)
+    return (time.perf_counter() - t0) / repetitions * 1000.0
+
+
+def main(n_taches=300, repetitions=20):
+    taches = _centre(n_taches)
+    ctx = _context()
+    _run(taches, ctx, 1)  # échauffement
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        off = _run(taches, ctx, repetitions)
+        collected = _run(taches, ctx, repetitions, collect=True)
+        with tracing(True) as lines:
+            _run(taches, ctx, 1)
+        settings.TRACE_ALL = True
+        try:
+            echoed = _run(taches, ctx, repetitions)
+        finally:
+            settings.TRACE_ALL = False
+
+    print(f"Centre de {len(taches)} tâches, {repetitions} répétitions")
+    print(f"  trace inactive      : {off:8.2f} ms/centre")
+    print(f"  trace collectée     : {collected:8.2f} ms/centre ({len(lines)} lignes)")
+    print(f"  trace stdout (print): {echoed:8.2f} ms/centre")
+    print(f"  gain trace inactive vs print : {echoed - off:8.2f} ms/centre (x{echoed / off:.1f})")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
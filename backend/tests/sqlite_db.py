@@ -0,0 +1,39 @@
+"""
+Base SQLite en mémoire pour les tests qui exécutent du SQL réel.
+
+Le schéma "dbo" est une base attachée : les tables des modèles et les requêtes
+texte `dbo.xxx` fonctionnent telles quelles.
+"""
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app.core.db import Base
+from app.models import db_models as m
+
+
+def sqlite_session():
+    """Session sur une base vide, avec une région 1 (une connexion partagée : la base survit entre requêtes)."""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "connect", lambda conn, rec: conn.execute("ATTACH DATABASE ':memory:' AS dbo"))
+    Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    db.add(m.Region(id=1, label="Région 1"))
+    db.flush()
+    return db
+
+
+def add_centre(db, centre_id, label=None, categorie_id=None, postes=(), region_id=1):
+    """
+    Ajoute un centre et ses postes : `postes` = [(cp_id, poste_id, effectif_actuel)].
+    Les Poste référencés doivent exister.
+    """
+    db.add(m.Centre(id=centre_id, label=label or f"Centre {centre_id}", categorie_id=categorie_id, region_id=region_id))
+    for cp_id, poste_id, effectif in postes:
+        code = db.get(m.Poste, poste_id).Code
+        db.add(m.CentrePoste(id=cp_id, centre_id=centre_id, poste_id=poste_id, code_resp=code, effectif_actuel=effectif))
+    db.flush()
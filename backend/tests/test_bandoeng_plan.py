@@ -0,0 +1,180 @@
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.bandoeng_engine import (
+    compile_bandoeng_plan, evaluate_bandoeng_plan,
+    BandoengInputVolumes, BandoengParameters
+)
+
+
+class MockPoste:
+    def __init__(self, label):
+        self.label = label
+
+
+class MockCentrePoste:
+    def __init__(self, code_resp, label):
+        self.code_resp = code_resp
+        self.poste = MockPoste(label)
+
+
+class MockTache:
+    def __init__(self, id, produit, unite, phase="", base_calcul=None, famille="TRI", resp=("A", "MANUTENTIONNAIRE")):
+        self.id = id
+        self.nom_tache = f"Tache {id}"
+        self.produit = produit
+        self.unite_mesure = unite
+        self.phase = phase
+        self.moy_sec = "90"
+        self.base_calcul = base_calcul
+        self.famille_uo = famille
+        self.centre_poste_id = id
+        self.centre_poste = MockCentrePoste(*resp)
+
+
+GRID = {
+    "amana": {
+        "depot": {"gc": {"local": 26400, "axes": 5280}, "part": {"local": 2640, "axes": 0}},
+        "recu": {"gc": {"local": 13200, "axes": 2640}, "part": {"local": "1 320", "axes": 0}},
+    },
+    "co": {"med": {"local": 52800, "axes": 10560}, "arrive": {"local": 26400, "axes": 0}},
+    "cr": {"med": {"local": 7920, "axes": 0}, "arrive": {"local": 5280, "axes": 2640}},
+    "ebarkia": {"med": 2640, "arrive": 0},
+    "lrh": {"med": 0, "arrive": 264},
+}
+
+TASKS = [
+    MockTache(1, "AMANA REÇU", "COLIS", "collect", base_calcul="60"),
+    MockTache(2, "AMANA DEPOT", "SAC", "sac", resp=("B", "AGENT OP")),
+    MockTache(3, "TOTAL CO", "SAC", "circul_geo"),
+    MockTache(4, "CR ARRIVE", "CAISSON", "retour_day_350", resp=("C", "FACTEUR")),
+    MockTache(5, "CO MED LOCAL", "DEPECHE", famille="GUICHET CO"),
+    MockTache(6, "E BARKIA MED", "ENVOI", "national_guichet"),
+    MockTache(7, "AMANA EXPORT", "COLIS", "international"),
+]
+
+
+def _params(**kw):
+    base = dict(ed_percent=40.0, coeff_circ=1.2, coeff_geo=1.1, pct_collecte=30.0, pct_guichet=50.0, pct_national=80.0)
+    base.update(kw)
+    return BandoengParameters(**base)
+
+
+POSTE_MAP = {"A": "MANUTENTIONNAIRE", "B": "AGENT OP", "C": "FACTEUR"}
+
+# (nom, paramètres, options d'évaluation) : chaque cas est figé dans GOLDEN_PATH
+CASES = [
+    ("defaut", dict(), dict()),
+    ("shift3_ed60", dict(shift=3, ed_percent=60.0), dict()),
+    ("mois_sans_guichet", dict(shift=2, pct_mois=10.0, has_guichet=0), dict()),
+    ("trajet_idle_productivite", dict(duree_trajet=20.0, idle_minutes=30.0, productivite=85.0), dict()),
+    ("croissance_globale", dict(pct_annee=5.0), dict()),
+    ("croissance_par_flux", dict(amana_pct_annee=10.0, co_pct_annee=-3.0, pct_mois_amana=12.0), dict()),
+    ("exclusions_roles", dict(), dict(
+        role_mapping={"A": "B"}, excluded_task_ids=[2],
+        excluded_task_quadruplets=[("tache3", "totalco", "tri", "sac")]
+    )),
+]
+
+# Résultats du moteur tâche par tâche d'avant le plan compilé (run_bandoeng_simulation
+# avec tasks_override). Régénérer volontairement avec : python tests/test_bandoeng_plan.py --update
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "bandoeng_plan.json")
+
+
+def _snapshot(result):
+    return {
+        "tasks": [
+            [t.task_id, t.heures_calculees, t.volume_journalier, t.formule, t.responsable]
+            for t in result.tasks
+        ],
+        "total_heures": result.total_heures,
+        "heures_net_jour": result.heures_net_jour,
+        "fte_calcule": result.fte_calcule,
+        "ressources_par_poste": result.ressources_par_poste,
+        "filtered_count": result.debug_info["filtered_guichet_count"],
+    }
+
+
+def _evaluer(params_kw, options, vectorized=False):
+    options = dict(options)
+    plan = compile_bandoeng_plan(TASKS, centre_id=1, poste_map=POSTE_MAP, role_mapping=options.pop("role_mapping", None))
+    volumes = BandoengInputVolumes(grid_values=GRID, amana_export=1000.0)
+    return evaluate_bandoeng_plan(plan, volumes, _params(**params_kw), vectorized=vectorized, **options)
+
+
+def _assert_snapshot(got, exp, cas):
+    assert len(got["tasks"]) == len(exp["tasks"]), cas
+    for g, e in zip(got["tasks"], exp["tasks"]):
+        assert g[0] == e[0] and g[3:] == e[3:], (cas, g, e)
+        assert abs(g[1] - e[1]) < 1e-9 and abs(g[2] - e[2]) < 1e-9, (cas, g, e)
+    for k in ("total_heures", "heures_net_jour", "fte_calcule"):
+        assert abs(got[k] - exp[k]) < 1e-9, (cas, k)
+    assert got["ressources_par_poste"].keys() == exp["ressources_par_poste"].keys(), cas
+    for k, v in exp["ressources_par_poste"].items():
+        assert abs(got["ressources_par_poste"][k] - v) < 1e-9, (cas, k)
+    assert got["filtered_count"] == exp["filtered_count"], cas
+
+
+def test_plan_matches_golden():
+    """Le plan compilé (boucle et vectorisé) reproduit les résultats figés du moteur d'origine."""
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    assert sorted(golden) == sorted(nom for nom, _, _ in CASES)
+    for nom, params_kw, options in CASES:
+        _assert_snapshot(_snapshot(_evaluer(params_kw, options)), golden[nom], nom)
+        _assert_snapshot(_snapshot(_evaluer(params_kw, options, vectorized=True)), golden[nom], nom + " (vectorisé)")
+
+
+def test_plan_exclusions_and_role_mapping():
+    poste_map = {"A": "MANUTENTIONNAIRE", "B": "AGENT OP", "C": "FACTEUR"}
+    plan = compile_bandoeng_plan(TASKS, centre_id=1, poste_map=poste_map, role_mapping={"A": "B"})
+    volumes = BandoengInputVolumes(grid_values=GRID)
+
+    result = evaluate_bandoeng_plan(
+        plan, volumes, _params(),
+        excluded_task_ids=[2],
+        excluded_task_quadruplets=[("tache3", "totalco", "tri", "sac")]
+    )
+    ids = [t.task_id for t in result.tasks]
+    assert 2 not in ids and 3 not in ids
+    assert result.debug_info["filtered_guichet_count"] == 2
+    assert "MANUTENTIONNAIRE" not in result.ressources_par_poste
+    assert "AGENT OP" in result.ressources_par_poste
+
+
+def test_vectorized_matches_loop():
+    poste_map = {"A": "MANUTENTIONNAIRE", "B": "AGENT OP", "C": "FACTEUR"}
+    plan = compile_bandoeng_plan(TASKS, centre_id=1, poste_map=poste_map)
+    volumes = BandoengInputVolumes(grid_values=GRID, amana_export=1000.0)
+
+    for params in (_params(), _params(shift=3, duree_trajet=20.0), _params(pct_mois_amana=12.0, has_guichet=0)):
+        loop = evaluate_bandoeng_plan(plan, volumes, params, excluded_task_ids=[6])
+        vect = evaluate_bandoeng_plan(plan, volumes, params, excluded_task_ids=[6], vectorized=True)
+        assert [t.task_id for t in vect.tasks] == [t.task_id for t in loop.tasks]
+        for got, exp in zip(vect.tasks, loop.tasks):
+            assert abs(got.heures_calculees - exp.heures_calculees) < 1e-9
+            assert got.formule == exp.formule
+        assert vect.ressources_par_poste.keys() == loop.ressources_par_poste.keys()
+        for k, v in loop.ressources_par_poste.items():
+            assert abs(vect.ressources_par_poste[k] - v) < 1e-9
+        assert abs(vect.fte_calcule - loop.fte_calcule) < 1e-9
+        assert vect.debug_info == loop.debug_info
+
+        aggregates_only = evaluate_bandoeng_plan(plan, volumes, params, excluded_task_ids=[6], vectorized=True, with_tasks=False)
+        assert aggregates_only.tasks == []
+        assert abs(aggregates_only.fte_calcule - loop.fte_calcule) < 1e-9
+
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump({nom: _snapshot(_evaluer(p, o)) for nom, p, o in CASES}, f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"[OK] Références régénérées: {GOLDEN_PATH}")
+        sys.exit(0)
+    test_plan_matches_golden()
+    test_plan_exclusions_and_role_mapping()
+    test_vectorized_matches_loop()
+    print("[OK] Plan compilé Bandoeng")
@@ -0,0 +1,122 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+
+from app.core.config import settings
+from app.api import bandoeng_router as R
+from app.models import db_models as m
+from app.services.bandoeng_engine import run_bandoeng_simulation, BandoengInputVolumes
+from app.services.referentiel_snapshot import bump_referentiel_version
+
+from sqlite_db import sqlite_session, add_centre
+from test_bandoeng_plan import GRID, TASKS
+
+settings.REDIS_ENABLED = False  # Invalidations locales uniquement
+
+
+def _base():
+    """Centre 1 : tâches de test_bandoeng_plan réparties sur 3 postes MOD, plus un poste MOI."""
+    db = sqlite_session()
+    for pid, code, label, tp in [(1, "A", "MANUTENTIONNAIRE", "MOD"), (2, "B", "AGENT OP", "MOD"),
+                                 (3, "C", "FACTEUR", "MOD"), (4, "D", "CHEF", "MOI")]:
+        db.add(m.Poste(id=pid, Code=code, label=label, type_poste=tp))
+    add_centre(db, 1, postes=[(11, 1, 2), (12, 2, 1), (13, 3, 3), (14, 4, 1)])
+    cp_par_code = {"A": 11, "B": 12, "C": 13}
+    for t in TASKS:
+        db.add(m.Tache(
+            id=t.id, centre_poste_id=cp_par_code[t.centre_poste.code_resp], nom_tache=t.nom_tache, produit=t.produit,
+            unite_mesure=t.unite_mesure, phase=t.phase, moy_sec=t.moy_sec, base_calcul=t.base_calcul,
+            famille_uo=t.famille_uo, ordre=t.id
+        ))
+    db.commit()
+    bump_referentiel_version()  # Plans et postes d'une base précédente : rechargés
+    return db
+
+
+def _request(**kw):
+    base = dict(centre_id=1, grid_values=GRID, parameters={"ed_percent": 40, "pct_collecte": 30, "pct_guichet": 50})
+    base.update(kw)
+    return R.BandoengSweepRequest(**base)
+
+
+def test_expansion_grille():
+    combos = R._expand_sweep([{"has_guichet": 0}, {"pct_mois": 10}], {"productivite": [80, 100], "shift": [1, 2, 3], "vide": []})
+    assert len(combos) == 2 * 2 * 3
+    assert combos[0] == {"has_guichet": 0, "productivite": 80, "shift": 1}
+    assert combos[-1] == {"pct_mois": 10, "productivite": 100, "shift": 3}
+    assert R._expand_sweep([], {}) == [{}]
+
+
+def test_balayage_identique_aux_simulations_unitaires():
+    db = _base()
+    request = _request(sweep={"productivite": [80, 100], "shift": [1, 3]}, scenarios=[{}, {"has_guichet": 0}])
+    res = R.simulate_bandoeng_sweep(request, db=db)
+    assert res.combinations == len(res.results) == len(res.matrix) == 8
+    assert res.results[5].overrides == {"has_guichet": 0, "productivite": 80, "shift": 3}
+
+    for point, ligne in zip(res.results, res.matrix):
+        attendu = run_bandoeng_simulation(
+            db, 1, BandoengInputVolumes(grid_values=GRID), R._params_from_dict({**request.parameters, **point.overrides})
+        )
+        assert abs(point.fte_calcule - attendu.fte_calcule) < 1e-9
+        assert abs(point.total_heures - attendu.total_heures) < 1e-9
+        assert point.fte_arrondi == attendu.fte_arrondi
+        assert ligne == [attendu.ressources_par_poste.get(k, 0.0) for k in res.postes]
+    assert res.results[0].fte_calcule > 0 and res.results[0].total_ressources_humaines > res.results[0].fte_calcule
+
+
+def test_limite_et_parametres_invalides():
+    # Refusés avant tout accès BDD
+    trop = {"productivite": list(range(50)), "shift": list(range(1, 42))}
+    for request, attendu in [
+        (_request(sweep=trop), f"maximum {R.MAX_SWEEP_COMBINATIONS}"),
+        (_request(sweep={"shift": [1, "deux"]}), "combinaison 2"),
+        (_request(sweep={"has_guichet": ["oui"]}), "combinaison 1"),
+        (_request(scenarios=[{"productivite": "rapide"}]), "'productivite'"),
+    ]:
+        try:
+            R.simulate_bandoeng_sweep(request, db=None)
+            assert False, request
+        except HTTPException as e:
+            assert e.status_code == 400 and attendu in e.detail, e.detail
+
+    for parameters in ({"hasGuichet": "non"}, {"productivite": "rapide"}, {"ed_percent": "40 %"}):
+        try:
+            R.simulate_bandoeng_direct(R.SimplifiedBandoengRequest(centre_id=1, parameters=parameters), db=None)
+            assert False, parameters
+        except HTTPException as e:
+            assert e.status_code == 400
+
+
+def test_valeurs_texte_et_vides():
+    """Nombres en texte convertis, valeur vide = paramètre absent (sweep et /simulate-bandoeng)."""
+    db = _base()
+    texte = [{"productivite": "90", "ed_percent": "40", "pct_collecte": "30", "shift": "2"}, {"productivite": "", "pct_collecte": " "}]
+    nombres = [{"productivite": 90, "ed_percent": 40, "pct_collecte": 30, "shift": 2}, {}]
+    base = {"pct_guichet": 50, "ed_percent": 40}
+    res_texte = R.simulate_bandoeng_sweep(_request(parameters=base, scenarios=texte), db=db)
+    res_nombres = R.simulate_bandoeng_sweep(_request(parameters=base, scenarios=nombres), db=db)
+    assert [r.fte_calcule for r in res_texte.results] == [r.fte_calcule for r in res_nombres.results]
+    assert res_texte.results[0].fte_calcule > 0
+
+    params = R._params_valides({"productivite": "90", "shift": "2", "pct_mois": "", "duree_trajet": ""})
+    assert (params.productivite, params.shift, params.pct_mois, params.duree_trajet) == (90.0, 2, None, 0.0)
+    assert isinstance(params.productivite, float) and isinstance(params.shift, int)
+
+    for parameters in texte:
+        direct_texte = R.simulate_bandoeng_direct(
+            R.SimplifiedBandoengRequest(centre_id=1, grid_values=GRID, parameters={**base, **parameters}), db=db)
+        direct_nombres = R.simulate_bandoeng_direct(
+            R.SimplifiedBandoengRequest(centre_id=1, grid_values=GRID, parameters={**base, **nombres[texte.index(parameters)]}), db=db)
+        assert direct_texte.fte_calcule == direct_nombres.fte_calcule
+        assert direct_texte.total_heures == direct_nombres.total_heures
+
+
+if __name__ == "__main__":
+    test_expansion_grille()
+    test_balayage_identique_aux_simulations_unitaires()
+    test_limite_et_parametres_invalides()
+    test_valeurs_texte_et_vides()
+    print("[OK] Balayage Bandoeng")
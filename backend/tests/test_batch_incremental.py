@@ -0,0 +1,84 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.api import batch_simulation
+from app.services import batch_compute
+from app.services import referentiel_snapshot as snap
+from app.services.referentiel_snapshot import bump_referentiel_version
+
+from test_bandoeng_plan import TASKS, GRID, POSTE_MAP
+
+settings.REDIS_ENABLED = False  # Invalidations locales uniquement
+
+
+def _prefetch(effectif=3.0):
+    """Pré-chargement d'un classeur de 3 onglets (même contenu à chaque appel, objets neufs)."""
+    entries = [
+        {
+            "sheet": f"C{cid}", "raw_params": {"ed_percent": 40, "pct_collecte": 30}, "grid": GRID,
+            "centre": {"id": cid, "label": f"C{cid}", "categorie_id": 1, "region_id": 1, "region_label": "R1"},
+        }
+        for cid in (1, 2, 3)
+    ]
+    rows = [(effectif, 0.0, "MOD", "MANUTENTIONNAIRE", 5000.0), (1.0, 0.0, "MOI", "CHEF", 9000.0)]
+    return {
+        "entries": entries,
+        "tasks_by_centre": {cid: TASKS for cid in (1, 2, 3)},
+        "moi_by_centre": {cid: 1.0 for cid in (1, 2, 3)},
+        "city_by_centre": {},
+        "postes_by_centre": {cid: list(rows) for cid in (1, 2, 3)},
+        "poste_map": POSTE_MAP,
+    }
+
+
+def _jobs(process_mode="actuel", **kw):
+    ctx = {"role_mapping": {"A": "B"} if process_mode == "recommande" else None, "excl_ids_by_centre": {}, "quads_by_cat": {}}
+    return batch_simulation._build_batch_jobs(_prefetch(**kw), process_mode, ctx)
+
+
+def _reused(jobs):
+    results, reused = batch_compute.compute_centres_incremental(jobs)
+    assert all("error" not in r for r in results)
+    return reused
+
+
+def test_cache_version_referentiel():
+    """Référentiel partagé : l'empreinte ne dépend que des versions, du centre et du mode."""
+    batch_compute.clear_result_cache()
+    snap._listener_alive.set()
+    try:
+        assert _reused(_jobs()) == [False] * 3
+        assert _reused(_jobs()) == [True] * 3           # Ré-import du même classeur
+        assert _reused(_jobs("recommande")) == [False] * 3  # Autre mode : autre résultat
+
+        bump_referentiel_version("taches")
+        assert _reused(_jobs()) == [False] * 3
+        assert _reused(_jobs()) == [True] * 3
+        bump_referentiel_version("exclusions")
+        assert _reused(_jobs()) == [False] * 3
+    finally:
+        snap._listener_alive.clear()
+        batch_compute.clear_result_cache()
+
+
+def test_cache_contenu_sans_abonnement():
+    """Sans abonnement : empreinte du contenu, plan haché une seule fois."""
+    batch_compute.clear_result_cache()
+    assert _reused(_jobs()) == [False] * 3
+    assert _reused(_jobs()) == [True] * 3
+    assert _reused(_jobs(effectif=4.0)) == [False] * 3  # Effectif modifié en BDD
+
+    jobs = _jobs()
+    stamp = batch_compute.referential_stamp(jobs[0])
+    assert jobs[1]["plan"] is not jobs[0]["plan"] and not hasattr(jobs[1]["plan"], "_digest")
+    jobs[0]["plan"]._digest = "autre"  # Empreinte mémorisée sur le plan, réutilisée telle quelle
+    assert batch_compute.referential_stamp(jobs[0]) != stamp
+    batch_compute.clear_result_cache()
+
+
+if __name__ == "__main__":
+    test_cache_version_referentiel()
+    test_cache_contenu_sans_abonnement()
+    print("[OK] Batch incrémental")
@@ -0,0 +1,162 @@
+import sys
+import os
+import time
+import threading
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy.orm import Session
+
+from app.core import cache
+from app.core.config import settings
+
+settings.REDIS_ENABLED = False  # Aucune connexion Redis en arrière-plan pendant les tests
+
+
+class FakeRedis:
+    """Double minimal de redis.Redis (get/set/setex/delete/exists/scan_iter)."""
+
+    def __init__(self):
+        self.data = {}
+        self.gets = 0
+
+    def get(self, key):
+        self.gets += 1
+        return self.data.get(key)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return False
+        self.data[key] = value
+        return True
+
+    def setex(self, key, ttl, value):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def exists(self, key):
+        return key in self.data
+
+    def scan_iter(self, match):
+        import fnmatch
+        return [k for k in list(self.data) if fnmatch.fnmatchcase(k, match)]
+
+
+def _reset(redis_client=None):
+    cache.redis_client = redis_client
+    cache._l1.clear()
+
+
+def test_session_ignoree_dans_la_cle():
+    _reset()
+    calls = []
+
+    @cache.redis_cache(ttl=60, prefix="t1")
+    def get_centres(db, direction_id, actif=True):
+        calls.append(direction_id)
+        return [{"id": direction_id}]
+
+    assert get_centres(Session(), 5) == [{"id": 5}]
+    assert get_centres(Session(), direction_id=5) == [{"id": 5}]
+    assert get_centres(db=Session(), direction_id=5, actif=True) == [{"id": 5}]
+    assert calls == [5]
+    get_centres(Session(), 6)
+    assert calls == [5, 6]
+
+
+def test_ignore_et_key_args():
+    _reset()
+    calls = []
+
+    @cache.redis_cache(ttl=60, prefix="t2", ignore=("verbose",))
+    def f(x, verbose=False):
+        calls.append(x)
+        return x
+
+    @cache.redis_cache(ttl=60, prefix="t2", key_args=("x",))
+    def g(x, tag=None):
+        calls.append(x)
+        return x
+
+    f(1, verbose=False); f(1, verbose=True)
+    g(2, tag="a"); g(2, tag="b")
+    assert calls == [1, 2]
+
+
+def test_l1_copie_independante_et_invalidation():
+    _reset()
+
+    @cache.redis_cache(ttl=60, prefix="t3")
+    def f(x):
+        return {"vals": [x]}
+
+    a = f(1)
+    a["vals"].append(99)  # Ne doit pas polluer le cache
+    assert f(1) == {"vals": [1]}
+    key = f.cache_key(1)
+    assert cache._l1.get(key) is not None
+    f.invalidate(1)
+    assert cache._l1.get(key) is None
+    f(1)
+    assert cache.invalidate_cache("t3:*") == 1
+
+
+def test_redis_l2_puis_l1():
+    fake = FakeRedis()
+    _reset(fake)
+    calls = []
+
+    @cache.redis_cache(ttl=60, prefix="t4")
+    def f(x):
+        calls.append(x)
+        return x * 2
+
+    assert f(3) == 6
+    assert fake.data[f.cache_key(3)] == "6"
+    assert not any(k.startswith("lock:") for k in fake.data)
+
+    cache._l1.clear()  # Autre processus : L1 vide, Redis chaud
+    assert f(3) == 6
+    gets = fake.gets
+    assert f(3) == 6   # Servi par L1, Redis non interrogé
+    assert fake.gets == gets
+    assert calls == [3]
+    stats = cache.get_cache_stats()["prefixes"]["t4"]
+    assert (stats["misses"], stats["redis_hits"], stats["l1_hits"]) == (1, 1, 1)
+    _reset()
+
+
+def test_single_flight():
+    _reset()
+    calls = []
+    start = threading.Event()
+
+    @cache.redis_cache(ttl=60, prefix="t5")
+    def lent(x):
+        calls.append(x)
+        time.sleep(0.2)
+        return x
+
+    def worker(out):
+        start.wait()
+        out.append(lent(7))
+
+    out = []
+    threads = [threading.Thread(target=worker, args=(out,)) for _ in range(8)]
+    for t in threads:
+        t.start()
+    start.set()
+    for t in threads:
+        t.join()
+    assert out == [7] * 8
+    assert calls == [7]
+
+
+if __name__ == "__main__":
+    test_session_ignoree_dans_la_cle()
+    test_ignore_et_key_args()
+    test_l1_copie_independante_et_invalidation()
+    test_redis_l2_puis_l1()
+    test_single_flight()
+    print("[OK] Cache")
@@ -0,0 +1,63 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from types import SimpleNamespace
+
+from app.models import db_models as m
+from app.services import centre_loaders as L
+
+from sqlite_db import sqlite_session, add_centre
+
+LABELS = ["Aït O'Brien", "CTD Casa, Anfa", "100% Rabat", "Fès \"Médina\"", "Centre 5"]
+
+
+def _base():
+    db = sqlite_session()
+    for pid, label, tp in [(1, "AGENT OP", "MOD"), (2, "CHEF", "MOI")]:
+        db.add(m.Poste(id=pid, Code=f"P{pid}", label=label, type_poste=tp))
+    for cid, label in enumerate(LABELS, 1):
+        add_centre(db, cid, label=label, postes=[(cid * 10 + 1, 1, cid), (cid * 10 + 2, 2, 1)])
+        db.add(m.Tache(id=cid * 100, centre_poste_id=cid * 10 + 1, nom_tache=f"Tâche {cid}", produit="CO ARRIVE", unite_mesure="courrier"))
+        db.add(m.Tache(id=cid * 100 + 1, centre_poste_id=cid * 10 + 2, nom_tache=f"Suivi {cid}", produit="LRH", unite_mesure="envoi"))
+    db.commit()
+    return db
+
+
+def test_chargements_par_ids():
+    db = _base()
+    taches = L.load_taches_centres(db, [3, 1, 99])
+    assert sorted(taches) == [1, 3, 99] and taches[99] == []
+    assert sorted((t["id"], t["poste_id"], t["nom_poste"], t["centre_id"]) for t in taches[1]) == [
+        (100, 1, "AGENT OP", 1), (101, 2, "CHEF", 1)
+    ]
+    postes = L.load_postes_centres(db, [2, 2, 4])
+    assert sorted((r.centre_id, r.cp_id, r.poste_id, r.effectif_actuel) for r in postes) == [
+        (2, 21, 1, 2.0), (2, 22, 2, 1.0), (4, 41, 1, 4.0), (4, 42, 2, 1.0)
+    ]
+    # Un seul paramètre quel que soit le nombre d'ids (au-delà des 2100 paramètres MSSQL)
+    assert len(L.load_postes_centres(db, list(range(1, 3001)))) == 2 * len(LABELS)
+    assert L.load_taches_centres(db, []) == {} and L.load_postes_centres(db, []) == []
+    assert L.load_centres_infos(db, [5, 1])[1]["label"] == "Aït O'Brien"
+
+
+def test_centres_par_labels():
+    db = _base()
+    found = L.load_centres_par_labels(db, ["Aït O'Brien", "100% Rabat", "Fès \"Médina\"", "CTD Casa", "", None, "Ait O'Brien"])
+    assert sorted((r.id, r.label) for r in found) == [(1, "Aït O'Brien"), (3, "100% Rabat"), (4, "Fès \"Médina\"")]
+    assert L.load_centres_par_labels(db, ["' OR 1=1 --"]) == []
+    assert L.load_centres_par_labels(db, []) == []
+
+
+def test_ensemble_mssql():
+    db = SimpleNamespace(get_bind=lambda: SimpleNamespace(dialect=SimpleNamespace(name="mssql")))
+    assert L.ensemble(db, "ids") == "(SELECT CAST([value] AS INT) AS val FROM OPENJSON(:ids))"
+    assert "COLLATE DATABASE_DEFAULT" in L.ensemble(db, "labels", "NVARCHAR")
+    assert L.valeurs_json(["Aït O'Brien"]) == '["Aït O\'Brien"]'
+
+
+if __name__ == "__main__":
+    test_chargements_par_ids()
+    test_centres_par_labels()
+    test_ensemble_mssql()
+    print("[OK] Chargements par liste de centres")
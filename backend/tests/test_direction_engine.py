@@ -0,0 +1,93 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.models import VolumesInput
+from app.services import direction_engine
+from app.services.direction_engine import compile_direction_plan, evaluate_direction_plan
+from app.services.simulation import calculer_simulation, contexte_volumes
+from app.services.simulation_shared import regroup_tasks_for_scenarios
+
+NOMS = ["Tri colis", "Collecte colis entreprises", "Traitement amana", "Suivi amana", "Courrier ordinaire arrivée",
+        "Courrier recommandé", "Ebarkia guichet", "LRH", "Ouverture sacs", "Rapport journalier", "Distribution"]
+UNITES = ["COLIS", "Sac", "sacs", "courriers", "Courrier", "courrier recommandé", "machine", "colis_amana", "amana", "kg", ""]
+FLUX = [None, "CO", "CR", "EB", "LRH", "MAG", "amana"]
+FAMILLES = [None, "Distribution", "Dist. DISTRIBUTION locale", "TRI"]
+
+SCENARIOS = [
+    # (volumes journaliers, volumes annuels)
+    ({"sacs": 12, "colis": 340, "colis_par_collecte": 2.5}, {"courrier_ordinaire": 120000, "courrier_recommande": 5000, "amana": 90000}),
+    ({"sacs": 0, "colis": 0}, {"amana": 52800}),                   # AMANA-only (fallback)
+    ({"sacs": 8, "colis": 0, "courriers_par_sac": 3000}, {}),      # courrier dérivé des sacs
+    ({"sacs": 0, "colis": 75, "colis_amana_par_sac": 4}, {"lrh": 2640, "ebarkia": 26400}),
+]
+
+
+def _taches(rnd, cid, n):
+    return [{
+        "id": cid * 1000 + k,
+        "nom_tache": rnd.choice(NOMS),
+        "unite_mesure": rnd.choice(UNITES),
+        "type_flux": rnd.choice(FLUX),
+        "famille_uo": rnd.choice(FAMILLES),
+        "moyenne_min": round(rnd.uniform(0, 3), 3),
+        "centre_poste_id": cid * 10 + rnd.randint(1, 4),
+        "phase": "x",
+    } for k in range(n)]
+
+
+def _reference(taches, volumes, annuels, idle, **kw):
+    try:
+        return calculer_simulation(
+            taches=regroup_tasks_for_scenarios(taches), volumes=volumes, productivite=85.0,
+            idle_minutes=idle, volumes_annuels=annuels, **kw
+        )
+    except Exception:
+        return None
+
+
+def _check(vectorized):
+    rnd = random.Random(7)
+    tasks_by_centre = {cid: _taches(rnd, cid, rnd.randint(0, 60)) for cid in range(1, 41)}
+    # Centre invalide : le regroupement courrier échoue comme dans le moteur
+    tasks_by_centre[41] = [{"nom_tache": "Courrier", "unite_mesure": "courriers", "moyenne_min": "1,5", "centre_poste_id": 411}]
+    plan = compile_direction_plan(tasks_by_centre)
+    assert 41 in plan.failed
+
+    for volumes, annuels in SCENARIOS:
+        for facteurs in ({}, {"taux_complexite": 1.3, "nature_geo": 1.1}):
+            contexts = {
+                cid: contexte_volumes(VolumesInput(**volumes), 85.0, None, 20.0, volumes_annuels=annuels)
+                for cid in tasks_by_centre
+            }
+            out = evaluate_direction_plan(plan, contexts, vectorized=vectorized, **facteurs)
+            for cid, taches in tasks_by_centre.items():
+                ref = _reference(taches, volumes, annuels, 20.0, **facteurs)
+                res = out[cid]
+                if ref is None:
+                    assert res is None, cid
+                    continue
+                assert (res.total_heures, res.fte_calcule, res.fte_arrondi, res.heures_net_jour) == \
+                    (ref.total_heures, ref.fte_calcule, ref.fte_arrondi, ref.heures_net_jour), (cid, volumes)
+                ref_hpp = {k: v for k, v in ref.heures_par_poste.items() if v != 0.0}
+                assert res.heures_par_poste == ref_hpp, (cid, volumes)
+
+
+def test_direction_vectorisee_identique_au_moteur():
+    _check(vectorized=True)
+
+
+def test_direction_scalaire_identique_au_moteur():
+    original = direction_engine.np
+    direction_engine.np = None  # numpy absent : compilation en listes + boucle scalaire
+    try:
+        _check(vectorized=True)
+    finally:
+        direction_engine.np = original
+
+
+if __name__ == "__main__":
+    test_direction_vectorisee_identique_au_moteur()
+    test_direction_scalaire_identique_au_moteur()
+    print("[OK] Moteur direction (plan compilé)")
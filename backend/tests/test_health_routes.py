@@ -0,0 +1,21 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+
+def test_seul_health_expose():
+    """Les routes de diagnostic (config BDD, fichiers, comptages) ne sont pas montées."""
+    client = TestClient(app)
+    res = client.get("/health")
+    assert res.status_code == 200 and res.json()["status"] == "ok"
+    for diagnostic in ("/health/config", "/health/db", "/health/db/meta", "/whoami"):
+        assert client.get(diagnostic).status_code == 404, diagnostic
+
+
+if __name__ == "__main__":
+    test_seul_health_expose()
+    print("[OK] Routes health")
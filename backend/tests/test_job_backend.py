@@ -0,0 +1,220 @@
+import sys
+import os
+import time
+import threading
+import base64
+from types import SimpleNamespace
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core import db as core_db
+from app.core.config import settings
+from app.api import batch_simulation
+from app.services import batch_compute
+from app.tasks import jobs
+
+settings.REDIS_ENABLED = False  # Aucune connexion Redis en arrière-plan pendant les tests
+
+
+class FakeSession:
+    def close(self):
+        pass
+
+
+def _fake_parse(db, content, region_id):
+    entries = [
+        {"sheet": f"C{cid}", "centre": {"id": cid, "label": f"C{cid}", "region_id": cid % 2, "region_label": f"R{cid % 2}"}}
+        for cid in range(1, int(content) + 1)
+    ]
+    return entries, []
+
+
+def _fake_jobs(prefetch, process_mode, mode_ctx, plans=None):
+    return [{"centre_id": e["centre"]["id"], "centre": e["centre"]} for e in prefetch["entries"]]
+
+
+def _compute(gate=None):
+    def compute(jobs_, force=False):
+        for i, job in enumerate(jobs_):
+            if gate is not None:
+                gate.wait(5)
+            c = job["centre"]
+            yield i, {
+                "centre_id": c["id"], "centre_label": c["label"], "region_id": c["region_id"],
+                "region_label": c["region_label"], "fte_calcule": 2.0, "fte_arrondi": 2,
+            }, False
+    return compute
+
+
+def _patched(fn):
+    def wrapper():
+        originals = (core_db.get_worker_session, batch_simulation._parse_batch_workbook,
+                     batch_simulation._prefetch_centres, batch_simulation._build_batch_jobs,
+                     batch_compute.iter_centres_incremental)
+        core_db.get_worker_session = FakeSession
+        batch_simulation._parse_batch_workbook = _fake_parse
+        batch_simulation._prefetch_centres = lambda db, entries: {"entries": entries}
+        batch_simulation._build_batch_jobs = _fake_jobs
+        batch_compute.iter_centres_incremental = _compute()
+        try:
+            fn()
+        finally:
+            (core_db.get_worker_session, batch_simulation._parse_batch_workbook,
+             batch_simulation._prefetch_centres, batch_simulation._build_batch_jobs,
+             batch_compute.iter_centres_incremental) = originals
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+def _wait(backend, job_id, states=("SUCCESS", "FAILURE", "REVOKED")):
+    for _ in range(500):
+        status = backend.status(job_id)
+        if status["state"] in states:
+            return status
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} bloqué: {backend.status(job_id)}")
+
+
+@_patched
+def test_batch_local():
+    backend = jobs.LocalJobBackend(max_workers=1)
+    job_id = backend.submit("batch", b"5", None, "actuel", False)
+    status = _wait(backend, job_id)
+    assert status["state"] == "SUCCESS" and status["progress"] == 100
+    result = status["result"]
+    assert result["task_id"] == job_id
+    assert result["data"]["national"]["nb_centres"] == 5
+    assert result["data"]["national"]["total_fte_calcule"] == 10.0
+    assert result["data"]["incremental"]["recalcules"] == 5
+    backend.shutdown()
+
+
+@_patched
+def test_annulation_et_file_bornee():
+    gate = threading.Event()
+    batch_compute.iter_centres_incremental = _compute(gate)
+    backend = jobs.LocalJobBackend(max_workers=1)
+
+    running = backend.submit("batch", b"3", None, "actuel", False)
+    queued = backend.submit("batch", b"3", None, "actuel", False)
+    _wait(backend, running, states=("PROGRESS",))
+    active = backend.active()
+    assert (active["total_active"], active["total_scheduled"]) == (1, 1)
+
+    # En file : retiré immédiatement ; en cours : arrêté au centre suivant
+    assert backend.cancel(queued)["status"] == "cancelled"
+    assert backend.status(queued)["state"] == "REVOKED"
+    assert backend.cancel(running)["status"] == "cancelled"
+    gate.set()
+    assert _wait(backend, running)["state"] == "REVOKED"
+    assert backend.cancel(running)["status"] == "REVOKED"
+    backend.shutdown()
+
+
+@_patched
+def test_erreur_et_type_inconnu():
+    def boom(db, content, region_id):
+        raise ValueError("classeur illisible")
+
+    batch_simulation._parse_batch_workbook = boom
+    backend = jobs.LocalJobBackend(max_workers=1)
+    status = _wait(backend, backend.submit("batch", b"1", None, "actuel", False))
+    assert status["state"] == "FAILURE" and status["error"] == "classeur illisible"
+    try:
+        backend.submit("centre_batch", [1], {})
+        assert False
+    except jobs.JobKindNotSupported:
+        pass
+    backend.shutdown()
+
+
+@_patched
+def test_selection_backend():
+    original = settings.JOB_BACKEND
+    try:
+        settings.JOB_BACKEND = "local"
+        assert jobs.get_job_backend() is jobs.get_local_backend()
+        settings.JOB_BACKEND = "auto"  # Redis désactivé : exécution locale
+        assert jobs.get_job_backend().name == "local"
+        job_id = jobs.get_local_backend().submit("batch", b"1", None, "actuel", False)
+        assert jobs.backend_for(job_id) is jobs.get_local_backend()
+        assert _wait(jobs.get_local_backend(), job_id)["state"] == "SUCCESS"
+    finally:
+        settings.JOB_BACKEND = original
+
+
+class FakeCeleryApp:
+    """AsyncResult / control.revoke : états fixés par le test, révocations enregistrées."""
+    def __init__(self, results):
+        self.results = results
+        self.revoked = []
+        self.control = SimpleNamespace(revoke=lambda ids, terminate=False: self.revoked.append((list(ids), terminate)))
+
+    def AsyncResult(self, job_id):
+        state, info = self.results.get(job_id, ("PENDING", None))
+        return SimpleNamespace(state=state, info=info)
+
+
+class FakeCeleryBackend(jobs.CeleryJobBackend):
+    def __init__(self, app):
+        self._app = app
+
+    @property
+    def app(self):
+        return self._app
+
+
+@_patched
+def test_annulation_celery_paquets():
+    from app.tasks import simulation_tasks as tasks
+
+    metas = {}
+    def recorder(key):
+        return lambda task_id=None, state=None, meta=None: metas.__setitem__(task_id or key, meta)
+
+    originals = (settings.CELERY_CHUNK_SIZE, tasks.get_worker_session, tasks.iter_centres_incremental, tasks._advance,
+                 batch_simulation._load_mode_context)
+    settings.CELERY_CHUNK_SIZE = 2
+    tasks.get_worker_session = FakeSession
+    tasks.iter_centres_incremental = _compute()
+    tasks._advance = lambda job_id, n=1: n
+    batch_simulation._load_mode_context = lambda db, process_mode: None
+    tasks.async_batch_simulation.update_state = recorder("job-1")
+    tasks.async_batch_simulation.replace = lambda sig: sig
+    tasks.async_batch_chunk.update_state = recorder(None)
+    tasks.async_batch_simulation.push_request(id="job-1")
+    try:
+        # 5 centres par paquets de 2 : le job se remplace par un chord de 3 paquets
+        pipeline = tasks.async_batch_simulation.run(base64.b64encode(b"5").decode("ascii"))
+        chunk_ids = metas["job-1"]["paquets"]
+        assert len(chunk_ids) == 3 == len(set(chunk_ids))
+        assert [sig.options["task_id"] for sig in pipeline.tasks] == chunk_ids
+
+        # Les paquets réécrivent la meta du job en gardant les ids
+        sig = pipeline.tasks[0]
+        tasks.async_batch_chunk.run(*sig.args)
+        assert metas["job-1"]["paquets"] == chunk_ids and metas["job-1"]["centres_termines"] == 1
+    finally:
+        tasks.async_batch_simulation.pop_request()
+        for t in (tasks.async_batch_simulation, tasks.async_batch_chunk):
+            vars(t).pop("update_state", None)
+        vars(tasks.async_batch_simulation).pop("replace", None)
+        (settings.CELERY_CHUNK_SIZE, tasks.get_worker_session, tasks.iter_centres_incremental, tasks._advance,
+         batch_simulation._load_mode_context) = originals
+
+    app = FakeCeleryApp({"job-1": ("PROGRESS", metas["job-1"]), "job-2": ("SUCCESS", None)})
+    backend = FakeCeleryBackend(app)
+    assert backend.cancel("job-1")["status"] == "cancelled"
+    assert app.revoked == [(["job-1", *chunk_ids], True)]
+    # En file (pas encore découpé) : seul le job est révoqué ; terminé : rien
+    assert backend.cancel("job-3")["status"] == "cancelled"
+    assert backend.cancel("job-2")["status"] == "SUCCESS"
+    assert app.revoked[1:] == [(["job-3"], True)]
+
+
+if __name__ == "__main__":
+    test_batch_local()
+    test_annulation_et_file_bornee()
+    test_erreur_et_type_inconnu()
+    test_selection_backend()
+    test_annulation_celery_paquets()
+    print("[OK] Backend de jobs local")
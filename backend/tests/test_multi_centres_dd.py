@@ -0,0 +1,190 @@
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.models import db_models as m
+from app.schemas.models import PosteResultat, SimulationResponse
+from app.schemas.volumes_ui import VolumesUIInput, VolumeItem
+from app.services import batch_compute
+from app.services import simulation_data_driven as S
+
+from sqlite_db import sqlite_session, add_centre
+
+NOMS = ["Tri", "Retrait colis", "Affectation facteurs", "Comptage Colis", "Distribution"]
+PRODUITS = ["AMANA RECU", "AMANA DEPOT", "CO ARRIVE", "CR DEPART", "LRH"]
+FAMILLES = ["ARRIVEE", "DISTRIBUTION", "GUICHET CO", "TRI"]
+POSTES = [(1, "AGENT OP", "MOD"), (3, "FACTEUR DISTRIBUTEUR", "MOD"), (4, "CHEF", "MOI")]
+
+
+def _volumes(k):
+    return VolumesUIInput(volumes_flux=[
+        VolumeItem(flux=f, sens=s, segment=g, volume=1000.0 * k * (i + 1))
+        for i, (f, s, g) in enumerate([
+            ("AMANA", "ARRIVEE", "PART"), ("AMANA", "DEPART", "GLOBAL"), ("AMANA", "GUICHET", "DEPOT"),
+            ("CO", "ARRIVEE", "GLOBAL"), ("CR", "DEPART", "GLOBAL"), ("LRH", "ARRIVEE", "GLOBAL"),
+        ])
+    ], pct_retour=25)
+
+
+def _centre(cid):
+    postes = [
+        {"centre_id": cid, "cp_id": cid * 10 + k, "poste_id": pid, "nom_poste": label, "type_poste": tp, "effectif_actuel": k + cid % 3}
+        for k, (pid, label, tp) in enumerate(POSTES)
+    ]
+    taches = [
+        {"id": cid * 100 + i, "centre_poste_id": cid * 10 + i % 3, "poste_id": POSTES[i % 3][0],
+         "nom_tache": NOMS[i % 5], "produit": PRODUITS[(i // 2) % 5], "unite_mesure": ["colis", "courrier", "envoi"][i % 3],
+         "famille_uo": FAMILLES[i % 4], "phase": "", "etat": None, "base_calcul": "100", "moy_sec": str(10 + i), "moyenne_min": None}
+        for i in range(30, 0, -1)  # désordonnées : le job les trie comme charger_taches_centre
+    ]
+    return postes, taches
+
+
+def test_job_centre_sans_bdd():
+    postes, taches = _centre(5)
+    job = S._job_multi_centre(5, {"label": "C5", "categorie_id": 10}, postes, taches, _volumes(1), 100.0, 8.5, 0.0, True)
+    res = S.simuler_centre_job(job)
+
+    # Référence : même calcul avec un contexte aux lookups pré-chargés
+    ctx = S.VolumeContext(_volumes(1), centre_id=5, centre_categorie_id=10, effectif_facteur_distributeur=postes[1]["effectif_actuel"])
+    attendu = 0.0
+    for p in postes:
+        attendu += S._simuler_taches_poste(ctx, p["cp_id"], job["taches_par_poste"][p["cp_id"]], 100.0, 8.5, 0.0).total_heures
+    assert res["total_heures"] > 0
+    assert abs(res["total_heures"] - attendu) < 1e-9
+    assert [p.centre_poste_id for p in res["postes"]] == [p["cp_id"] for p in postes]
+    assert abs(sum(p.total_heures for p in res["postes"]) - res["total_heures"]) < 1e-9
+    assert all(d.centre_poste_id in res["heures_par_poste"] for d in res["details_taches"])
+
+
+def test_jobs_repartis_sur_le_pool():
+    jobs = []
+    for cid in range(1, 9):
+        postes, taches = _centre(cid)
+        jobs.append(S._job_multi_centre(cid, {"label": f"C{cid}"}, postes, taches, _volumes(cid), 90.0, 8.5, 15.0, False))
+    sequentiel = [S.simuler_centre_job(job) for job in jobs]
+
+    workers, seuil = settings.BATCH_WORKERS, settings.BATCH_PARALLEL_MIN_CENTRES
+    settings.BATCH_WORKERS, settings.BATCH_PARALLEL_MIN_CENTRES = 2, 1
+    try:
+        parallele = dict(batch_compute.iter_map_parallel(S.simuler_centre_job, jobs))
+    finally:
+        settings.BATCH_WORKERS, settings.BATCH_PARALLEL_MIN_CENTRES = workers, seuil
+        batch_compute.reset_batch_pool()
+    for i, res in enumerate(sequentiel):
+        assert parallele[i]["centre_id"] == res["centre_id"]
+        assert parallele[i]["total_heures"] == res["total_heures"]
+        assert [p.model_dump() for p in parallele[i]["postes"]] == [p.model_dump() for p in res["postes"]]
+        assert parallele[i]["details_taches"] == []
+
+
+# (nom, produit, famille, unité, base, poste) : retrait (exclu en catégorie 10) et
+# affectation aux facteurs (effectif Facteur Distributeur) compris
+TACHES_BDD = [
+    ("Retrait colis", "AMANA RECU", "GUICHET", "colis", "100", 0),
+    ("Affectation aux facteurs", "CO ARRIVE", "DISTRIBUTION LOCALE", "courrier", "100", 1),
+    ("Tri", "CO ARRIVE", "ARRIVEE CAMION PRINCIPAL", "courrier", "100", 0),
+    ("Comptage Colis", "AMANA RECU", "ARRIVEE CAMION PRINCIPAL", "colis", "100", 0),
+    ("Distribution", "CR ARRIVE", "DISTRIBUTION LOCALE", "courrier", "100", 1),
+    ("Chargement facteur", "CO ARRIVE", "DISTRIBUTION LOCALE", "courrier", "100", 1),
+    ("Opération guichet dépôt", "AMANA DEPOT", "GUICHET", "colis", "60", 0),
+]
+
+
+def _volumes_bdd(k):
+    return VolumesUIInput(volumes_flux=[
+        VolumeItem(flux=f, sens=s, segment=g, volume=1000.0 * k * (i + 1))
+        for i, (f, s, g) in enumerate([
+            ("AMANA", "GUICHET", "RECU"), ("AMANA", "ARRIVEE", "PART"), ("AMANA", "ARRIVEE", "GLOBAL"),
+            ("AMANA", "GUICHET", "DEPOT"), ("CO", "ARRIVEE", "GLOBAL"), ("CR", "ARRIVEE", "GLOBAL"),
+        ])
+    ], pct_retour=25)
+
+
+def _base_centres():
+    """Centres (id, catégorie, effectif Facteur Distributeur) ; le centre 4 n'a aucune tâche."""
+    db = sqlite_session()
+    for pid, label, tp in POSTES[:2] + [(2, "CHEF", "MOI")]:
+        db.add(m.Poste(id=pid, Code=f"P{pid}", label=label, type_poste=tp))
+    db.add_all([m.Categorie(id=10, label="CTD"), m.Categorie(id=2, label="CM")])
+    tid = 1
+    for cid, cat, fd in [(1, 10, 4), (2, 2, 7), (3, 10, 0), (4, None, 2)]:
+        postes = [(cid * 10 + 1, 1, 3), (cid * 10 + 2, 3, fd), (cid * 10 + 3, 2, 1)]
+        add_centre(db, cid, categorie_id=cat, postes=postes)
+        for k, (nom, produit, famille, unite, base, i) in enumerate(TACHES_BDD if cid != 4 else []):
+            db.add(m.Tache(
+                id=tid, centre_poste_id=postes[i][0], nom_tache=nom, produit=produit, famille_uo=famille,
+                unite_mesure=unite, base_calcul=base, moy_sec=str(20 + 7 * k + cid), moyenne_min=(20 + 7 * k + cid) / 60, ordre=k
+            ))
+            tid += 1
+    db.commit()
+    return db
+
+
+def test_multi_centres_identique_au_calcul_par_centre():
+    db = _base_centres()
+    ids = [3, 1, 2, 4]
+    volumes = {cid: _volumes_bdd(2 if cid == 3 else 1) for cid in ids}
+    multi = S.calculer_simulation_multi_centres_data_driven(
+        db, ids, _volumes_bdd(1), productivite=90, idle_minutes=15, volumes_par_centre={3: volumes[3]}, avec_details=True
+    )
+    assert [c.centre_id for c in multi.centres] == ids
+    details = {}
+    for d in multi.details_taches:
+        details[(d.centre_poste_id, d.task)] = d
+    for cr in multi.centres:
+        seul = S.calculer_simulation_centre_data_driven(db, cr.centre_id, volumes[cr.centre_id], productivite=90, idle_minutes=15)
+        assert abs(cr.total_heures - seul.total_heures) < 1e-9, cr.centre_id
+        assert [p.model_dump() for p in cr.postes] == [p.model_dump() for p in sorted(seul.postes, key=lambda p: p.id)]
+        assert sorted(repr(d.model_dump()) for d in seul.details_taches) == sorted(
+            repr(d.model_dump()) for d in multi.details_taches if d.centre_poste_id // 10 == cr.centre_id
+        )
+
+    # Catégorie 10 : pas de % retour sur le retrait ; effectif FD propre à chaque centre
+    assert "(Exclu CTD)" in details[(11, "Retrait colis")].formule
+    assert "(Retrait/Retour)" in details[(21, "Retrait colis")].formule
+    assert (details[(12, "Affectation aux facteurs")].nombre_unite, details[(22, "Affectation aux facteurs")].nombre_unite) == (4.0, 7.0)
+    assert (32, "Affectation aux facteurs") not in details
+    assert multi.centres[3].total_heures == 0.0
+
+    # Consolidation : une ligne par poste du référentiel, sans centre_poste
+    assert [(p.id, p.centre_poste_id) for p in multi.postes] == [(1, None), (2, None), (3, None)]
+    assert [p.effectif_actuel for p in multi.postes] == [12.0, 4.0, 13.0]
+    assert abs(sum(p.total_heures for p in multi.postes) - multi.total_heures) < 1e-9
+
+
+def test_cci_consolide_par_poste():
+    """Le CCI (moteur dédié) rejoint les lignes consolidées de ses postes du référentiel."""
+    db = _base_centres()
+    add_centre(db, 1952, postes=[(19521, 1, 5), (19522, 3, 2)])
+    moteur = S.calculer_simulation_centre_data_driven
+
+    def cci(db_, centre_id, volumes_ui, **kw):
+        if centre_id != 1952:
+            return moteur(db_, centre_id, volumes_ui, **kw)
+        postes = [
+            PosteResultat(id=1, centre_poste_id=19521, poste_label="AGENT OP", etp_calcule=1.5, etp_arrondi=2, total_heures=10.0, effectif_actuel=5),
+            PosteResultat(id=3, centre_poste_id=19522, poste_label="FACTEUR DISTRIBUTEUR", etp_calcule=0.5, etp_arrondi=1, total_heures=4.0, effectif_actuel=2),
+        ]
+        return SimulationResponse(total_heures=14.0, fte_calcule=2.0, fte_arrondi=2, heures_net_jour=7.0, details_taches=[],
+                                  heures_par_poste={19521: 10.0, 19522: 4.0}, postes=postes)
+
+    S.calculer_simulation_centre_data_driven = cci
+    try:
+        multi = S.calculer_simulation_multi_centres_data_driven(db, [1, 1952], _volumes_bdd(1))
+    finally:
+        S.calculer_simulation_centre_data_driven = moteur
+    consolides = {p.id: p for p in multi.postes}
+    assert sorted(consolides) == [1, 2, 3]
+    assert consolides[1].effectif_actuel == 3 + 5 and consolides[3].effectif_actuel == 4 + 2
+    assert abs(consolides[1].total_heures - (multi.centres[0].postes[0].total_heures + 10.0)) < 1e-9
+    assert all(p.centre_poste_id is None for p in multi.postes)
+
+
+if __name__ == "__main__":
+    test_job_centre_sans_bdd()
+    test_jobs_repartis_sur_le_pool()
+    test_multi_centres_identique_au_calcul_par_centre()
+    test_cci_consolide_par_poste()
+    print("[OK] Multi-centres data-driven")
@@ -0,0 +1,116 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.models import VolumesInput
+from app.services import national_cube
+from app.services.direction_engine import FLUX_LABELS, compile_direction_plan, evaluate_direction_plan_par_flux
+from app.services.national_cube import CubeBuilder, CubeDimensions, NationalCube, slice_cube
+from app.services.simulation import contexte_volumes
+
+import test_direction_engine as T
+
+POSTES = {1: ("AGENT OP", "MOD"), 2: ("FACTEUR", "MOD"), 3: ("CHEF", "MOI"), 4: ("TRIEUR", "MOD")}
+
+
+def _dims(centre_ids):
+    centres = [{
+        "id": cid, "label": f"Centre {cid}", "typologie": ["CM", "CTD", None][cid % 3],
+        "direction_id": 1 + cid % 4, "direction_label": f"DR {1 + cid % 4}",
+        "region_id": 1 + cid % 2, "region_label": f"R{1 + cid % 2}",
+    } for cid in centre_ids]
+    cps = [{
+        "id": cid * 10 + k, "centre_id": cid, "poste_label": POSTES[k][0], "type_poste": POSTES[k][1], "actuel": (cid + k) % 4,
+    } for cid in centre_ids for k in POSTES]
+    actuel = {}
+    for cp in cps:
+        actuel[cp["centre_id"]] = actuel.get(cp["centre_id"], 0.0) + cp["actuel"]
+    return CubeDimensions(
+        centres=centres, centre_postes=cps, directions=[], total_actuel=float(sum(cp["actuel"] for cp in cps)),
+        actuel_par_centre=actuel, centre_by_id={c["id"]: c for c in centres},
+    )
+
+
+def _cube():
+    rnd = random.Random(11)
+    tasks_by_centre = {cid: T._taches(rnd, cid, rnd.randint(5, 40)) for cid in range(1, 31)}
+    volumes, annuels = T.SCENARIOS[0]
+    contexts = {cid: contexte_volumes(VolumesInput(**volumes), 85.0, None, 20.0, volumes_annuels=annuels) for cid in tasks_by_centre}
+    plan = compile_direction_plan(tasks_by_centre, regroup=False)
+    results, ventilation = evaluate_direction_plan_par_flux(plan, contexts)
+
+    dims = _dims(list(range(1, 36)))   # 5 centres sans simulation
+    builder = CubeBuilder(dims, FLUX_LABELS)
+    for cid, res in results.items():
+        builder.ajouter_centre(cid, res.fte_calcule, res.total_heures, res.heures_net_jour, ventilation.get(cid, []))
+    return builder.construire("run-test", {"facteur_scenario": 1.0}), results, ventilation, dims
+
+
+def _check_slices(cube, results, dims):
+    total_etp = sum(r.fte_calcule for r in results.values())
+    par_direction = slice_cube(cube, "direction")
+    assert sum(r["centres"] for r in par_direction) == 35
+    assert abs(sum(r["etp_calcule"] for r in par_direction) - total_etp) < 0.05
+    assert sum(r["etp_actuel"] for r in par_direction) == dims.total_actuel
+
+    # Direction 2 : mêmes totaux que ses centres
+    d2 = [r for r in par_direction if r["cle"] == 2][0]
+    centres_d2 = [c["id"] for c in dims.centres if c["direction_id"] == 2]
+    assert d2["centres"] == len(centres_d2)
+    assert abs(d2["etp_calcule"] - sum(results[c].fte_calcule for c in centres_d2 if c in results)) < 0.01
+    assert slice_cube(cube, "centre", {"direction_id": 2}) and all(
+        r["cle"] in centres_d2 for r in slice_cube(cube, "centre", {"direction_id": 2})
+    )
+
+    # Poste : effectif actuel de tous les centres, ETP des faits
+    facteur = [r for r in slice_cube(cube, "poste") if r["cle"] == "FACTEUR"][0]
+    assert facteur["etp_actuel"] == sum(cp["actuel"] for cp in dims.centre_postes if cp["poste_label"] == "FACTEUR")
+    assert facteur["type_poste"] == "MOD"
+
+    # Flux : somme des heures = heures totales ; pas d'effectif actuel par flux
+    par_flux = slice_cube(cube, "flux")
+    assert abs(sum(r["heures"] for r in par_flux) - sum(r.total_heures for r in results.values())) < 0.5
+    assert all(r["etp_actuel"] is None for r in par_flux)
+    co_facteur = slice_cube(cube, "centre", {"flux": "co", "poste": "Facteur"})
+    assert all(r["etp_actuel"] is None for r in co_facteur)
+
+
+def test_ventilation_par_flux_coherente():
+    _, results, ventilation, _ = _cube()
+    for cid, res in results.items():
+        par_poste = {}
+        for cp, flux, heures in ventilation.get(cid, []):
+            assert flux in FLUX_LABELS
+            par_poste[cp] = par_poste.get(cp, 0.0) + heures
+        assert par_poste.keys() == res.heures_par_poste.keys()
+        for cp, heures in res.heures_par_poste.items():
+            assert abs(par_poste[cp] - heures) < 1e-6
+
+
+def test_cube_slices_et_serialisation():
+    cube, results, _, dims = _cube()
+    _check_slices(cube, results, dims)
+    copie = NationalCube.from_bytes(cube.to_bytes())
+    for by in national_cube.AXES:
+        assert slice_cube(copie, by) == slice_cube(cube, by)
+
+
+def test_cube_slices_sans_numpy():
+    cube, results, _, dims = _cube()
+    original = national_cube.np
+    national_cube.np = None
+    try:
+        attendu = {by: slice_cube(NationalCube.from_bytes(cube.to_bytes()), by) for by in national_cube.AXES}
+        _check_slices(cube, results, dims)
+    finally:
+        national_cube.np = original
+    for by in national_cube.AXES:
+        assert slice_cube(cube, by) == attendu[by]
+
+
+if __name__ == "__main__":
+    test_ventilation_par_flux_coherente()
+    test_cube_slices_et_serialisation()
+    test_cube_slices_sans_numpy()
+    print("[OK] Cube national")
@@ -0,0 +1,168 @@
+import sys
+import os
+import pickle
+import threading
+import time
+import io
+import asyncio
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services import referentiel_snapshot as snap
+from app.services import bandoeng_engine
+from app.services import direction_engine
+from app.models import db_models as m
+
+from sqlite_db import sqlite_session, add_centre
+
+settings.REDIS_ENABLED = False  # Aucune connexion Redis en arrière-plan pendant les tests
+
+
+def _counting_loader(calls):
+    def loader(db):
+        calls.append(db)
+        return snap.FrozenDict(n=len(calls))
+    return loader
+
+
+def test_rechargement_uniquement_apres_bump():
+    calls = []
+    loader = _counting_loader(calls)
+    a = snap._section("mappings", "db1", loader)
+    b = snap._section("mappings", "db2", loader)
+    assert a is b and len(calls) == 1
+
+    v_postes = snap.referentiel_version("postes")
+    snap.bump_referentiel_version("mappings")
+    assert snap.referentiel_version("postes") == v_postes  # Les autres sections ne bougent pas
+    c = snap._section("mappings", "db3", loader)
+    assert c == {"n": 2} and len(calls) == 2
+
+
+def test_frozen_dict():
+    d = snap.FrozenDict(a=1)
+    for op in (lambda: d.__setitem__("b", 2), lambda: d.update(b=2), lambda: d.pop("a"), d.clear):
+        try:
+            op()
+            assert False, "écriture acceptée"
+        except TypeError:
+            pass
+    copie = pickle.loads(pickle.dumps(d))  # Jobs batch envoyés aux processus
+    assert copie == {"a": 1} and type(copie) is dict
+
+
+def test_sections_inconnues():
+    try:
+        snap.bump_referentiel_version("inconnue")
+        assert False
+    except ValueError:
+        pass
+
+
+def test_plan_bandoeng_invalide_par_version():
+    loads = []
+
+    def fake_load(db, centre_id, poste_code=None, role_mapping=None):
+        loads.append(centre_id)
+        return object()
+
+    original = bandoeng_engine.load_bandoeng_plan
+    bandoeng_engine.load_bandoeng_plan = fake_load
+    try:
+        p1 = bandoeng_engine.get_bandoeng_plan(None, 42)
+        assert bandoeng_engine.get_bandoeng_plan(None, 42) is p1
+        snap.bump_referentiel_version("exclusions")
+        assert bandoeng_engine.get_bandoeng_plan(None, 42) is p1
+        snap.bump_referentiel_version("taches")
+        assert bandoeng_engine.get_bandoeng_plan(None, 42) is not p1
+        assert loads == [42, 42]
+    finally:
+        bandoeng_engine.load_bandoeng_plan = original
+
+
+class FakePubSub:
+    def __init__(self):
+        self.messages = []
+
+    def subscribe(self, channel):
+        self.channel = channel
+
+    def get_message(self, ignore_subscribe_messages=True, timeout=1.0):
+        if self.messages:
+            return {"type": "message", "data": self.messages.pop(0)}
+        time.sleep(0.01)
+        return None
+
+
+def test_invalidation_inter_processus():
+    pubsub = FakePubSub()
+    t = threading.Thread(target=snap._listen, args=(pubsub,), daemon=True)
+    t.start()
+    for _ in range(100):
+        if snap.referentiel_partage():
+            break
+        time.sleep(0.01)
+    assert snap.referentiel_partage()
+
+    v = snap.referentiel_version("sites", "postes")
+    pubsub.messages.append(f"{snap._ORIGIN}:sites")   # Message de ce processus : ignoré
+    pubsub.messages.append("autre-worker:sites")
+    for _ in range(100):
+        if snap.referentiel_version("sites")[0] != v[0]:
+            break
+        time.sleep(0.01)
+    assert snap.referentiel_version("sites", "postes") == (v[0] + 1, v[1])
+
+    snap._listener_stop.set()
+    t.join(timeout=5)
+    snap._listener_stop.clear()
+    assert not snap.referentiel_partage()
+
+
+def _excel_cndp(taches):
+    import pandas as pd
+    out = io.BytesIO()
+    pd.DataFrame(taches).to_excel(out, index=False)
+    return out.getvalue()
+
+
+def test_import_cndp_invalide_les_plans():
+    """Import CNDP : plans Bandoeng / direction rechargés, même sans expiration (pub/sub actif)."""
+    from fastapi import UploadFile
+    from app.api.cndp_router import import_cndp_tasks
+
+    db = sqlite_session()
+    db.add(m.Poste(id=1, Code="AG", label="AGENT OP", type_poste="MOD"))
+    add_centre(db, 1965, postes=[(10, 1, 2)])
+    db.add(m.Tache(id=1, centre_poste_id=10, nom_tache="Ancienne", unite_mesure="Colis", moyenne_min="1"))
+    db.commit()
+
+    snap._listener_alive.set()  # Caches sans TTL : seule la version invalide
+    try:
+        plan_b = bandoeng_engine.get_bandoeng_plan(db, 1965)
+        plan_d = direction_engine.get_direction_plan(db, [1965])
+        assert len(plan_d.slot_keys) == 1
+
+        contenu = _excel_cndp([
+            {"nom_tache": "Tri", "responsable 1": "AGENT OP", "unite_mesure": "Colis", "moyenne_min": 0.5},
+            {"nom_tache": "Saisie", "responsable 1": "NOUVEAU POSTE", "unite_mesure": "Colis", "moyenne_min": 0.2},
+        ])
+        res = asyncio.run(import_cndp_tasks(UploadFile(io.BytesIO(contenu), filename="cndp.xlsx"), centre_id=1965, db=db))
+        assert res["imported_tasks"] == 2
+
+        assert bandoeng_engine.get_bandoeng_plan(db, 1965) is not plan_b
+        plan_d2 = direction_engine.get_direction_plan(db, [1965])
+        assert plan_d2 is not plan_d
+        assert len(plan_d2.slot_keys) == 2  # Deux postes : AGENT OP et le poste créé
+    finally:
+        snap._listener_alive.clear()
+
+
+if __name__ == "__main__":
+    test_rechargement_uniquement_apres_bump()
+    test_frozen_dict()
+    test_sections_inconnues()
+    test_plan_bandoeng_invalide_par_version()
+    test_invalidation_inter_processus()
+    test_import_cndp_invalide_les_plans()
+    print("[OK] Snapshot référentiel")
@@ -0,0 +1,110 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text
+
+from app.api import scoring
+from app.models import db_models as m
+from app.models import scoring_models as sm
+from app.services.scoring_rules import ScoringService
+from app.services.simulation import calculer_simulation
+
+from sqlite_db import sqlite_session, add_centre
+
+UNITES = ["Sac", "Colis", "courrier", "Envoi"]
+PRODUITS = [None, "AMANA", "CO", "CR", "LRH"]
+CAMPAGNE = "SCORING-TEST"
+
+
+def _base(n_centres=9):
+    """
+    Centres 1..n : le 4 a un poste sans tâche, le 7 n'a aucun poste ; le 6 est supprimé
+    mais ses postes et tâches restent (groupe du flux sans centre) ; catégories variées.
+    """
+    db = sqlite_session()
+    for cat_id, label in [(1, "Classe A"), (2, "Classe C"), (3, "Classe D")]:
+        db.add(m.Categorisation(id_categorisation=cat_id, label=label))
+    for pid, label in [(1, "AGENT OP"), (2, "FACTEUR")]:
+        db.add(m.Poste(id=pid, Code=label[:3], label=label, type_poste="MOD"))
+    rnd = random.Random(20)
+    tid = 1
+    # Ordre d'insertion différent de l'ordre des id (le curseur trie par centre)
+    for cid in rnd.sample(range(1, n_centres + 1), n_centres):
+        postes = [] if cid == 7 else [(cid * 10 + 1, 1, 2), (cid * 10 + 2, 2, 3)]
+        add_centre(db, cid, postes=postes)
+        db.get(m.Centre, cid).id_categorisation = [None, 1, 2, 3][cid % 4]
+        if cid == 4:
+            continue
+        for cp_id, _, _ in postes:
+            for _ in range(rnd.randint(2, 15)):
+                db.add(m.Tache(
+                    id=tid, centre_poste_id=cp_id, nom_tache=f"T{tid}", unite_mesure=rnd.choice(UNITES),
+                    produit=rnd.choice(PRODUITS), moyenne_min=str(round(rnd.uniform(0.5, 30.0), 3)),
+                ))
+                tid += 1
+    db.add(sm.ScoringCampaign(id=CAMPAGNE, scope_type="all"))
+    db.commit()
+    db.execute(text("DELETE FROM dbo.centres WHERE id = 6"))
+    db.commit()
+    return db
+
+
+def _reference(db, centre):
+    """Ancien calcul : une requête de tâches par centre."""
+    taches = db.query(m.Tache).join(m.CentrePoste).filter(m.CentrePoste.centre_id == centre.id).all()
+    seed = centre.id * 12345
+    volumes = {
+        "courrier_ordinaire": 10000 + (seed % 100000), "courrier_recommande": 5000 + (seed % 50000),
+        "colis": 1000 + (seed % 20000), "amana": 500 + (seed % 10000), "ebarkia": 100 + (seed % 2000),
+        "lrh": 50 + (seed % 500), "sacs": 0, "colis_amana_par_sac": 5, "courriers_par_sac": 4500,
+    }
+    sim = calculer_simulation(
+        taches=[{a.key: getattr(t, a.key) for a in m.Tache.__mapper__.column_attrs} for t in taches],
+        volumes=volumes, productivite=80.0, volumes_annuels=volumes
+    )
+    output = ScoringService.calculate_score({**volumes, "effectif_global": sim.fte_arrondi})
+    cat = centre.categorisation.label if centre.categorisation else "SANS"
+    return sim.fte_arrondi, output, ScoringService.determine_impact(cat, output["simulated_class"])
+
+
+def test_campagne_identique_au_calcul_par_centre():
+    db = _base()
+    chunk, batch = scoring.CAMPAIGN_INSERT_CHUNK, scoring.CAMPAIGN_STREAM_BATCH
+    scoring.CAMPAIGN_INSERT_CHUNK, scoring.CAMPAIGN_STREAM_BATCH = 2, 5  # Plusieurs paquets d'insertion et de lecture
+    try:
+        res = scoring.run_campaign(CAMPAGNE, db=db)
+    finally:
+        scoring.CAMPAIGN_INSERT_CHUNK, scoring.CAMPAIGN_STREAM_BATCH = chunk, batch
+    assert res["results_count"] == 8  # 4 paquets de 2 résultats
+
+    db.expire_all()
+    resultats = db.query(sm.ScoringResult).filter(sm.ScoringResult.campaign_id == CAMPAGNE).order_by(sm.ScoringResult.id).all()
+    assert [r.centre_id for r in resultats] == [1, 2, 3, 4, 5, 7, 8, 9]
+
+    stats = {"total": 0, "impacted": 0, "promotions": 0, "downgrades": 0, "stable": 0}
+    etps = set()
+    for r in resultats:
+        etp, output, impact = _reference(db, db.get(m.Centre, r.centre_id))
+        etps.add(etp)
+        assert (r.effectif_input, r.global_score, r.simulated_class, r.impact) == \
+               (etp, output["global_score"], output["simulated_class"], impact), r.centre_id
+
+        details = db.query(sm.ScoringDetail).filter(sm.ScoringDetail.result_id == r.id).order_by(sm.ScoringDetail.id).all()
+        assert [(d.indicator_key, d.value, d.points, d.score) for d in details] == \
+               [(d["key"], d["value"], d["points"], d["score"]) for d in output["details"]], r.centre_id
+
+        stats["total"] += 1
+        stats["promotions"] += impact == "Promotion"
+        stats["downgrades"] += impact == "Reclassement"
+        stats["stable"] += impact not in ("Promotion", "Reclassement")
+        stats["impacted"] += impact != "Stable"
+    assert res["summary"] == stats
+    assert len(etps) > 1 and 0 in etps  # Centres sans tâche compris
+    assert db.query(sm.ScoringDetail).count() == sum(len(r.details) for r in resultats)
+
+
+if __name__ == "__main__":
+    test_campagne_identique_au_calcul_par_centre()
+    print("[OK] Campagne de scoring")
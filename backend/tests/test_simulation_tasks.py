@@ -0,0 +1,123 @@
+import sys
+import os
+import json
+import base64
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.core.celery_app import celery_app
+
+# Mode eager : tâches exécutées dans le processus, résultats en mémoire
+settings.REDIS_ENABLED = False
+celery_app.conf.update(task_always_eager=True, broker_url="memory://", result_backend="cache+memory://")
+
+from app.api import batch_simulation
+from app.tasks import simulation_tasks
+
+
+REGIONS = {1: "Casa", 2: "Rabat", 3: "Fès"}
+
+
+def _workbook(n):
+    """Classeur factice : le parse est remplacé, seul le nombre d'onglets compte."""
+    return base64.b64encode(json.dumps({"n": n}).encode()).decode()
+
+
+def _fake_parse(db, content, region_id):
+    n = json.loads(content)["n"]
+    entries = []
+    for cid in range(1, n + 1):
+        rid = cid % 3 + 1
+        if region_id and rid != region_id:
+            continue
+        centre = {"id": cid, "label": f"C{cid}", "categorie_id": None, "region_id": rid, "region_label": REGIONS[rid]}
+        entries.append({"sheet": f"C{cid}", "centre": centre, "raw_params": {}, "grid": {}})
+    return entries, [{"sheet": "Inconnu", "error": "Centre non trouvé (matching strict onglet)"}]
+
+
+def _fake_prefetch(db, entries):
+    return {"entries": entries}
+
+
+def _fake_jobs(prefetch, process_mode, mode_ctx, plans=None):
+    return [{"centre_id": e["centre"]["id"], "centre": e["centre"]} for e in prefetch["entries"]]
+
+
+def _fake_compute(jobs, force=False):
+    for i, job in enumerate(jobs):
+        c = job["centre"]
+        if c["id"] == 7:
+            yield i, {"error": "calcul impossible", "sheet": c["label"], "centre": c["label"]}, False
+            continue
+        res = {
+            "centre_id": c["id"], "centre_label": c["label"],
+            "region_id": c["region_id"], "region_label": c["region_label"],
+            "fte_calcule": c["id"] * 1.5, "fte_arrondi": int(round(c["id"] * 1.5)),
+        }
+        yield i, res, c["id"] % 2 == 0
+
+
+def _patched(fn):
+    def wrapper():
+        originals = (
+            batch_simulation._parse_batch_workbook, batch_simulation._prefetch_centres,
+            batch_simulation._build_batch_jobs, simulation_tasks.iter_centres_incremental,
+            simulation_tasks.progress_meta, settings.CELERY_CHUNK_SIZE,
+        )
+        batch_simulation._parse_batch_workbook = _fake_parse
+        batch_simulation._prefetch_centres = _fake_prefetch
+        batch_simulation._build_batch_jobs = _fake_jobs
+        simulation_tasks.iter_centres_incremental = _fake_compute
+        settings.CELERY_CHUNK_SIZE = 3
+        seen = []
+
+        def meta(done, total, status, **extra):
+            seen.append((done, total))
+            return originals[4](done, total, status, **extra)
+
+        simulation_tasks.progress_meta = meta
+        try:
+            fn(seen)
+        finally:
+            (batch_simulation._parse_batch_workbook, batch_simulation._prefetch_centres,
+             batch_simulation._build_batch_jobs, simulation_tasks.iter_centres_incremental,
+             simulation_tasks.progress_meta, settings.CELERY_CHUNK_SIZE) = originals
+    wrapper.__name__ = fn.__name__
+    return wrapper
+
+
+@_patched
+def test_batch_nationale_fan_out(seen):
+    result = simulation_tasks.async_batch_simulation.delay(_workbook(10), None, "actuel", False)
+    out = result.get()
+    data = out["data"]
+
+    # Progression : compteur réel des centres terminés (4 paquets de 3 max)
+    assert seen[0] == (0, 10)
+    assert [d for d, _ in seen[1:]] == list(range(1, 11))
+
+    # Ordre des onglets conservé, erreurs de parse + de calcul remontées
+    assert [c["centre_id"] for c in data["par_centre"]] == [1, 2, 3, 4, 5, 6, 8, 9, 10]
+    assert len(data["errors"]) == 2
+    assert data["national"]["nb_centres"] == 9
+    assert data["national"]["total_fte_calcule"] == round(sum(c * 1.5 for c in (1, 2, 3, 4, 5, 6, 8, 9, 10)), 2)
+    assert {r["region_id"]: r["nb_centres"] for r in data["par_region"]} == {1: 3, 2: 3, 3: 3}
+    assert data["incremental"]["reutilises"] == 5
+    assert out["task_id"] == result.id and not simulation_tasks._progress
+
+
+@_patched
+def test_batch_regionale_et_vide(seen):
+    out = simulation_tasks.async_batch_simulation.delay(_workbook(10), 2, "actuel", False).get()
+    assert {c["region_id"] for c in out["data"]["par_centre"]} == {2}
+    assert out["region_id"] == 2
+
+    vide = simulation_tasks.async_batch_simulation.delay(_workbook(0), None, "actuel", False).get()
+    assert vide["data"]["national"]["nb_centres"] == 0
+    assert len(vide["data"]["errors"]) == 1
+
+
+if __name__ == "__main__":
+    test_batch_nationale_fan_out()
+    test_batch_regionale_et_vide()
+    print("[OK] Pipeline Celery batch")
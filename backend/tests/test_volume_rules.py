@@ -0,0 +1,167 @@
+import sys
+import os
+import io
+import json
+import hashlib
+import contextlib
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.schemas.volumes_ui import VolumesUIInput, VolumeItem
+from app.services.simulation_data_driven import (
+    VolumeContext, _calculer_volume_raw, resoudre_regle_volume, HANDLERS_VOLUME
+)
+
+# Empreintes de référence (une par produit) : tout écart de volume, facteur ou chemin UI les casse.
+# Régénérer volontairement avec : python tests/test_volume_rules.py --update
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden", "volume_rules.json")
+
+PRODUITS = [
+    "AMANA RECU", "AMANA REÇU", "AMANA ARRIVÉ", "AMANA ARRIVE",
+    "AMANA DEPOT", "AMANA DÉPÔT", "AMANA DEPÔT", "AMANA DÉPOT", "AMANA DEPOT AXE",
+    "AMANA DEPOT INTERNATIONAL", "AMANA DÉPÔT INTERNATIONAL", "BARID PRO AMANA DEPOT INTERNATIONAL",
+    "ARRIVEE CAMIONS AXES", "ARRIVÉE CAMIONS AXES", "CAMION AXE", "COLIS",
+    "CO ARRIVE", "CO ARRIVÉ", "COURRIER ORDINAIRE ARRIVE", "CO DEPART", "CO DÉPART", "CO MED",
+    "CR ARRIVE", "CR ARRIVÉ", "COURRIER RECOMMANDE ARRIVE", "CR DEPART", "CR MED",
+    "E-BARKIA ARRIVE", "EBARKIA ARRIVÉ", "E BARKIA DEPART", "E-BARKIA DÉPART",
+    "LRH", "AMANA EXPORT", "CR", "DIVERS", "",
+]
+
+FAMILLES = [
+    "ARRIVÉE CAMION PRINCIPAL", "DÉPART AXES", "GUICHET", "DISTRIBUTION LOCALE", "COLLECTE",
+    "DÉPART CAMION PRINCIPAL", "ARRIVEE CAMIONS AXES", "RETOUR INFO", "REPORTING", "TRI", "",
+]
+
+NOMS = [
+    "Comptage colis", "Rapprochement", "Chargement facteur", "Appel client",
+    "Opération guichet dépôt", "Retrait colis", "Récupération", "Affectation aux facteurs",
+    "Contrôle états non distribués", "Confirmation", "Déchargement facteur", "Recouvrement",
+    "Tri international", "Tri",
+]
+
+UNITES = ["COLIS", "SAC", "CAISSON", "COURRIER", "PLI", "LETTRE", "DEPECHE", "FACTEUR", "ETAT", ""]
+BASES = ["100", "60", "40", "50%"]
+PHASES = ["", "INTERNATIONAL", "CIRCUL_MARCH", "CIRCUL_COLLECT", "MARCHE", "day_350"]
+POSTES = ["AGENT TRAITEMENT", "FACTEUR", "MANUTENTIONNAIRE", "FACTEUR DISTRIBUTEUR", "CHEF D'AGENCE"]
+
+
+class MockPoste:
+    def __init__(self, label):
+        self.label = label
+
+
+class MockCentrePoste:
+    def __init__(self, label):
+        self.poste = MockPoste(label)
+
+
+class MockTache:
+    def __init__(self, id, produit, famille, nom, unite, base, phase, poste):
+        self.id = id
+        self.produit = produit
+        self.famille_uo = famille
+        self.nom_tache = nom
+        self.unite_mesure = unite
+        self.base_calcul = base
+        self.phase = phase
+        self.etat = "A"
+        self.moy_sec = 30.0
+        self.centre_poste = MockCentrePoste(poste)
+
+
+def _context():
+    items = []
+    for i, flux in enumerate(["AMANA", "CO", "CR", "EBARKIA", "LRH"]):
+        for j, sens in enumerate(["ARRIVEE", "DEPART", "GUICHET"]):
+            for k, segment in enumerate(["GLOBAL", "PART", "PRO", "DIST", "AXES", "DEPOT", "RECUP"]):
+                items.append(VolumeItem(flux=flux, sens=sens, segment=segment, volume=float(100000 + 7919 * i + 1013 * j + 97 * k)))
+    volumes = VolumesUIInput(
+        volumes_flux=items, pct_axes_arrivee=0.3, pct_axes_depart=0.4,
+        pct_retour=12.0, pct_international=15.0, pct_national=70.0, pct_collecte=20.0
+    )
+    return VolumeContext(volumes)
+
+
+def _cases():
+    n = 0
+    for produit in PRODUITS:
+        for famille in FAMILLES:
+            for nom in NOMS:
+                n += 1
+                yield MockTache(
+                    n, produit, famille, nom,
+                    UNITES[n % len(UNITES)], BASES[(n // len(UNITES)) % len(BASES)],
+                    PHASES[(n // 3) % len(PHASES)], POSTES[(n // 7) % len(POSTES)]
+                )
+
+
+def _digests():
+    ctx = _context()
+    digests = {}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for t in _cases():
+            try:
+                res = repr(_calculer_volume_raw(t, ctx))
+            except Exception as e:
+                res = f"ERR {type(e).__name__}"
+            h = digests.setdefault(t.produit, hashlib.sha256())
+            h.update(f"{t.famille_uo}|{t.nom_tache}|{t.unite_mesure}|{t.base_calcul}|{t.phase}|{res}\n".encode("utf-8"))
+    return {k: v.hexdigest() for k, v in digests.items()}
+
+
+def test_volume_rules_golden(tmp_path, monkeypatch):
+    """Le résolveur produit→volume reproduit exactement les résultats de référence."""
+    monkeypatch.chdir(tmp_path)  # trace_calcul.log
+    with open(GOLDEN_PATH, encoding="utf-8") as f:
+        golden = json.load(f)
+    got = _digests()
+    diff = sorted(p for p in set(golden) | set(got) if golden.get(p) != got.get(p))
+    assert not diff, f"Résultats modifiés pour les produits: {diff}"
+
+
+def test_resolution_priorite():
+    """L'ordre de REGLES_VOLUME fixe la priorité (International avant Dépôt standard)."""
+    assert resoudre_regle_volume("AMANA DEPOT", "", "Tri") is HANDLERS_VOLUME["AMANA_DEPOT"]
+    assert resoudre_regle_volume("AMANA DEPOT", "INTERNATIONAL", "Tri") is HANDLERS_VOLUME["AMANA_DEPOT_INTERNATIONAL"]
+    assert resoudre_regle_volume("AMANA DÉPÔT", "", "Tri international") is HANDLERS_VOLUME["AMANA_DEPOT_INTERNATIONAL"]
+    assert resoudre_regle_volume("ARRIVEE CAMIONS AXES", "", None) is HANDLERS_VOLUME["ARRIVEE_CAMIONS_AXES"]
+    assert resoudre_regle_volume("CO MED", "", "Tri") is HANDLERS_VOLUME["CO_DEPART"]
+    assert resoudre_regle_volume("DIVERS", "", "Tri") is None
+
+
+def test_index_volumes_contexte():
+    """Index du contexte : insensible à la casse, 1re occurrence, repli GLOBAL, grille texte."""
+    items = [
+        VolumeItem(flux="amana", sens="arrivee", segment="part", volume=10.0),
+        VolumeItem(flux="AMANA", sens="ARRIVEE", segment="PART", volume=99.0),
+        VolumeItem(flux="AMANA", sens="ARRIVEE", segment="PRO", volume=5.0),
+        VolumeItem(flux="AMANA", sens="ARRIVEE", segment="GLOBAL", volume=1000.0),
+        VolumeItem(flux="CO", sens="DEPART", segment="GLOBAL", volume=300.0),
+        VolumeItem(flux="CO", sens="DEPART", segment="PART", volume=0.0),
+    ]
+    ctx = VolumeContext(VolumesUIInput(volumes_flux=items))
+    assert ctx.get_volume("Amana", "Arrivee", "Part") == 10.0
+    assert ctx.get_volume("AMANA", "ARRIVEE") == 1000.0
+    assert ctx.get_aggregated_volume("AMANA", "ARRIVEE") == 10.0 + 99.0 + 5.0
+    assert ctx.get_aggregated_volume("CO", "DEPART") == 300.0  # Somme nulle : repli sur GLOBAL
+    assert ctx.get_aggregated_volume("LRH", "DEPART") == 0.0
+
+    grille = {
+        "amana": {"import": {"national": "1 200,5", "international": "30%"}, "export": {"guichet": ""}},
+        "lrh": {"med": "abc", "arrive": 7},
+    }
+    ctx = VolumeContext(VolumesUIInput.model_construct(volumes_flux=[], grid_values=grille))
+    assert ctx.get_grid_volume_by_product("amana reçu") == 1200.5 + 30.0
+    assert ctx.get_grid_volume_by_product("AMANA RECU INTERNATIONAL") == 30.0
+    assert ctx.get_grid_volume_by_product("AMANA DEPART") == 0.0
+    assert ctx.get_grid_volume_by_product("LRH") == 0.0
+    assert ctx.get_grid_volume_by_product("LRH RECU") == 7.0
+    grille["lrh"]["arrive"] = 8  # Résolution mémorisée par contexte
+    assert ctx.get_grid_volume_by_product(" lrh recu ") == 7.0
+
+
+if __name__ == "__main__":
+    if "--update" in sys.argv:
+        os.makedirs(os.path.dirname(GOLDEN_PATH), exist_ok=True)
+        with open(GOLDEN_PATH, "w", encoding="utf-8") as f:
+            json.dump(_digests(), f, indent=2, ensure_ascii=False, sort_keys=True)
+        print(f"[OK] Références régénérées: {GOLDEN_PATH}")
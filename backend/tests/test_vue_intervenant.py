@@ -0,0 +1,100 @@
+import sys
+import os
+import random
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.api import views
+from app.models import db_models as m
+from app.services.simulation import calculer_simulation
+
+from sqlite_db import sqlite_session, add_centre
+
+UNITES = ["Sac", "Colis", "courrier", "Scellé", "Envoi", "Conteneur"]
+PHASES = [None, "Tri", "Distribution", "Collecte"]
+PRODUITS = [None, "AMANA", "CO", "CR", "LRH"]
+
+
+def _base(n_centres=4):
+    db = sqlite_session()
+    db.execute(text("ALTER TABLE dbo.centres ADD COLUMN cas REAL"))
+    for pid, label, tp in [(1, "AGENT OP", "MOD"), (2, "FACTEUR", "MOD"), (3, "CHEF", "MOI"), (4, "TRIEUR", "MOD")]:
+        db.add(m.Poste(id=pid, Code=label[:3], label=label, type_poste=tp))
+    rnd = random.Random(19)
+    tid = 1
+    for cid in range(1, n_centres + 1):
+        postes = [(cid * 10 + pid, pid, rnd.randint(0, 6)) for pid in (1, 2, 3, 4) if pid != cid % 4 + 1]
+        add_centre(db, cid, postes=postes)
+        for cp_id, _, _ in postes[:-1]:  # Le dernier poste reste sans tâche
+            for k in range(rnd.randint(3, 12)):
+                db.add(m.Tache(
+                    id=tid, centre_poste_id=cp_id, nom_tache=f"T{rnd.randint(0, 9)}", unite_mesure=rnd.choice(UNITES),
+                    phase=rnd.choice(PHASES), produit=rnd.choice(PRODUITS), ordre=rnd.choice([None, 1, 2, 3]),
+                    moyenne_min=str(round(rnd.uniform(0.05, 4.0), 3)), base_calcul=rnd.choice([None, "60", "100"]),
+                ))
+                tid += 1
+    db.execute(text("UPDATE dbo.centres SET cas = id * 1.5 WHERE id % 2 = 0"))
+    db.commit()
+    return db
+
+
+def _reference_par_poste(db, centre_id, poste_id, volumes_input, volumes_mensuels, productivite, heures_net):
+    """Ancienne vue : une requête et un appel moteur par poste."""
+    rows = db.execute(text("""
+        SELECT t.id, t.nom_tache, t.phase, t.unite_mesure, t.moyenne_min, t.min_min, t.moy_sec,
+               t.ordre, t.base_calcul, t.produit, t.centre_poste_id
+        FROM dbo.taches t
+        INNER JOIN dbo.centre_postes cp ON cp.id = t.centre_poste_id
+        WHERE cp.centre_id = :centre_id AND cp.poste_id = :poste_id
+        ORDER BY t.ordre, t.nom_tache
+    """), {"centre_id": centre_id, "poste_id": poste_id}).mappings().all()
+    return calculer_simulation(
+        taches=[dict(r) for r in rows], volumes=volumes_input, productivite=productivite,
+        heures_net_input=heures_net, volumes_mensuels=volumes_mensuels
+    )
+
+
+def test_ventilation_par_poste_identique_a_l_appel_par_poste():
+    db = _base()
+    for productivite, heures_net in [(100, None), (85, None), (90, 6.5)]:
+        volumes_input, volumes_mensuels = views._volumes_vue(120, 800, 15, 2_400_000, 300_000, 12_000, 6_000, 450_000)
+        vues = views._charger_vues_intervenant(db, [4, 1, 2, 3], volumes_input, volumes_mensuels, productivite, heures_net)
+        assert sorted(vues) == [1, 2, 3, 4]
+        n_non_nuls = 0
+        for cid, vue in vues.items():
+            assert vue.cas == (cid * 1.5 if cid % 2 == 0 else None)
+            assert [p.poste_label for p in vue.postes] == sorted(p.poste_label for p in vue.postes)
+            for p in vue.postes:
+                ref = _reference_par_poste(db, cid, p.poste_id, volumes_input, volumes_mensuels, productivite, heures_net)
+                assert (p.etp_calcule, p.etp_arrondi, p.total_heures) == (ref.fte_calcule, ref.fte_arrondi, ref.total_heures), (cid, p)
+                assert p.ecart == ref.fte_arrondi - p.effectif_actuel
+                n_non_nuls += p.total_heures > 0
+            assert vue.total_etp_arrondi == sum(p.etp_arrondi for p in vue.postes)
+        assert n_non_nuls > 0
+
+
+def test_batch_limite_et_ordre():
+    db = _base()
+    params = dict(sacs=10, colis=50, scelle=0, courrier_ordinaire=0, courrier_recommande=0, ebarkia=0, lrh=0, amana=0,
+                  productivite=100, heures_net=None, db=db)
+    try:
+        views.get_vue_intervenant_batch(centre_ids=list(range(1, views.MAX_CENTRES_BATCH + 2)), **params)
+        assert False, "batch de plus de 50 centres accepté"
+    except HTTPException as e:
+        assert e.status_code == 400
+
+    res = views.get_vue_intervenant_batch(centre_ids=[3, 1, 3], **params)
+    assert [v.centre_id for v in res] == [3, 1]
+    try:
+        views.get_vue_intervenant_batch(centre_ids=[1, 99], **params)
+        assert False, "centre inconnu accepté"
+    except HTTPException as e:
+        assert e.status_code == 404
+
+
+if __name__ == "__main__":
+    test_ventilation_par_poste_identique_a_l_appel_par_poste()
+    test_batch_limite_et_ordre()
+    print("[OK] Vue intervenant")